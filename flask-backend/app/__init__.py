@@ -4,10 +4,10 @@ from flask_cors import CORS
 from flask_restful import Api
 
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=['X-Next-Cursor', 'Upload-Offset'])
 app.config.from_object('app.config.Config')
 db = SQLAlchemy(app)
 
 api = Api(app)
 
-from . import routes
+from . import routes, commands
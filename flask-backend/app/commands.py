@@ -0,0 +1,81 @@
+import click
+from app import app
+from app.services.rollup_service import TaskRollupService
+from app.services.search_service import SearchService
+from app.services.embedding_service import EmbeddingService
+from app.services.tag_service import TagService
+from app.services.job_service import run_workers
+from app.services.upload_service import UploadService
+from app.services.token_service import TokenService
+from app.services.session_service import SessionService
+from app.services import document_service  # noqa: F401  registers the document job handler
+from app.services import ai_task_service  # noqa: F401  registers the AI job handlers
+
+
+@app.cli.command('rebuild-task-rollups')
+def rebuild_task_rollups():
+    """Recreate the task_rollups table from scratch"""
+    count = TaskRollupService.rebuild()
+    click.echo(f"Rebuilt {count} task rollup rows")
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Recreate the full-text search index from the searchable tables"""
+    count = SearchService.rebuild()
+    click.echo(f"Indexed {count} entities")
+
+
+@app.cli.command('rebuild-tag-index')
+def rebuild_tag_index():
+    """Recreate the entity_tags table from the tags JSON columns"""
+    count = TagService.rebuild()
+    click.echo(f"Indexed {count} entity tags")
+
+
+@app.cli.command('rebuild-embeddings')
+def rebuild_embeddings():
+    """Re-embed notes, documents and cheat sheets with the configured embedder"""
+    count = EmbeddingService.rebuild()
+    click.echo(f"Embedded {count} chunks")
+
+
+@app.cli.command('embed-pending')
+def embed_pending():
+    """Embed saved chunks still without a vector, e.g. after the embedder was unavailable"""
+    count = EmbeddingService.embed_pending()
+    click.echo(f"Embedded {count} chunks")
+
+
+@app.cli.command('run-worker')
+@click.option('--processes', type=int, default=None,
+              help='Worker processes (default: JOB_WORKER_PROCESSES)')
+@click.option('--queue', 'queues', multiple=True,
+              help='Only claim jobs from this queue (repeatable; default: all queues)')
+def run_worker(processes, queues):
+    """Run background job workers until interrupted"""
+    click.echo(f"Starting {processes or app.config['JOB_WORKER_PROCESSES']} job worker(s)")
+    run_workers(processes, list(queues) or None)
+
+
+@app.cli.command('purge-uploads')
+def purge_uploads():
+    """Delete expired resumable upload sessions and their partial files"""
+    count = UploadService.purge_expired()
+    click.echo(f"Purged {count} expired uploads")
+
+
+@app.cli.command('purge-revoked-tokens')
+def purge_revoked_tokens():
+    """Delete denylist entries of revoked tokens that have since expired"""
+    count = TokenService.purge_expired()
+    click.echo(f"Purged {count} expired revoked tokens")
+
+
+@app.cli.command('purge-sessions')
+@click.option('--batch-size', type=int, default=1000,
+              help='Sessions deleted per transaction (default: 1000)')
+def purge_sessions(batch_size):
+    """Delete expired login sessions, a batch at a time"""
+    count = SessionService.purge_expired(batch_size)
+    click.echo(f"Purged {count} expired sessions")
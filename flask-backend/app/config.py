@@ -15,11 +15,119 @@ class Config:
 
     # JWT configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', secrets.token_hex(32))
-    JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 86400))  # 24 hours in seconds
+    # Access tokens are short-lived; clients renew them at /api/auth/refresh with the rotating
+    # refresh token from login, without sending the password again
+    JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 900))  # 15 minutes in seconds
+    JWT_REFRESH_TOKEN_EXPIRES = int(os.environ.get('JWT_REFRESH_TOKEN_EXPIRES', 30 * 86400))  # seconds
+    # Password hashes (app/passwords.py); hashes made with other parameters are redone at login.
+    # Hashing runs on PASSWORD_HASH_THREADS threads; beyond PASSWORD_HASH_MAX_PENDING waiting
+    # hashes, logins and registrations are refused with 429
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'pbkdf2:sha256')
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+    PASSWORD_HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', max(1, (os.cpu_count() or 2) // 2)))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64))
+    # Verified tokens are cached (LRU, until they expire) so repeat requests skip decoding;
+    # revocations made by other processes are picked up every AUTH_DENYLIST_REFRESH seconds
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+    AUTH_DENYLIST_REFRESH = float(os.environ.get('AUTH_DENYLIST_REFRESH', 5))
 
     # CORS configuration
     CORS_HEADERS = 'Content-Type'
 
+    # Pagination for list endpoints
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+
+    # Prerequisite traversal: 'graph' walks in Python, 'cte' uses one WITH RECURSIVE query
+    TASK_GRAPH_TRAVERSAL = os.environ.get('TASK_GRAPH_TRAVERSAL', 'graph')
+
+    # Uploads (POST /api/documents and resumable /api/uploads sessions)
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 2 * 1024 ** 3))  # bytes
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 ** 2))  # largest PUT body
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 86400))  # seconds
+    # How long one PUT may hold an upload's offset; a writer that died frees it after this
+    UPLOAD_WRITE_LEASE = int(os.environ.get('UPLOAD_WRITE_LEASE', 600))  # seconds
+
+    # Thumbnails (GET /api/documents/<id>/thumbnail?size=...), rendered on first request
+    THUMBNAIL_SIZES = {'small': 128, 'medium': 320, 'large': 800}  # longest side in pixels
+    THUMBNAIL_CACHE_BYTES = int(os.environ.get('THUMBNAIL_CACHE_BYTES', 512 * 1024 ** 2))
+    THUMBNAIL_MAX_AGE = int(os.environ.get('THUMBNAIL_MAX_AGE', 86400))  # Cache-Control seconds
+    # Lifetime of the signed thumbnail_url in API responses (at least this, at most twice)
+    THUMBNAIL_URL_TTL = int(os.environ.get('THUMBNAIL_URL_TTL', 3600))  # seconds
+    # Command writing page one of {input} as an image, e.g.
+    # "pdftoppm -f 1 -l 1 -singlefile -png -scale-to {size} {input} {output_stem}"
+    THUMBNAIL_PDF_RASTERIZER = os.environ.get('THUMBNAIL_PDF_RASTERIZER', '')
+    THUMBNAIL_RASTERIZE_TIMEOUT = int(os.environ.get('THUMBNAIL_RASTERIZE_TIMEOUT', 30))
+
+    # PDF text extraction: pages are split into ranges across a process pool
+    PDF_EXTRACT_PROCESSES = int(os.environ.get('PDF_EXTRACT_PROCESSES', os.cpu_count() or 1))
+    PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', 16))
+    PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 32))  # smaller PDFs stay in-process
+    # Documents.extracted_text keeps at most this many characters; full text lives in document_pages
+    EXTRACTED_TEXT_MAX_CHARS = int(os.environ.get('EXTRACTED_TEXT_MAX_CHARS', 1000000))
+
+    # OCR: large scans are downscaled and binarized, very large ones split into
+    # horizontal bands recognised in parallel; results are cached by content hash
+    OCR_LANG = os.environ.get('OCR_LANG', 'eng')
+    OCR_TESSERACT_CONFIG = os.environ.get('OCR_TESSERACT_CONFIG', '')
+    OCR_MAX_MEGAPIXELS = float(os.environ.get('OCR_MAX_MEGAPIXELS', 16))
+    OCR_BINARIZE = os.environ.get('OCR_BINARIZE', 'true').lower() == 'true'
+    OCR_TILE_MEGAPIXELS = float(os.environ.get('OCR_TILE_MEGAPIXELS', 4))
+    OCR_PROCESSES = int(os.environ.get('OCR_PROCESSES', os.cpu_count() or 1))
+
+    # AI responses are cached by provider, model, prompt, temperature and max_tokens;
+    # send "bypass_cache": true to /api/ai/* to force a fresh response
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 7 * 86400))  # seconds
+    AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 10000))  # least recently used go first
+    # Content longer than this (estimated at 4 characters a token) is summarized map-reduce
+    # style, or split for flashcards, in chunks of about this size
+    AI_CHUNK_TOKENS = int(os.environ.get('AI_CHUNK_TOKENS', 3000))
+    AI_CHUNK_CONCURRENCY = int(os.environ.get('AI_CHUNK_CONCURRENCY', 4))  # chunk requests at once
+    AI_SECTION_SUMMARY_WORDS = int(os.environ.get('AI_SECTION_SUMMARY_WORDS', 150))
+    # Provider calls: each attempt may take AI_REQUEST_TIMEOUT seconds; rate limits, timeouts
+    # and 5xx are retried with jittered exponential backoff. After AI_BREAKER_THRESHOLD
+    # failures in a row a provider is skipped (503) for AI_BREAKER_RESET seconds.
+    AI_REQUEST_TIMEOUT = float(os.environ.get('AI_REQUEST_TIMEOUT', 60))
+    AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 3))
+    AI_RETRY_BASE_DELAY = float(os.environ.get('AI_RETRY_BASE_DELAY', 1.0))  # seconds, doubled per retry
+    AI_RETRY_MAX_DELAY = float(os.environ.get('AI_RETRY_MAX_DELAY', 20))  # longer Retry-After hints fail at once
+    AI_BREAKER_THRESHOLD = int(os.environ.get('AI_BREAKER_THRESHOLD', 5))
+    AI_BREAKER_RESET = float(os.environ.get('AI_BREAKER_RESET', 30))
+
+    # Semantic search (GET /api/search/semantic): notes, document text and cheat sheet sections
+    # are split into chunks of about EMBEDDING_CHUNK_TOKENS and embedded when they are saved.
+    # 'hashing' embeds offline; 'openai' uses EMBEDDING_MODEL through the provider layer.
+    EMBEDDINGS_ENABLED = os.environ.get('EMBEDDINGS_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'hashing')
+    EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'text-embedding-3-small')
+    EMBEDDING_DIMENSIONS = int(os.environ.get('EMBEDDING_DIMENSIONS', 256))
+    EMBEDDING_CHUNK_TOKENS = int(os.environ.get('EMBEDDING_CHUNK_TOKENS', 300))
+    EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 64))  # texts per embedder call
+    # Memory-mapped vector files (used when NumPy is installed); default <upload folder>/embeddings
+    EMBEDDING_INDEX_DIR = os.environ.get('EMBEDDING_INDEX_DIR', '')
+    SEMANTIC_SEARCH_MAX_RESULTS = int(os.environ.get('SEMANTIC_SEARCH_MAX_RESULTS', 20))
+    # /api/ai/flashcards and /api/ai/questions with module_id + topic instead of content: the
+    # prompt is built from the module's AI_RAG_TOP_K most relevant chunks, within this budget
+    AI_RAG_MAX_TOKENS = int(os.environ.get('AI_RAG_MAX_TOKENS', 2000))
+    AI_RAG_TOP_K = int(os.environ.get('AI_RAG_TOP_K', 12))
+    AI_RAG_MIN_RELATIVE_SCORE = float(os.environ.get('AI_RAG_MIN_RELATIVE_SCORE', 0.5))  # of the best match
+
+    # Background jobs (flask --app app run-worker)
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 300))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 30))  # seconds, doubled per attempt
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+    JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', os.cpu_count() or 1))
+    # Run jobs in the request that queued them (no worker needed; for development and tests)
+    JOBS_RUN_INLINE = os.environ.get('JOBS_RUN_INLINE', 'false').lower() == 'true'
+
+    # AI requests sent with "async": true run as jobs on the 'ai' queue
+    AI_EXECUTOR_THREADS = int(os.environ.get('AI_EXECUTOR_THREADS', 4))  # provider calls at once per web process
+    AI_MAX_JOBS_PER_USER = int(os.environ.get('AI_MAX_JOBS_PER_USER', 3))  # queued or running
+    AI_MAX_QUEUED_JOBS = int(os.environ.get('AI_MAX_QUEUED_JOBS', 100))  # all users together
+    AI_JOB_MAX_ATTEMPTS = int(os.environ.get('AI_JOB_MAX_ATTEMPTS', 1))
+
     # API configuration
     API_TITLE = 'Task Manager API'
     API_VERSION = '1.0'
@@ -1,6 +1,7 @@
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import hash_password, needs_rehash, verify_password
 from app import db
 from datetime import datetime
+from flask import current_app
 from sqlalchemy import func
 import enum
 
@@ -53,6 +54,12 @@ class DocumentStatus(enum.Enum):
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
 
+class JobStatus(enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
 class QuestionType(enum.Enum):
     MULTIPLE_CHOICE = "MULTIPLE_CHOICE"
     TRUE_FALSE = "TRUE_FALSE"
@@ -131,21 +138,48 @@ class Task(db.Model):
         lazy='dynamic'
     )
 
-    def add_prerequisite(self, task, max_depth=5):
-      """Add a prerequisite task with cycle detection"""
-      # Check if this would create a cycle
-      if self in task.get_prerequisites(max_depth):
-        raise ValueError("Adding this prerequisite would create a cycle")
+    def add_prerequisite(self, task, max_depth=None):
+        """
+        Add a prerequisite task with cycle detection.
+        The check covers the whole graph; max_depth is accepted for compatibility.
+        """
+        from app.services.task_graph_service import TaskGraphService
+
+        if task is self or (self.id is not None and task.id is not None and
+                            TaskGraphService.would_create_cycle(self.id, task.id, task.project_id)):
+            raise ValueError("Adding this prerequisite would create a cycle")
         self.prerequisites.append(task)
 
-    def get_prerequisites(self, max_depth=5, current_depth=0):
-        """Get all prerequisites up to max_depth"""
-        if current_depth >= max_depth:
+    def get_prerequisites(self, max_depth=5, use_cte=None):
+        """
+        Get all unique prerequisites up to max_depth ordered by (depth, id),
+        or by id alone when max_depth is None (the query has no depth then)
+        """
+        if self._use_cte(use_cte):
+            from app.services.task_graph_service import TaskGraphService
+            return TaskGraphService.get_reachable_tasks(self.id, max_depth)
+
+        from app.services.task_graph_service import PrerequisiteGraph
+
+        graph = PrerequisiteGraph(complete=False)
+        ids = graph.ancestors(self.id, max_depth)
+        if max_depth is None:
+            ids.sort()
+        if not ids:
             return []
-        result = list(self.prerequisites)
-        for prereq in self.prerequisites:
-            result.extend(prereq.get_prerequisites(max_depth, current_depth + 1))
-        return result
+        tasks = {task.id: task for task in Task.query.filter(Task.id.in_(ids))}
+        return [tasks[task_id] for task_id in ids if task_id in tasks]
+
+    def get_dependents(self, max_depth=5):
+        """Get all unique tasks that transitively depend on this one, nearest first"""
+        from app.services.task_graph_service import TaskGraphService
+        return TaskGraphService.get_reachable_tasks(self.id, max_depth, reverse=True)
+
+    @staticmethod
+    def _use_cte(use_cte):
+        if use_cte is not None:
+            return use_cte
+        return current_app.config.get('TASK_GRAPH_TRAVERSAL', 'graph') == 'cte'
 
     # Update Task model's technology relationship
     technologies = db.relationship(
@@ -187,9 +221,7 @@ class Project(db.Model):
         return [task for task in self.tasks if task.is_milestone]
 
     def project_progress(self):
-        completed_tasks = sum(1 for task in self.tasks if task.is_completed)
-        total_tasks = len(self.tasks)
-        return (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+        return TaskRollup.progress_for(project_id=self.id)
 
     def technologies_used(self):
         return list(set(task.technology for task in self.tasks if task.technology))
@@ -210,14 +242,38 @@ class Progress(db.Model):
     @staticmethod
     def calculate_progress(entity_type, entity_id):
         if entity_type == 'project':
-            project = Project.query.get(entity_id)
-            return project.progress() if project else None
+            return TaskRollup.progress_for(project_id=entity_id)
         elif entity_type == 'technology':
-            technology = Technology.query.get(entity_id)
-            tasks = technology.tasks
-            completed_tasks = sum(1 for task in tasks if task.is_completed)
-            total_tasks = len(tasks)
-            return (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+            return TaskRollup.progress_for(technology_id=entity_id)
+
+
+class TaskRollup(db.Model):
+    """
+    Materialized task counts keyed by (project_id, technology_id).
+    A key of ALL (0) matches any project or technology, so (p, 0) holds every
+    task in project p, (0, t) every task using technology t and (0, 0) all tasks.
+    Maintained incrementally by TaskRollupService.
+    """
+    __tablename__ = 'task_rollups'
+    ALL = 0
+
+    project_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    technology_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    total_tasks = db.Column(db.Integer, nullable=False, default=0)
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def progress(self):
+        return (self.completed_tasks / self.total_tasks * 100) if self.total_tasks > 0 else 0
+
+    @staticmethod
+    def progress_for(project_id=ALL, technology_id=ALL):
+        """Completion percentage for a key, read with a single primary key lookup"""
+        from app.services.rollup_service import TaskRollupService
+        TaskRollupService.ensure()
+        rollup = db.session.get(TaskRollup, (project_id or TaskRollup.ALL,
+                                             technology_id or TaskRollup.ALL))
+        return rollup.progress if rollup else 0
 
 class Technology(db.Model):
     __tablename__ = 'technologies'
@@ -265,10 +321,13 @@ class User(db.Model):
     # tasks = db.relationship('Task', backref='creator', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     @property
     def is_authenticated(self):
@@ -285,6 +344,35 @@ class User(db.Model):
     def get_id(self):
         return str(self.id)
 
+class AuthSession(db.Model):
+    """
+    A login that can be renewed without the password. Only the SHA-256 of
+    the current refresh token is stored; each renewal replaces it, and the
+    one before is kept to recognise a stolen, already-rotated token.
+    """
+    __tablename__ = 'auth_sessions'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False,
+                        index=True)
+    refresh_hash = db.Column(db.String(64), unique=True, nullable=False)
+    previous_hash = db.Column(db.String(64), index=True)
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class RevokedToken(db.Model):
+    """
+    Denylist entry for a revoked access token, kept only until the token
+    would have expired anyway. Ids are never reused, so each process syncs
+    its in-memory copy by id, checked against a count of unexpired rows.
+    """
+    __tablename__ = 'revoked_tokens'
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = ({'sqlite_autoincrement': True},)
+
 class Attachment(db.Model):
     __tablename__ = 'attachments'
     id = db.Column(db.Integer, primary_key=True)
@@ -298,6 +386,25 @@ class Attachment(db.Model):
     __table_args__ = (db.Index('idx_attachment_entity', 'entity_type', 'entity_id'),)
 
 
+class EntityTag(db.Model):
+    """
+    One row per (entity, tag), mirroring the tags JSON of notes, courses,
+    documents, flashcards and questions so tag filters and counts can use
+    indexes. owner_id copies the entity's owner for per-user tag clouds.
+    Maintained by TagService.
+    """
+    __tablename__ = 'entity_tags'
+    entity_type = db.Column(db.String(20), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    tag = db.Column(db.String(100), primary_key=True)
+    owner_id = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index('idx_entity_tag_lookup', 'entity_type', 'tag', 'entity_id'),
+        db.Index('idx_entity_tag_owner', 'owner_id', 'entity_type', 'tag'),
+    )
+
+
 class Folder(db.Model):
     __tablename__ = 'folders'
     id = db.Column(db.Integer, primary_key=True)
@@ -448,6 +555,8 @@ class Document(db.Model):
     thumbnail_url = db.Column(db.String(500))
     file_size = db.Column(db.Integer)  # in bytes
     mime_type = db.Column(db.String(100))
+    # Stored file (file_url) shared by every document with the same content
+    blob_sha256 = db.Column(db.String(64), db.ForeignKey('file_blobs.sha256'), index=True)
     page_count = db.Column(db.Integer)
     status = db.Column(db.Enum(DocumentStatus), default=DocumentStatus.PENDING)
     processed_pdf_url = db.Column(db.String(500))  # For converted PPT
@@ -460,6 +569,132 @@ class Document(db.Model):
     date_created = db.Column(db.DateTime, default=datetime.utcnow)
     last_modified = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class FileBlob(db.Model):
+    """
+    One stored file per distinct content, named by its SHA-256 and shared by
+    the documents referencing it. Removed when ref_count drops to zero.
+    """
+    __tablename__ = 'file_blobs'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UploadSession(db.Model):
+    """
+    A resumable upload in progress. Chunks are appended to a partial file
+    until `received` reaches `size`; completing it creates the Document.
+    """
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    original_name = db.Column(db.String(200), nullable=False)
+    type = db.Column(db.Enum(ContentType), nullable=False)
+    mime_type = db.Column(db.String(100))
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    sha256 = db.Column(db.String(64))  # optional, checked on completion
+    tags = db.Column(db.JSON)
+    module_id = db.Column(db.Integer, db.ForeignKey('modules.id'), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(32))  # claim of the request writing the next chunk
+    lease_expires_at = db.Column(db.DateTime)
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    last_modified = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class OCRResult(db.Model):
+    """OCR text cached by image content hash and the OCR settings that produced it"""
+    __tablename__ = 'ocr_results'
+    content_sha256 = db.Column(db.String(64), primary_key=True)
+    settings = db.Column(db.String(64), primary_key=True)
+    text = db.Column(db.Text)
+    megapixels = db.Column(db.Float)
+    tiles = db.Column(db.Integer)
+    duration_ms = db.Column(db.Integer)
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AIResponse(db.Model):
+    """A provider response cached by a fingerprint of the request that produced it"""
+    __tablename__ = 'ai_responses'
+    fingerprint = db.Column(db.String(64), primary_key=True)
+    provider = db.Column(db.String(50), nullable=False)
+    model = db.Column(db.String(100))
+    response = db.Column(db.Text, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class Embedding(db.Model):
+    """
+    Vector of one chunk of a note, document or cheat sheet section, for
+    semantic search. Rows are replaced (new ids) whenever their entity
+    changes, and ids are never reused, so readers can sync by id alone.
+    """
+    __tablename__ = 'embeddings'
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    chunk = db.Column(db.Integer, nullable=False)  # position within the entity, from 0
+    owner_id = db.Column(db.Integer)
+    is_shared = db.Column(db.Boolean, nullable=False, default=False)
+    title = db.Column(db.String(300))
+    text = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(40), nullable=False)  # sha1 of text, to reuse vectors
+    model = db.Column(db.String(100), nullable=False)  # embedder that produced the vector
+    vector = db.Column(db.LargeBinary)  # float32, unit length; NULL until embedded after commit
+
+    __table_args__ = (
+        db.Index('idx_embedding_entity', 'entity_type', 'entity_id'),
+        # Searchable rows only: index syncs count and scan these by id
+        db.Index('idx_embedding_model_id', 'model', 'id',
+                 sqlite_where=db.text('vector IS NOT NULL'),
+                 postgresql_where=db.text('vector IS NOT NULL')),
+        {'sqlite_autoincrement': True},
+    )
+
+class DocumentPage(db.Model):
+    """Extracted text of one page of a document (page_number starts at 1)"""
+    __tablename__ = 'document_pages'
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'),
+                            primary_key=True)
+    page_number = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.Text)
+    char_count = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    """
+    Background job stored in the database. Workers claim QUEUED jobs (or
+    RUNNING ones whose lease expired) with a compare-and-set update, so each
+    attempt runs on one worker only. See JobService.
+    """
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    queue = db.Column(db.String(50), nullable=False, default='default')
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lease_expires_at = db.Column(db.DateTime)
+    locked_by = db.Column(db.String(100))
+    last_error = db.Column(db.Text)
+    result = db.Column(db.JSON)
+    # What the job works on, e.g. ('document', 12)
+    entity_type = db.Column(db.String(50))
+    entity_id = db.Column(db.Integer)
+    # Who queued it, for per-user limits and access checks (None for system jobs)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    date_created = db.Column(db.DateTime, default=datetime.utcnow)
+    last_modified = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_job_claim', 'queue', 'status', 'run_after'),
+        db.Index('idx_job_entity', 'entity_type', 'entity_id'),
+        db.Index('idx_job_user', 'user_id', 'queue', 'status'),
+    )
+
 # AI Learning Materials
 class Flashcard(db.Model):
     __tablename__ = 'flashcards'
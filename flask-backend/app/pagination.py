@@ -0,0 +1,197 @@
+"""
+Keyset pagination and field projection shared by the list resources.
+
+List endpoints accept:
+    - limit:  page size (defaults to API_PAGE_SIZE, capped at API_MAX_PAGE_SIZE)
+    - cursor: opaque token from the previous page's X-Next-Cursor header
+    - fields: comma separated field names to return (and load from the DB)
+
+The response body stays a plain JSON list; the cursor for the next page is
+sent in the X-Next-Cursor header and is omitted on the last page.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from flask import current_app, request
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class PaginationError(ValueError):
+    """Raised for malformed limit, cursor or fields arguments"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if hasattr(value, 'value'):  # Enum members
+        return value.value
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return date.fromisoformat(value['$d'])
+    return value
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque token"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode a token produced by encode_cursor into a list of sort key values"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise PaginationError("Invalid cursor")
+    return [_decode_value(v) for v in values]
+
+
+def _nullable(column):
+    return getattr(getattr(column, 'expression', column), 'nullable', True)
+
+
+def _ordering(column, descending):
+    """
+    ORDER BY term of a sort key. NULL sorts below every value (first
+    ascending, last descending) on every database, as _after assumes.
+    """
+    if not _nullable(column):
+        return column.desc() if descending else column.asc()
+    return column.desc().nulls_last() if descending else column.asc().nulls_first()
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _beyond(column, descending, value):
+    """Rows whose key sorts after `value` in this key's direction, or None if none can"""
+    if value is None:
+        return None if descending else column.isnot(None)
+    if descending:
+        return or_(column < value, column.is_(None)) if _nullable(column) else column < value
+    return column > value
+
+
+def _after(order_by, values):
+    """
+    Keyset predicate selecting the rows after `values` for the given ordering:
+    (a > x) OR (a = x AND b > y) ..., flipping comparisons for descending keys.
+    NULL keys are matched with IS NULL / IS NOT NULL, since comparisons with
+    NULL are never true.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        step = _beyond(column, descending, values[i])
+        if step is not None:
+            equal = [_equal(col, values[j]) for j, (col, _) in enumerate(order_by[:i])]
+            clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def get_limit():
+    default = current_app.config.get('API_PAGE_SIZE', 100)
+    maximum = current_app.config.get('API_MAX_PAGE_SIZE', 500)
+    limit = request.args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, maximum)
+
+
+def get_fields(allowed):
+    """Requested field names that are in `allowed`, or None for all fields"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def get_offset():
+    """Offset for ranked results, which page with a cursor wrapping a plain offset"""
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return 0
+    offset = decode_cursor(cursor, 1)[0]
+    if not isinstance(offset, int) or offset < 0:
+        raise PaginationError("Invalid cursor")
+    return offset
+
+
+def offset_cursor(offset, limit, fetched):
+    """Cursor for the page after [offset, offset + limit) if `fetched` (limit + 1 rows) overflowed"""
+    return encode_cursor([offset + limit]) if fetched > limit else None
+
+
+def paginate(query, model, order_by, fields=None):
+    """
+    Apply the cursor, ordering, limit and column projection to a query.
+
+    order_by is a list of (column, descending) pairs ending with a unique
+    column (usually the primary key) so the ordering is total.
+    Returns (rows, next_cursor).
+    """
+    limit = get_limit()
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(_after(order_by, decode_cursor(cursor, len(order_by))))
+
+    if fields is not None:
+        # Load only requested columns plus whatever the sort key needs
+        columns = model.__table__.columns
+        names = {name for name in fields if name in columns}
+        names.update(column.key for column, _ in order_by if column.key in columns)
+        names.update(column.key for column in model.__table__.primary_key)
+        query = query.options(load_only(*[getattr(model, name) for name in names]))
+
+    query = query.order_by(*[_ordering(column, descending) for column, descending in order_by])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in order_by])
+    return rows, next_cursor
+
+
+def page_headers(next_cursor):
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+
+def paginated_dump(query, model, order_by, schema_class):
+    """
+    Paginate a query and dump it with a marshmallow schema.
+    Returns a flask-restful (body, status, headers) tuple.
+    """
+    try:
+        fields = get_fields(schema_class._declared_fields.keys())
+        rows, next_cursor = paginate(query, model, order_by, fields)
+    except PaginationError as e:
+        return {"message": str(e)}, 400
+
+    schema = schema_class(many=True, only=fields) if fields else schema_class(many=True)
+    return schema.dump(rows), 200, page_headers(next_cursor)
@@ -0,0 +1,80 @@
+"""
+Password hashing policy.
+
+Passwords are hashed with PBKDF2 (PASSWORD_HASH_ALGORITHM, e.g.
+'pbkdf2:sha256') at PASSWORD_HASH_ITERATIONS. Stored hashes record the
+parameters they were made with (werkzeug's "method$salt$hash" format), so
+hashes made under an older policy still verify and are replaced with a
+policy hash the next time their user logs in.
+
+Hashing is deliberately slow, so it runs on a pool of PASSWORD_HASH_THREADS
+threads (hashlib releases the GIL while it works) instead of in the request
+thread. A login storm then keeps at most that many cores busy, leaving the
+rest for other endpoints; once PASSWORD_HASH_MAX_PENDING hashes are queued,
+further attempts are refused with PasswordHashBusyError. The pool is
+rebuilt when either setting changes.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# ((PASSWORD_HASH_THREADS, PASSWORD_HASH_MAX_PENDING), executor, semaphore) of the current pool
+_current = None
+_lock = threading.Lock()
+
+
+class PasswordHashBusyError(ValueError):
+    """Too many password hashes queued; status is the HTTP status to answer with"""
+
+    def __init__(self, message="Too many login attempts in progress; try again shortly",
+                 status=429, retry_after=1):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def policy_method():
+    """The werkzeug method string for new hashes, e.g. 'pbkdf2:sha256:260000'"""
+    config = current_app.config
+    return f"{config['PASSWORD_HASH_ALGORITHM']}:{config['PASSWORD_HASH_ITERATIONS']}"
+
+
+def _pool():
+    """The executor and queue slots for the configured pool size"""
+    global _current
+    config = current_app.config
+    key = (config['PASSWORD_HASH_THREADS'], config['PASSWORD_HASH_MAX_PENDING'])
+    with _lock:
+        if _current is None or _current[0] != key:
+            # Not shut down: hashes already submitted to the old pool still finish, and its
+            # threads exit once nothing references it any more
+            _current = (key,
+                        ThreadPoolExecutor(max_workers=key[0], thread_name_prefix='password-hash'),
+                        threading.BoundedSemaphore(key[0] + key[1]))
+        return _current[1], _current[2]
+
+
+def _run(fn, *args):
+    """fn(*args) on the hashing pool, or PasswordHashBusyError if its queue is full"""
+    executor, pending = _pool()
+    if not pending.acquire(blocking=False):
+        raise PasswordHashBusyError()
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        pending.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, policy_method())
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with other parameters than the policy's"""
+    return password_hash.split('$', 1)[0] != policy_method()
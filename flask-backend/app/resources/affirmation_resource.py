@@ -4,6 +4,8 @@ from flask import request, g
 from app.schemas import AffirmationSchema
 from marshmallow import ValidationError
 from app.resources.auth_resource import token_required
+from app.models import Affirmation
+from app.pagination import paginated_dump
 
 # Create schema instances
 affirmation_schema = AffirmationSchema()
@@ -12,9 +14,9 @@ affirmations_schema = AffirmationSchema(many=True)
 class AffirmationListResource(Resource):
     @token_required
     def get(self):
-        """List all affirmations"""
-        affirmations = AffirmationService.get_all_affirmations()
-        return affirmations_schema.dump(affirmations)
+        """List affirmations, one page at a time"""
+        return paginated_dump(AffirmationService.query_affirmations(), Affirmation,
+                              [(Affirmation.id, False)], AffirmationSchema)
 
     @token_required
     def post(self):
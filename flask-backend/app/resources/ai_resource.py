@@ -1,217 +1,134 @@
 from flask_restful import Resource
-from flask import request
-from app.services.ai_service import get_ai_service
-from app.services.notes_service import NoteService, ModuleService
-from app.models import Flashcard, Question, CheatSheet
+from flask import Response, request, g, stream_with_context
+from app.services.ai_cache_service import AICacheService
+from app.services.ai_providers import ProviderUnavailableError
+from app.services.ai_task_service import AITaskService, AIJobLimitError
+from app.resources.auth_resource import token_required, admin_required
+from app.resources.job_resource import job_to_dict
 from app import db
-from marshmallow import ValidationError
-from app.resources.auth_resource import token_required
-from datetime import datetime
+from itertools import chain
+import json
+
+
+def sse(event, data):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_ai_task(task, data, error_message):
+    """
+    Run an AI task as a text/event-stream: a `token` event per piece of text
+    as the provider produces it, then `done` with the usual response body
+    (or `error`). Failures before the first token still get a plain 500.
+    """
+    events = AITaskService.stream(task, data)
+    try:
+        first = next(events)
+    except ValueError as e:
+        return {"message": str(e)}, 400
+    except ProviderUnavailableError as e:
+        return {"message": str(e)}, e.status, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        db.session.rollback()
+        return {"message": f"{error_message}: {str(e)}"}, 500
+
+    def generate():
+        try:
+            for event, payload in chain([first], events):
+                yield sse(event, {"text": payload} if event == 'token' else payload)
+        except Exception as e:
+            db.session.rollback()
+            yield sse('error', {"message": f"{error_message}: {str(e)}"})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def run_ai_task(task, error_message, retrieval=False):
+    """
+    Run an AI task for the current request. With "stream": true in the body
+    the response is streamed as Server-Sent Events (summarize and cheatsheet).
+    With "async": true it is queued instead, and the response is 202 with the
+    job to poll at /api/jobs/<id>; its result is this endpoint's usual
+    response body. With retrieval, module_id and topic may replace content:
+    the prompt is built from the current user's most relevant module material.
+    """
+    data = request.get_json()
+    if not data or not (data.get('content') or data.get('document_id')):
+        if not retrieval:
+            return {"message": "Content or document_id is required"}, 400
+        if not data or not data.get('module_id') or not str(data.get('topic') or '').strip():
+            return {"message": "Content, document_id, or module_id and topic are required"}, 400
+        # Only material the requester may see is retrieved (and the results are theirs)
+        data = {**data, 'user_id': g.user_id}
+
+    if data.get('stream', False):
+        if not AITaskService.can_stream(task):
+            return {"message": "Streaming is not supported for this endpoint"}, 400
+        return stream_ai_task(task, data, error_message)
+
+    if data.get('async', False):
+        try:
+            job = AITaskService.submit(task, data, g.user_id)
+        except AIJobLimitError as e:
+            return {"message": str(e)}, e.status, {'Retry-After': str(e.retry_after)}
+        except Exception as e:
+            return {"message": f"{error_message}: {str(e)}"}, 500
+        return {"job": job_to_dict(job)}, 202
+
+    try:
+        return AITaskService.run(task, data), 200
+    except ValueError as e:
+        db.session.rollback()
+        return {"message": str(e)}, 400
+    except ProviderUnavailableError as e:
+        db.session.rollback()
+        return {"message": str(e)}, e.status, {'Retry-After': str(e.retry_after)}
+    except Exception as e:
+        db.session.rollback()
+        return {"message": f"{error_message}: {str(e)}"}, 500
 
 
 class AISummarizeResource(Resource):
     @token_required
     def post(self):
         """Generate AI summary of content"""
-        try:
-            data = request.get_json()
-            if not data or 'content' not in data:
-                return {"message": "Content is required"}, 400
-
-            content = data['content']
-            content_type = data.get('content_type', 'note')
-            max_length = data.get('max_length', 200)
-
-            ai_service = get_ai_service()
-            summary = ai_service.generate_summary(content, content_type, max_length)
-
-            # Optionally update note/module with summary
-            note_id = data.get('note_id')
-            module_id = data.get('module_id')
-
-            if note_id:
-                NoteService.update_note(note_id, ai_summary=summary)
-            elif module_id:
-                module = ModuleService.get_module(module_id)
-                # Could add ai_summary field to Module model
-
-            return {
-                "summary": summary,
-                "word_count": len(summary.split())
-            }, 200
-
-        except Exception as e:
-            return {"message": f"Error generating summary: {str(e)}"}, 500
+        return run_ai_task('summarize', "Error generating summary")
 
 
 class AIFlashcardsResource(Resource):
     @token_required
     def post(self):
         """Generate flashcards from content"""
-        try:
-            data = request.get_json()
-            if not data or 'content' not in data:
-                return {"message": "Content is required"}, 400
-
-            content = data['content']
-            num_cards = data.get('num_cards', 10)
-            difficulty = data.get('difficulty', 'MEDIUM')
-            module_id = data.get('module_id')
-            note_id = data.get('note_id')
-            user_id = data.get('user_id')
-            save_to_db = data.get('save_to_db', True)
-
-            ai_service = get_ai_service()
-            flashcards_data = ai_service.generate_flashcards(content, num_cards, difficulty)
-
-            result_flashcards = []
-
-            if save_to_db and flashcards_data:
-                # Save flashcards to database
-                for card_data in flashcards_data:
-                    flashcard = Flashcard(
-                        module_id=module_id,
-                        note_id=note_id,
-                        front=card_data.get('front', ''),
-                        back=card_data.get('back', ''),
-                        difficulty=card_data.get('difficulty', difficulty),
-                        tags=card_data.get('tags', []),
-                        user_id=user_id,
-                        date_created=datetime.utcnow()
-                    )
-                    db.session.add(flashcard)
-
-                db.session.commit()
-
-                # Get saved flashcards with IDs
-                result_flashcards = [{
-                    'id': fc.id,
-                    'front': fc.front,
-                    'back': fc.back,
-                    'difficulty': fc.difficulty.value if fc.difficulty else 'MEDIUM',
-                    'tags': fc.tags
-                } for fc in Flashcard.query.filter_by(module_id=module_id, user_id=user_id).all()]
-            else:
-                result_flashcards = flashcards_data
-
-            return {
-                "flashcards": result_flashcards,
-                "count": len(result_flashcards)
-            }, 200
-
-        except Exception as e:
-            db.session.rollback()
-            return {"message": f"Error generating flashcards: {str(e)}"}, 500
+        return run_ai_task('flashcards', "Error generating flashcards", retrieval=True)
 
 
 class AIQuestionsResource(Resource):
     @token_required
     def post(self):
         """Generate quiz questions from content"""
-        try:
-            data = request.get_json()
-            if not data or 'content' not in data:
-                return {"message": "Content is required"}, 400
-
-            content = data['content']
-            num_questions = data.get('num_questions', 5)
-            question_types = data.get('question_types', ['MULTIPLE_CHOICE', 'SHORT_ANSWER'])
-            module_id = data.get('module_id')
-            note_id = data.get('note_id')
-            user_id = data.get('user_id')
-            save_to_db = data.get('save_to_db', True)
-
-            ai_service = get_ai_service()
-            questions_data = ai_service.generate_questions(content, num_questions, question_types)
-
-            result_questions = []
-
-            if save_to_db and questions_data:
-                # Save questions to database
-                for q_data in questions_data:
-                    question = Question(
-                        module_id=module_id,
-                        note_id=note_id,
-                        question=q_data.get('question', ''),
-                        type=q_data.get('type', 'SHORT_ANSWER'),
-                        options=q_data.get('options'),
-                        correct_answer=q_data.get('correct_answer', ''),
-                        explanation=q_data.get('explanation', ''),
-                        difficulty=q_data.get('difficulty', 'MEDIUM'),
-                        tags=q_data.get('tags', []),
-                        user_id=user_id,
-                        date_created=datetime.utcnow()
-                    )
-                    db.session.add(question)
-
-                db.session.commit()
-
-                # Get saved questions
-                result_questions = [{
-                    'id': q.id,
-                    'question': q.question,
-                    'type': q.type.value if q.type else 'SHORT_ANSWER',
-                    'options': q.options,
-                    'correct_answer': q.correct_answer,
-                    'explanation': q.explanation,
-                    'difficulty': q.difficulty.value if q.difficulty else 'MEDIUM',
-                    'tags': q.tags
-                } for q in Question.query.filter_by(module_id=module_id, user_id=user_id).all()]
-            else:
-                result_questions = questions_data
-
-            return {
-                "questions": result_questions,
-                "count": len(result_questions)
-            }, 200
-
-        except Exception as e:
-            db.session.rollback()
-            return {"message": f"Error generating questions: {str(e)}"}, 500
+        return run_ai_task('questions', "Error generating questions", retrieval=True)
 
 
 class AICheatSheetResource(Resource):
     @token_required
     def post(self):
         """Generate structured cheat sheet"""
-        try:
-            data = request.get_json()
-            if not data or 'content' not in data:
-                return {"message": "Content is required"}, 400
-
-            content = data['content']
-            title = data.get('title', 'Study Guide')
-            module_id = data.get('module_id')
-            course_id = data.get('course_id')
-            user_id = data.get('user_id')
-            save_to_db = data.get('save_to_db', True)
-
-            ai_service = get_ai_service()
-            cheatsheet_data = ai_service.generate_cheatsheet(content, title)
-
-            if save_to_db:
-                # Save cheat sheet to database
-                cheatsheet = CheatSheet(
-                    module_id=module_id,
-                    course_id=course_id,
-                    title=cheatsheet_data.get('title', title),
-                    content=cheatsheet_data.get('sections', []),
-                    tags=cheatsheet_data.get('tags', []),
-                    user_id=user_id,
-                    date_created=datetime.utcnow()
-                )
-                db.session.add(cheatsheet)
-                db.session.commit()
-
-                return {
-                    "id": cheatsheet.id,
-                    "title": cheatsheet.title,
-                    "content": cheatsheet.content,
-                    "tags": cheatsheet.tags
-                }, 200
-            else:
-                return cheatsheet_data, 200
+        return run_ai_task('cheatsheet', "Error generating cheat sheet")
+
+
+class AICacheResource(Resource):
+    @token_required
+    @admin_required
+    def get(self):
+        """Response cache size and hit/miss counters (admin only)"""
+        return AICacheService.stats(), 200
 
+    @token_required
+    @admin_required
+    def delete(self):
+        """Empty the response cache (admin only)"""
+        try:
+            return {"message": "AI cache cleared", "removed": AICacheService.clear()}, 200
         except Exception as e:
-            db.session.rollback()
-            return {"message": f"Error generating cheat sheet: {str(e)}"}, 500
+            return {"message": str(e)}, 500
@@ -1,11 +1,15 @@
 from flask_restful import Resource, reqparse
 from app.services.auth_service import AuthService
+from app.services.token_service import TokenService, TokenRevokedError
+from app.services.session_service import SessionService, InvalidRefreshTokenError
 from app.schemas import UserSchema, UserLoginSchema
 from marshmallow import ValidationError
 from flask import request, g, jsonify
 import jwt
 from functools import wraps
-from flask import current_app
+from app.models import User
+from app.passwords import PasswordHashBusyError
+from app.pagination import paginated_dump
 
 # Schema instances
 user_schema = UserSchema()
@@ -26,25 +30,30 @@ def token_required(f):
             return {'message': 'Token is missing'}, 401
 
         try:
-            # Decode token
-            data = jwt.decode(
-                token,
-                current_app.config.get('SECRET_KEY', 'dev-key'),
-                algorithms=['HS256']
-            )
+            # Verify token (cached after the first request that uses it)
+            principal = TokenService.verify(token)
 
             # Set current user in flask g
-            g.user_id = data['user_id']
-            g.is_admin = data['is_admin']
+            g.principal = principal
+            g.user_id = principal.user_id
+            g.is_admin = principal.is_admin
 
         except jwt.ExpiredSignatureError:
             return {'message': 'Token has expired'}, 401
+        except TokenRevokedError:
+            return {'message': 'Token has been revoked'}, 401
         except jwt.InvalidTokenError:
             return {'message': 'Invalid token'}, 401
 
         return f(*args, **kwargs)
     return decorated
 
+def search_user_id():
+    """Results are limited to the caller's own content; admins may search as another user"""
+    if g.get('is_admin') and request.args.get('user_id', type=int):
+        return request.args.get('user_id', type=int)
+    return g.user_id
+
 def admin_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -80,6 +89,8 @@ class RegisterResource(Resource):
 
         except ValidationError as err:
             return {"message": "Validation error", "errors": err.messages}, 400
+        except PasswordHashBusyError as e:
+            return {"message": str(e)}, e.status, {'Retry-After': str(e.retry_after)}
         except Exception as e:
             return {"message": f"Error: {str(e)}"}, 500
 
@@ -108,16 +119,44 @@ class LoginResource(Resource):
 
         except ValidationError as err:
             return {"message": "Validation error", "errors": err.messages}, 400
+        except PasswordHashBusyError as e:
+            return {"message": str(e)}, e.status, {'Retry-After': str(e.retry_after)}
+        except Exception as e:
+            return {"message": f"Error: {str(e)}"}, 500
+
+class RefreshResource(Resource):
+    def post(self):
+        """Exchange a refresh token for a new access token and refresh token"""
+        json_data = request.get_json(silent=True) or {}
+        refresh_token = json_data.get('refresh_token')
+        if not isinstance(refresh_token, str) or not refresh_token:
+            return {"message": "refresh_token is required"}, 400
+
+        try:
+            return SessionService.refresh(refresh_token), 200
+        except InvalidRefreshTokenError as e:
+            return {"message": str(e)}, e.status
+        except Exception as e:
+            return {"message": f"Error: {str(e)}"}, 500
+
+class LogoutResource(Resource):
+    @token_required
+    def post(self):
+        """Revoke the token used for this request and end its session"""
+        try:
+            TokenService.revoke(g.principal)
+            if g.principal.session_id is not None:
+                SessionService.end(g.principal.session_id, g.user_id)
         except Exception as e:
             return {"message": f"Error: {str(e)}"}, 500
+        return {"message": "Logged out"}, 200
 
 class UserListResource(Resource):
     @token_required
     @admin_required
     def get(self):
-        """Get all users (admin only)"""
-        users = AuthService.get_all_users()
-        return users_schema.dump(users), 200
+        """Get users one page at a time (admin only)"""
+        return paginated_dump(AuthService.query_users(), User, [(User.id, False)], UserSchema)
 
 class UserResource(Resource):
     @token_required
@@ -162,7 +201,9 @@ class UserResource(Resource):
                 username=username,
                 email=email,
                 password=password,
-                is_admin=is_admin
+                is_admin=is_admin,
+                # Changing your own password keeps the session you did it from
+                keep_session_id=g.principal.session_id if g.user_id == user_id else None
             )
 
             if error:
@@ -170,6 +211,8 @@ class UserResource(Resource):
 
             return user_schema.dump(user), 200
 
+        except PasswordHashBusyError as e:
+            return {"message": str(e)}, e.status, {'Retry-After': str(e.retry_after)}
         except Exception as e:
             return {"message": f"Error: {str(e)}"}, 500
 
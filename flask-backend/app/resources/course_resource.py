@@ -4,6 +4,8 @@ from flask import request
 from app.schemas import CourseSchema
 from marshmallow import ValidationError
 from app.resources.auth_resource import token_required
+from app.models import Course
+from app.pagination import paginated_dump
 
 # Create schema instances
 course_schema = CourseSchema()
@@ -12,15 +14,22 @@ courses_schema = CourseSchema(many=True)
 class CourseListResource(Resource):
     @token_required
     def get(self):
-        """List all courses with optional filters"""
+        """List courses with optional filters, one page at a time"""
         user_id = request.args.get('user_id', type=int)
         field = request.args.get('field')
+        tags = request.args.getlist('tags')
+        tag_mode = request.args.get('tag_mode', 'all')
 
-        courses = CourseService.get_all_courses(
-            user_id=user_id,
-            field=field
-        )
-        return courses_schema.dump(courses)
+        try:
+            query = CourseService.query_courses(
+                user_id=user_id,
+                field=field,
+                tags=tags if tags else None,
+                tag_mode=tag_mode
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        return paginated_dump(query, Course, [(Course.name, False), (Course.id, False)], CourseSchema)
 
     @token_required
     def post(self):
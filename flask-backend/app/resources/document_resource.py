@@ -1,18 +1,57 @@
 from flask_restful import Resource
-from flask import request
+from flask import request, current_app, send_file
 from werkzeug.utils import secure_filename
 from app.services.file_service import get_file_service
-from app.models import Document, DocumentStatus, ContentType
+from app.services.blob_service import BlobService
+from app.services.document_service import DocumentService
+from app.services.job_service import JobService
+from app.services.thumbnail_service import ThumbnailService
+from app.models import Document, DocumentPage, DocumentStatus, ContentType
 from app import db
 from app.resources.auth_resource import token_required
+from app.resources.job_resource import job_to_dict
+from app.pagination import paginate, get_fields, page_headers, PaginationError
+from app.services.tag_service import TagService
 from datetime import datetime
 import os
 
 
+# Fields returned by the document list endpoint
+DOCUMENT_LIST_FIELDS = {
+    'id': lambda doc: doc.id,
+    'name': lambda doc: doc.name,
+    'type': lambda doc: doc.type.value if doc.type else None,
+    'file_url': lambda doc: doc.file_url,
+    'thumbnail_url': ThumbnailService.signed_url,
+    'file_size': lambda doc: doc.file_size,
+    'status': lambda doc: doc.status.value if doc.status else None,
+    'page_count': lambda doc: doc.page_count,
+    'tags': lambda doc: doc.tags,
+    'module_id': lambda doc: doc.module_id,
+    'date_created': lambda doc: doc.date_created.isoformat() if doc.date_created else None
+}
+
+
+def upload_response(document, job):
+    """Response for a new document: 202 while processing is queued, 201 if it was reused"""
+    return {
+        'id': document.id,
+        'name': document.name,
+        'type': document.type.value,
+        'file_url': document.file_url,
+        'file_size': document.file_size,
+        'status': document.status.value,
+        'extracted_text': document.extracted_text,
+        'page_count': document.page_count,
+        'thumbnail_url': ThumbnailService.signed_url(document),
+        'job': job_to_dict(job)
+    }, 201 if job is None else 202
+
+
 class DocumentListResource(Resource):
     @token_required
     def get(self):
-        """List all documents"""
+        """List documents, newest first, one page at a time"""
         user_id = request.args.get('user_id', type=int)
         module_id = request.args.get('module_id', type=int)
 
@@ -23,25 +62,33 @@ class DocumentListResource(Resource):
         if module_id:
             query = query.filter_by(module_id=module_id)
 
-        documents = query.order_by(Document.date_created.desc()).all()
-
-        return [{
-            'id': doc.id,
-            'name': doc.name,
-            'type': doc.type.value if doc.type else None,
-            'file_url': doc.file_url,
-            'thumbnail_url': doc.thumbnail_url,
-            'file_size': doc.file_size,
-            'status': doc.status.value if doc.status else None,
-            'page_count': doc.page_count,
-            'tags': doc.tags,
-            'module_id': doc.module_id,
-            'date_created': doc.date_created.isoformat() if doc.date_created else None
-        } for doc in documents]
+        tags = request.args.getlist('tags')
+        try:
+            if tags:
+                query = TagService.filter_by_tags(query, 'document', Document.id, tags,
+                                                  request.args.get('tag_mode', 'all'))
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            fields = get_fields(DOCUMENT_LIST_FIELDS.keys())
+            documents, next_cursor = paginate(
+                query, Document,
+                [(Document.date_created, True), (Document.id, True)],
+                fields or list(DOCUMENT_LIST_FIELDS)
+            )
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+
+        selected = fields or list(DOCUMENT_LIST_FIELDS)
+        return [{name: DOCUMENT_LIST_FIELDS[name](doc) for name in selected}
+                for doc in documents], 200, page_headers(next_cursor)
 
     @token_required
     def post(self):
         """Upload a new document"""
+        if (request.content_length or 0) > current_app.config['MAX_UPLOAD_SIZE']:
+            return {"message": "File is too large; use /api/uploads for resumable uploads"}, 413
         try:
             # Check if file is in request
             if 'file' not in request.files:
@@ -64,73 +111,32 @@ class DocumentListResource(Resource):
                 tags_list = []
 
             # Determine file type
-            file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
-            if file_ext == 'pdf':
-                content_type = ContentType.PDF
-                subfolder = 'documents'
-            elif file_ext in ['ppt', 'pptx']:
-                content_type = ContentType.PPT
-                subfolder = 'documents'
-            elif file_ext in ['png', 'jpg', 'jpeg', 'gif', 'bmp']:
-                content_type = ContentType.IMAGE
-                subfolder = 'images'
-            else:
+            content_type = DocumentService.content_type_for(file.filename)
+            if content_type is None:
+                file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
                 return {"message": f"Unsupported file type: {file_ext}"}, 400
 
-            # Save file
-            file_service = get_file_service()
-            filename, file_path, file_size = file_service.save_file(file, subfolder)
+            # Save file (identical content is stored once and shared)
+            blob = BlobService.store(file)
 
             # Create document record
-            document = Document(
-                name=filename,
-                original_name=file.filename,
-                type=content_type,
-                file_url=file_path,
-                file_size=file_size,
+            document = DocumentService.create_document(
+                blob, file.filename, content_type,
                 mime_type=file.content_type,
-                status=DocumentStatus.PENDING,
                 tags=tags_list,
                 uploaded_by=user_id,
-                module_id=module_id,
-                date_created=datetime.utcnow()
+                module_id=module_id
             )
 
-            db.session.add(document)
-            db.session.commit()
-
-            # Start processing in background (or immediately for MVP)
-            try:
-                result = file_service.process_document(file_path, content_type.value)
+            # Text extraction and OCR run on a worker (flask --app app run-worker),
+            # unless the same content was processed before
+            job = DocumentService.queue_processing(document)
 
-                # Update document with processing results
-                document.extracted_text = result.get('extracted_text')
-                document.ocr_text = result.get('ocr_text')
-                document.page_count = result.get('page_count', 0)
-
-                if result.get('thumbnail_url'):
-                    document.thumbnail_url = f"/uploads/thumbnails/{result['thumbnail_url']}"
-
-                document.status = DocumentStatus.COMPLETED
-                db.session.commit()
-
-            except Exception as e:
-                document.status = DocumentStatus.FAILED
-                db.session.commit()
-                print(f"Error processing document: {str(e)}")
-
-            return {
-                'id': document.id,
-                'name': document.name,
-                'type': document.type.value,
-                'file_url': document.file_url,
-                'file_size': document.file_size,
-                'status': document.status.value,
-                'extracted_text': document.extracted_text,
-                'page_count': document.page_count,
-                'thumbnail_url': document.thumbnail_url
-            }, 201
+            return upload_response(document, job)
 
+        except ValueError as e:
+            db.session.rollback()
+            return {"message": str(e)}, 400
         except Exception as e:
             db.session.rollback()
             return {"message": f"Error uploading document: {str(e)}"}, 500
@@ -149,17 +155,19 @@ class DocumentResource(Resource):
                 'original_name': document.original_name,
                 'type': document.type.value if document.type else None,
                 'file_url': document.file_url,
-                'thumbnail_url': document.thumbnail_url,
+                'thumbnail_url': ThumbnailService.signed_url(document),
                 'file_size': document.file_size,
                 'mime_type': document.mime_type,
                 'page_count': document.page_count,
+                'pages_extracted': DocumentService.pages_extracted(document.id),
                 'status': document.status.value if document.status else None,
                 'extracted_text': document.extracted_text,
                 'ocr_text': document.ocr_text,
                 'tags': document.tags,
                 'module_id': document.module_id,
                 'uploaded_by': document.uploaded_by,
-                'date_created': document.date_created.isoformat() if document.date_created else None
+                'date_created': document.date_created.isoformat() if document.date_created else None,
+                'job': job_to_dict(JobService.latest_for('document', document.id))
             }
 
         except Exception as e:
@@ -171,22 +179,40 @@ class DocumentResource(Resource):
         try:
             document = Document.query.get_or_404(document_id)
 
+            # Shared files are only removed with their last document
+            file_url = document.file_url
+            thumbnail_key = None
+            released = None
+            if document.blob_sha256:
+                released = BlobService.release(document.blob_sha256)
+                file_url = released.path if released else None
+                thumbnail_key = document.blob_sha256 if released else None
+            elif os.path.exists(file_url):
+                thumbnail_key = ThumbnailService.content_key(document)
+            thumbnail_url = document.thumbnail_url if file_url else None
+
+            # Delete database records
+            DocumentService.delete_pages(document.id)
+            db.session.delete(document)
+            db.session.commit()
+
             # Delete physical file
             file_service = get_file_service()
             try:
-                file_service.delete_file(document.file_url)
-                if document.thumbnail_url:
-                    # Extract filename from URL
-                    thumb_filename = os.path.basename(document.thumbnail_url)
+                if released:
+                    BlobService.remove_file(released)
+                elif file_url:
+                    file_service.delete_file(file_url)
+                if thumbnail_key:
+                    ThumbnailService.purge(thumbnail_key)
+                if thumbnail_url and thumbnail_url.startswith('/uploads/thumbnails/'):
+                    # Thumbnail from before ThumbnailService
+                    thumb_filename = os.path.basename(thumbnail_url)
                     thumb_path = os.path.join(file_service.upload_folder, 'thumbnails', thumb_filename)
                     file_service.delete_file(thumb_path)
             except Exception as e:
                 print(f"Error deleting files: {str(e)}")
 
-            # Delete database record
-            db.session.delete(document)
-            db.session.commit()
-
             return {'message': 'Document deleted successfully'}, 200
 
         except Exception as e:
@@ -194,43 +220,71 @@ class DocumentResource(Resource):
             return {"message": f"Error deleting document: {str(e)}"}, 500
 
 
+class DocumentPageListResource(Resource):
+    @token_required
+    def get(self, document_id):
+        """Extracted text page by page; pages appear while the document is still processing"""
+        Document.query.get_or_404(document_id)
+        query = DocumentPage.query.filter_by(document_id=document_id)
+        try:
+            pages, next_cursor = paginate(query, DocumentPage, [(DocumentPage.page_number, False)])
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+
+        return [{'page_number': page.page_number,
+                 'text': page.text,
+                 'char_count': page.char_count}
+                for page in pages], 200, page_headers(next_cursor)
+
+
+class DocumentThumbnailResource(Resource):
+    def get(self, document_id):
+        """
+        Thumbnail JPEG at ?size=small|medium|large (default medium), rendered on
+        first request. Needs a Bearer token unless the URL carries a valid signature.
+        """
+        if ThumbnailService.verify_signature(document_id, request.args.get('expires'),
+                                             request.args.get('signature')):
+            return self._send(document_id)
+        return token_required(self._send)(document_id)
+
+    @staticmethod
+    def _send(document_id):
+        document = Document.query.get_or_404(document_id)
+        try:
+            path, etag = ThumbnailService.get(document, request.args.get('size', 'medium'))
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        except Exception as e:
+            return {"message": f"Error generating thumbnail: {str(e)}"}, 500
+        if path is None:
+            return {"message": "No thumbnail for this document"}, 404
+
+        # Derivatives never change under a key, so clients can revalidate with If-None-Match
+        response = send_file(path, mimetype='image/jpeg', etag=etag, conditional=True,
+                             max_age=current_app.config['THUMBNAIL_MAX_AGE'])
+        response.cache_control.private = True
+        return response
+
+
 class DocumentProcessResource(Resource):
     @token_required
     def post(self, document_id):
-        """Trigger document processing (reprocess)"""
+        """Queue document processing (reprocess)"""
         try:
             document = Document.query.get_or_404(document_id)
 
             if not os.path.exists(document.file_url):
                 return {"message": "File not found"}, 404
 
-            document.status = DocumentStatus.PROCESSING
-            db.session.commit()
-
-            # Process document
-            file_service = get_file_service()
-            result = file_service.process_document(document.file_url, document.type.value)
-
-            # Update with results
-            document.extracted_text = result.get('extracted_text')
-            document.ocr_text = result.get('ocr_text')
-            document.page_count = result.get('page_count', 0)
-
-            if result.get('thumbnail_url'):
-                document.thumbnail_url = f"/uploads/thumbnails/{result['thumbnail_url']}"
-
-            document.status = DocumentStatus.COMPLETED
-            document.last_modified = datetime.utcnow()
-            db.session.commit()
+            job = DocumentService.queue_processing(document, reuse=False)
 
             return {
                 'id': document.id,
                 'status': document.status.value,
-                'extracted_text': document.extracted_text,
-                'page_count': document.page_count
-            }, 200
+                'job': job_to_dict(job)
+            }, 202
 
         except Exception as e:
-            document.status = DocumentStatus.FAILED
-            db.session.commit()
+            db.session.rollback()
             return {"message": f"Error processing document: {str(e)}"}, 500
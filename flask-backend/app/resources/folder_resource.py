@@ -4,6 +4,8 @@ from flask import request
 from app.schemas import FolderSchema
 from marshmallow import ValidationError
 from app.resources.auth_resource import token_required
+from app.models import Folder
+from app.pagination import paginated_dump
 
 # Create schema instances
 folder_schema = FolderSchema()
@@ -12,15 +14,15 @@ folders_schema = FolderSchema(many=True)
 class FolderListResource(Resource):
     @token_required
     def get(self):
-        """List all folders with optional filters"""
+        """List folders with optional filters, one page at a time"""
         user_id = request.args.get('user_id', type=int)
         parent_id = request.args.get('parent_id', type=int)
 
-        folders = FolderService.get_all_folders(
+        query = FolderService.query_folders(
             user_id=user_id,
             parent_id=parent_id
         )
-        return folders_schema.dump(folders)
+        return paginated_dump(query, Folder, [(Folder.name, False), (Folder.id, False)], FolderSchema)
 
     @token_required
     def post(self):
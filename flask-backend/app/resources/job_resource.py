@@ -0,0 +1,45 @@
+from flask_restful import Resource
+from flask import g
+from app.services.job_service import JobService
+from app.resources.auth_resource import token_required
+
+
+def can_see_error(job):
+    """Failure messages are for the job's owner and admins only"""
+    return g.get('is_admin') or (job.user_id is not None and job.user_id == g.get('user_id'))
+
+
+def job_to_dict(job):
+    """Pollable view of a background job (None when there is no job)"""
+    if job is None:
+        return None
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'queue': job.queue,
+        'status': job.status.value if job.status else None,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_after': job.run_after.isoformat() if job.run_after else None,
+        'last_error': job.last_error if can_see_error(job) else None,
+        'result': job.result,
+        'entity_type': job.entity_type,
+        'entity_id': job.entity_id,
+        'user_id': job.user_id,
+        'date_created': job.date_created.isoformat() if job.date_created else None,
+        'last_modified': job.last_modified.isoformat() if job.last_modified else None
+    }
+
+
+class JobResource(Resource):
+    @token_required
+    def get(self, job_id):
+        """Get the status of a background job"""
+        try:
+            job = JobService.get_job(job_id)
+        except Exception as e:
+            return {"message": f"Error retrieving job: {str(e)}"}, 404
+        # Jobs someone queued (AI requests) hold their content: owner and admins only
+        if job.user_id is not None and job.user_id != g.user_id and not g.is_admin:
+            return {"message": "Job not found"}, 404
+        return job_to_dict(job)
@@ -4,6 +4,8 @@ from flask import request
 from app.schemas import ModuleSchema
 from marshmallow import ValidationError
 from app.resources.auth_resource import token_required
+from app.models import Module
+from app.pagination import paginated_dump
 
 # Create schema instances
 module_schema = ModuleSchema()
@@ -12,11 +14,13 @@ modules_schema = ModuleSchema(many=True)
 class ModuleListResource(Resource):
     @token_required
     def get(self):
-        """List all modules with optional course filter"""
+        """List modules with optional course filter, one page at a time"""
         course_id = request.args.get('course_id', type=int)
 
-        modules = ModuleService.get_all_modules(course_id=course_id)
-        return modules_schema.dump(modules)
+        query = ModuleService.query_modules(course_id=course_id)
+        return paginated_dump(query, Module,
+                              [(Module.order, False), (Module.name, False), (Module.id, False)],
+                              ModuleSchema)
 
     @token_required
     def post(self):
@@ -3,7 +3,10 @@ from app.services.notes_service import NoteService
 from flask import request
 from app.schemas import NoteSchema
 from marshmallow import ValidationError
-from app.resources.auth_resource import token_required
+from app.resources.auth_resource import token_required, search_user_id
+from app.models import Note
+from app.pagination import (paginated_dump, get_limit, get_offset, offset_cursor, page_headers,
+                            PaginationError)
 
 # Create schema instances
 note_schema = NoteSchema()
@@ -12,19 +15,24 @@ notes_schema = NoteSchema(many=True)
 class NoteListResource(Resource):
     @token_required
     def get(self):
-        """List all notes with optional filters"""
+        """List notes with optional filters, newest first, one page at a time"""
         user_id = request.args.get('user_id', type=int)
         folder_id = request.args.get('folder_id', type=int)
         module_id = request.args.get('module_id', type=int)
         tags = request.args.getlist('tags')  # Support multiple tags
+        tag_mode = request.args.get('tag_mode', 'all')  # 'all' or 'any' of the tags
 
-        notes = NoteService.get_all_notes(
-            user_id=user_id,
-            folder_id=folder_id,
-            module_id=module_id,
-            tags=tags if tags else None
-        )
-        return notes_schema.dump(notes)
+        try:
+            query = NoteService.query_notes(
+                user_id=user_id,
+                folder_id=folder_id,
+                module_id=module_id,
+                tags=tags if tags else None,
+                tag_mode=tag_mode
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        return paginated_dump(query, Note, [(Note.last_modified, True), (Note.id, True)], NoteSchema)
 
     @token_required
     def post(self):
@@ -92,15 +100,30 @@ class NoteResource(Resource):
 class NoteSearchResource(Resource):
     @token_required
     def get(self):
-        """Search notes"""
+        """Ranked full-text search over the caller's notes, one page at a time"""
         query_string = request.args.get('q', '')
-        user_id = request.args.get('user_id', type=int)
+        user_id = search_user_id()
 
         if not query_string:
             return {"message": "Search query is required"}, 400
 
         try:
-            notes = NoteService.search_notes(query_string, user_id)
-            return notes_schema.dump(notes)
+            limit = get_limit()
+            offset = get_offset()
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            # Fetch one extra hit to know whether another page exists
+            hits = NoteService.search_notes(query_string, user_id, limit + 1, offset)
         except Exception as e:
             return {"message": f"Error searching notes: {str(e)}"}, 500
+
+        next_cursor = offset_cursor(offset, limit, len(hits))
+        results = []
+        for note, rank, snippet in hits[:limit]:
+            result = note_schema.dump(note)
+            result['rank'] = rank
+            result['snippet'] = snippet
+            results.append(result)
+        return results, 200, page_headers(next_cursor)
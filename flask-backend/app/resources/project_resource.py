@@ -5,6 +5,8 @@ from datetime import datetime
 from app.schemas import ProjectSchema
 from marshmallow import ValidationError
 from app.resources.auth_resource import token_required
+from app.models import Project
+from app.pagination import paginated_dump
 
 # Create schema instances
 project_schema = ProjectSchema()
@@ -13,9 +15,9 @@ projects_schema = ProjectSchema(many=True)
 class ProjectListResource(Resource):
     @token_required
     def get(self):
-        """List all projects"""
-        projects = ProjectService.get_all_projects()
-        return projects_schema.dump(projects)
+        """List projects, one page at a time"""
+        return paginated_dump(ProjectService.query_projects(), Project,
+                              [(Project.id, False)], ProjectSchema)
 
     @token_required
     def post(self):
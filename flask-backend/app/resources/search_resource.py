@@ -0,0 +1,82 @@
+from flask_restful import Resource
+from flask import current_app, request
+from app.services.search_service import SearchService, ENTITY_TYPES
+from app.services.embedding_service import EmbeddingService, EMBEDDED_TYPES
+from app.resources.auth_resource import token_required, search_user_id
+from app.pagination import get_limit, get_offset, offset_cursor, page_headers, PaginationError
+
+
+def requested_types():
+    """?type=note&type=document or ?type=note,document"""
+    return [name.strip() for value in request.args.getlist('type')
+            for name in value.split(',') if name.strip()]
+
+
+class SearchResource(Resource):
+    @token_required
+    def get(self):
+        """Ranked full-text search across notes, documents, flashcards, questions and cheat sheets"""
+        query_string = request.args.get('q', '')
+        if not query_string:
+            return {"message": "Search query is required"}, 400
+
+        entity_types = requested_types()
+        unknown = [name for name in entity_types if name not in ENTITY_TYPES]
+        if unknown:
+            return {"message": f"Unknown type: {', '.join(unknown)}"}, 400
+        user_id = search_user_id()
+
+        try:
+            limit = get_limit()
+            offset = get_offset()
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            hits = SearchService.search(query_string, user_id, entity_types or None,
+                                        limit + 1, offset)
+        except Exception as e:
+            return {"message": f"Error searching: {str(e)}"}, 500
+
+        results = [{
+            'type': hit.entity_type,
+            'id': hit.entity_id,
+            'title': hit.title,
+            'rank': hit.rank,
+            'snippet': hit.snippet
+        } for hit in hits[:limit]]
+        return results, 200, page_headers(offset_cursor(offset, limit, len(hits)))
+
+
+class SemanticSearchResource(Resource):
+    @token_required
+    def get(self):
+        """Notes, documents and cheat sheet sections closest in meaning to q, best first"""
+        query_string = request.args.get('q', '')
+        if not query_string.strip():
+            return {"message": "Search query is required"}, 400
+
+        entity_types = requested_types()
+        unknown = [name for name in entity_types if name not in EMBEDDED_TYPES]
+        if unknown:
+            return {"message": f"Unknown type: {', '.join(unknown)}"}, 400
+
+        try:
+            limit = min(get_limit(), current_app.config['SEMANTIC_SEARCH_MAX_RESULTS'])
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            hits = EmbeddingService.search(query_string, search_user_id(), entity_types or None,
+                                           limit)
+        except Exception as e:
+            return {"message": f"Error searching: {str(e)}"}, 500
+
+        return [{
+            'type': hit.entity_type,
+            'id': hit.entity_id,
+            'title': hit.title,
+            'score': round(hit.score, 4),
+            'chunk': hit.chunk,
+            'snippet': hit.text[:300]
+        } for hit in hits], 200
@@ -0,0 +1,27 @@
+from flask_restful import Resource
+from flask import request
+from app.services.tag_service import TagService, TAGGED
+from app.resources.auth_resource import token_required, search_user_id
+from app.pagination import get_limit, PaginationError
+
+
+class TagListResource(Resource):
+    @token_required
+    def get(self):
+        """Tag cloud of the caller's content: tags with usage counts, most used first"""
+        entity_type = request.args.get('type')
+        user_id = search_user_id()
+
+        if entity_type and entity_type not in TAGGED:
+            return {"message": f"Unknown type: {entity_type}"}, 400
+
+        try:
+            limit = get_limit()
+        except PaginationError as e:
+            return {"message": str(e)}, 400
+
+        try:
+            counts = TagService.tag_counts(entity_type, user_id, limit)
+            return [{'tag': tag, 'count': count} for tag, count in counts]
+        except Exception as e:
+            return {"message": f"Error retrieving tags: {str(e)}"}, 500
@@ -5,6 +5,8 @@ from datetime import datetime
 from app.schemas import TaskSchema
 from marshmallow import ValidationError
 from app.resources.auth_resource import token_required
+from app.models import Task
+from app.pagination import paginated_dump
 
 # Create schema instances
 task_schema = TaskSchema()
@@ -13,9 +15,8 @@ tasks_schema = TaskSchema(many=True)
 class TaskListResource(Resource):
     @token_required
     def get(self):
-        """List all tasks"""
-        tasks = TaskService.get_all_tasks()
-        return tasks_schema.dump(tasks)
+        """List tasks, one page at a time"""
+        return paginated_dump(TaskService.query_tasks(), Task, [(Task.id, False)], TaskSchema)
 
     @token_required
     def post(self):
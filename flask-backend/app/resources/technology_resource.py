@@ -4,6 +4,8 @@ from flask import request, g
 from app.schemas import TechnologySchema
 from marshmallow import ValidationError
 from app.resources.auth_resource import token_required
+from app.models import Technology
+from app.pagination import paginated_dump
 
 # Create schema instances
 technology_schema = TechnologySchema()
@@ -12,9 +14,9 @@ technologies_schema = TechnologySchema(many=True)
 class TechnologyListResource(Resource):
     @token_required
     def get(self):
-        """List all technologies"""
-        technologies = TechnologyService.get_all_technologies()
-        return technologies_schema.dump(technologies)
+        """List technologies, one page at a time"""
+        return paginated_dump(TechnologyService.query_technologies(), Technology,
+                              [(Technology.id, False)], TechnologySchema)
 
     @token_required
     def post(self):
@@ -0,0 +1,103 @@
+from flask_restful import Resource
+from flask import request, g, current_app
+from app import db
+from app.services.upload_service import UploadService, UploadError
+from app.resources.auth_resource import token_required
+from app.resources.document_resource import upload_response
+
+
+def upload_to_dict(upload):
+    return {
+        'id': upload.id,
+        'original_name': upload.original_name,
+        'type': upload.type.value,
+        'size': upload.size,
+        'offset': upload.received,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+        'expires_at': upload.expires_at.isoformat()
+    }
+
+
+class UploadListResource(Resource):
+    @token_required
+    def post(self):
+        """Start a resumable upload; the name and size are checked before any bytes are sent"""
+        data = request.get_json(silent=True) or {}
+        try:
+            upload = UploadService.start(
+                g.user_id,
+                data.get('filename'),
+                data.get('size'),
+                mime_type=data.get('mime_type'),
+                sha256=data.get('sha256'),
+                tags=data.get('tags'),
+                module_id=data.get('module_id')
+            )
+        except UploadError as e:
+            return {"message": str(e)}, e.status
+        except Exception as e:
+            return {"message": f"Error starting upload: {str(e)}"}, 500
+        return upload_to_dict(upload), 201
+
+
+class UploadResource(Resource):
+    @token_required
+    def get(self, upload_id):
+        """Upload progress; resume by sending the bytes from `offset` on"""
+        try:
+            return upload_to_dict(UploadService.get_upload(upload_id, g.user_id, g.get('is_admin')))
+        except UploadError as e:
+            return {"message": str(e)}, e.status
+
+    @token_required
+    def put(self, upload_id):
+        """
+        Write one chunk. The raw request body is the chunk; its position is
+        given by the Upload-Offset header (or ?offset=).
+        """
+        offset = request.headers.get('Upload-Offset', request.args.get('offset'))
+        try:
+            offset = int(offset)
+        except (TypeError, ValueError):
+            return {"message": "Upload-Offset header is required"}, 400
+
+        try:
+            upload = UploadService.get_upload(upload_id, g.user_id, g.get('is_admin'))
+            new_offset = UploadService.write_chunk(upload, offset, request.stream,
+                                                   request.content_length)
+        except UploadError as e:
+            body = {"message": str(e)}
+            if e.status == 409:
+                body['offset'] = upload.received
+            return body, e.status
+        except Exception as e:
+            db.session.rollback()
+            return {"message": f"Error writing chunk: {str(e)}"}, 500
+        return {'id': upload_id, 'offset': new_offset, 'size': upload.size}, 200, \
+            {'Upload-Offset': str(new_offset)}
+
+    @token_required
+    def delete(self, upload_id):
+        """Abort an upload and discard the bytes received so far"""
+        try:
+            UploadService.abort(UploadService.get_upload(upload_id, g.user_id, g.get('is_admin')))
+        except UploadError as e:
+            return {"message": str(e)}, e.status
+        except Exception as e:
+            return {"message": f"Error aborting upload: {str(e)}"}, 500
+        return {"message": "Upload aborted"}, 200
+
+
+class UploadCompleteResource(Resource):
+    @token_required
+    def post(self, upload_id):
+        """Finish an upload: verify it, store it and create the document"""
+        try:
+            upload = UploadService.get_upload(upload_id, g.user_id, g.get('is_admin'))
+            document, job = UploadService.complete(upload)
+        except UploadError as e:
+            return {"message": str(e)}, e.status
+        except Exception as e:
+            db.session.rollback()
+            return {"message": f"Error completing upload: {str(e)}"}, 500
+        return upload_response(document, job)
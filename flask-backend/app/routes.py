@@ -8,13 +8,17 @@ from .resources.task_resource import TaskListResource, TaskResource, TaskComplet
 from .resources.project_resource import ProjectListResource, ProjectResource, ProjectCompleteResource
 from .resources.technology_resource import TechnologyListResource, TechnologyResource
 from .resources.affirmation_resource import AffirmationListResource, AffirmationResource
-from .resources.auth_resource import RegisterResource, LoginResource, UserListResource, UserResource
+from .resources.auth_resource import RegisterResource, LoginResource, RefreshResource, LogoutResource, UserListResource, UserResource
 from .resources.note_resource import NoteListResource, NoteResource, NoteSearchResource
 from .resources.folder_resource import FolderListResource, FolderResource
 from .resources.course_resource import CourseListResource, CourseResource, CourseProgressResource
 from .resources.module_resource import ModuleListResource, ModuleResource
-from .resources.ai_resource import AISummarizeResource, AIFlashcardsResource, AIQuestionsResource, AICheatSheetResource
-from .resources.document_resource import DocumentListResource, DocumentResource, DocumentProcessResource
+from .resources.ai_resource import AISummarizeResource, AIFlashcardsResource, AIQuestionsResource, AICheatSheetResource, AICacheResource
+from .resources.document_resource import DocumentListResource, DocumentResource, DocumentPageListResource, DocumentThumbnailResource, DocumentProcessResource
+from .resources.search_resource import SearchResource, SemanticSearchResource
+from .resources.tag_resource import TagListResource
+from .resources.job_resource import JobResource
+from .resources.upload_resource import UploadListResource, UploadResource, UploadCompleteResource
 import calendar
 from sqlalchemy.orm import joinedload
 from datetime import datetime
@@ -37,6 +41,8 @@ api.add_resource(AffirmationResource, '/api/affirmations/<int:affirmation_id>')
 # Add authentication endpoints
 api.add_resource(RegisterResource, '/api/auth/register')
 api.add_resource(LoginResource, '/api/auth/login')
+api.add_resource(RefreshResource, '/api/auth/refresh')
+api.add_resource(LogoutResource, '/api/auth/logout')
 api.add_resource(UserListResource, '/api/users')
 api.add_resource(UserResource, '/api/users/<int:user_id>')
 
@@ -60,12 +66,28 @@ api.add_resource(AISummarizeResource, '/api/ai/summarize')
 api.add_resource(AIFlashcardsResource, '/api/ai/flashcards')
 api.add_resource(AIQuestionsResource, '/api/ai/questions')
 api.add_resource(AICheatSheetResource, '/api/ai/cheatsheet')
+api.add_resource(AICacheResource, '/api/ai/cache')
 
 # Add document management endpoints
 api.add_resource(DocumentListResource, '/api/documents')
 api.add_resource(DocumentResource, '/api/documents/<int:document_id>')
+api.add_resource(DocumentPageListResource, '/api/documents/<int:document_id>/pages')
+api.add_resource(DocumentThumbnailResource, '/api/documents/<int:document_id>/thumbnail')
 api.add_resource(DocumentProcessResource, '/api/documents/<int:document_id>/process')
 
+# Resumable uploads
+api.add_resource(UploadListResource, '/api/uploads')
+api.add_resource(UploadResource, '/api/uploads/<string:upload_id>')
+api.add_resource(UploadCompleteResource, '/api/uploads/<string:upload_id>/complete')
+
+# Add cross-entity search endpoint
+api.add_resource(SearchResource, '/api/search')
+api.add_resource(SemanticSearchResource, '/api/search/semantic')
+api.add_resource(TagListResource, '/api/tags')
+
+# Background job status
+api.add_resource(JobResource, '/api/jobs/<int:job_id>')
+
 # original routes for backward compatibility
 @app.route('/', methods=['GET', 'POST'])
 def home():
@@ -0,0 +1,147 @@
+from app import app, db
+from app.models import AIResponse
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+import hashlib
+import json
+import threading
+
+# Lookups served by this process since it started (the hits column keeps the all-time count)
+_stats = {'hits': 0, 'misses': 0, 'bypassed': 0}
+_stats_lock = threading.Lock()
+
+# Responses this process stored since it last checked the cache size
+_puts = 0
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+class AICacheService:
+    """
+    Provider responses cached in ai_responses.
+
+    Entries expire AI_CACHE_TTL seconds after they were fetched, and once
+    there are more than AI_CACHE_MAX_ENTRIES the least recently used are
+    evicted; each process checks the size after storing 1% of that many
+    responses rather than after every one. The cache only ever saves a
+    provider call: if it cannot be read or written, the call goes ahead as
+    if it were empty.
+
+    Reads and writes run in their own short transactions on a separate
+    connection, so a lookup never commits or rolls back whatever the
+    caller has pending in the request's session.
+    """
+
+    @staticmethod
+    def enabled():
+        return app.config.get('AI_CACHE_ENABLED', True)
+
+    @staticmethod
+    def fingerprint(provider, model, system_prompt, user_prompt, temperature, max_tokens):
+        """Hash of everything that is sent to the provider"""
+        request = [provider, model, system_prompt, user_prompt, float(temperature), int(max_tokens)]
+        return hashlib.sha256(json.dumps(request).encode()).hexdigest()
+
+    @staticmethod
+    def get(fingerprint):
+        """The cached response text, or None on a miss"""
+        if not AICacheService.enabled():
+            return None
+        now = datetime.utcnow()
+        fresh_after = now - timedelta(seconds=app.config['AI_CACHE_TTL'])
+        try:
+            with db.engine.begin() as connection:
+                response = connection.execute(
+                    update(AIResponse)
+                    .where(AIResponse.fingerprint == fingerprint,
+                           AIResponse.date_created > fresh_after)
+                    .values(hits=AIResponse.hits + 1, last_used=now)
+                    .returning(AIResponse.response)
+                ).scalar()
+        except SQLAlchemyError:
+            response = None
+        _count('misses' if response is None else 'hits')
+        return response
+
+    @staticmethod
+    def bypass():
+        """Record a lookup skipped at the caller's request"""
+        _count('bypassed')
+
+    @staticmethod
+    def put(fingerprint, provider, model, response):
+        """Store (or refresh) a response, evicting old entries if the cache is full"""
+        global _puts
+        if not AICacheService.enabled():
+            return
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(delete(AIResponse).where(AIResponse.fingerprint == fingerprint))
+                connection.execute(insert(AIResponse).values(
+                    fingerprint=fingerprint, provider=provider, model=model, response=response,
+                    hits=0, date_created=now, last_used=now))
+        except SQLAlchemyError:
+            # Usually another request stored the same response first
+            return
+        with _stats_lock:
+            _puts += 1
+            due = _puts >= max(1, app.config['AI_CACHE_MAX_ENTRIES'] // 100)
+            if due:
+                _puts = 0
+        if due:
+            try:
+                AICacheService.evict()
+            except SQLAlchemyError:
+                pass  # the next check tries again
+
+    @staticmethod
+    def evict():
+        """
+        Drop expired entries and, when over AI_CACHE_MAX_ENTRIES, the least
+        recently used down to 90% of it. Returns the number removed.
+        """
+        limit = app.config['AI_CACHE_MAX_ENTRIES']
+        expired = datetime.utcnow() - timedelta(seconds=app.config['AI_CACHE_TTL'])
+        with db.engine.begin() as connection:
+            removed = connection.execute(
+                delete(AIResponse).where(AIResponse.date_created <= expired)
+            ).rowcount
+            excess = connection.scalar(select(func.count()).select_from(AIResponse)) - limit
+            if excess > 0:
+                excess += limit // 10
+                oldest = select(AIResponse.fingerprint).order_by(AIResponse.last_used).limit(excess)
+                removed += connection.execute(
+                    delete(AIResponse).where(AIResponse.fingerprint.in_(oldest))
+                ).rowcount
+        return removed
+
+    @staticmethod
+    def stats():
+        entries, hits = db.session.execute(
+            select(func.count(), func.coalesce(func.sum(AIResponse.hits), 0))
+        ).one()
+        with _stats_lock:
+            process = dict(_stats)
+        lookups = process['hits'] + process['misses']
+        return {
+            'entries': entries,
+            'max_entries': app.config['AI_CACHE_MAX_ENTRIES'],
+            'ttl': app.config['AI_CACHE_TTL'],
+            'stored_hits': hits,
+            'process': {**process, 'hit_rate': round(process['hits'] / lookups, 3) if lookups else None},
+        }
+
+    @staticmethod
+    def clear():
+        try:
+            removed = db.session.execute(delete(AIResponse)).rowcount
+            db.session.commit()
+            return removed
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error clearing AI cache: {str(e)}")
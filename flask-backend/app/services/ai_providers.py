@@ -0,0 +1,379 @@
+import os
+import random
+import threading
+import time
+from typing import Callable, Iterator, Optional
+from app import app
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+try:
+    import anthropic
+    ANTHROPIC_AVAILABLE = True
+except ImportError:
+    ANTHROPIC_AVAILABLE = False
+
+# HTTP statuses worth sending again: timeout, conflict, rate limit; and any 5xx
+RETRYABLE_STATUSES = {408, 409, 429}
+
+# One SDK client per provider and API key, shared by every thread of the process
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Provider name -> CircuitBreaker
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+_END = object()
+
+
+class ProviderError(Exception):
+    """
+    A provider call failed. retryable: sending it again may succeed (rate
+    limits, timeouts, 5xx); retry_after: the provider's hint in seconds.
+    """
+
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class ProviderUnavailableError(ProviderError):
+    """The provider's circuit is open; status is the HTTP status to answer with"""
+
+    def __init__(self, message, retry_after, status=503):
+        super().__init__(message, retryable=False, retry_after=retry_after)
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing. After `threshold`
+    consecutive transient failures the circuit opens and calls fail at once
+    for `reset_after` seconds; then one trial call is let through
+    (half-open), and its outcome closes or re-opens the circuit. So an outage
+    costs each waiting request a fast 503 instead of a worker held for
+    timeouts and retries.
+    """
+
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if not self.trial and time.monotonic() < self.opened_at + self.reset_after:
+                return 'open'
+            return 'half-open'
+
+    def before(self, name):
+        """Raise ProviderUnavailableError unless a call may go through now"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            wait = self.opened_at + self.reset_after - time.monotonic()
+            if wait > 0 or self.trial:
+                raise ProviderUnavailableError(
+                    f"AI provider '{name}' is unavailable after repeated failures; try again shortly",
+                    retry_after=max(1, round(wait)))
+            self.trial = True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(app.config['AI_BREAKER_THRESHOLD'],
+                                             app.config['AI_BREAKER_RESET'])
+        return _breakers[name]
+
+
+def breaker_states():
+    """Provider name -> 'closed', 'open' or 'half-open'"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.state for name, breaker in breakers.items()}
+
+
+def backoff(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number attempt + 1: "full jitter", a random
+    delay up to AI_RETRY_BASE_DELAY * 2**attempt (capped at
+    AI_RETRY_MAX_DELAY), so clients that failed together do not retry
+    together. A provider's Retry-After is a lower bound; None means it asks
+    for longer than the cap and the call should fail instead of waiting.
+    """
+    cap = app.config['AI_RETRY_MAX_DELAY']
+    if retry_after is not None and retry_after > cap:
+        return None
+    delay = random.uniform(0, min(cap, app.config['AI_RETRY_BASE_DELAY'] * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+def classify(exc, connection_errors=()):
+    """ProviderError for an exception raised by an SDK client"""
+    if isinstance(exc, ProviderError):
+        return exc
+    status = getattr(exc, 'status_code', None)
+    retryable = (isinstance(exc, connection_errors) or status in RETRYABLE_STATUSES
+                 or (status or 0) >= 500)
+    retry_after = None
+    response = getattr(exc, 'response', None)
+    try:
+        retry_after = float(response.headers['retry-after'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        pass
+    return ProviderError(f"AI API error: {str(exc)}", retryable, retry_after)
+
+
+def call(provider, attempt: Callable):
+    """
+    attempt(timeout) against provider, through its circuit breaker. Transient
+    failures are retried up to AI_MAX_RETRIES times with jittered backoff;
+    each attempt gets AI_REQUEST_TIMEOUT seconds. Raises ProviderError.
+    """
+    breaker = get_breaker(provider.name)
+    retries = app.config['AI_MAX_RETRIES']
+    timeout = app.config['AI_REQUEST_TIMEOUT']
+    for number in range(retries + 1):
+        breaker.before(provider.name)
+        try:
+            result = attempt(timeout)
+        except Exception as e:
+            error = provider.error(e)
+            if not error.retryable:
+                # The provider answered; the request itself was refused
+                breaker.success()
+                raise error from e
+            breaker.failure()
+            delay = backoff(number, error.retry_after)
+            if number == retries or delay is None:
+                raise error from e
+            time.sleep(delay)
+        else:
+            breaker.success()
+            return result
+
+
+def _first(pieces):
+    pieces = iter(pieces)
+    return pieces, next(pieces, _END)
+
+
+def call_stream(provider, start: Callable) -> Iterator[str]:
+    """
+    Like call for start(timeout) returning an iterator of text: retried until
+    the first piece arrives; a failure after that ends the stream with a
+    ProviderError (its text has already been sent on).
+    """
+    pieces, first = call(provider, lambda timeout: _first(start(timeout)))
+    if first is _END:
+        return
+    yield first
+    try:
+        yield from pieces
+    except Exception as e:
+        raise provider.error(e) from e
+
+
+class OpenAIProvider:
+    name = 'openai'
+
+    @staticmethod
+    def available():
+        return OPENAI_AVAILABLE
+
+    @staticmethod
+    def model():
+        return os.getenv('OPENAI_MODEL', 'gpt-4-turbo-preview')
+
+    @staticmethod
+    def create_client():
+        # Retries are ours (call above), so the SDK's are off
+        return openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0,
+                             timeout=app.config['AI_REQUEST_TIMEOUT'])
+
+    @staticmethod
+    def error(exc):
+        return classify(exc, (openai.APIConnectionError,) if OPENAI_AVAILABLE else ())
+
+    @staticmethod
+    def _messages(system_prompt, user_prompt):
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    @staticmethod
+    def complete(client, model, system_prompt, user_prompt, temperature, max_tokens, timeout):
+        response = client.chat.completions.create(
+            model=model,
+            messages=OpenAIProvider._messages(system_prompt, user_prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+        return response.choices[0].message.content
+
+    @staticmethod
+    def stream(client, model, system_prompt, user_prompt, temperature, max_tokens, timeout):
+        stream = client.chat.completions.create(
+            model=model,
+            messages=OpenAIProvider._messages(system_prompt, user_prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            timeout=timeout
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class AnthropicProvider:
+    name = 'anthropic'
+
+    @staticmethod
+    def available():
+        return ANTHROPIC_AVAILABLE
+
+    @staticmethod
+    def model():
+        return os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022')
+
+    @staticmethod
+    def create_client():
+        return anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'), max_retries=0,
+                                   timeout=app.config['AI_REQUEST_TIMEOUT'])
+
+    @staticmethod
+    def error(exc):
+        return classify(exc, (anthropic.APIConnectionError,) if ANTHROPIC_AVAILABLE else ())
+
+    @staticmethod
+    def complete(client, model, system_prompt, user_prompt, temperature, max_tokens, timeout):
+        response = client.messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": user_prompt}
+            ],
+            timeout=timeout
+        )
+        return response.content[0].text
+
+    @staticmethod
+    def stream(client, model, system_prompt, user_prompt, temperature, max_tokens, timeout):
+        with client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": user_prompt}
+            ],
+            timeout=timeout
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+
+
+class FakeClient:
+    """
+    Offline stand-in for a provider (AI_PROVIDER=fake): replies with the
+    first words of the prompt, one word every AI_FAKE_TOKEN_DELAY seconds,
+    so streaming and timeouts can be exercised without network access. A
+    delay longer than the call's timeout fails like a timed-out request.
+    """
+
+    def __init__(self, token_delay: float = 0.05, max_words: int = 60):
+        self.token_delay = token_delay
+        self.max_words = max_words
+
+    def stream(self, system_prompt: str, user_prompt: str, max_tokens: int,
+               timeout: Optional[float] = None) -> Iterator[str]:
+        words = user_prompt.split()[:min(self.max_words, max_tokens)]
+        for i, word in enumerate(words):
+            if timeout is not None and self.token_delay > timeout:
+                time.sleep(timeout)
+                raise TimeoutError(f"No reply within {timeout} seconds")
+            time.sleep(self.token_delay)
+            yield word if i == 0 else ' ' + word
+
+
+class FakeProvider:
+    name = 'fake'
+
+    @staticmethod
+    def available():
+        return True
+
+    @staticmethod
+    def model():
+        return 'fake'
+
+    @staticmethod
+    def create_client():
+        return FakeClient(float(os.getenv('AI_FAKE_TOKEN_DELAY', 0.05)))
+
+    @staticmethod
+    def error(exc):
+        return classify(exc, (TimeoutError,))
+
+    @staticmethod
+    def complete(client, model, system_prompt, user_prompt, temperature, max_tokens, timeout):
+        return ''.join(client.stream(system_prompt, user_prompt, max_tokens, timeout))
+
+    @staticmethod
+    def stream(client, model, system_prompt, user_prompt, temperature, max_tokens, timeout):
+        return client.stream(system_prompt, user_prompt, max_tokens, timeout)
+
+
+PROVIDERS = {provider.name: provider for provider in (OpenAIProvider, AnthropicProvider, FakeProvider)}
+
+
+def get_provider(name):
+    """The provider class for an AI_PROVIDER value, or None if unknown or not installed"""
+    provider = PROVIDERS.get(name)
+    return provider if provider is not None and provider.available() else None
+
+
+def shared_client(provider):
+    """
+    The process's client for provider. SDK clients keep a pool of keep-alive
+    HTTP connections and are safe to share between threads, so every request,
+    chunk and job thread reuses one instead of opening new connections.
+    """
+    if provider is FakeProvider:
+        return provider.create_client()
+    key = (provider.name, os.getenv(f"{provider.name.upper()}_API_KEY"))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = provider.create_client()
+        return _clients[key]
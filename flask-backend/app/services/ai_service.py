@@ -1,18 +1,11 @@
 import os
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import json
-
-try:
-    import openai
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
-try:
-    import anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
+from app import app, db
+from app.services.ai_cache_service import AICacheService
+from app.services.ai_providers import PROVIDERS, call, call_stream, get_provider, shared_client
+from app.services.chunk_service import estimate_tokens, pack, split_chunks
 
 
 class AIService:
@@ -21,51 +14,81 @@ class AIService:
     def __init__(self):
         self.provider = os.getenv('AI_PROVIDER', 'openai').lower()
 
-        if self.provider == 'openai' and OPENAI_AVAILABLE:
-            self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-            self.model = os.getenv('OPENAI_MODEL', 'gpt-4-turbo-preview')
-        elif self.provider == 'anthropic' and ANTHROPIC_AVAILABLE:
-            self.client = anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
-            self.model = os.getenv('ANTHROPIC_MODEL', 'claude-3-5-sonnet-20241022')
+        provider = get_provider(self.provider)
+        if provider is not None:
+            self.client = shared_client(provider)
+            self.model = provider.model()
         else:
             self.client = None
             self.model = None
 
-    def _call_ai(self, system_prompt: str, user_prompt: str, temperature: float = 0.7, max_tokens: int = 2000) -> str:
-        """Internal method to call AI provider"""
+    def _call_ai(self, system_prompt: str, user_prompt: str, temperature: float = 0.7,
+                 max_tokens: int = 2000, use_cache: bool = True) -> str:
+        """
+        Internal method to call AI provider. Responses are served from and
+        saved to the response cache; use_cache=False skips the lookup (the
+        fresh response still replaces the cached one).
+        """
         if not self.client:
             raise Exception(f"AI provider '{self.provider}' not configured or library not installed")
 
-        try:
-            if self.provider == 'openai':
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
-                return response.choices[0].message.content
-
-            elif self.provider == 'anthropic':
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    system=system_prompt,
-                    messages=[
-                        {"role": "user", "content": user_prompt}
-                    ]
-                )
-                return response.content[0].text
-
-        except Exception as e:
-            raise Exception(f"AI API error: {str(e)}")
-
-    def generate_summary(self, content: str, content_type: str = "note", max_length: int = 200) -> str:
-        """Generate a concise summary of learning content"""
+        fingerprint = AICacheService.fingerprint(self.provider, self.model, system_prompt,
+                                                 user_prompt, temperature, max_tokens)
+        if use_cache:
+            cached = AICacheService.get(fingerprint)
+            if cached is not None:
+                return cached
+        else:
+            AICacheService.bypass()
+
+        response = self._request(system_prompt, user_prompt, temperature, max_tokens)
+        AICacheService.put(fingerprint, self.provider, self.model, response)
+        return response
+
+    def _call_ai_stream(self, system_prompt: str, user_prompt: str, temperature: float = 0.7,
+                        max_tokens: int = 2000, use_cache: bool = True) -> Iterator[str]:
+        """
+        Like _call_ai, but yields the response text piece by piece as the
+        provider produces it. A cached response is yielded in one piece; a
+        streamed one is cached once it is complete.
+        """
+        if not self.client:
+            raise Exception(f"AI provider '{self.provider}' not configured or library not installed")
+
+        fingerprint = AICacheService.fingerprint(self.provider, self.model, system_prompt,
+                                                 user_prompt, temperature, max_tokens)
+        if use_cache:
+            cached = AICacheService.get(fingerprint)
+            if cached is not None:
+                yield cached
+                return
+        else:
+            AICacheService.bypass()
+
+        chunks = []
+        for text in self._request_stream(system_prompt, user_prompt, temperature, max_tokens):
+            chunks.append(text)
+            yield text
+        AICacheService.put(fingerprint, self.provider, self.model, ''.join(chunks))
+
+    def _request_stream(self, system_prompt: str, user_prompt: str, temperature: float,
+                        max_tokens: int) -> Iterator[str]:
+        """Send one streaming request to the provider and yield text deltas"""
+        provider = PROVIDERS[self.provider]
+        return call_stream(provider, lambda timeout: provider.stream(
+            self.client, self.model, system_prompt, user_prompt, temperature, max_tokens, timeout))
+
+    def _request(self, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> str:
+        """
+        Send one request to the provider, retrying rate limits and transient
+        errors (see ai_providers.call)
+        """
+        provider = PROVIDERS[self.provider]
+        return call(provider, lambda timeout: provider.complete(
+            self.client, self.model, system_prompt, user_prompt, temperature, max_tokens, timeout))
+
+    @staticmethod
+    def _summary_prompts(content: str, content_type: str, max_length: int):
         system_prompt = f"""You are an expert educational content summarizer.
         Create clear, concise summaries that capture key concepts and main ideas.
         Keep summaries under {max_length} words."""
@@ -75,11 +98,107 @@ class AIService:
 {content}
 
 Provide a summary that captures the main ideas and key concepts."""
+        return system_prompt, user_prompt
 
-        return self._call_ai(system_prompt, user_prompt, temperature=0.5, max_tokens=500)
-
-    def generate_flashcards(self, content: str, num_cards: int = 10, difficulty: str = "MEDIUM") -> List[Dict]:
-        """Generate flashcards from learning content"""
+    @staticmethod
+    def _combine_prompts(summaries: List[str], content_type: str, max_length: int):
+        system_prompt = f"""You are an expert educational content summarizer.
+        Combine summaries of consecutive sections into one clear, concise summary
+        that captures the key concepts and main ideas. Keep it under {max_length} words."""
+
+        sections = "\n\n".join(f"Section {i}:\n{summary}" for i, summary in enumerate(summaries, 1))
+        user_prompt = f"""These are summaries of consecutive sections of one {content_type}:
+
+{sections}
+
+Combine them into a single summary of the whole {content_type}."""
+        return system_prompt, user_prompt
+
+    def _map(self, fn: Callable, items: List) -> List:
+        """fn over items on up to AI_CHUNK_CONCURRENCY threads; results in order"""
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+
+        def run(item):
+            with app.app_context():
+                try:
+                    return fn(item)
+                finally:
+                    db.session.remove()
+
+        with ThreadPoolExecutor(max_workers=min(len(items), app.config['AI_CHUNK_CONCURRENCY'])) as pool:
+            return list(pool.map(run, items))
+
+    def _summary_request(self, content: str, content_type: str, max_length: int):
+        """
+        Prompts for the call that produces the summary. Content over
+        AI_CHUNK_TOKENS is first condensed map-reduce style: each chunk is
+        summarized in parallel, then groups of summaries are combined until
+        they fit in one prompt. Those intermediate calls always use the
+        response cache, so after an edit only the changed chunk (and the
+        combines above it) go to the provider again.
+        """
+        budget = app.config['AI_CHUNK_TOKENS']
+        if estimate_tokens(content) <= budget:
+            return self._summary_prompts(content, content_type, max_length)
+
+        section_length = app.config['AI_SECTION_SUMMARY_WORDS']
+        summaries = self._map(
+            lambda chunk: self._call_ai(
+                *self._summary_prompts(chunk, f"{content_type} section", section_length),
+                temperature=0.5, max_tokens=500),
+            split_chunks(content, budget))
+        groups = pack(summaries, budget)
+        while 1 < len(groups) < len(summaries):
+            summaries = self._map(
+                lambda group: self._call_ai(
+                    *self._combine_prompts(group, content_type, section_length),
+                    temperature=0.5, max_tokens=500),
+                groups)
+            groups = pack(summaries, budget)
+        return self._combine_prompts(summaries, content_type, max_length)
+
+    def generate_summary(self, content: str, content_type: str = "note", max_length: int = 200,
+                         use_cache: bool = True) -> str:
+        """Generate a concise summary of learning content (map-reduce for long content)"""
+        system_prompt, user_prompt = self._summary_request(content, content_type, max_length)
+        return self._call_ai(system_prompt, user_prompt, temperature=0.5, max_tokens=500,
+                             use_cache=use_cache)
+
+    def stream_summary(self, content: str, content_type: str = "note", max_length: int = 200,
+                       use_cache: bool = True) -> Iterator[str]:
+        """generate_summary, yielding the summary text as it is generated"""
+        system_prompt, user_prompt = self._summary_request(content, content_type, max_length)
+        return self._call_ai_stream(system_prompt, user_prompt, temperature=0.5, max_tokens=500,
+                                    use_cache=use_cache)
+
+    def generate_flashcards(self, content: str, num_cards: int = 10, difficulty: str = "MEDIUM",
+                            use_cache: bool = True) -> List[Dict]:
+        """
+        Generate flashcards from learning content. Content over
+        AI_CHUNK_TOKENS is split into chunks that each get a share of the
+        cards in proportion to their length, generated in parallel.
+        """
+        budget = app.config['AI_CHUNK_TOKENS']
+        if estimate_tokens(content) <= budget:
+            return self._flashcards_for(content, num_cards, difficulty, use_cache)
+
+        chunks = split_chunks(content, budget)
+        sizes = [estimate_tokens(chunk) for chunk in chunks]
+        total = sum(sizes)
+        # Largest remainder: shares add up to num_cards, going to the longest chunks first
+        shares = [num_cards * size // total for size in sizes]
+        by_remainder = sorted(range(len(chunks)), key=lambda i: -(num_cards * sizes[i] % total))
+        for i in by_remainder[:num_cards - sum(shares)]:
+            shares[i] += 1
+
+        batches = self._map(
+            lambda work: self._flashcards_for(work[0], work[1], difficulty, use_cache),
+            [(chunk, share) for chunk, share in zip(chunks, shares) if share])
+        return [card for batch in batches for card in batch][:num_cards]
+
+    def _flashcards_for(self, content: str, num_cards: int, difficulty: str,
+                        use_cache: bool) -> List[Dict]:
         system_prompt = """You are an expert at creating effective flashcards for studying.
         Create clear, focused flashcards with concise questions and answers.
         Each flashcard should test a single concept."""
@@ -100,7 +219,8 @@ Return the response as a JSON array with this exact structure:
 
 Only return the JSON array, no additional text."""
 
-        response = self._call_ai(system_prompt, user_prompt, temperature=0.7, max_tokens=2000)
+        response = self._call_ai(system_prompt, user_prompt, temperature=0.7, max_tokens=2000,
+                                 use_cache=use_cache)
 
         try:
             # Parse JSON response
@@ -116,7 +236,7 @@ Only return the JSON array, no additional text."""
             }]
 
     def generate_questions(self, content: str, num_questions: int = 5,
-                          question_types: List[str] = None) -> List[Dict]:
+                          question_types: List[str] = None, use_cache: bool = True) -> List[Dict]:
         """Generate quiz questions from learning content"""
         if question_types is None:
             question_types = ["MULTIPLE_CHOICE", "TRUE_FALSE", "SHORT_ANSWER"]
@@ -145,7 +265,8 @@ Return as JSON array with this structure:
 
 Only return the JSON array."""
 
-        response = self._call_ai(system_prompt, user_prompt, temperature=0.7, max_tokens=2000)
+        response = self._call_ai(system_prompt, user_prompt, temperature=0.7, max_tokens=2000,
+                                 use_cache=use_cache)
 
         try:
             questions = json.loads(response)
@@ -160,8 +281,8 @@ Only return the JSON array."""
                 "tags": []
             }]
 
-    def generate_cheatsheet(self, content: str, title: str = "Study Guide") -> Dict:
-        """Generate a structured cheat sheet from learning content"""
+    @staticmethod
+    def _cheatsheet_prompts(content: str, title: str):
         system_prompt = """You are an expert at creating concise, well-organized study guides.
         Create structured cheat sheets with clear sections, key concepts, and examples."""
 
@@ -185,9 +306,11 @@ Return as JSON with this structure:
 }}
 
 Only return the JSON object."""
+        return system_prompt, user_prompt
 
-        response = self._call_ai(system_prompt, user_prompt, temperature=0.6, max_tokens=2500)
-
+    @staticmethod
+    def parse_cheatsheet(response: str, title: str = "Study Guide") -> Dict:
+        """Cheat sheet dict from the provider's reply (one overview section if it isn't JSON)"""
         try:
             cheatsheet = json.loads(response)
             return cheatsheet
@@ -203,6 +326,24 @@ Only return the JSON object."""
                 "tags": []
             }
 
+    def generate_cheatsheet(self, content: str, title: str = "Study Guide",
+                            use_cache: bool = True) -> Dict:
+        """Generate a structured cheat sheet from learning content"""
+        system_prompt, user_prompt = self._cheatsheet_prompts(content, title)
+        response = self._call_ai(system_prompt, user_prompt, temperature=0.6, max_tokens=2500,
+                                 use_cache=use_cache)
+        return self.parse_cheatsheet(response, title)
+
+    def stream_cheatsheet(self, content: str, title: str = "Study Guide",
+                          use_cache: bool = True) -> Iterator[str]:
+        """
+        Yield the raw cheat sheet text (JSON) as it is generated; pass the
+        joined text to parse_cheatsheet
+        """
+        system_prompt, user_prompt = self._cheatsheet_prompts(content, title)
+        return self._call_ai_stream(system_prompt, user_prompt, temperature=0.6, max_tokens=2500,
+                                    use_cache=use_cache)
+
     def analyze_weak_points(self, performance_data: List[Dict]) -> List[Dict]:
         """Analyze performance data to identify weak points"""
         system_prompt = """You are an expert learning analytics specialist.
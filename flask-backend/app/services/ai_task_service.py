@@ -0,0 +1,419 @@
+from app import app, db
+from app.models import (CheatSheet, Document, Flashcard, Job, JobStatus, Priority, Question,
+                        QuestionType)
+from app.services.ai_service import get_ai_service
+from app.services.chunk_service import PAGE_BREAK
+from app.services.document_service import DocumentService
+from app.services.embedding_service import EmbeddingService
+from app.services.job_service import JobService, job_handler
+from app.services.notes_service import NoteService
+from app.services.search_service import SearchService
+from app.services.tag_service import TagService
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+import os
+import socket
+import threading
+
+AI_QUEUE = 'ai'
+
+# Task name -> function(data) returning the endpoint's response body
+_tasks = {}
+# Task name -> generator(data) yielding ('token', text) pieces, then ('done', response body)
+_streams = {}
+
+# Runs queued AI jobs in the web process, AI_EXECUTOR_THREADS at a time
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class AIJobLimitError(ValueError):
+    """Too many AI jobs queued; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=429, retry_after=5):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def ai_task(name):
+    """Register a generation task, runnable directly or as an 'ai_<name>' job"""
+    def register(fn):
+        _tasks[name] = fn
+        job_handler(f"ai_{name}")(lambda job: fn(job.payload))
+        return fn
+    return register
+
+
+def ai_stream(name):
+    """Register the streaming variant of a generation task"""
+    def register(fn):
+        _streams[name] = fn
+        return fn
+    return register
+
+
+def content_of(data):
+    """
+    The text a request works on: its `content`, or the extracted text of
+    `document_id` with page breaks kept so chunking can split on them
+    """
+    if data.get('content'):
+        return data['content']
+    document_id = data.get('document_id')
+    text = DocumentService.joined_text(document_id, separator=PAGE_BREAK)
+    if not text:
+        document = db.session.get(Document, document_id)
+        if document is None:
+            raise ValueError(f"Document {document_id} not found")
+        text = document.extracted_text or document.ocr_text
+    if not text:
+        raise ValueError(f"Document {document_id} has no extracted text yet")
+    return text
+
+
+def retrieved_content(data):
+    """
+    For requests with module_id and topic instead of content: the module's
+    chunks most relevant to the topic, within AI_RAG_MAX_TOKENS (or a smaller
+    "max_context_tokens"), as prompt content, and the sources they came from
+    """
+    topic = str(data.get('topic') or '').strip()
+    module_id = data.get('module_id')
+    if not topic or not module_id:
+        raise ValueError("module_id and topic are required without content")
+    max_tokens = app.config['AI_RAG_MAX_TOKENS']
+    if data.get('max_context_tokens'):
+        max_tokens = min(int(data['max_context_tokens']), max_tokens)
+    hits = EmbeddingService.retrieve(topic, module_id, data.get('user_id'), max_tokens)
+    if not hits:
+        raise ValueError(f"Module {module_id} has no notes or documents about '{topic}'")
+    content = f"Topic: {topic}\n\n" + '\n\n'.join(f"## {hit.title}\n{hit.text}" for hit in hits)
+    sources = [{
+        'type': hit.entity_type,
+        'id': hit.entity_id,
+        'chunk': hit.chunk,
+        'title': hit.title,
+        'score': round(hit.score, 4)
+    } for hit in hits]
+    return content, sources
+
+
+def material_of(data):
+    """(content, sources) of a request; sources is None unless content was retrieved"""
+    if data.get('content') or data.get('document_id'):
+        return content_of(data), None
+    return retrieved_content(data)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config['AI_EXECUTOR_THREADS'],
+                                           thread_name_prefix='ai-job')
+        return _executor
+
+
+def _run_job(job_id):
+    """Executor task: claim and run one AI job"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+    with app.app_context():
+        try:
+            JobService.run_inline(job_id, worker_id)
+        finally:
+            db.session.remove()
+
+
+class AITaskService:
+    """
+    AI generation requests, run synchronously or as jobs on the 'ai' queue.
+
+    Submitted jobs are handed to a bounded thread pool in the submitting
+    process, so a slow provider holds a pool thread rather than a web
+    worker. They are ordinary jobs, so `flask run-worker --queue ai` picks
+    up any that a process left behind (e.g. when it restarted). Each user may
+    have AI_MAX_JOBS_PER_USER queued or running jobs, and all users together
+    AI_MAX_QUEUED_JOBS; beyond that submissions are refused.
+    """
+
+    @staticmethod
+    def tasks():
+        return list(_tasks)
+
+    @staticmethod
+    def run(task, data):
+        """Run a task in this thread and return its result"""
+        return _tasks[task](data)
+
+    @staticmethod
+    def can_stream(task):
+        return task in _streams
+
+    @staticmethod
+    def stream(task, data):
+        """Run a task in this thread, yielding ('token', text) events and finally ('done', result)"""
+        return _streams[task](data)
+
+    @staticmethod
+    def active_counts(user_id):
+        """(this user's, everyone's) queued or running AI jobs"""
+        active = select(Job.user_id).where(
+            Job.queue == AI_QUEUE, Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+        ).subquery()
+        mine, total = db.session.execute(
+            select(func.count().filter(active.c.user_id == user_id), func.count())
+            .select_from(active)
+        ).one()
+        return mine, total
+
+    @staticmethod
+    def below_limits(user_id):
+        """SQL condition: the user and the server are both under their AI job caps"""
+        active = select(func.count()).select_from(Job).where(
+            Job.queue == AI_QUEUE, Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+        )
+        return and_(
+            active.where(Job.user_id == user_id).scalar_subquery()
+            < app.config['AI_MAX_JOBS_PER_USER'],
+            active.scalar_subquery() < app.config['AI_MAX_QUEUED_JOBS']
+        )
+
+    @staticmethod
+    def submit(task, data, user_id):
+        """
+        Queue a task as a job and start it on the executor. Raises
+        AIJobLimitError when the user or the server has too many in flight.
+        """
+        if task not in _tasks:
+            raise ValueError(f"Unknown AI task '{task}'")
+
+        # Both caps are checked by the INSERT itself, so concurrent submits cannot overshoot
+        job = JobService.enqueue(f"ai_{task}", data, queue=AI_QUEUE, user_id=user_id,
+                                 max_attempts=app.config['AI_JOB_MAX_ATTEMPTS'],
+                                 only_if=AITaskService.below_limits(user_id))
+        if job is None:
+            mine, _ = AITaskService.active_counts(user_id)
+            if mine >= app.config['AI_MAX_JOBS_PER_USER']:
+                raise AIJobLimitError(
+                    f"You already have {mine} AI jobs in progress; wait for one to finish")
+            raise AIJobLimitError("The AI service is busy; try again shortly")
+        if job.status == JobStatus.QUEUED and not app.config.get('JOBS_RUN_INLINE', False):
+            _get_executor().submit(_run_job, job.id)
+        return job
+
+
+@ai_task('summarize')
+def summarize(data):
+    summary = get_ai_service().generate_summary(content_of(data),
+                                                data.get('content_type', 'note'),
+                                                data.get('max_length', 200),
+                                                not data.get('bypass_cache', False))
+    return finish_summary(data, summary)
+
+
+@ai_stream('summarize')
+def stream_summarize(data):
+    chunks = []
+    for text in get_ai_service().stream_summary(content_of(data),
+                                                data.get('content_type', 'note'),
+                                                data.get('max_length', 200),
+                                                not data.get('bypass_cache', False)):
+        chunks.append(text)
+        yield 'token', text
+    yield 'done', finish_summary(data, ''.join(chunks))
+
+
+def finish_summary(data, summary):
+    # Optionally update note with summary
+    # (modules have no ai_summary field yet, so module_id is ignored)
+    note_id = data.get('note_id')
+    if note_id:
+        NoteService.update_note(note_id, ai_summary=summary)
+
+    return {
+        "summary": summary,
+        "word_count": len(summary.split())
+    }
+
+
+def enum_lookup(enum_class):
+    """Member for each name and value (upper-cased), built once per batch"""
+    return {key.upper(): member for member in enum_class for key in (member.name, member.value)}
+
+
+def _choose(lookup, value, default):
+    return lookup.get(value.strip().upper(), default) if isinstance(value, str) else default
+
+
+def _insert_returning(model, values, columns):
+    """
+    Insert all rows with one INSERT ... RETURNING and index them for search and
+    tags (a bulk insert skips the flush hooks that normally do), then commit.
+    Returns the inserted rows in id order.
+    """
+    if not values:
+        return []
+    rows = db.session.execute(insert(model).returning(*columns), values).all()
+    rows.sort(key=lambda row: row.id)
+    SearchService.index_rows(model, rows)
+    TagService.index_rows(model, rows)
+    db.session.commit()
+    return rows
+
+
+def save_flashcards(cards, data, difficulty='MEDIUM'):
+    """
+    Insert generated flashcards in a single statement and return them with
+    their new ids, without re-querying. Difficulties the model made up fall
+    back to the requested one.
+    """
+    difficulties = enum_lookup(Priority)
+    default = _choose(difficulties, difficulty, Priority.MEDIUM)
+    now = datetime.utcnow()
+    values = [{
+        'module_id': data.get('module_id'),
+        'note_id': data.get('note_id'),
+        'front': card.get('front', ''),
+        'back': card.get('back', ''),
+        'difficulty': _choose(difficulties, card.get('difficulty'), default),
+        'tags': card.get('tags', []),
+        'user_id': data.get('user_id'),
+        'date_created': now
+    } for card in cards if isinstance(card, dict)]
+    try:
+        rows = _insert_returning(Flashcard, values, [
+            Flashcard.id, Flashcard.front, Flashcard.back, Flashcard.difficulty,
+            Flashcard.tags, Flashcard.user_id
+        ])
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise Exception(f"Error saving flashcards: {str(e)}")
+    return [{
+        'id': row.id,
+        'front': row.front,
+        'back': row.back,
+        'difficulty': row.difficulty.value,
+        'tags': row.tags
+    } for row in rows]
+
+
+def save_questions(items, data):
+    """Insert generated questions in a single statement and return them with their new ids"""
+    types = enum_lookup(QuestionType)
+    difficulties = enum_lookup(Priority)
+    now = datetime.utcnow()
+    values = [{
+        'module_id': data.get('module_id'),
+        'note_id': data.get('note_id'),
+        'question': item.get('question', ''),
+        'type': _choose(types, item.get('type'), QuestionType.SHORT_ANSWER),
+        'options': item.get('options'),
+        'correct_answer': item.get('correct_answer', ''),
+        'explanation': item.get('explanation', ''),
+        'difficulty': _choose(difficulties, item.get('difficulty'), Priority.MEDIUM),
+        'tags': item.get('tags', []),
+        'related_concepts': item.get('related_concepts'),
+        'user_id': data.get('user_id'),
+        'date_created': now
+    } for item in items if isinstance(item, dict)]
+    try:
+        rows = _insert_returning(Question, values, [
+            Question.id, Question.question, Question.type, Question.options,
+            Question.correct_answer, Question.explanation, Question.difficulty,
+            Question.tags, Question.related_concepts, Question.user_id
+        ])
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        raise Exception(f"Error saving questions: {str(e)}")
+    return [{
+        'id': row.id,
+        'question': row.question,
+        'type': row.type.value,
+        'options': row.options,
+        'correct_answer': row.correct_answer,
+        'explanation': row.explanation,
+        'difficulty': row.difficulty.value,
+        'tags': row.tags
+    } for row in rows]
+
+
+@ai_task('flashcards')
+def flashcards(data):
+    difficulty = data.get('difficulty', 'MEDIUM')
+    content, sources = material_of(data)
+    flashcards_data = get_ai_service().generate_flashcards(content,
+                                                           data.get('num_cards', 10),
+                                                           difficulty,
+                                                           not data.get('bypass_cache', False))
+
+    if data.get('save_to_db', True) and flashcards_data:
+        flashcards_data = save_flashcards(flashcards_data, data, difficulty)
+    result = {"flashcards": flashcards_data, "count": len(flashcards_data)}
+    if sources is not None:
+        result["sources"] = sources
+    return result
+
+
+@ai_task('questions')
+def questions(data):
+    question_types = data.get('question_types', ['MULTIPLE_CHOICE', 'SHORT_ANSWER'])
+    content, sources = material_of(data)
+    questions_data = get_ai_service().generate_questions(content,
+                                                         data.get('num_questions', 5),
+                                                         question_types,
+                                                         not data.get('bypass_cache', False))
+
+    if data.get('save_to_db', True) and questions_data:
+        questions_data = save_questions(questions_data, data)
+    result = {"questions": questions_data, "count": len(questions_data)}
+    if sources is not None:
+        result["sources"] = sources
+    return result
+
+
+@ai_task('cheatsheet')
+def cheatsheet(data):
+    title = data.get('title', 'Study Guide')
+    cheatsheet_data = get_ai_service().generate_cheatsheet(content_of(data), title,
+                                                           not data.get('bypass_cache', False))
+    return finish_cheatsheet(data, cheatsheet_data)
+
+
+@ai_stream('cheatsheet')
+def stream_cheatsheet(data):
+    ai_service = get_ai_service()
+    title = data.get('title', 'Study Guide')
+    chunks = []
+    for text in ai_service.stream_cheatsheet(content_of(data), title,
+                                             not data.get('bypass_cache', False)):
+        chunks.append(text)
+        yield 'token', text
+    yield 'done', finish_cheatsheet(data, ai_service.parse_cheatsheet(''.join(chunks), title))
+
+
+def finish_cheatsheet(data, cheatsheet_data):
+    title = data.get('title', 'Study Guide')
+    if not data.get('save_to_db', True):
+        return cheatsheet_data
+
+    # Save cheat sheet to database
+    sheet = CheatSheet(
+        module_id=data.get('module_id'),
+        course_id=data.get('course_id'),
+        title=cheatsheet_data.get('title', title),
+        content=cheatsheet_data.get('sections', []),
+        tags=cheatsheet_data.get('tags', []),
+        user_id=data.get('user_id'),
+        date_created=datetime.utcnow()
+    )
+    db.session.add(sheet)
+    db.session.commit()
+    return {
+        "id": sheet.id,
+        "title": sheet.title,
+        "content": sheet.content,
+        "tags": sheet.tags
+    }
@@ -1,9 +1,8 @@
 from app import db
 from app.models import User
+from app.passwords import PasswordHashBusyError
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime, timedelta
-import jwt
-from flask import current_app
+from app.services.session_service import SessionService
 
 class AuthService:
     @staticmethod
@@ -34,28 +33,28 @@ class AuthService:
 
     @staticmethod
     def authenticate_user(username, password):
-        """Authenticate a user and return a JWT token"""
+        """Authenticate a user and open a session; returns its access and refresh tokens"""
         try:
             user = User.query.filter_by(username=username).first()
 
             if not user or not user.check_password(password):
                 return None, "Invalid username or password"
 
-            # Generate JWT token
-            payload = {
-                'user_id': user.id,
-                'is_admin': user.is_admin,
-                'exp': datetime.utcnow() + timedelta(days=1)  # Token expires in 1 day
-            }
-
-            token = jwt.encode(
-                payload,
-                current_app.config.get('SECRET_KEY', 'dev-key'),
-                algorithm='HS256'
-            )
-
-            return {'token': token, 'user_id': user.id, 'username': user.username}, None
+            # Hashes made under an older policy are upgraded while the password is at hand
+            if user.password_needs_rehash():
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except PasswordHashBusyError:
+                    # The password checked out; the upgrade can wait for the next login
+                    db.session.rollback()
+
+            # Short-lived access token plus a refresh token for renewing it without the password
+            return SessionService.start(user), None
+        except PasswordHashBusyError:
+            raise
         except Exception as e:
+            db.session.rollback()
             return None, f"Authentication error: {str(e)}"
 
     @staticmethod
@@ -68,11 +67,18 @@ class AuthService:
         """Get all users (admin only)"""
         return User.query.all()
 
+    @staticmethod
+    def query_users():
+        """Unordered users query (admin only)"""
+        return User.query
+
     @staticmethod
     def delete_user(user_id):
         """Delete a user (admin only)"""
         try:
             user = User.query.get_or_404(user_id)
+            # Explicitly: SQLite only cascades with PRAGMA foreign_keys on
+            SessionService.end_all(user.id)
             db.session.delete(user)
             db.session.commit()
             return True, None
@@ -81,8 +87,12 @@ class AuthService:
             return False, f"Database error: {str(e)}"
 
     @staticmethod
-    def update_user(user_id, username=None, email=None, password=None, is_admin=None):
-        """Update a user"""
+    def update_user(user_id, username=None, email=None, password=None, is_admin=None,
+                    keep_session_id=None):
+        """
+        Update a user. A new password ends the user's login sessions (all but
+        keep_session_id, the caller's own), so old refresh tokens stop working.
+        """
         try:
             user = User.query.get_or_404(user_id)
 
@@ -102,6 +112,7 @@ class AuthService:
 
             if password:
                 user.set_password(password)
+                SessionService.end_all(user.id, keep=keep_session_id)
 
             if is_admin is not None:
                 user.is_admin = is_admin
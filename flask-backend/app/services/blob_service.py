@@ -0,0 +1,139 @@
+from app import db
+from app.models import FileBlob
+from app.services.file_service import get_file_service
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from collections import namedtuple
+import os
+import threading
+
+# A blob whose last reference was dropped: identity is the (st_dev, st_ino)
+# of its file at that point, so a file stored again since is told apart
+ReleasedBlob = namedtuple('ReleasedBlob', 'sha256 path identity')
+
+# Serialises moving blob files into place with removing released ones
+_files_lock = threading.Lock()
+
+
+def _identity(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+class BlobService:
+    """
+    Content-addressed file storage with reference counting.
+
+    Reference changes are made in the caller's transaction, so a blob's
+    ref_count always matches the committed documents pointing at it.
+
+    A new reference is counted before its file is moved into place, and a
+    released blob's file is only removed after commit if no row for that
+    content exists again and the file is still the one that was released.
+    An upload of the same content racing a delete therefore never ends up
+    with a row whose file is gone.
+    """
+
+    @staticmethod
+    def store(file):
+        """
+        Save an upload (deduplicated by SHA-256) and add a reference to its
+        blob. Flushes but does not commit. Returns the FileBlob.
+        """
+        sha256, temp_path, file_size, ext = get_file_service().store_blob(file)
+        try:
+            return BlobService._register(sha256, temp_path, file_size, ext)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def adopt(temp_path, sha256, file_size, ext=''):
+        """
+        Move an already hashed file (e.g. a finished resumable upload) into
+        blob storage and add a reference to it. Flushes but does not commit.
+        """
+        return BlobService._register(sha256, temp_path, file_size, ext)
+
+    @staticmethod
+    def _register(sha256, temp_path, file_size, ext):
+        file_service = get_file_service()
+        try:
+            blob = BlobService.acquire(sha256, file_service.blob_path(sha256, ext), file_size)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error storing file: {str(e)}")
+
+        # Same content may be stored already (possibly under another extension): replace it
+        with _files_lock:
+            file_service.adopt_blob(temp_path, blob.path)
+        return blob
+
+    @staticmethod
+    def acquire(sha256, file_path, file_size):
+        """Increment a blob's ref_count, registering the blob on first use"""
+        result = db.session.execute(
+            update(FileBlob)
+            .where(FileBlob.sha256 == sha256)
+            .values(ref_count=FileBlob.ref_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(FileBlob(sha256=sha256, path=file_path, size=file_size,
+                                            ref_count=1))
+                return db.session.get(FileBlob, sha256)
+            except IntegrityError:
+                # A concurrent upload registered it first
+                db.session.execute(
+                    update(FileBlob)
+                    .where(FileBlob.sha256 == sha256)
+                    .values(ref_count=FileBlob.ref_count + 1)
+                    .execution_options(synchronize_session=False)
+                )
+        return db.session.get(FileBlob, sha256, populate_existing=True)
+
+    @staticmethod
+    def release(sha256):
+        """
+        Drop a reference to a blob (in the caller's transaction). Returns a
+        ReleasedBlob when this was the last reference, for remove_file after
+        committing; None otherwise.
+        """
+        db.session.execute(
+            update(FileBlob)
+            .where(FileBlob.sha256 == sha256)
+            .values(ref_count=FileBlob.ref_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        blob = db.session.get(FileBlob, sha256, populate_existing=True)
+        if blob is None or blob.ref_count > 0:
+            return None
+        # Taken while this transaction holds the row, before another upload can re-store it
+        released = ReleasedBlob(sha256, blob.path, _identity(blob.path))
+        db.session.execute(
+            delete(FileBlob)
+            .where(FileBlob.sha256 == sha256, FileBlob.ref_count <= 0)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.expunge(blob)
+        return released
+
+    @staticmethod
+    def remove_file(released):
+        """
+        Delete a released blob's file (after the release committed), unless
+        the same content has been stored again since. Returns whether it was.
+        """
+        with _files_lock:
+            if db.session.get(FileBlob, released.sha256, populate_existing=True) is not None:
+                return False
+            if released.identity is None or _identity(released.path) != released.identity:
+                return False
+            os.remove(released.path)
+            return True
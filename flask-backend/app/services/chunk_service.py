@@ -0,0 +1,98 @@
+import hashlib
+import re
+
+# Rough tokens per character for English prose; providers count ~4 chars a token
+CHARS_PER_TOKEN = 4
+
+PAGE_BREAK = '\f'
+_PARAGRAPH = re.compile(r'\n\s*\n')
+_SENTENCE = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_anchor(paragraph, every=4):
+    """Roughly one paragraph in `every`, chosen by content rather than position"""
+    return int(hashlib.sha1(paragraph.encode()).hexdigest()[:8], 16) % every == 0
+
+
+def _split_long(text, max_tokens):
+    """Cut an oversized paragraph into pieces of at most max_tokens, at sentences then words"""
+    pieces, current = [], ''
+    for sentence in _SENTENCE.split(text):
+        while estimate_tokens(sentence) > max_tokens:
+            # A single enormous sentence: break it at the last space that fits
+            limit = max_tokens * CHARS_PER_TOKEN
+            cut = sentence.rfind(' ', 0, limit)
+            cut = cut if cut > 0 else limit
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and estimate_tokens(current) + estimate_tokens(sentence) + 1 > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_chunks(text, max_tokens):
+    """
+    Split text into chunks of at most about max_tokens, breaking only
+    between paragraphs (blank lines) and pages (form feeds) unless a single
+    paragraph is too long.
+
+    Boundaries are content-defined: once a chunk is at least half full it
+    ends after an "anchor" paragraph (picked by hashing its text) or at a page
+    break. So an edit changes the chunk it falls in, and boundaries after it
+    realign at the next anchor instead of all shifting; chunk-level results
+    cached by prompt stay valid for the rest of the text.
+    """
+    chunks, current, size = [], [], 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            chunks.append('\n\n'.join(current))
+        current, size = [], 0
+
+    for page in text.split(PAGE_BREAK):
+        for paragraph in _PARAGRAPH.split(page):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            pieces = ([paragraph] if estimate_tokens(paragraph) <= max_tokens
+                      else _split_long(paragraph, max_tokens))
+            for piece in pieces:
+                tokens = estimate_tokens(piece)
+                if current and size + tokens > max_tokens:
+                    flush()
+                current.append(piece)
+                size += tokens
+                if size >= max_tokens // 2 and _is_anchor(piece):
+                    flush()
+        if size >= max_tokens // 2:
+            flush()
+    flush()
+    return chunks
+
+
+def pack(texts, max_tokens, separator='\n\n'):
+    """Group consecutive texts into as few groups of at most max_tokens as fit"""
+    groups, current, size = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text) + estimate_tokens(separator)
+        if current and size + tokens > max_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+    if current:
+        groups.append(current)
+    return groups
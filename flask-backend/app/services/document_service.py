@@ -0,0 +1,239 @@
+from app import app, db
+from app.models import ContentType, Document, DocumentPage, DocumentStatus
+from app.services.file_service import PYPDF2_AVAILABLE, get_file_service
+from app.services.job_service import JobService, job_handler
+from app.services.ocr_service import OCRService
+from app.services.thumbnail_service import ThumbnailService
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.utils import secure_filename
+from datetime import datetime
+
+PROCESS_JOB = 'process_document'
+DOCUMENT_QUEUE = 'documents'
+
+
+# Upload extension -> content type
+CONTENT_TYPES = {
+    'pdf': ContentType.PDF,
+    'ppt': ContentType.PPT, 'pptx': ContentType.PPT,
+    'png': ContentType.IMAGE, 'jpg': ContentType.IMAGE, 'jpeg': ContentType.IMAGE,
+    'gif': ContentType.IMAGE, 'bmp': ContentType.IMAGE,
+    'mp3': ContentType.AUDIO, 'wav': ContentType.AUDIO, 'm4a': ContentType.AUDIO,
+    'mp4': ContentType.VIDEO, 'mov': ContentType.VIDEO, 'avi': ContentType.VIDEO
+}
+
+
+class DocumentService:
+    @staticmethod
+    def content_type_for(filename):
+        """ContentType for an upload's extension, or None if unsupported"""
+        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        return CONTENT_TYPES.get(ext)
+
+    @staticmethod
+    def create_document(blob, original_name, content_type, mime_type=None, tags=None,
+                        uploaded_by=None, module_id=None):
+        """Create and commit the Document for a stored blob"""
+        document = Document(
+            name=secure_filename(original_name),
+            original_name=original_name,
+            type=content_type,
+            file_url=blob.path,
+            file_size=blob.size,
+            blob_sha256=blob.sha256,
+            mime_type=mime_type,
+            status=DocumentStatus.PENDING,
+            tags=tags or [],
+            uploaded_by=uploaded_by,
+            module_id=module_id,
+            date_created=datetime.utcnow()
+        )
+        try:
+            db.session.add(document)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error creating document: {str(e)}")
+        return document
+
+    @staticmethod
+    def queue_processing(document, reuse=True):
+        """
+        Mark a document PENDING and queue a processing job for it, unless one
+        is already queued or running. Returns the job, or None when reuse is
+        allowed and a document with the same content was already processed
+        (its results are copied and the document is COMPLETED right away).
+        """
+        if reuse and DocumentService.reuse_processing(document):
+            return None
+
+        active = JobService.active_for('document', document.id, PROCESS_JOB)
+        if active is not None:
+            return active
+
+        document.status = DocumentStatus.PENDING
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error queueing document processing: {str(e)}")
+        return JobService.enqueue(PROCESS_JOB, {'document_id': document.id, 'reuse': reuse},
+                                  queue=DOCUMENT_QUEUE,
+                                  entity_type='document', entity_id=document.id)
+
+    @staticmethod
+    def reuse_processing(document):
+        """
+        Copy text, page count and pages from a completed document
+        stored in the same blob. Returns False if there is none.
+        """
+        if not document.blob_sha256:
+            return False
+        source = (Document.query
+                  .filter(Document.blob_sha256 == document.blob_sha256,
+                          Document.status == DocumentStatus.COMPLETED,
+                          Document.id != document.id)
+                  .order_by(Document.id)
+                  .first())
+        if source is None:
+            return False
+
+        try:
+            DocumentService.delete_pages(document.id)
+            db.session.execute(insert(DocumentPage).from_select(
+                ['document_id', 'page_number', 'text', 'char_count'],
+                select(literal(document.id), DocumentPage.page_number, DocumentPage.text,
+                       DocumentPage.char_count)
+                .where(DocumentPage.document_id == source.id)
+            ))
+            for field in ('extracted_text', 'ocr_text', 'page_count', 'processed_pdf_url'):
+                setattr(document, field, getattr(source, field))
+            # Thumbnails are keyed by content, so this serves the source's renders
+            document.thumbnail_url = ThumbnailService.url_for(document)
+            document.status = DocumentStatus.COMPLETED
+            document.last_modified = datetime.utcnow()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error reusing document processing: {str(e)}")
+        return True
+
+    @staticmethod
+    def apply_result(document, result):
+        """Copy FileService.process_document output onto a document"""
+        document.extracted_text = result.get('extracted_text')
+        document.ocr_text = result.get('ocr_text')
+        document.page_count = result.get('page_count', 0)
+        document.thumbnail_url = ThumbnailService.url_for(document)
+
+    @staticmethod
+    def extract_pdf_pages(document):
+        """
+        Extract a PDF into document_pages, committing each batch of pages as
+        its process finishes so progress is visible while it runs. Returns a
+        process_document style result whose extracted_text is rebuilt in page
+        order from the table, capped at EXTRACTED_TEXT_MAX_CHARS.
+        """
+        file_service = get_file_service()
+        page_count = file_service.pdf_page_count(document.file_url)
+        parallel = page_count >= app.config.get('PDF_PARALLEL_MIN_PAGES', 32)
+
+        db.session.execute(delete(DocumentPage).where(DocumentPage.document_id == document.id))
+        document.page_count = page_count
+        db.session.commit()
+
+        batches = file_service.iter_pdf_pages(
+            document.file_url,
+            processes=app.config.get('PDF_EXTRACT_PROCESSES', 1) if parallel else 1,
+            pages_per_task=app.config.get('PDF_PAGES_PER_TASK', 16),
+            page_count=page_count
+        )
+        for batch in batches:
+            db.session.execute(insert(DocumentPage), [
+                {'document_id': document.id, 'page_number': number,
+                 'text': text, 'char_count': len(text)}
+                for number, text in batch
+            ])
+            db.session.commit()
+
+        return {
+            'extracted_text': DocumentService.joined_text(
+                document.id, app.config.get('EXTRACTED_TEXT_MAX_CHARS')),
+            'page_count': page_count
+        }
+
+    @staticmethod
+    def joined_text(document_id, max_chars=None, separator="\n\n"):
+        """A document's page texts in order, streamed from document_pages until max_chars"""
+        rows = db.session.execute(
+            select(DocumentPage.text)
+            .where(DocumentPage.document_id == document_id, DocumentPage.char_count > 0)
+            .order_by(DocumentPage.page_number)
+            .execution_options(yield_per=100)
+        ).scalars()
+        parts, size = [], 0
+        for text in rows:
+            if parts:
+                size += len(separator)
+            if max_chars is not None and size + len(text) > max_chars:
+                if max_chars > size:
+                    parts.append(text[:max_chars - size])
+                break
+            parts.append(text)
+            size += len(text)
+        rows.close()
+        return separator.join(parts)
+
+    @staticmethod
+    def pages_extracted(document_id):
+        return db.session.scalar(
+            select(func.count()).where(DocumentPage.document_id == document_id))
+
+    @staticmethod
+    def delete_pages(document_id):
+        db.session.execute(delete(DocumentPage).where(DocumentPage.document_id == document_id))
+
+    @staticmethod
+    def process(document_id, last_attempt=True, reuse=False):
+        """
+        Extract text, page count and thumbnail for a document. On failure the
+        document goes back to PENDING while retries remain, FAILED otherwise.
+        With reuse, results of an identical document finished meanwhile are
+        copied instead.
+        """
+        document = db.session.get(Document, document_id)
+        if document is None:
+            return {'skipped': 'document was deleted'}
+        if reuse and DocumentService.reuse_processing(document):
+            return {'reused': True, 'page_count': document.page_count}
+
+        document.status = DocumentStatus.PROCESSING
+        db.session.commit()
+        try:
+            if document.type == ContentType.PDF and PYPDF2_AVAILABLE:
+                result = DocumentService.extract_pdf_pages(document)
+            elif document.type == ContentType.IMAGE:
+                # Cached by content, so reprocessing and duplicates skip recognition
+                result = {'ocr_text': OCRService.text_for(document.file_url, document.blob_sha256),
+                          'page_count': 0}
+            else:
+                result = get_file_service().process_document(document.file_url,
+                                                             document.type.value)
+            DocumentService.apply_result(document, result)
+            document.status = DocumentStatus.COMPLETED
+            document.last_modified = datetime.utcnow()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            document.status = DocumentStatus.FAILED if last_attempt else DocumentStatus.PENDING
+            db.session.commit()
+            raise
+        return {'page_count': document.page_count}
+
+
+@job_handler(PROCESS_JOB)
+def process_document_job(job):
+    return DocumentService.process(job.payload['document_id'],
+                                   last_attempt=job.attempts >= job.max_attempts,
+                                   reuse=job.payload.get('reuse', False))
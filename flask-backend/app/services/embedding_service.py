@@ -0,0 +1,561 @@
+from app import app, db
+from app.models import CheatSheet, Document, Embedding, Note
+from app.services.ai_providers import OpenAIProvider, call, get_provider, shared_client
+from app.services.chunk_service import estimate_tokens, split_chunks
+from app.services.file_service import get_file_service
+from app.services.vector_index import (VectorIndex, normalize, pack_vector, remove_files,
+                                       unpack_vector)
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from array import array
+from collections import namedtuple
+from operator import mul
+import hashlib
+import math
+import os
+import re
+import threading
+import zlib
+
+# EMBEDDING_PROVIDER name -> factory returning an embedder: an object with
+# `name` (stored with each vector), `dimensions` and `embed(texts)` -> unit vectors
+_embedders = {}
+
+# (database URL, embedder name) -> VectorIndex
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+_WORD = re.compile(r'\w+')
+_STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have in into is it its of on or so than that '
+    'the their then there these this to was were which will with'.split())
+
+SemanticHit = namedtuple('SemanticHit', 'entity_type entity_id chunk title score text')
+
+
+def embedder(name):
+    """Register an embedder factory under an EMBEDDING_PROVIDER name"""
+    def register(factory):
+        _embedders[name] = factory
+        return factory
+    return register
+
+
+@embedder('hashing')
+class HashingEmbedder:
+    """
+    Offline embedder, the default. Words, and character trigrams of longer
+    words, are hashed into a fixed number of signed buckets (the "hashing
+    trick"), weighted by 1 + log(count) and normalized. Texts sharing words
+    or word stems score close; real synonyms need a provider embedder. The
+    hash is stable across processes, so stored vectors stay comparable.
+    """
+
+    def __init__(self, dimensions=None):
+        self.dimensions = dimensions or app.config['EMBEDDING_DIMENSIONS']
+        self.name = f"hashing-{self.dimensions}"
+
+    @staticmethod
+    def _features(text):
+        for word in _WORD.findall(text.lower()):
+            if word in _STOPWORDS:
+                continue
+            yield word, 1.0
+            if len(word) > 4:
+                padded = f"<{word}>"
+                for i in range(len(padded) - 2):
+                    yield padded[i:i + 3], 0.5
+
+    def _vector(self, text):
+        counts = {}
+        for feature, weight in self._features(text):
+            counts[feature] = counts.get(feature, 0.0) + weight
+        vector = [0.0] * self.dimensions
+        for feature, count in counts.items():
+            code = zlib.crc32(feature.encode())
+            sign = 1.0 if code & 0x80000000 else -1.0
+            vector[code % self.dimensions] += sign * (1 + math.log1p(count))
+        return normalize(vector)
+
+    def embed(self, texts):
+        return [self._vector(text) for text in texts]
+
+
+@embedder('openai')
+class OpenAIEmbedder:
+    """
+    Embeddings from the OpenAI API (EMBEDDING_MODEL), sent through the
+    provider layer's shared client, retries and circuit breaker
+    """
+
+    def __init__(self):
+        if get_provider(OpenAIProvider.name) is None:
+            raise Exception("EMBEDDING_PROVIDER 'openai' needs the openai package")
+        self.dimensions = app.config['EMBEDDING_DIMENSIONS']
+        self.name = f"{app.config['EMBEDDING_MODEL']}-{self.dimensions}"
+        self.client = shared_client(OpenAIProvider)
+
+    def embed(self, texts):
+        response = call(OpenAIProvider, lambda timeout: self.client.embeddings.create(
+            model=app.config['EMBEDDING_MODEL'], input=texts, dimensions=self.dimensions,
+            timeout=timeout))
+        return [normalize(item.embedding) for item in sorted(response.data, key=lambda d: d.index)]
+
+
+def get_embedder():
+    name = app.config['EMBEDDING_PROVIDER']
+    if name not in _embedders:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER '{name}'")
+    return _embedders[name]()
+
+
+def _strings(value):
+    """Every string inside a JSON value (lists, dicts, nested)"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [part for item in value for part in _strings(item)]
+    return [str(value)]
+
+
+def _text(*values):
+    return '\n\n'.join(part for value in values for part in _strings(value) if part.strip())
+
+
+def _split(title, text):
+    return [(title, chunk) for chunk in split_chunks(text, app.config['EMBEDDING_CHUNK_TOKENS'])]
+
+
+def _note_chunks(note):
+    return _split(note.name, _text(note.content, note.items) or note.name or '')
+
+
+def _document_chunks(document):
+    return _split(document.original_name or document.name,
+                  document.extracted_text or document.ocr_text or '')
+
+
+def _cheatsheet_chunks(sheet):
+    """One or more chunks per section, titled "<sheet>: <section>" """
+    sections = sheet.content if isinstance(sheet.content, list) else [sheet.content]
+    chunks = []
+    for section in sections:
+        title = sheet.title
+        if isinstance(section, dict) and section.get('title'):
+            title = f"{sheet.title}: {section['title']}"
+            section = {key: value for key, value in section.items() if key != 'title'}
+        chunks.extend(_split(title, _text(section)))
+    return chunks
+
+
+class EmbeddedEntity(namedtuple('EmbeddedEntity', 'kind code model owner fields chunks')):
+    """
+    How one model is embedded: a small code for the index, the owner column,
+    the columns whose changes re-embed it, and a function returning its
+    (title, text) chunks
+    """
+
+    def owner_id(self, obj):
+        return getattr(obj, self.owner)
+
+    def is_shared(self, obj):
+        return bool(getattr(obj, 'is_shared', False))
+
+
+ENTITIES = [
+    EmbeddedEntity('note', 1, Note, 'user_id', ['name', 'content', 'items', 'user_id'],
+                   _note_chunks),
+    EmbeddedEntity('document', 2, Document, 'uploaded_by',
+                   ['name', 'original_name', 'extracted_text', 'ocr_text', 'uploaded_by',
+                    'is_shared'],
+                   _document_chunks),
+    EmbeddedEntity('cheatsheet', 5, CheatSheet, 'user_id', ['title', 'content', 'user_id'],
+                   _cheatsheet_chunks),
+]
+EMBEDDED_TYPES = {entity.kind: entity for entity in ENTITIES}
+_BY_MODEL = {entity.model: entity for entity in ENTITIES}
+_KIND_CODES = {entity.kind: entity.code for entity in ENTITIES}
+
+
+def _hash(title, text):
+    return hashlib.sha1(f"{title}\n{text}".encode()).hexdigest()
+
+
+def _write(connection, embedder, removed, items):
+    """
+    Replace the embeddings of the `removed` (kind, id) entities with those of
+    `items`, (entity, obj) pairs. Chunks whose title and text are unchanged
+    keep their vector; the rest are written without one, for
+    EmbeddingService.embed_pending to fill in after the transaction commits.
+    The embedder is never called here. Returns the number of chunks written.
+    """
+    table = Embedding.__table__
+    keys = {}
+    for kind, entity_id in removed + [(entity.kind, obj.id) for entity, obj in items]:
+        keys.setdefault(kind, set()).add(entity_id)
+    if not keys:
+        return 0
+
+    reuse = {}
+    for kind, entity_ids in keys.items():
+        condition = (table.c.entity_type == kind) & table.c.entity_id.in_(entity_ids)
+        reuse.update(connection.execute(
+            select(table.c.content_hash, table.c.vector)
+            .where(condition, table.c.model == embedder.name)).all())
+        connection.execute(delete(table).where(condition))
+
+    rows = []
+    for entity, obj in items:
+        for number, (title, text) in enumerate(entity.chunks(obj)):
+            content_hash = _hash(title, text)
+            row = {'entity_type': entity.kind, 'entity_id': obj.id, 'chunk': number,
+                   'owner_id': entity.owner_id(obj), 'is_shared': entity.is_shared(obj),
+                   'title': (title or '')[:300], 'text': text, 'content_hash': content_hash,
+                   'model': embedder.name, 'vector': reuse.get(content_hash)}
+            rows.append(row)
+    if rows:
+        connection.execute(insert(table), rows)
+    return len(rows)
+
+
+def _changed(obj, entity):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in entity.fields)
+
+
+def _after_flush(session, flush_context):
+    """
+    Rewrite the chunks of flushed inserts and updates of embedded models and
+    drop those of deleted ones; their new vectors are filled in after commit
+    """
+    if not app.config['EMBEDDINGS_ENABLED']:
+        return
+    removed, items = [], []
+    for obj in session.deleted:
+        entity = _BY_MODEL.get(type(obj))
+        if entity is not None and obj.id is not None:
+            removed.append((entity.kind, obj.id))
+    for obj in list(session.new) + list(session.dirty):
+        entity = _BY_MODEL.get(type(obj))
+        if entity is None or obj in session.deleted:
+            continue
+        if obj in session.new or _changed(obj, entity):
+            items.append((entity, obj))
+    if removed or items:
+        _write(session.connection(), get_embedder(), removed, items)
+        session.info.setdefault('embeddings_pending', set()).update(
+            (entity.kind, obj.id) for entity, obj in items)
+
+
+def _after_commit(session):
+    """
+    Embed the chunks the committed transaction wrote without a vector. A
+    failing embedder must not fail the save that already committed: the
+    chunks stay unsearchable until `flask embed-pending` (or a rebuild)
+    """
+    pending = session.info.pop('embeddings_pending', None)
+    if not pending:
+        return
+    try:
+        EmbeddingService.embed_pending(pending)
+    except Exception as e:
+        app.logger.warning("Embedding %d saved entities failed: %s", len(pending), e)
+
+
+def _after_rollback(session):
+    session.info.pop('embeddings_pending', None)
+
+
+def _index_folder():
+    return app.config['EMBEDDING_INDEX_DIR'] or os.path.join(get_file_service().upload_folder,
+                                                             'embeddings')
+
+
+def _namespace(url):
+    """Prefix of one database's index files: a hash of its URL"""
+    return hashlib.sha1(str(url).encode()).hexdigest()[:12]
+
+
+def _reset_indexes(target=None, connection=None, **kwargs):
+    """
+    Forget a database's loaded indexes and delete their files, e.g. when its
+    tables are dropped; other databases' indexes in the folder are kept
+    """
+    url = str((connection or db).engine.url)
+    with _indexes_lock:
+        for key in [key for key in _indexes if key[0] == url]:
+            del _indexes[key]
+    remove_files(_index_folder(), _namespace(url))
+
+
+event.listen(db.session, 'after_flush', _after_flush)
+event.listen(db.session, 'after_commit', _after_commit)
+event.listen(db.session, 'after_rollback', _after_rollback)
+event.listen(db.metadata, 'before_drop', _reset_indexes)
+
+
+class EmbeddingService:
+    """
+    Semantic search over notes, document text and cheat sheet sections.
+
+    Each entity is split into chunks of about EMBEDDING_CHUNK_TOKENS; every
+    chunk gets a row in `embeddings` with its text and unit vector. A session
+    after_flush hook rewrites an entity's rows in the same transaction when it
+    changes, reusing the vectors of chunks whose text did not change; the
+    chunks it touched are written without a vector and embedded once the
+    transaction has committed, so the embedder (possibly a network call) never
+    runs under the database write lock and its failures never fail a save.
+    Chunks without a vector are left out of searches until they are embedded.
+    Bulk statements bypass the hook; run `flask rebuild-embeddings` after those.
+
+    Searches go through a per-process VectorIndex that catches up with the
+    table by id before each query (new rows since the last one, and deletions
+    when the row count disagrees).
+    """
+
+    @staticmethod
+    def index_for(embedder):
+        key = (str(db.engine.url), embedder.name)
+        with _indexes_lock:
+            if key not in _indexes:
+                _indexes[key] = VectorIndex(embedder.name, embedder.dimensions, _index_folder(),
+                                            _namespace(key[0]))
+            return _indexes[key]
+
+    @staticmethod
+    def refresh(index):
+        """Bring index up to date with the embeddings table (call with index.lock held)"""
+        model = (Embedding.model == index.model) & Embedding.vector.isnot(None)
+        max_id, count = db.session.execute(
+            select(func.max(Embedding.id), func.count()).where(model)).one()
+        columns = (Embedding.id, Embedding.entity_type, Embedding.owner_id, Embedding.is_shared,
+                   Embedding.vector)
+
+        def add(rows):
+            for row in rows:
+                index.add(row.id, _KIND_CODES[row.entity_type], row.owner_id, row.is_shared,
+                          row.vector)
+
+        if (max_id or 0) > index.watermark:
+            add(db.session.execute(select(*columns).where(model, Embedding.id > index.watermark)
+                                   .order_by(Embedding.id).execution_options(yield_per=1000)))
+        if count != len(index):
+            # Deletions, or rows committed out of id order by concurrent writers
+            live = set(db.session.execute(select(Embedding.id).where(model)).scalars())
+            index.discard(live)
+            missing = sorted(live - set(index.rows))
+            for start in range(0, len(missing), 1000):
+                add(db.session.execute(select(*columns)
+                                       .where(Embedding.id.in_(missing[start:start + 1000]))))
+        if index.needs_compaction():
+            index.compact()
+
+    @staticmethod
+    def embed_pending(entities=None):
+        """
+        Embed the chunks written without a vector, of every entity or only of
+        the (kind, id) pairs in entities, EMBEDDING_BATCH_SIZE per embedder
+        call. No transaction is open while the embedder runs; each embedded
+        chunk then replaces its row under a new id, so indexes syncing by id
+        pick it up. Returns the number of chunks embedded.
+        """
+        embedder = get_embedder()
+        table = Embedding.__table__
+        condition = (table.c.model == embedder.name) & table.c.vector.is_(None)
+        if entities is not None:
+            keys = {}
+            for kind, entity_id in entities:
+                keys.setdefault(kind, set()).add(entity_id)
+            if not keys:
+                return 0
+            condition &= db.or_(*[(table.c.entity_type == kind) & table.c.entity_id.in_(ids)
+                                  for kind, ids in keys.items()])
+
+        batch_size = app.config['EMBEDDING_BATCH_SIZE']
+        count, last_id = 0, 0
+        while True:
+            with db.engine.connect() as connection:
+                rows = connection.execute(select(table).where(condition, table.c.id > last_id)
+                                          .order_by(table.c.id).limit(batch_size)).mappings().all()
+            if not rows:
+                return count
+            last_id = rows[-1]['id']
+            vectors = embedder.embed([f"{row['title']}\n{row['text']}" for row in rows])
+            with db.engine.begin() as connection:
+                # Rows rewritten meanwhile (their entity changed again) are not brought back
+                replaced = set(connection.execute(
+                    delete(table).where(table.c.id.in_([row['id'] for row in rows]),
+                                        table.c.vector.is_(None))
+                    .returning(table.c.id)).scalars())
+                embedded = [dict({key: value for key, value in row.items() if key != 'id'},
+                                 vector=pack_vector(vector))
+                            for row, vector in zip(rows, vectors) if row['id'] in replaced]
+                if embedded:
+                    connection.execute(insert(table), embedded)
+            count += len(embedded)
+
+    @staticmethod
+    def search(query_string, user_id=None, entity_types=None, limit=10, per_entity=True):
+        """
+        SemanticHit tuples for the chunks most similar to query_string, best
+        first (score is the cosine similarity). With user_id, only that user's
+        entities, shared documents and entities without an owner; per_entity
+        keeps the best chunk of each entity.
+        """
+        unknown = set(entity_types or ()) - set(EMBEDDED_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown entity types: {', '.join(sorted(unknown))}")
+        if not query_string.strip():
+            return []
+
+        embedder = get_embedder()
+        vector = embedder.embed([query_string])[0]
+        kinds = {_KIND_CODES[kind] for kind in entity_types} if entity_types else None
+        index = EmbeddingService.index_for(embedder)
+        with index.lock:
+            EmbeddingService.refresh(index)
+            # Several chunks of one entity may rank high; fetch extra to fill the page
+            scored = index.search(vector, limit * 4 if per_entity else limit, kinds, user_id)
+
+        scored = [(score, embedding_id) for score, embedding_id in scored if score > 0]
+        rows = {row.id: row for row in db.session.execute(
+            select(Embedding.id, Embedding.entity_type, Embedding.entity_id, Embedding.chunk,
+                   Embedding.title, Embedding.text)
+            .where(Embedding.id.in_([embedding_id for _, embedding_id in scored])))}
+        hits, seen = [], set()
+        for score, embedding_id in scored:
+            row = rows.get(embedding_id)
+            if row is None or (per_entity and (row.entity_type, row.entity_id) in seen):
+                continue
+            seen.add((row.entity_type, row.entity_id))
+            hits.append(SemanticHit(row.entity_type, row.entity_id, row.chunk, row.title,
+                                    score, row.text))
+            if len(hits) == limit:
+                break
+        return hits
+
+    @staticmethod
+    def _module_entities(module_id, user_id=None):
+        """{kind: ids} of the module's notes and documents visible to user_id"""
+        entities = {}
+        for kind in ('note', 'document'):
+            entity = EMBEDDED_TYPES[kind]
+            model = entity.model
+            query = select(model.id).where(model.module_id == module_id)
+            if user_id is not None:
+                owner = getattr(model, entity.owner)
+                visible = owner.is_(None) | (owner == user_id)
+                if hasattr(model, 'is_shared'):
+                    visible |= model.is_shared.is_(True)
+                query = query.where(visible)
+            entities[kind] = set(db.session.execute(query).scalars())
+        return entities
+
+    @staticmethod
+    def _chunks_of(entities, model):
+        condition = db.or_(*[(Embedding.entity_type == kind) & Embedding.entity_id.in_(ids)
+                             for kind, ids in entities.items() if ids])
+        return db.session.execute(
+            select(Embedding.entity_type, Embedding.entity_id, Embedding.chunk, Embedding.title,
+                   Embedding.text, Embedding.vector)
+            .where(Embedding.model == model, condition)).all()
+
+    @staticmethod
+    def retrieve(query_string, module_id, user_id=None, max_tokens=None, limit=None):
+        """
+        The chunks of a module's notes and documents most similar to
+        query_string, at most `limit` (AI_RAG_TOP_K) of them and together at
+        most max_tokens (AI_RAG_MAX_TOKENS), as SemanticHits in reading order.
+        Chunks scoring under AI_RAG_MIN_RELATIVE_SCORE of the best are left out.
+        With user_id, only that user's notes and documents, shared documents
+        and those without an owner. Entities saved without embeddings for the
+        current embedder (bulk inserts, a new embedder, a failed embedder
+        call) are embedded first.
+        """
+        max_tokens = max_tokens or app.config['AI_RAG_MAX_TOKENS']
+        limit = limit or app.config['AI_RAG_TOP_K']
+        if not query_string.strip():
+            return []
+        embedder = get_embedder()
+        entities = EmbeddingService._module_entities(module_id, user_id)
+        if not any(entities.values()):
+            return []
+
+        rows = EmbeddingService._chunks_of(entities, embedder.name)
+        embedded = {(row.entity_type, row.entity_id) for row in rows}
+        pending = {(row.entity_type, row.entity_id) for row in rows if row.vector is None}
+        missing = []
+        for kind, ids in entities.items():
+            entity = EMBEDDED_TYPES[kind]
+            unembedded = [entity_id for entity_id in ids if (kind, entity_id) not in embedded]
+            if unembedded:
+                missing.extend((entity, obj) for obj in
+                               entity.model.query.filter(entity.model.id.in_(unembedded)))
+        if missing:
+            try:
+                _write(db.session.connection(), embedder, [], missing)
+                db.session.commit()
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                raise Exception(f"Error embedding module {module_id}: {str(e)}")
+            pending.update((entity.kind, obj.id) for entity, obj in missing)
+        if pending:
+            EmbeddingService.embed_pending(pending)
+            rows = EmbeddingService._chunks_of(entities, embedder.name)
+
+        query = array('f', embedder.embed([query_string])[0])
+        scored = sorted(((sum(map(mul, unpack_vector(row.vector), query)), row)
+                         for row in rows if row.vector is not None),
+                        key=lambda pair: -pair[0])
+        # Chunks far below the best match would spend the budget on unrelated text
+        floor = max(0.0, scored[0][0] * app.config['AI_RAG_MIN_RELATIVE_SCORE']) if scored else 0
+        hits, used = [], 0
+        for score, row in scored:
+            if score <= floor or len(hits) == limit:
+                break
+            tokens = estimate_tokens(f"{row.title}\n{row.text}")
+            if used + tokens > max_tokens:
+                continue  # a smaller, less similar chunk may still fit
+            used += tokens
+            hits.append(SemanticHit(row.entity_type, row.entity_id, row.chunk, row.title,
+                                    score, row.text))
+        order = {kind: position for position, kind in enumerate(entities)}
+        return sorted(hits, key=lambda hit: (order[hit.entity_type], hit.entity_id, hit.chunk))
+
+    @staticmethod
+    def rebuild(batch_size=200):
+        """
+        Re-embed every note, document and cheat sheet with the current
+        embedder (unchanged chunks keep their vectors) and drop rows of other
+        embedders or of entities that no longer exist. The chunks are written
+        first and embedded after that commits. Returns the chunk count.
+        """
+        embedder = get_embedder()
+        table = Embedding.__table__
+        count = 0
+        try:
+            connection = db.session.connection()
+            connection.execute(delete(table).where(table.c.model != embedder.name))
+            for entity in ENTITIES:
+                connection.execute(delete(table).where(
+                    table.c.entity_type == entity.kind,
+                    table.c.entity_id.not_in(select(entity.model.id))))
+                query = entity.model.query.order_by(entity.model.id).yield_per(batch_size)
+                batch = []
+                for obj in query:
+                    batch.append((entity, obj))
+                    if len(batch) == batch_size:
+                        count += _write(connection, embedder, [], batch)
+                        batch = []
+                count += _write(connection, embedder, [], batch)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error rebuilding embeddings: {str(e)}")
+        EmbeddingService.embed_pending()
+        _reset_indexes()
+        return count
@@ -1,6 +1,9 @@
 import os
 import io
-from typing import Optional, Tuple
+import hashlib
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
 from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
 
@@ -24,6 +27,27 @@ except ImportError:
     PPTX_AVAILABLE = False
 
 
+# Reader kept open by each extraction process across its page ranges:
+# PyPDF2 walks the whole page tree when a reader first touches its pages
+_pdf_reader = {}
+
+
+def _pdf_pages(pdf_reader, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Text of pages [start, stop) as [(page_number, text)], 1-based"""
+    return [(number + 1, pdf_reader.pages[number].extract_text() or '')
+            for number in range(start, stop)]
+
+
+def _extract_pdf_range(file_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Pool task: extract one page range, reusing this process's reader for the file"""
+    if _pdf_reader.get('path') != file_path:
+        if _pdf_reader:
+            _pdf_reader['file'].close()
+        file = open(file_path, 'rb')
+        _pdf_reader.update(path=file_path, file=file, reader=PdfReader(file))
+    return _pdf_pages(_pdf_reader['reader'], start, stop)
+
+
 class FileService:
     """Service for file upload, storage, and processing"""
 
@@ -35,6 +59,26 @@ class FileService:
         'video': ['mp4', 'mov', 'avi']
     }
 
+    # Leading bytes each extension must start with (offset, signature);
+    # any one match is enough
+    SIGNATURES = {
+        'pdf': [(0, b'%PDF-')],
+        'pptx': [(0, b'PK\x03\x04')],
+        'ppt': [(0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')],
+        'png': [(0, b'\x89PNG\r\n\x1a\n')],
+        'jpg': [(0, b'\xff\xd8\xff')],
+        'jpeg': [(0, b'\xff\xd8\xff')],
+        'gif': [(0, b'GIF87a'), (0, b'GIF89a')],
+        'bmp': [(0, b'BM')],
+        'mp3': [(0, b'ID3'), (0, b'\xff\xfb'), (0, b'\xff\xf3'), (0, b'\xff\xf2')],
+        'wav': [(8, b'WAVE')],
+        'm4a': [(4, b'ftyp')],
+        'mp4': [(4, b'ftyp')],
+        'mov': [(4, b'ftyp'), (4, b'moov'), (4, b'mdat'), (4, b'wide'), (4, b'free')],
+        'avi': [(8, b'AVI ')]
+    }
+    SIGNATURE_BYTES = 16
+
     def __init__(self, upload_folder: str = None):
         self.upload_folder = upload_folder or os.getenv(
             'UPLOAD_FOLDER',
@@ -90,42 +134,147 @@ class FileService:
 
         return filename, file_path, file_size
 
-    def extract_text_from_pdf(self, file_path: str) -> Tuple[Optional[str], int]:
+    def store_blob(self, file: FileStorage,
+                   chunk_size: int = 1024 * 1024) -> Tuple[str, str, int, str]:
         """
-        Extract text from PDF file
-        Returns (extracted_text, page_count)
+        Stream an upload to a temporary file in blob storage, hashing it on
+        the way. Returns (sha256, temp_path, file_size, ext); the caller moves
+        it into place with adopt_blob once the blob is registered.
         """
-        if not PYPDF2_AVAILABLE:
-            return None, 0
+        if not file or file.filename == '':
+            raise ValueError("No file provided")
+
+        if not self.allowed_file(file.filename):
+            raise ValueError(f"File type not allowed: {file.filename}")
+
+        _, ext = os.path.splitext(secure_filename(file.filename))
+        blob_folder = os.path.join(self.upload_folder, 'blobs')
+        os.makedirs(blob_folder, exist_ok=True)
 
+        digest = hashlib.sha256()
+        file_size = 0
+        fd, temp_path = tempfile.mkstemp(dir=blob_folder, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = file.stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    if file_size == 0 and not self.matches_signature(file.filename, chunk):
+                        raise ValueError(f"File content does not match its type: {file.filename}")
+                    digest.update(chunk)
+                    out.write(chunk)
+                    file_size += len(chunk)
+
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return digest.hexdigest(), temp_path, file_size, ext
+
+    def adopt_blob(self, temp_path: str, file_path: str) -> str:
+        """
+        Move a fully written file to its blob path. An existing file there has
+        the same content and is replaced atomically rather than trusted to
+        stay, since a release of that content may be about to remove it.
+        """
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(temp_path, file_path)
+        return file_path
+
+    def partial_path(self, upload_id: str) -> str:
+        """Where a resumable upload is assembled (same filesystem as the blobs)"""
+        return os.path.join(self.upload_folder, 'blobs', 'partial', f"{secure_filename(upload_id)}.part")
+
+    def matches_signature(self, filename: str, head: bytes) -> bool:
+        """Whether the first bytes of a file fit its extension (True for unknown extensions)"""
+        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        signatures = self.SIGNATURES.get(ext)
+        if not signatures:
+            return True
+        return any(head[offset:offset + len(magic)] == magic for offset, magic in signatures)
+
+    def blob_path(self, sha256: str, ext: str = '') -> str:
+        """Storage path of a blob, fanned out by hash prefix"""
+        return os.path.join(self.upload_folder, 'blobs', sha256[:2], f"{sha256}{ext.lower()}")
+
+    def pdf_page_count(self, file_path: str) -> int:
+        if not PYPDF2_AVAILABLE:
+            return 0
         try:
             with open(file_path, 'rb') as file:
-                pdf_reader = PdfReader(file)
-                page_count = len(pdf_reader.pages)
+                return len(PdfReader(file).pages)
+        except Exception as e:
+            raise Exception(f"Error reading PDF: {str(e)}")
 
-                text_content = []
-                for page in pdf_reader.pages:
-                    text = page.extract_text()
-                    if text:
-                        text_content.append(text)
+    def iter_pdf_pages(self, file_path: str, processes: int = 1, pages_per_task: int = 16,
+                       page_count: int = None) -> Iterator[List[Tuple[int, str]]]:
+        """
+        Extract PDF text in batches of [(page_number, text)].
 
-                extracted_text = "\n\n".join(text_content)
-                return extracted_text, page_count
+        With processes > 1, page ranges of pages_per_task pages are spread over
+        a process pool and batches are yielded as they finish, so not in page
+        order. At most two ranges per process are in flight, which bounds
+        memory regardless of the page count.
+        """
+        if not PYPDF2_AVAILABLE:
+            return
+        if page_count is None:
+            page_count = self.pdf_page_count(file_path)
+        ranges = [(start, min(start + pages_per_task, page_count))
+                  for start in range(0, page_count, pages_per_task)]
 
+        try:
+            if processes <= 1 or len(ranges) <= 1:
+                with open(file_path, 'rb') as file:
+                    pdf_reader = PdfReader(file)
+                    for start, stop in ranges:
+                        yield _pdf_pages(pdf_reader, start, stop)
+                return
+
+            with ProcessPoolExecutor(max_workers=min(processes, len(ranges))) as pool:
+                pending = set()
+                ranges = iter(ranges)
+                while True:
+                    for start, stop in ranges:
+                        pending.add(pool.submit(_extract_pdf_range, file_path, start, stop))
+                        if len(pending) >= processes * 2:
+                            break
+                    if not pending:
+                        return
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
 
+    def extract_text_from_pdf(self, file_path: str) -> Tuple[Optional[str], int]:
+        """
+        Extract text from PDF file
+        Returns (extracted_text, page_count)
+        """
+        if not PYPDF2_AVAILABLE:
+            return None, 0
+
+        page_count = self.pdf_page_count(file_path)
+        pages = [page for batch in self.iter_pdf_pages(file_path, page_count=page_count)
+                 for page in batch]
+        extracted_text = "\n\n".join(text for _, text in pages if text)
+        return extracted_text, page_count
+
     def extract_text_from_image(self, file_path: str) -> Optional[str]:
         """
-        Extract text from image using OCR
+        Extract text from image using OCR (preprocessed, and split into
+        bands recognised in parallel for large scans)
         """
         if not TESSERACT_AVAILABLE:
             return None
 
+        from app.services.ocr_service import recognize
         try:
-            image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
-            return text.strip()
+            text, _, _ = recognize(file_path)
+            return text
         except Exception as e:
             raise Exception(f"Error performing OCR: {str(e)}")
 
@@ -157,47 +306,16 @@ class FileService:
         except Exception as e:
             raise Exception(f"Error extracting text from PPT: {str(e)}")
 
-    def generate_thumbnail(self, file_path: str, output_path: str = None,
-                          size: Tuple[int, int] = (200, 200)) -> Optional[str]:
-        """
-        Generate thumbnail for image file
-        """
-        if not TESSERACT_AVAILABLE:  # PIL is imported with pytesseract
-            return None
-
-        try:
-            image = Image.open(file_path)
-
-            # Convert to RGB if necessary
-            if image.mode in ('RGBA', 'LA', 'P'):
-                image = image.convert('RGB')
-
-            # Create thumbnail
-            image.thumbnail(size, Image.Resampling.LANCZOS)
-
-            # Save thumbnail
-            if not output_path:
-                name, _ = os.path.splitext(os.path.basename(file_path))
-                output_path = os.path.join(
-                    self.upload_folder, 'thumbnails', f"{name}_thumb.jpg"
-                )
-
-            image.save(output_path, 'JPEG')
-            return output_path
-
-        except Exception as e:
-            raise Exception(f"Error generating thumbnail: {str(e)}")
-
     def process_document(self, file_path: str, file_type: str) -> Dict:
         """
-        Process uploaded document (extract text, generate thumbnail, etc.)
-        Returns dict with processing results
+        Process uploaded document (extract text, OCR)
+        Returns dict with processing results. Thumbnails are rendered on
+        request by ThumbnailService.
         """
         result = {
             'extracted_text': None,
             'ocr_text': None,
-            'page_count': 0,
-            'thumbnail_url': None
+            'page_count': 0
         }
 
         try:
@@ -214,10 +332,6 @@ class FileService:
             elif file_type == 'IMAGE' and TESSERACT_AVAILABLE:
                 ocr_text = self.extract_text_from_image(file_path)
                 result['ocr_text'] = ocr_text
-                # Generate thumbnail for images
-                thumb_path = self.generate_thumbnail(file_path)
-                if thumb_path:
-                    result['thumbnail_url'] = os.path.basename(thumb_path)
 
         except Exception as e:
             print(f"Error processing document: {str(e)}")
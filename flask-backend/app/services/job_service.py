@@ -0,0 +1,306 @@
+from app import app, db
+from app.models import Job, JobStatus
+from sqlalchemy import and_, func, insert, literal, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+# Job kind -> handler(job) returning a JSON-serialisable result
+_handlers = {}
+
+
+def job_handler(kind):
+    """Register a function as the handler for jobs of this kind"""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def _config(name, default):
+    return app.config.get(name, default)
+
+
+def _claimable(now):
+    """Queued jobs that are due, and running jobs whose worker stopped renewing the lease"""
+    return or_(
+        and_(Job.status == JobStatus.QUEUED, Job.run_after <= now),
+        and_(Job.status == JobStatus.RUNNING, Job.lease_expires_at < now)
+    )
+
+
+class JobService:
+    """
+    Database-backed job queue.
+
+    A claim is a conditional UPDATE that only succeeds while the job is still
+    claimable, so concurrent workers never run the same attempt (no row locks
+    or SKIP LOCKED needed, which keeps it portable to SQLite). The claiming
+    worker holds a lease and renews it while the handler runs; if it dies the
+    lease expires and another worker picks the job up. Failed attempts are
+    retried with exponential backoff until max_attempts is reached.
+    """
+
+    @staticmethod
+    def enqueue(kind, payload=None, queue='default', entity_type=None, entity_id=None,
+                max_attempts=None, run_after=None, user_id=None, only_if=None):
+        """
+        Queue a job and commit it. Runs it right away when JOBS_RUN_INLINE is set.
+
+        only_if is an optional SQL condition checked by the INSERT itself
+        (INSERT ... SELECT ... WHERE only_if), so a cap such as "fewer than
+        N active jobs" cannot be overshot by concurrent callers. Returns None
+        when the condition is false and nothing was queued.
+        """
+        values = dict(
+            kind=kind,
+            queue=queue,
+            payload=payload or {},
+            entity_type=entity_type,
+            entity_id=entity_id,
+            user_id=user_id,
+            max_attempts=max_attempts or _config('JOB_MAX_ATTEMPTS', 3),
+            run_after=run_after or datetime.utcnow(),
+            status=JobStatus.QUEUED
+        )
+        try:
+            if only_if is None:
+                job = Job(**values)
+                db.session.add(job)
+                db.session.commit()
+            else:
+                job = JobService._insert_if(values, only_if)
+                db.session.commit()
+                if job is None:
+                    return None
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error queueing job: {str(e)}")
+
+        if _config('JOBS_RUN_INLINE', False):
+            JobService.run_inline(job.id)
+        return job
+
+    @staticmethod
+    def _insert_if(values, condition):
+        table = Job.__table__
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Under READ COMMITTED concurrent inserts do not see each other's
+            # rows, so serialize the check per queue for this transaction
+            db.session.execute(select(func.pg_advisory_xact_lock(func.hashtext(values['queue']))))
+        columns = list(values)
+        job_id = db.session.execute(
+            insert(table)
+            .from_select(columns, select(*[literal(values[name], table.c[name].type)
+                                           for name in columns]).where(condition))
+            .returning(table.c.id)
+        ).scalar()
+        return db.session.get(Job, job_id) if job_id is not None else None
+
+    @staticmethod
+    def get_job(job_id):
+        return Job.query.get_or_404(job_id)
+
+    @staticmethod
+    def latest_for(entity_type, entity_id):
+        """Most recent job for an entity, or None"""
+        return (Job.query
+                .filter_by(entity_type=entity_type, entity_id=entity_id)
+                .order_by(Job.id.desc())
+                .first())
+
+    @staticmethod
+    def active_for(entity_type, entity_id, kind):
+        """A queued or running job of this kind for an entity, or None"""
+        return (Job.query
+                .filter(Job.entity_type == entity_type, Job.entity_id == entity_id,
+                        Job.kind == kind,
+                        Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+                .order_by(Job.id.desc())
+                .first())
+
+    @staticmethod
+    def _try_claim(job_id, worker_id, lease_seconds):
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, _claimable(now))
+            .values(status=JobStatus.RUNNING,
+                    locked_by=worker_id,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=Job.attempts + 1,
+                    last_modified=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount != 1:
+            return None
+        return db.session.get(Job, job_id, populate_existing=True)
+
+    @staticmethod
+    def claim(worker_id, queues=None, lease_seconds=None, candidates=10):
+        """Claim the next due job from the given queues, or return None"""
+        lease_seconds = lease_seconds or _config('JOB_LEASE_SECONDS', 300)
+        query = select(Job.id).where(_claimable(datetime.utcnow()))
+        if queues:
+            query = query.where(Job.queue.in_(queues))
+        # Look at a few candidates so workers that lose a race move straight on
+        job_ids = db.session.execute(
+            query.order_by(Job.run_after, Job.id).limit(candidates)).scalars().all()
+        db.session.commit()
+        for job_id in job_ids:
+            job = JobService._try_claim(job_id, worker_id, lease_seconds)
+            if job is not None:
+                return job
+        return None
+
+    @staticmethod
+    def heartbeat(job_id, worker_id, lease_seconds=None):
+        """Extend the lease of a job this worker holds; False if the lease was lost"""
+        lease_seconds = lease_seconds or _config('JOB_LEASE_SECONDS', 300)
+        # Own connection: runs beside the handler, which may be mid-transaction
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.locked_by == worker_id,
+                       Job.status == JobStatus.RUNNING)
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+            )
+        return result.rowcount == 1
+
+    @staticmethod
+    def _finish(job_id, worker_id, **values):
+        values['last_modified'] = datetime.utcnow()
+        values.setdefault('lease_expires_at', None)
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == JobStatus.RUNNING)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def complete(job, worker_id, result=None):
+        JobService._finish(job.id, worker_id, status=JobStatus.SUCCEEDED, result=result,
+                           last_error=None)
+
+    @staticmethod
+    def fail(job, worker_id, error, final=False):
+        """Record a failed attempt: retry later with backoff, or give up after max_attempts"""
+        if final or job.attempts >= job.max_attempts:
+            JobService._finish(job.id, worker_id, status=JobStatus.FAILED, last_error=error)
+        else:
+            delay = _config('JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+            JobService._finish(job.id, worker_id, status=JobStatus.QUEUED, last_error=error,
+                               locked_by=None,
+                               run_after=datetime.utcnow() + timedelta(seconds=delay))
+
+    @staticmethod
+    def execute(job, worker_id):
+        """Run a claimed job's handler, renewing its lease meanwhile, and record the outcome"""
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            JobService.fail(job, worker_id, f"No handler for job kind '{job.kind}'", final=True)
+            return False
+        if job.attempts > job.max_attempts:
+            # Reclaimed after its worker died during the last allowed attempt
+            JobService.fail(job, worker_id, job.last_error or "Lease expired", final=True)
+            return False
+
+        lease_seconds = _config('JOB_LEASE_SECONDS', 300)
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(lease_seconds / 3):
+                with app.app_context():
+                    if not JobService.heartbeat(job.id, worker_id, lease_seconds):
+                        return
+
+        renewer = threading.Thread(target=renew, daemon=True)
+        renewer.start()
+        try:
+            result = handler(job)
+        except Exception as e:
+            db.session.rollback()
+            # The traceback goes to the log; the job keeps a message safe to show its owner
+            app.logger.exception("Job %s (%s) failed", job.id, job.kind)
+            JobService.fail(job, worker_id, f"{type(e).__name__}: {e}")
+            return False
+        finally:
+            stop.set()
+            renewer.join()
+        JobService.complete(job, worker_id, result)
+        return True
+
+    @staticmethod
+    def run_inline(job_id, worker_id=None):
+        """Claim and run one specific job in this process (JOBS_RUN_INLINE, tests, scripts)"""
+        worker_id = worker_id or f"inline:{os.getpid()}"
+        job = JobService._try_claim(job_id, worker_id, _config('JOB_LEASE_SECONDS', 300))
+        if job is not None:
+            JobService.execute(job, worker_id)
+        return job
+
+    @staticmethod
+    def work(worker_id, queues=None, stop_event=None, poll_interval=None, max_jobs=None):
+        """Claim and run jobs until stop_event is set (or max_jobs ran); returns jobs run"""
+        poll_interval = poll_interval or _config('JOB_POLL_INTERVAL', 1.0)
+        stop_event = stop_event or threading.Event()
+        done = 0
+        while not stop_event.is_set() and (max_jobs is None or done < max_jobs):
+            try:
+                job = JobService.claim(worker_id, queues)
+            except SQLAlchemyError:
+                db.session.rollback()
+                job = None
+            if job is None:
+                if max_jobs is not None:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            JobService.execute(job, worker_id)
+            db.session.remove()
+            done += 1
+        return done
+
+
+def _worker_process(index, queues, stop_event, poll_interval):
+    """Entry point of one worker process"""
+    # Children must not share the parent's pooled connections
+    db.engine.dispose(close=False)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent coordinates shutdown
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    with app.app_context():
+        JobService.work(worker_id, queues, stop_event, poll_interval)
+
+
+def run_workers(processes=None, queues=None, poll_interval=None):
+    """
+    Run a pool of worker processes until interrupted. On SIGINT/SIGTERM the
+    workers finish their current job and exit; an unfinished job's lease
+    simply expires and it is retried elsewhere.
+    """
+    processes = processes or _config('JOB_WORKER_PROCESSES', os.cpu_count() or 1)
+    with app.app_context():
+        db.engine.dispose()
+    stop_event = multiprocessing.Event()
+    workers = [multiprocessing.Process(target=_worker_process,
+                                       args=(i, queues, stop_event, poll_interval),
+                                       name=f"job-worker-{i}")
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+
+    def shutdown(*args):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    for worker in workers:
+        worker.join()
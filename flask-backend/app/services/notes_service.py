@@ -1,5 +1,7 @@
 from app import db
 from app.models import Note, Folder, Course, Module
+from app.services.search_service import SearchService
+from app.services.tag_service import TagService
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
@@ -33,8 +35,14 @@ class NoteService:
             raise Exception(f"Error adding note: {str(e)}")
 
     @staticmethod
-    def get_all_notes(user_id=None, folder_id=None, module_id=None, tags=None):
+    def get_all_notes(user_id=None, folder_id=None, module_id=None, tags=None, tag_mode='all'):
         """Get all notes with optional filters"""
+        query = NoteService.query_notes(user_id, folder_id, module_id, tags, tag_mode)
+        return query.order_by(Note.last_modified.desc()).all()
+
+    @staticmethod
+    def query_notes(user_id=None, folder_id=None, module_id=None, tags=None, tag_mode='all'):
+        """Unordered notes query with optional filters; tag_mode is 'all' or 'any'"""
         query = Note.query
 
         if user_id:
@@ -44,11 +52,9 @@ class NoteService:
         if module_id:
             query = query.filter_by(module_id=module_id)
         if tags:
-            # Filter by tags (JSON contains)
-            for tag in tags:
-                query = query.filter(Note.tags.contains([tag]))
+            query = TagService.filter_by_tags(query, 'note', Note.id, tags, tag_mode)
 
-        return query.order_by(Note.last_modified.desc()).all()
+        return query
 
     @staticmethod
     def get_note(note_id):
@@ -89,22 +95,9 @@ class NoteService:
             raise Exception(f"Error deleting note: {str(e)}")
 
     @staticmethod
-    def search_notes(query_string, user_id=None):
-        """Search notes by name or content"""
-        query = Note.query
-
-        if user_id:
-            query = query.filter_by(user_id=user_id)
-
-        # Search in name or content (if content is text)
-        query = query.filter(
-            db.or_(
-                Note.name.ilike(f'%{query_string}%'),
-                Note.ai_summary.ilike(f'%{query_string}%')
-            )
-        )
-
-        return query.order_by(Note.last_modified.desc()).all()
+    def search_notes(query_string, user_id=None, limit=20, offset=0):
+        """Full-text search over notes; returns (note, rank, snippet) tuples, best first"""
+        return SearchService.search_notes(query_string, user_id, limit, offset)
 
 
 class FolderService:
@@ -131,6 +124,11 @@ class FolderService:
     @staticmethod
     def get_all_folders(user_id=None, parent_id=None):
         """Get all folders with optional filters"""
+        return FolderService.query_folders(user_id, parent_id).order_by(Folder.name).all()
+
+    @staticmethod
+    def query_folders(user_id=None, parent_id=None):
+        """Unordered folders query with optional filters"""
         query = Folder.query
 
         if user_id:
@@ -138,7 +136,7 @@ class FolderService:
         if parent_id is not None:
             query = query.filter_by(parent_id=parent_id)
 
-        return query.order_by(Folder.name).all()
+        return query
 
     @staticmethod
     def get_folder(folder_id):
@@ -209,16 +207,23 @@ class CourseService:
             raise Exception(f"Error adding course: {str(e)}")
 
     @staticmethod
-    def get_all_courses(user_id=None, field=None):
+    def get_all_courses(user_id=None, field=None, tags=None, tag_mode='all'):
         """Get all courses with optional filters"""
+        return CourseService.query_courses(user_id, field, tags, tag_mode).order_by(Course.name).all()
+
+    @staticmethod
+    def query_courses(user_id=None, field=None, tags=None, tag_mode='all'):
+        """Unordered courses query with optional filters; tag_mode is 'all' or 'any'"""
         query = Course.query
 
         if user_id:
             query = query.filter_by(user_id=user_id)
         if field:
             query = query.filter_by(field=field)
+        if tags:
+            query = TagService.filter_by_tags(query, 'course', Course.id, tags, tag_mode)
 
-        return query.order_by(Course.name).all()
+        return query
 
     @staticmethod
     def get_course(course_id):
@@ -300,12 +305,17 @@ class ModuleService:
     @staticmethod
     def get_all_modules(course_id=None):
         """Get all modules with optional course filter"""
+        return ModuleService.query_modules(course_id).order_by(Module.order, Module.name).all()
+
+    @staticmethod
+    def query_modules(course_id=None):
+        """Unordered modules query with optional course filter"""
         query = Module.query
 
         if course_id:
             query = query.filter_by(course_id=course_id)
 
-        return query.order_by(Module.order, Module.name).all()
+        return query
 
     @staticmethod
     def get_module(module_id):
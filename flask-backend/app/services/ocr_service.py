@@ -0,0 +1,181 @@
+from app import app, db
+from app.models import OCRResult
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.exc import SQLAlchemyError
+import hashlib
+import json
+import math
+import shutil
+import time
+
+try:
+    from PIL import Image, ImageOps
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+# Bump when preprocessing changes so cached results are recomputed
+PIPELINE_VERSION = 1
+
+
+def ocr_available():
+    """pytesseract is installed and the tesseract binary it drives can be found"""
+    return TESSERACT_AVAILABLE and shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+def otsu_threshold(histogram):
+    """Grey level that best separates ink from paper in a 256-bin histogram"""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+
+def preprocess(image, max_megapixels=16, binarize=True):
+    """
+    Upright greyscale copy of a scan, downscaled to at most max_megapixels and
+    optionally thresholded to black and white, which is what Tesseract works
+    on internally anyway
+    """
+    limit = max_megapixels * 1e6
+    if image.width * image.height > limit:
+        # Let the JPEG decoder skip detail that the resize below would discard
+        scale = math.sqrt(limit / (image.width * image.height))
+        image.draft('L', (int(image.width * scale), int(image.height * scale)))
+    image = ImageOps.exif_transpose(image).convert('L')
+    if image.width * image.height > limit:
+        scale = math.sqrt(limit / (image.width * image.height))
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    if binarize:
+        threshold = otsu_threshold(image.histogram())
+        image = image.point(lambda value: 255 if value > threshold else 0)
+    return image
+
+
+def band_boxes(image, tile_megapixels=4):
+    """
+    Split an image into full-width horizontal bands of about tile_megapixels.
+    Each cut is moved to the lightest row near it, so it falls between lines
+    of text rather than through them.
+    """
+    count = math.ceil(image.width * image.height / (tile_megapixels * 1e6))
+    if count <= 1:
+        return [(0, 0, image.width, image.height)]
+
+    # Mean brightness of every row
+    rows = list(image.resize((1, image.height), Image.Resampling.BOX).getdata())
+    band_height = image.height / count
+    window = max(1, int(band_height / 8))
+    cuts = [0]
+    for i in range(1, count):
+        target = int(i * band_height)
+        low, high = max(cuts[-1] + 1, target - window), min(image.height - 1, target + window)
+        cuts.append(max(range(low, high + 1), key=lambda y: (rows[y], -abs(y - target))))
+    cuts.append(image.height)
+    return [(0, top, image.width, bottom) for top, bottom in zip(cuts, cuts[1:])]
+
+
+def _recognize_band(mode, size, data, lang, config):
+    """Pool task: OCR one band (passed as raw pixels to keep pickling cheap)"""
+    return pytesseract.image_to_string(Image.frombytes(mode, size, data), lang=lang,
+                                       config=config).strip()
+
+
+def recognize(file_path, processes=None):
+    """
+    OCR an image file through preprocessing and band tiling.
+    Returns (text, megapixels after preprocessing, band count).
+    """
+    config = app.config
+    with Image.open(file_path) as image:
+        image = preprocess(image, config['OCR_MAX_MEGAPIXELS'], config['OCR_BINARIZE'])
+    boxes = band_boxes(image, config['OCR_TILE_MEGAPIXELS'])
+    megapixels = image.width * image.height / 1e6
+    lang, options = config['OCR_LANG'], config['OCR_TESSERACT_CONFIG']
+
+    processes = min(processes or config['OCR_PROCESSES'], len(boxes))
+    if processes <= 1:
+        texts = [pytesseract.image_to_string(image.crop(box), lang=lang, config=options).strip()
+                 for box in boxes]
+    else:
+        bands = [image.crop(box) for box in boxes]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            texts = list(pool.map(_recognize_band,
+                                  [band.mode for band in bands],
+                                  [band.size for band in bands],
+                                  [band.tobytes() for band in bands],
+                                  [lang] * len(bands), [options] * len(bands)))
+    return "\n".join(text for text in texts if text), megapixels, len(boxes)
+
+
+class OCRService:
+    """OCR with results cached in ocr_results by content hash and settings"""
+
+    @staticmethod
+    def settings_fingerprint():
+        """Hash of everything that changes OCR output besides the image itself"""
+        config = app.config
+        settings = [PIPELINE_VERSION, config['OCR_LANG'], config['OCR_TESSERACT_CONFIG'],
+                    config['OCR_MAX_MEGAPIXELS'], config['OCR_BINARIZE'],
+                    config['OCR_TILE_MEGAPIXELS']]
+        return hashlib.sha256(json.dumps(settings).encode()).hexdigest()
+
+    @staticmethod
+    def file_sha256(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_cached(content_sha256):
+        return db.session.get(OCRResult, (content_sha256, OCRService.settings_fingerprint()))
+
+    @staticmethod
+    def text_for(file_path, content_sha256=None):
+        """
+        OCR text of an image file, from the cache when this content was
+        recognised before with the same settings. None if OCR is unavailable.
+        """
+        content_sha256 = content_sha256 or OCRService.file_sha256(file_path)
+        cached = OCRService.get_cached(content_sha256)
+        if cached is not None:
+            return cached.text
+        if not ocr_available():
+            return None
+
+        start = time.perf_counter()
+        try:
+            text, megapixels, tiles = recognize(file_path)
+        except Exception as e:
+            raise Exception(f"Error performing OCR: {str(e)}")
+        result = OCRResult(content_sha256=content_sha256,
+                           settings=OCRService.settings_fingerprint(),
+                           text=text,
+                           megapixels=round(megapixels, 2),
+                           tiles=tiles,
+                           duration_ms=int((time.perf_counter() - start) * 1000))
+        try:
+            db.session.merge(result)
+            db.session.commit()
+        except SQLAlchemyError:
+            # Another worker cached the same content first
+            db.session.rollback()
+        return text
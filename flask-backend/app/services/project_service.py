@@ -1,5 +1,6 @@
 from app import db
 from app.models import Project
+from app.services.rollup_service import TaskRollupService
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
@@ -13,6 +14,10 @@ class ProjectService:
     def get_all_projects():
          return Project.query.order_by(Project.id).all()
 
+    @staticmethod
+    def query_projects():
+        return Project.query
+
     @staticmethod
     def get_ongoing_projects():
         return Project.query.filter_by(is_completed='False').order_by(Project.id).all()
@@ -78,6 +83,7 @@ class ProjectService:
     def delete_project(project_id):
         project_to_delete = Project.query.get_or_404(project_id)
         try:
+            TaskRollupService.drop_project(project_id)
             db.session.delete(project_to_delete)
             db.session.commit()
             return "<h4>Project deleted</h4>"
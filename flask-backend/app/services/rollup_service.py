@@ -0,0 +1,173 @@
+from app import db
+from app.models import Task, TaskRollup, task_technologies
+from sqlalchemy import event, exists, func, insert, select, update, delete
+from sqlalchemy.exc import SQLAlchemyError
+
+ALL = TaskRollup.ALL
+
+# Engines whose task_rollups table is known to be populated
+_ready = set()
+
+
+def _aggregate(executor):
+    """Compute every rollup row from the tasks table as (project_id, technology_id, total, completed)"""
+    completed = func.sum(Task.is_completed.cast(db.Integer))
+    linked = select().select_from(Task).join(task_technologies,
+                                             task_technologies.c.task_id == Task.id)
+    aggregates = [
+        # (0, 0): every task
+        select(func.count(Task.id), completed),
+        # (p, 0): per project
+        select(Task.project_id, func.count(Task.id), completed)
+        .where(Task.project_id.isnot(None))
+        .group_by(Task.project_id),
+        # (0, t): per technology
+        linked.add_columns(task_technologies.c.technology_id, func.count(Task.id), completed)
+        .group_by(task_technologies.c.technology_id),
+        # (p, t): per project and technology
+        linked.add_columns(Task.project_id, task_technologies.c.technology_id,
+                           func.count(Task.id), completed)
+        .where(Task.project_id.isnot(None))
+        .group_by(Task.project_id, task_technologies.c.technology_id),
+    ]
+
+    rows = []
+    total, done = executor.execute(aggregates[0]).one()
+    if total:
+        rows.append((ALL, ALL, total, done))
+    rows += [(p, ALL, total, done) for p, total, done in executor.execute(aggregates[1])]
+    rows += [(ALL, t, total, done) for t, total, done in executor.execute(aggregates[2])]
+    rows += [(p, t, total, done) for p, t, total, done in executor.execute(aggregates[3])]
+    return rows
+
+
+def _replace(executor, rows):
+    executor.execute(delete(TaskRollup))
+    if rows:
+        executor.execute(insert(TaskRollup), [{
+            'project_id': p,
+            'technology_id': t,
+            'total_tasks': total,
+            'completed_tasks': done or 0
+        } for p, t, total, done in rows])
+
+
+def _backfill(executor):
+    """
+    Fill an empty table from the tasks through `executor`; returns True if it did.
+    Databases created before the rollups existed have tasks but no rows.
+    """
+    if executor.execute(select(exists().select_from(TaskRollup))).scalar():
+        return False
+    _replace(executor, _aggregate(executor))
+    return True
+
+
+event.listen(db.metadata, 'before_drop', lambda target, connection, **kw: _ready.discard(connection.engine))
+
+
+class TaskRollupService:
+    """
+    Keeps the task_rollups table in step with task writes.
+
+    Callers take a snapshot of a task before and after changing it and pass
+    both to record_change() inside the same transaction, so the counters are
+    committed (or rolled back) together with the task itself. The task must
+    already be added to, changed in or deleted from the session by then.
+
+    The table is backfilled from the tasks on first use, so databases created
+    before it existed need no manual rebuild.
+    """
+
+    @staticmethod
+    def snapshot(task, technology_ids=None):
+        """Capture the fields the rollups depend on: (project_id, technology_ids, is_completed)"""
+        if technology_ids is None:
+            technology_ids = [tech.id for tech in task.technologies] if task.id else []
+        return (task.project_id, tuple(sorted(set(technology_ids))), bool(task.is_completed))
+
+    @staticmethod
+    def _keys(snapshot):
+        project_id, technology_ids, _ = snapshot
+        keys = [(ALL, ALL)]
+        if project_id:
+            keys.append((project_id, ALL))
+        for technology_id in technology_ids:
+            keys.append((ALL, technology_id))
+            if project_id:
+                keys.append((project_id, technology_id))
+        return keys
+
+    @staticmethod
+    def _apply(snapshot, sign):
+        completed = sign if snapshot[2] else 0
+        for project_id, technology_id in TaskRollupService._keys(snapshot):
+            # Increment in SQL so concurrent writers never lose an update
+            result = db.session.execute(
+                update(TaskRollup)
+                .where(TaskRollup.project_id == project_id,
+                       TaskRollup.technology_id == technology_id)
+                .values(total_tasks=TaskRollup.total_tasks + sign,
+                        completed_tasks=TaskRollup.completed_tasks + completed)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                db.session.execute(insert(TaskRollup).values(
+                    project_id=project_id,
+                    technology_id=technology_id,
+                    total_tasks=max(sign, 0),
+                    completed_tasks=max(completed, 0)
+                ))
+
+    @staticmethod
+    def record_change(before=None, after=None):
+        """Move a task's contribution from the `before` snapshot to the `after` one"""
+        if before == after:
+            return
+        engine = db.engine
+        if engine not in _ready:
+            # The aggregates include this change once it is flushed, so a
+            # backfill replaces applying it
+            db.session.flush()
+            if _backfill(db.session):
+                return
+            _ready.add(engine)
+        if before is not None:
+            TaskRollupService._apply(before, -1)
+        if after is not None:
+            TaskRollupService._apply(after, +1)
+
+    @staticmethod
+    def drop_project(project_id):
+        """Remove the rows of a deleted project (its tasks keep their other rollups)"""
+        db.session.execute(delete(TaskRollup).where(TaskRollup.project_id == project_id)
+                           .execution_options(synchronize_session=False))
+
+    @staticmethod
+    def drop_technology(technology_id):
+        """Remove the rows of a deleted technology (project and overall totals are unaffected)"""
+        db.session.execute(delete(TaskRollup).where(TaskRollup.technology_id == technology_id)
+                           .execution_options(synchronize_session=False))
+
+    @staticmethod
+    def ensure():
+        """Backfill the table in its own transaction if it has never been populated"""
+        engine = db.engine
+        if engine in _ready:
+            return
+        with engine.begin() as connection:
+            _backfill(connection)
+        _ready.add(engine)
+
+    @staticmethod
+    def rebuild():
+        """Recreate every rollup row from the tasks table"""
+        try:
+            rows = _aggregate(db.session)
+            _replace(db.session, rows)
+            db.session.commit()
+            _ready.add(db.engine)
+            return len(rows)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error rebuilding task rollups: {str(e)}")
@@ -0,0 +1,388 @@
+from app import db
+from app.models import Note, Document, Flashcard, Question, CheatSheet
+from sqlalchemy import bindparam, event, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from collections import namedtuple
+import re
+
+INDEX_TABLE = 'search_index'
+
+# Index tables from earlier versions, dropped when the current one is created
+_OLD_TABLES = ['note_search']
+
+# SQLite: one FTS5 table for every entity type. The rowid packs (entity id, type code);
+# kind and owner hold tokens that searches match on, so type and user filters run
+# inside the index. Column order matters for the bm25 weights below.
+_SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+    "title, tags, summary, body, kind, owner, tokenize = 'porter unicode61')"
+]
+
+# PostgreSQL: a side table with a weighted, generated tsvector and a GIN index
+_POSTGRES_CREATE = [
+    f"""CREATE TABLE IF NOT EXISTS {INDEX_TABLE} (
+        kind VARCHAR(20) NOT NULL,
+        entity_id INTEGER NOT NULL,
+        owner_id INTEGER,
+        is_shared BOOLEAN NOT NULL DEFAULT FALSE,
+        title TEXT, tags TEXT, summary TEXT, body TEXT,
+        document TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(tags, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(summary, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(body, '')), 'D')
+        ) STORED,
+        PRIMARY KEY (kind, entity_id)
+    )""",
+    f"CREATE INDEX IF NOT EXISTS ix_{INDEX_TABLE}_document ON {INDEX_TABLE} USING GIN (document)",
+    f"CREATE INDEX IF NOT EXISTS ix_{INDEX_TABLE}_owner ON {INDEX_TABLE} (owner_id, kind)"
+]
+
+_SQLITE_INSERT = (f"INSERT INTO {INDEX_TABLE} (rowid, title, tags, summary, body, kind, owner) "
+                  "VALUES (:rowid, :title, :tags, :summary, :body, :kind, :owner)")
+_POSTGRES_INSERT = (f"INSERT INTO {INDEX_TABLE} "
+                    "(kind, entity_id, owner_id, is_shared, title, tags, summary, body) "
+                    "VALUES (:kind, :entity_id, :owner_id, :is_shared, :title, :tags, :summary, :body)")
+
+_SQLITE_DELETE = f"DELETE FROM {INDEX_TABLE} WHERE rowid = :rowid"
+_POSTGRES_DELETE = f"DELETE FROM {INDEX_TABLE} WHERE kind = :kind AND entity_id = :entity_id"
+
+_SQLITE_SEARCH = f"""
+    SELECT rowid, kind, title,
+           -bm25({INDEX_TABLE}, 10.0, 5.0, 2.0, 1.0, 0.0, 0.0) AS rank,
+           snippet({INDEX_TABLE}, -1, '<mark>', '</mark>', '...', 12) AS snippet
+    FROM {INDEX_TABLE}
+    WHERE {INDEX_TABLE} MATCH :query
+    ORDER BY rank DESC, rowid DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+_POSTGRES_SEARCH = f"""
+    SELECT s.kind, s.entity_id, s.title,
+           ts_rank_cd(s.document, q) AS rank,
+           ts_headline('english', concat_ws(' ', s.title, s.summary, s.body), q,
+                       'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8') AS snippet
+    FROM {INDEX_TABLE} AS s, to_tsquery('english', :query) AS q
+    WHERE s.document @@ q {{filters}}
+    ORDER BY rank DESC, s.entity_id DESC
+    LIMIT :limit OFFSET :offset
+"""
+
+# Searchable columns; the kind and owner columns only ever match filter tokens
+_TEXT_COLUMNS = '{title tags summary body}'
+SHARED = 'shared'   # owner token of shared documents
+PUBLIC = 'public'   # owner token of entities without an owner
+
+SearchHit = namedtuple('SearchHit', 'entity_type entity_id title rank snippet')
+
+
+def _flatten(value):
+    """Collect every string inside a JSON value (lists, dicts, nested)"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return [part for item in value for part in _flatten(item)]
+    return [str(value)]
+
+
+def _join(*values):
+    return '\n'.join(part for value in values for part in _flatten(value) if part)
+
+
+class SearchEntity(namedtuple('SearchEntity', 'kind code model owner fields document')):
+    """
+    How one model is indexed: a type code packed into the FTS rowid, the owner
+    column, the columns whose changes trigger a re-index, and a function
+    building the (title, tags, summary, body) text from an instance or row.
+    """
+
+    def owner_id(self, obj):
+        return getattr(obj, self.owner)
+
+    def is_shared(self, obj):
+        return bool(getattr(obj, 'is_shared', False))
+
+
+ENTITIES = [
+    SearchEntity('note', 1, Note, 'user_id',
+                 ['name', 'tags', 'ai_summary', 'content', 'items', 'user_id'],
+                 lambda n: (n.name, _join(n.tags), n.ai_summary, _join(n.content, n.items))),
+    SearchEntity('document', 2, Document, 'uploaded_by',
+                 ['name', 'original_name', 'tags', 'extracted_text', 'ocr_text',
+                  'uploaded_by', 'is_shared'],
+                 lambda d: (d.original_name or d.name, _join(d.tags), None,
+                            _join(d.extracted_text, d.ocr_text))),
+    SearchEntity('flashcard', 3, Flashcard, 'user_id',
+                 ['front', 'back', 'tags', 'user_id'],
+                 lambda f: (f.front, _join(f.tags), None, f.back)),
+    SearchEntity('question', 4, Question, 'user_id',
+                 ['question', 'options', 'correct_answer', 'explanation', 'tags',
+                  'related_concepts', 'user_id'],
+                 lambda q: (q.question, _join(q.tags, q.related_concepts), q.explanation,
+                            _join(q.options, q.correct_answer))),
+    SearchEntity('cheatsheet', 5, CheatSheet, 'user_id',
+                 ['title', 'content', 'tags', 'user_id'],
+                 lambda c: (c.title, _join(c.tags), None, _join(c.content))),
+]
+ENTITY_TYPES = {entity.kind: entity for entity in ENTITIES}
+_BY_MODEL = {entity.model: entity for entity in ENTITIES}
+_CODE_BITS = 3
+
+# Engines whose index table is known to exist (cleared again when it is dropped)
+_ready = set()
+
+
+def _is_postgres(bind):
+    return bind.dialect.name == 'postgresql'
+
+
+def _rowid(entity, entity_id):
+    return (entity_id << _CODE_BITS) | entity.code
+
+
+def _owner_tokens(owner_id, is_shared):
+    tokens = [f'u{owner_id}' if owner_id else PUBLIC]
+    if is_shared:
+        tokens.append(SHARED)
+    return ' '.join(tokens)
+
+
+def _key(entity, entity_id):
+    """Parameters identifying an index row on either dialect"""
+    return {'rowid': _rowid(entity, entity_id), 'kind': entity.kind, 'entity_id': entity_id}
+
+
+def _entry(entity, obj):
+    """Index row parameters for an instance (or a row with the same attributes)"""
+    title, tags, summary, body = entity.document(obj)
+    owner_id = entity.owner_id(obj)
+    is_shared = entity.is_shared(obj)
+    return {
+        **_key(entity, obj.id),
+        'owner_id': owner_id,
+        'is_shared': is_shared,
+        'owner': _owner_tokens(owner_id, is_shared),
+        'title': title or '',
+        'tags': tags or '',
+        'summary': summary or '',
+        'body': body or ''
+    }
+
+
+def _match_terms(query_string, postgres=False):
+    """
+    Turn free text into a safe match expression: every word must match,
+    and a trailing * on a word makes it a prefix search.
+    """
+    terms = re.findall(r'\w+\*?', query_string, re.UNICODE)
+    if postgres:
+        return ' & '.join(term[:-1] + ':*' if term.endswith('*') else term for term in terms)
+    return ' '.join(f'"{term[:-1]}"*' if term.endswith('*') else f'"{term}"' for term in terms)
+
+
+def _create_index(connection):
+    for table in _OLD_TABLES:
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    for statement in _POSTGRES_CREATE if _is_postgres(connection) else _SQLITE_CREATE:
+        connection.execute(text(statement))
+
+
+def _drop_index(connection):
+    connection.execute(text(f"DROP TABLE IF EXISTS {INDEX_TABLE}"))
+    _ready.discard(connection.engine)
+
+
+def _write(connection, removed, entries):
+    postgres = _is_postgres(connection)
+    if removed:
+        connection.execute(text(_POSTGRES_DELETE if postgres else _SQLITE_DELETE), removed)
+    if entries:
+        connection.execute(text(_POSTGRES_INSERT if postgres else _SQLITE_INSERT), entries)
+
+
+def _ensure(connection):
+    """Create and backfill the index on this connection if it does not exist yet"""
+    if connection.engine in _ready:
+        return
+    if inspect(connection).has_table(INDEX_TABLE):
+        _ready.add(connection.engine)
+    else:
+        _create_index(connection)
+        SearchService.backfill(connection)
+
+
+def _changed(obj, entity):
+    state = inspect(obj)
+    return any(state.attrs[field].history.has_changes() for field in entity.fields)
+
+
+def _after_flush(session, flush_context):
+    """Mirror flushed inserts, updates and deletes of searchable models into the index"""
+    removed, entries = [], []
+    for obj in session.deleted:
+        entity = _BY_MODEL.get(type(obj))
+        if entity is not None and obj.id is not None:
+            removed.append(_key(entity, obj.id))
+    for obj in list(session.new) + list(session.dirty):
+        entity = _BY_MODEL.get(type(obj))
+        if entity is None or obj in session.deleted:
+            continue
+        if obj in session.new or _changed(obj, entity):
+            # Delete before insert even for new rows: a backfill run by _ensure below
+            # may already have picked them up
+            entry = _entry(entity, obj)
+            removed.append(entry)
+            entries.append(entry)
+    if removed or entries:
+        connection = session.connection()
+        _ensure(connection)
+        _write(connection, removed, entries)
+
+
+# Create and drop the index together with the models (db.create_all / drop_all)
+event.listen(db.metadata, 'after_create', lambda target, connection, **kw: _create_index(connection))
+event.listen(db.metadata, 'before_drop', lambda target, connection, **kw: _drop_index(connection))
+event.listen(db.session, 'after_flush', _after_flush)
+
+
+class SearchService:
+    """
+    Full-text index over notes, documents, flashcards, questions and cheat
+    sheets. Uses FTS5 on SQLite and a tsvector column on PostgreSQL.
+
+    The index is updated from a session after_flush hook, so it is committed
+    (or rolled back) together with the entity. Bulk statements such as
+    insert(Note) with a list of rows bypass the hook; pass their rows to
+    index_rows, or run `flask rebuild-search-index` after them.
+    """
+
+    @staticmethod
+    def ensure_index():
+        """Create and backfill the index for databases created before it existed"""
+        engine = db.engine
+        if engine in _ready:
+            return
+        with engine.begin() as connection:
+            _ensure(connection)
+        _ready.add(engine)
+
+    @staticmethod
+    def backfill(connection, batch_size=1000):
+        """Index every searchable entity through `connection`; returns the number indexed"""
+        count = 0
+        for entity in ENTITIES:
+            columns = {'id', entity.owner, *entity.fields}
+            if hasattr(entity.model, 'is_shared'):
+                columns.add('is_shared')
+            rows = connection.execution_options(yield_per=batch_size).execute(
+                select(*[getattr(entity.model, name) for name in sorted(columns)])
+                .order_by(entity.model.id))
+            for batch in rows.partitions():
+                _write(connection, None, [_entry(entity, row) for row in batch])
+                count += len(batch)
+        return count
+
+    @staticmethod
+    def index_rows(model, rows):
+        """
+        Index rows just written with a bulk statement (which the flush hook
+        never sees), in the session's transaction. Each row needs the id,
+        owner and document columns of its model, e.g. from RETURNING.
+        """
+        entity = _BY_MODEL[model]
+        entries = [_entry(entity, row) for row in rows]
+        if entries:
+            connection = db.session.connection()
+            _ensure(connection)
+            _write(connection, entries, entries)
+
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """Recreate the index from the entity tables; returns the number of entities indexed"""
+        try:
+            with db.engine.begin() as connection:
+                _drop_index(connection)
+                _create_index(connection)
+                count = SearchService.backfill(connection, batch_size)
+            _ready.add(db.engine)
+            return count
+        except SQLAlchemyError as e:
+            raise Exception(f"Error rebuilding search index: {str(e)}")
+
+    @staticmethod
+    def search(query_string, user_id=None, entity_types=None, limit=20, offset=0,
+               owner_only=False):
+        """
+        Ranked search across entity types. Returns SearchHit tuples, best match
+        first; higher rank is better and snippets mark matches with <mark></mark>.
+
+        With user_id, only that user's entities, shared documents and entities
+        without an owner are returned (owner_only: just that user's entities).
+        """
+        unknown = set(entity_types or ()) - set(ENTITY_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown entity types: {', '.join(sorted(unknown))}")
+
+        SearchService.ensure_index()
+        postgres = _is_postgres(db.engine)
+        terms = _match_terms(query_string, postgres)
+        if not terms:
+            return []
+
+        params = {'limit': limit, 'offset': offset}
+        if postgres:
+            filters = ''
+            params['query'] = terms
+            if entity_types:
+                filters += ' AND s.kind IN :kinds'
+                params['kinds'] = tuple(entity_types)
+            if user_id:
+                filters += ' AND s.owner_id = :user_id' if owner_only else \
+                    ' AND (s.owner_id = :user_id OR s.owner_id IS NULL OR s.is_shared)'
+                params['user_id'] = user_id
+            statement = text(_POSTGRES_SEARCH.format(filters=filters))
+            if entity_types:
+                statement = statement.bindparams(bindparam('kinds', expanding=True))
+            rows = db.session.execute(statement, params)
+            return [SearchHit(row.kind, row.entity_id, row.title, float(row.rank), row.snippet)
+                    for row in rows]
+
+        # The type and owner filters are part of the MATCH expression
+        expression = f'{_TEXT_COLUMNS} : ({terms})'
+        if entity_types:
+            expression += f" AND kind : ({' OR '.join(entity_types)})"
+        if user_id:
+            owners = f'u{int(user_id)}' if owner_only else f'u{int(user_id)} OR {SHARED} OR {PUBLIC}'
+            expression += f' AND owner : ({owners})'
+        params['query'] = expression
+        rows = db.session.execute(text(_SQLITE_SEARCH), params)
+        return [SearchHit(row.kind, row.rowid >> _CODE_BITS, row.title, float(row.rank), row.snippet)
+                for row in rows]
+
+    @staticmethod
+    def load(hits):
+        """Fetch the entities behind search hits (one query per type), keyed by (type, id)"""
+        ids = {}
+        for hit in hits:
+            ids.setdefault(hit.entity_type, []).append(hit.entity_id)
+        loaded = {}
+        for kind, entity_ids in ids.items():
+            model = ENTITY_TYPES[kind].model
+            for obj in model.query.filter(model.id.in_(entity_ids)):
+                loaded[(kind, obj.id)] = obj
+        return loaded
+
+    @staticmethod
+    def search_notes(query_string, user_id=None, limit=20, offset=0):
+        """
+        Ranked note search. Returns (note, rank, snippet) tuples, best match first.
+        Unlike search(), user_id keeps only that user's notes.
+        """
+        hits = SearchService.search(query_string, user_id, ['note'], limit, offset, owner_only=True)
+        notes = SearchService.load(hits)
+        return [(notes[('note', hit.entity_id)], hit.rank, hit.snippet)
+                for hit in hits if ('note', hit.entity_id) in notes]
@@ -0,0 +1,151 @@
+from app import app, db
+from app.models import AuthSession, User
+from app.services.token_service import TokenService
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta
+import hashlib
+import secrets
+
+
+class InvalidRefreshTokenError(ValueError):
+    """Unknown, expired or replayed refresh token; status is the HTTP status to answer with"""
+
+    def __init__(self, message="Invalid or expired refresh token", status=401):
+        super().__init__(message)
+        self.status = status
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _tokens(user, session_id, refresh_token):
+    """The login/refresh response body"""
+    return {
+        'token': TokenService.issue(user, session_id),
+        'refresh_token': refresh_token,
+        'expires_in': app.config['JWT_ACCESS_TOKEN_EXPIRES'],
+        'user_id': user.id,
+        'username': user.username
+    }
+
+
+class SessionService:
+    """
+    Login sessions with rotating refresh tokens.
+
+    A login (one password check) opens a session and returns a short-lived
+    access token plus a refresh token. Renewing exchanges the refresh token
+    for a new pair with one indexed UPDATE ... RETURNING on its SHA-256, so
+    it never hashes a password. Each refresh token works once; presenting
+    one that was already rotated out means it was copied, and ends the
+    session. Sessions last JWT_REFRESH_TOKEN_EXPIRES seconds from login.
+    """
+
+    @staticmethod
+    def start(user):
+        """Open a session for a user whose password was just checked; returns the login body"""
+        refresh_token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        session = AuthSession(
+            user_id=user.id,
+            refresh_hash=_hash(refresh_token),
+            date_created=now,
+            last_used=now,
+            expires_at=now + timedelta(seconds=app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+        )
+        try:
+            db.session.add(session)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error starting session: {str(e)}")
+        return _tokens(user, session.id, refresh_token)
+
+    @staticmethod
+    def refresh(refresh_token):
+        """
+        Rotate a refresh token: the response body of a login, with a new
+        refresh token. Raises InvalidRefreshTokenError for unknown, expired or
+        replayed tokens.
+        """
+        presented = _hash(refresh_token)
+        replacement = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        sessions = AuthSession.__table__
+        try:
+            # Core statements on the session's connection: no ORM bookkeeping on this hot path
+            connection = db.session.connection()
+            row = connection.execute(
+                update(sessions)
+                .where(sessions.c.refresh_hash == presented, sessions.c.expires_at > now)
+                .values(refresh_hash=_hash(replacement), previous_hash=presented, last_used=now)
+                .returning(sessions.c.id, sessions.c.user_id)
+            ).first()
+            if row is None:
+                replayed = connection.execute(
+                    delete(sessions).where(sessions.c.previous_hash == presented)).rowcount
+                db.session.commit()
+                if replayed:
+                    raise InvalidRefreshTokenError(
+                        "Refresh token was already used; the session has been ended")
+                raise InvalidRefreshTokenError()
+
+            users = User.__table__
+            user = connection.execute(select(users.c.id, users.c.username, users.c.is_admin)
+                                      .where(users.c.id == row.user_id)).first()
+            if user is None:
+                connection.execute(delete(sessions).where(sessions.c.id == row.id))
+                db.session.commit()
+                raise InvalidRefreshTokenError()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error refreshing session: {str(e)}")
+        return _tokens(user, row.id, replacement)
+
+    @staticmethod
+    def end(session_id, user_id):
+        """Delete one of a user's sessions (logout); its refresh token stops working"""
+        try:
+            db.session.execute(delete(AuthSession).where(AuthSession.id == session_id,
+                                                         AuthSession.user_id == user_id))
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error ending session: {str(e)}")
+
+    @staticmethod
+    def end_all(user_id, keep=None):
+        """
+        Delete a user's sessions, except the one with id `keep`, in the
+        caller's transaction (which commits), e.g. with a password change
+        """
+        condition = AuthSession.user_id == user_id
+        if keep is not None:
+            condition &= AuthSession.id != keep
+        db.session.execute(delete(AuthSession).where(condition)
+                           .execution_options(synchronize_session=False))
+
+    @staticmethod
+    def purge_expired(batch_size=1000):
+        """
+        Delete expired sessions batch_size at a time, committing after each
+        batch so the table is never locked for long; returns how many
+        """
+        now = datetime.utcnow()
+        count = 0
+        try:
+            while True:
+                ids = db.session.execute(select(AuthSession.id)
+                                         .where(AuthSession.expires_at < now)
+                                         .limit(batch_size)).scalars().all()
+                if not ids:
+                    return count
+                db.session.execute(delete(AuthSession).where(AuthSession.id.in_(ids)))
+                db.session.commit()
+                count += len(ids)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error purging sessions: {str(e)}")
@@ -0,0 +1,112 @@
+from app import db
+from app.models import Task, Project, Technology, task_technologies
+from sqlalchemy import func
+
+UNKNOWN_PROJECT = "Unknown Project"
+UNKNOWN_TECHNOLOGY = "Unknown Technology"
+
+
+class StatsService:
+    # Columns a date window may be applied to
+    DATE_FIELDS = {
+        'date_created': Task.date_created,
+        'due_date': Task.due_date,
+        'completion_date': Task.completion_date,
+    }
+
+    @staticmethod
+    def completion_counts(group_by="both", project_id=None, technology_id=None,
+                          assignee_id=None, start_date=None, end_date=None,
+                          date_field='date_created'):
+        """
+        Returns raw completion counts from a single joined aggregate query.
+
+        Each row is a dict with project_id, project_name, technology_id,
+        technology_name, total and completed. Rows are grouped by:
+            - "project"
+            - "technology"
+            - "both" (project + technology)
+        """
+        if date_field not in StatsService.DATE_FIELDS:
+            raise ValueError(f"Invalid date field: {date_field}")
+
+        group_columns = []
+        select_columns = []
+        if group_by in ("project", "both"):
+            group_columns += [Task.project_id, Project.name]
+            select_columns += [Task.project_id.label("project_id"),
+                               Project.name.label("project_name")]
+        if group_by in ("technology", "both"):
+            group_columns += [task_technologies.c.technology_id, Technology.name]
+            select_columns += [task_technologies.c.technology_id.label("technology_id"),
+                               Technology.name.label("technology_name")]
+        if not group_columns:
+            raise ValueError(f"Invalid group_by: {group_by}")
+
+        query = (
+            db.session.query(
+                *select_columns,
+                func.count(Task.id).label("total_tasks"),
+                func.sum(Task.is_completed.cast(db.Integer)).label("completed_tasks")
+            )
+            .select_from(Task)
+            .join(task_technologies, task_technologies.c.task_id == Task.id)
+        )
+
+        if group_by in ("project", "both"):
+            query = query.outerjoin(Project, Project.id == Task.project_id)
+        if group_by in ("technology", "both"):
+            query = query.outerjoin(Technology, Technology.id == task_technologies.c.technology_id)
+
+        # Optional filters
+        if project_id is not None:
+            query = query.filter(Task.project_id == project_id)
+        if technology_id is not None:
+            query = query.filter(task_technologies.c.technology_id == technology_id)
+        if assignee_id is not None:
+            query = query.filter(Task.assignee_id == assignee_id)
+
+        date_column = StatsService.DATE_FIELDS[date_field]
+        if start_date is not None:
+            query = query.filter(date_column >= start_date)
+        if end_date is not None:
+            query = query.filter(date_column < end_date)
+
+        rows = []
+        for row in query.group_by(*group_columns).all():
+            mapping = row._mapping
+            rows.append({
+                'project_id': mapping.get('project_id'),
+                'project_name': mapping.get('project_name') or UNKNOWN_PROJECT,
+                'technology_id': mapping.get('technology_id'),
+                'technology_name': mapping.get('technology_name') or UNKNOWN_TECHNOLOGY,
+                'total': row.total_tasks,
+                'completed': row.completed_tasks or 0,
+            })
+        return rows
+
+    @staticmethod
+    def completion_percentages(group_by="both", **filters):
+        """
+        Returns {group name: completion percentage}, keyed the same way the
+        home page has always displayed them.
+        """
+        stats = {}
+        for row in StatsService.completion_counts(group_by=group_by, **filters):
+            if group_by == "project":
+                key = row['project_name']
+            elif group_by == "technology":
+                key = row['technology_name']
+            else:  # both
+                key = f"{row['project_name']} - {row['technology_name']}"
+
+            # Names are not unique keys, so fold rows that share one
+            if key not in stats:
+                stats[key] = {"total": 0, "completed": 0}
+            stats[key]["total"] += row['total']
+            stats[key]["completed"] += row['completed']
+
+        return {
+            key: (value["completed"] / value["total"]) * 100 if value["total"] > 0 else 0
+            for key, value in stats.items()
+        }
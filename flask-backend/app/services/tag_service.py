@@ -0,0 +1,225 @@
+from app import db
+from app.models import EntityTag, Note, Course, Document, Flashcard, Question
+from sqlalchemy import delete, event, exists, func, insert, inspect, intersect, select
+from sqlalchemy.exc import SQLAlchemyError
+
+# entity_type -> (model, owner column)
+TAGGED = {
+    'note': (Note, 'user_id'),
+    'course': (Course, 'user_id'),
+    'document': (Document, 'uploaded_by'),
+    'flashcard': (Flashcard, 'user_id'),
+    'question': (Question, 'user_id'),
+}
+_BY_MODEL = {model: (entity_type, owner) for entity_type, (model, owner) in TAGGED.items()}
+
+TAG_MODES = ('all', 'any')
+MAX_TAG_LENGTH = EntityTag.__table__.c.tag.type.length
+
+# Engines whose entity_tags table is known to be backfilled
+_ready = set()
+
+
+def normalize_tags(tags):
+    """Unique, stripped, non-empty tag strings in their original order"""
+    if not isinstance(tags, (list, tuple)):
+        return []
+    result = []
+    for tag in tags:
+        if isinstance(tag, str):
+            tag = tag.strip()[:MAX_TAG_LENGTH]
+            if tag and tag not in result:
+                result.append(tag)
+    return result
+
+
+def _rows(entity_type, entity_id, tags, owner_id):
+    return [{'entity_type': entity_type, 'entity_id': entity_id, 'tag': tag, 'owner_id': owner_id}
+            for tag in normalize_tags(tags)]
+
+
+def _replace(connection, removed, rows):
+    """Delete the tag rows of `removed` (entity_type, entity_id) pairs, then insert `rows`"""
+    by_type = {}
+    for entity_type, entity_id in removed:
+        by_type.setdefault(entity_type, []).append(entity_id)
+    table = EntityTag.__table__
+    for entity_type, entity_ids in by_type.items():
+        connection.execute(delete(table).where(table.c.entity_type == entity_type,
+                                               table.c.entity_id.in_(entity_ids)))
+    if rows:
+        connection.execute(insert(table), rows)
+
+
+def _backfill(connection, batch_size=1000):
+    """Insert the tag rows of every tagged entity through `connection`; returns the row count"""
+    table = EntityTag.__table__
+    count = 0
+    for entity_type, (model, owner) in TAGGED.items():
+        rows = connection.execution_options(yield_per=batch_size).execute(
+            select(model.id, model.tags, getattr(model, owner).label('owner_id'))
+            .order_by(model.id))
+        for batch in rows.partitions():
+            tag_rows = [tag_row for row in batch
+                        for tag_row in _rows(entity_type, row.id, row.tags, row.owner_id)]
+            if tag_rows:
+                connection.execute(insert(table), tag_rows)
+                count += len(tag_rows)
+    return count
+
+
+def _ensure(connection):
+    """
+    Create and backfill entity_tags on this connection if it is missing or
+    empty, as on databases created before it existed. Returns True if it did.
+    """
+    if connection.engine in _ready:
+        return False
+    table = EntityTag.__table__
+    if inspect(connection).has_table(table.name):
+        if connection.execute(select(exists().select_from(table))).scalar():
+            _ready.add(connection.engine)
+            return False
+    else:
+        table.create(connection)
+    _backfill(connection)
+    return True
+
+
+def _after_flush(session, flush_context):
+    """Mirror flushed changes to the tags (and owner) of tagged models into entity_tags"""
+    removed, rows = [], []
+    for obj in session.deleted:
+        tagged = _BY_MODEL.get(type(obj))
+        if tagged is not None and obj.id is not None:
+            removed.append((tagged[0], obj.id))
+    for obj in list(session.new) + list(session.dirty):
+        tagged = _BY_MODEL.get(type(obj))
+        if tagged is None or obj in session.deleted:
+            continue
+        entity_type, owner = tagged
+        if obj in session.dirty:
+            state = inspect(obj)
+            if not (state.attrs.tags.history.has_changes() or
+                    state.attrs[owner].history.has_changes()):
+                continue
+            removed.append((entity_type, obj.id))
+        rows.extend(_rows(entity_type, obj.id, obj.tags, getattr(obj, owner)))
+    if removed or rows:
+        connection = session.connection()
+        if _ensure(connection):
+            # The backfill already read this flush; it counts once the transaction commits
+            session.info['tags_backfilled'] = connection.engine
+        else:
+            _replace(connection, removed, rows)
+
+
+def _after_commit(session):
+    engine = session.info.pop('tags_backfilled', None)
+    if engine is not None:
+        _ready.add(engine)
+
+
+def _after_rollback(session):
+    session.info.pop('tags_backfilled', None)
+
+
+event.listen(db.metadata, 'before_drop', lambda target, connection, **kw: _ready.discard(connection.engine))
+event.listen(db.session, 'after_flush', _after_flush)
+event.listen(db.session, 'after_commit', _after_commit)
+event.listen(db.session, 'after_rollback', _after_rollback)
+
+
+class TagService:
+    """
+    Tag filters and counts backed by the entity_tags table.
+
+    The table is kept in step with the tags JSON columns by a session
+    after_flush hook, in the same transaction as the entity, and backfilled
+    on first use on databases created before it existed. Bulk statements
+    bypass the hook; pass their rows to index_rows, or run
+    `flask rebuild-tag-index` after them.
+    """
+
+    @staticmethod
+    def ensure_index():
+        """Create and backfill entity_tags for databases created before it existed"""
+        engine = db.engine
+        if engine in _ready:
+            return
+        with engine.begin() as connection:
+            _ensure(connection)
+        _ready.add(engine)
+
+    @staticmethod
+    def filter_by_tags(query, entity_type, id_column, tags, mode='all'):
+        """
+        Restrict a query to entities carrying all (mode='all') or any
+        (mode='any') of the given tags, using the tag index
+        """
+        if mode not in TAG_MODES:
+            raise ValueError(f"tag_mode must be one of: {', '.join(TAG_MODES)}")
+        tags = normalize_tags(tags)
+        if not tags:
+            return query
+        TagService.ensure_index()
+
+        def tagged(*values):
+            return select(EntityTag.entity_id).where(
+                EntityTag.entity_type == entity_type,
+                EntityTag.tag.in_(values)
+            )
+
+        if mode == 'all' and len(tags) > 1:
+            # Each branch is a range scan of the (entity_type, tag, entity_id) index
+            matching = intersect(*[tagged(tag) for tag in tags])
+        else:
+            matching = tagged(*tags)
+        return query.filter(id_column.in_(matching))
+
+    @staticmethod
+    def tag_counts(entity_type=None, owner_id=None, limit=None):
+        """[(tag, count)] with the most used tags first, from a single grouped query"""
+        TagService.ensure_index()
+        count = func.count().label('count')
+        query = db.session.query(EntityTag.tag, count)
+        if entity_type:
+            query = query.filter(EntityTag.entity_type == entity_type)
+        if owner_id:
+            query = query.filter(EntityTag.owner_id == owner_id)
+        query = query.group_by(EntityTag.tag).order_by(count.desc(), EntityTag.tag)
+        if limit:
+            query = query.limit(limit)
+        return [(row.tag, row.count) for row in query]
+
+    @staticmethod
+    def index_rows(model, rows):
+        """
+        Add entity_tags rows for entities just inserted with a bulk statement,
+        in the session's transaction. Each row needs id, tags and the owner column.
+        """
+        entity_type, owner = _BY_MODEL[model]
+        tag_rows = [tag_row for row in rows
+                    for tag_row in _rows(entity_type, row.id, row.tags, getattr(row, owner))]
+        connection = db.session.connection()
+        if _ensure(connection):
+            db.session.info['tags_backfilled'] = connection.engine
+        elif tag_rows:
+            _replace(connection, [], tag_rows)
+
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """
+        Recreate entity_tags from the tags JSON of every tagged model (also
+        creating the table on databases that predate it). Returns the row count.
+        """
+        table = EntityTag.__table__
+        try:
+            with db.engine.begin() as connection:
+                table.create(connection, checkfirst=True)
+                connection.execute(delete(table))
+                count = _backfill(connection, batch_size)
+            _ready.add(db.engine)
+            return count
+        except SQLAlchemyError as e:
+            raise Exception(f"Error rebuilding tag index: {str(e)}")
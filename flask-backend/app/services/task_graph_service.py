@@ -0,0 +1,305 @@
+from app import db
+from app.models import Task, task_prerequisites
+from sqlalchemy import select, literal, func, Integer
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+from collections import defaultdict, deque
+
+
+class PrerequisiteGraph:
+    """
+    In-memory view of the task_prerequisites edge set.
+
+    An edge task -> prerequisite means `task` cannot start before
+    `prerequisite` is done. All traversals are iterative, so deep chains
+    cannot hit the recursion limit, and every node is visited once, so
+    diamond-shaped graphs produce no duplicates.
+    """
+
+    def __init__(self, edges=(), durations=None, complete=True):
+        self.prerequisites = defaultdict(set)  # task -> tasks it depends on
+        self.dependents = defaultdict(set)     # task -> tasks depending on it
+        self.durations = dict(durations or {})
+        self.nodes = set(self.durations)
+        # A partial graph fetches prerequisite edges of unloaded tasks on demand
+        self.complete = complete
+        self.loaded = set()
+        for task_id, prerequisite_id in edges:
+            self.add_edge(task_id, prerequisite_id)
+
+    @classmethod
+    def load(cls, project_id=None):
+        """
+        Load a project's tasks and prerequisite edges with a single query.
+        With no project_id the whole graph is loaded. Prerequisites that belong
+        to other projects are included as nodes; their own edges are fetched
+        on demand when a traversal reaches them.
+        """
+        prerequisite = aliased(Task)
+        query = (
+            db.session.query(
+                Task.id,
+                Task.estimated_duration,
+                task_prerequisites.c.prerequisite_id,
+                prerequisite.estimated_duration
+            )
+            .outerjoin(task_prerequisites, task_prerequisites.c.task_id == Task.id)
+            .outerjoin(prerequisite, prerequisite.id == task_prerequisites.c.prerequisite_id)
+        )
+        if project_id is not None:
+            query = query.filter(Task.project_id == project_id)
+
+        graph = cls(complete=project_id is None)
+        for task_id, duration, prerequisite_id, prerequisite_duration in query:
+            graph._add_node(task_id, duration)
+            graph.loaded.add(task_id)
+            if prerequisite_id is not None:
+                graph._add_node(prerequisite_id, prerequisite_duration)
+                graph.add_edge(task_id, prerequisite_id)
+        return graph
+
+    def expand(self, task_ids):
+        """Load the prerequisite edges of tasks that are not fully loaded yet (one query)"""
+        if self.complete:
+            return
+        missing = [task_id for task_id in task_ids if task_id not in self.loaded]
+        if not missing:
+            return
+        prerequisite = aliased(Task)
+        rows = (
+            db.session.query(task_prerequisites.c.task_id, task_prerequisites.c.prerequisite_id,
+                             prerequisite.estimated_duration)
+            .join(prerequisite, prerequisite.id == task_prerequisites.c.prerequisite_id)
+            .filter(task_prerequisites.c.task_id.in_(missing))
+        )
+        for task_id, prerequisite_id, duration in rows:
+            self._add_node(prerequisite_id, duration)
+            self.add_edge(task_id, prerequisite_id)
+        self.loaded.update(missing)
+
+    def _add_node(self, task_id, duration=None):
+        self.nodes.add(task_id)
+        if duration is not None or task_id not in self.durations:
+            self.durations[task_id] = duration or 0
+
+    def add_edge(self, task_id, prerequisite_id):
+        self.nodes.update((task_id, prerequisite_id))
+        self.prerequisites[task_id].add(prerequisite_id)
+        self.dependents[prerequisite_id].add(task_id)
+
+    def _walk(self, start, adjacency, max_depth=None, on_level=None):
+        """Breadth-first walk from start; returns reachable nodes ordered by (depth, id)"""
+        seen = {start}
+        order = []
+        frontier = [start]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            if on_level:
+                on_level(frontier)
+            next_frontier = []
+            for node in frontier:
+                for neighbour in adjacency.get(node, ()):
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        next_frontier.append(neighbour)
+            next_frontier.sort()
+            order.extend(next_frontier)
+            frontier = next_frontier
+            depth += 1
+        return order
+
+    def ancestors(self, task_id, max_depth=None):
+        """All transitive prerequisites of a task, nearest first, without duplicates"""
+        return self._walk(task_id, self.prerequisites, max_depth, on_level=self.expand)
+
+    def descendants(self, task_id, max_depth=None):
+        """All loaded tasks that transitively depend on a task, nearest first"""
+        return self._walk(task_id, self.dependents, max_depth)
+
+    def transitive_closure(self):
+        """Map every task to the frozenset of all of its transitive prerequisites"""
+        closure = {}
+        for task_id in self.topological_order():
+            reachable = set()
+            for prerequisite_id in self.prerequisites.get(task_id, ()):
+                reachable.add(prerequisite_id)
+                reachable |= closure[prerequisite_id]
+            closure[task_id] = frozenset(reachable)
+        return closure
+
+    def would_create_cycle(self, task_id, prerequisite_id):
+        """True if making prerequisite_id a prerequisite of task_id closes a cycle"""
+        if task_id == prerequisite_id:
+            return True
+        # A cycle appears if task_id is already reachable from the new prerequisite
+        return task_id in self.ancestors(prerequisite_id)
+
+    def find_cycle(self):
+        """Return one cycle as a list of task ids (first id repeated at the end), or None"""
+        WHITE, GREY, BLACK = 0, 1, 2
+        colour = dict.fromkeys(self.nodes, WHITE)
+        for root in self.nodes:
+            if colour[root] != WHITE:
+                continue
+            colour[root] = GREY
+            path = [root]
+            stack = [iter(self.prerequisites.get(root, ()))]
+            while stack:
+                advanced = False
+                for neighbour in stack[-1]:
+                    if colour[neighbour] == GREY:
+                        return path[path.index(neighbour):] + [neighbour]
+                    if colour[neighbour] == WHITE:
+                        colour[neighbour] = GREY
+                        path.append(neighbour)
+                        stack.append(iter(self.prerequisites.get(neighbour, ())))
+                        advanced = True
+                        break
+                if not advanced:
+                    colour[path.pop()] = BLACK
+                    stack.pop()
+        return None
+
+    def topological_order(self):
+        """Task ids ordered so every prerequisite comes before its dependents"""
+        remaining = {node: len(self.prerequisites.get(node, ())) for node in self.nodes}
+        ready = deque(sorted(node for node, count in remaining.items() if count == 0))
+        order = []
+        while ready:
+            node = ready.popleft()
+            order.append(node)
+            for dependent in self.dependents.get(node, ()):
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) != len(self.nodes):
+            raise ValueError("Prerequisite graph contains a cycle")
+        return order
+
+    def critical_path(self):
+        """
+        Longest chain of prerequisites weighted by estimated_duration.
+        Returns (total duration, [task ids from first prerequisite to last task]).
+        """
+        finish = {}
+        previous = {}
+        for node in self.topological_order():
+            start = 0
+            for prerequisite_id in self.prerequisites.get(node, ()):
+                if finish[prerequisite_id] > start:
+                    start = finish[prerequisite_id]
+                    previous[node] = prerequisite_id
+            finish[node] = start + (self.durations.get(node) or 0)
+
+        if not finish:
+            return 0, []
+        end = max(finish, key=finish.get)
+        path = [end]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        path.reverse()
+        return finish[end], path
+
+
+class TaskGraphService:
+    @staticmethod
+    def get_graph(project_id=None):
+        """Load the prerequisite graph of a project (or of every task)"""
+        return PrerequisiteGraph.load(project_id)
+
+    @staticmethod
+    def would_create_cycle(task_id, prerequisite_id, project_id=None):
+        """
+        Cycle check that starts from the project's bulk-loaded edges and only
+        queries again for prerequisites outside the project
+        """
+        if project_id is not None:
+            graph = PrerequisiteGraph.load(project_id)
+        else:
+            graph = PrerequisiteGraph(complete=False)
+        return graph.would_create_cycle(task_id, prerequisite_id)
+
+    @staticmethod
+    def reachable_query(task_id, max_depth=5, reverse=False):
+        """
+        Build a WITH RECURSIVE query over task_prerequisites returning
+        (task_id, depth) for every task reachable from task_id, each once at its
+        smallest depth (NULL when max_depth is None). Prerequisites are followed
+        by default; reverse=True follows dependents instead. Uses only portable
+        SQL so SQLite and PostgreSQL return the same rows.
+        """
+        edges = task_prerequisites.c
+        source, target = (edges.prerequisite_id, edges.task_id) if reverse else \
+                         (edges.task_id, edges.prerequisite_id)
+
+        # UNION (not UNION ALL) discards rows already produced, so cycles terminate:
+        # on the bare id when unbounded, on (id, depth) when max_depth caps the walk
+        if max_depth is None:
+            walk = select(target.label('task_id')).where(source == task_id) \
+                .cte('reachable', recursive=True)
+            walk = walk.union(
+                select(target).join(walk, source == walk.c.task_id)
+            )
+            return select(walk.c.task_id, literal(None, Integer).label('depth')) \
+                .where(walk.c.task_id != task_id)
+
+        # The anchor is depth 1, so max_depth=0 has to filter it out as well
+        walk = select(target.label('task_id'), literal(1).label('depth')) \
+            .where(source == task_id, literal(1) <= max_depth) \
+            .cte('reachable', recursive=True)
+        walk = walk.union(
+            select(target, walk.c.depth + 1)
+            .join(walk, source == walk.c.task_id)
+            .where(walk.c.depth < max_depth)
+        )
+        return select(walk.c.task_id, func.min(walk.c.depth).label('depth')) \
+            .where(walk.c.task_id != task_id) \
+            .group_by(walk.c.task_id)
+
+    @staticmethod
+    def get_reachable_tasks(task_id, max_depth=5, reverse=False):
+        """Tasks reachable from task_id in one round trip, ordered by (depth, id)"""
+        reachable = TaskGraphService.reachable_query(task_id, max_depth, reverse).subquery()
+        return (
+            Task.query
+            .join(reachable, Task.id == reachable.c.task_id)
+            .order_by(reachable.c.depth, Task.id)
+            .all()
+        )
+
+    @staticmethod
+    def get_blocked_tasks(project_id=None):
+        """
+        Tasks with at least one incomplete prerequisite anywhere up their chain,
+        found with a single recursive query: start from the direct dependents of
+        incomplete tasks and walk the dependent edges from there.
+        """
+        edges = task_prerequisites.c
+        blocking = aliased(Task)
+        blocked = (
+            select(edges.task_id.label('task_id'))
+            .join(blocking, blocking.id == edges.prerequisite_id)
+            .where(blocking.is_completed.isnot(True))
+            .cte('blocked', recursive=True)
+        )
+        blocked = blocked.union(
+            select(edges.task_id).join(blocked, edges.prerequisite_id == blocked.c.task_id)
+        )
+
+        query = Task.query.filter(Task.id.in_(select(blocked.c.task_id)))
+        if project_id is not None:
+            query = query.filter(Task.project_id == project_id)
+        return query.order_by(Task.id).all()
+
+    @staticmethod
+    def add_prerequisite(task_id, prerequisite_id):
+        """Make prerequisite_id a prerequisite of task_id, refusing cycles"""
+        task = Task.query.get_or_404(task_id)
+        prerequisite = Task.query.get_or_404(prerequisite_id)
+        task.add_prerequisite(prerequisite)
+        try:
+            db.session.commit()
+            return task
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error adding prerequisite: {str(e)}")
@@ -1,6 +1,7 @@
 from app import db
-from app.models import Task, Project, Technology, task_technologies
-from sqlalchemy import func
+from app.models import Task, Technology
+from app.services.stats_service import StatsService
+from app.services.rollup_service import TaskRollupService
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 from flask import abort
@@ -20,14 +21,19 @@ class TaskService:
             description=description,
             is_completed=is_completed,
             project_id=project_id,
-            technology_id=technology_id,
             is_milestone=is_milestone,
             date_created=datetime.utcnow(),
             hierarchy=hierarchy,
             completion_date=completion_date
         )
+        technology = Technology.query.get(technology_id) if technology_id else None
+        if technology:
+            new_task.technologies.append(technology)
         try:
             db.session.add(new_task)
+            TaskRollupService.record_change(
+                after=TaskRollupService.snapshot(new_task, [technology.id] if technology else [])
+            )
             db.session.commit()
             return new_task
         except SQLAlchemyError as e:
@@ -42,6 +48,8 @@ class TaskService:
                     technology_id=None, is_milestone=None):
 
         task = Task.query.get_or_404(task_id)
+        before = TaskRollupService.snapshot(task)
+        technology_ids = None
 
         # Only check for name and due_date if they're explicitly provided
         if name is not None:
@@ -57,7 +65,11 @@ class TaskService:
         if project_id is not None:
             task.project_id = project_id
         if technology_id is not None:
-            task.technology_id = technology_id
+            technology = Technology.query.get_or_404(technology_id)
+            for current in task.technologies.all():
+                task.technologies.remove(current)
+            task.technologies.append(technology)
+            technology_ids = [technology.id]
         if is_milestone is not None:
             task.is_milestone = is_milestone
 
@@ -68,6 +80,7 @@ class TaskService:
             task.completion_date = None  # Reset if not completed
 
         try:
+            TaskRollupService.record_change(before, TaskRollupService.snapshot(task, technology_ids))
             db.session.commit()
             return task
         except SQLAlchemyError as e:
@@ -79,6 +92,7 @@ class TaskService:
     @staticmethod
     def complete_task(task_id,task_complete):
         task = Task.query.get_or_404(task_id)
+        before = TaskRollupService.snapshot(task)
         task.is_completed = task_complete
         if task_complete:
             task.completion_date = datetime.utcnow()
@@ -86,16 +100,20 @@ class TaskService:
             task.completion_date = None
 
         try:
+            TaskRollupService.record_change(before, before[:2] + (bool(task_complete),))
             db.session.commit()
             return
         except:
+            db.session.rollback()
             return "Unable to mark your task complete"
 
     @staticmethod
     def delete_task(task_id):
         task_to_delete = Task.query.get_or_404(task_id)
         try:
+            before = TaskRollupService.snapshot(task_to_delete)
             db.session.delete(task_to_delete)
+            TaskRollupService.record_change(before=before)
             db.session.commit()
         except SQLAlchemyError as e:
             db.session.rollback()  # Rollback in case of error
@@ -107,6 +125,11 @@ class TaskService:
         # Retrieves all tasks
         return Task.query.order_by(Task.id).all()
 
+    @staticmethod
+    def query_tasks():
+        # Unordered query for callers that paginate
+        return Task.query
+
 
     @staticmethod
     def get_task(id): #display_task()
@@ -142,58 +165,14 @@ class TaskService:
 
 
     @staticmethod
-    def get_completion_stats(group_by="both"):
+    def get_completion_stats(group_by="both", **filters):
         """
-        Returns completion stats grouped by:
+        Returns completion percentages grouped by:
             - "project"
             - "technology"
             - "both" (project + technology)
-        """
-
-        # Base M2M join query
-        query = (
-            db.session.query(
-                Task.project_id,
-                task_technologies.c.technology_id.label("tech_id"),
-                func.count(Task.id).label("total_tasks"),
-                func.sum(Task.is_completed.cast(db.Integer)).label("completed_tasks")
-            )
-            .join(task_technologies, task_technologies.c.task_id == Task.id)
-            .group_by(Task.project_id, task_technologies.c.technology_id)
-        )
-
-        # Keep raw counts instead of percentages
-        stats = {}
 
-        for row in query.all():
-
-            # Lookup names
-            project = Project.query.get(row.project_id) if row.project_id else None
-            tech = Technology.query.get(row.tech_id) if row.tech_id else None
-
-            project_name = project.name if project else "Unknown Project"
-            tech_name = tech.name if tech else "Unknown Technology"
-
-            # Generate group key depending on mode
-            if group_by == "project":
-                key = project_name
-            elif group_by == "technology":
-                key = tech_name
-            else:  # both
-                key = f"{project_name} - {tech_name}"
-
-            # Initialize
-            if key not in stats:
-                stats[key] = {"total": 0, "completed": 0}
-
-            # Aggregate raw task counts
-            stats[key]["total"] += row.total_tasks
-            stats[key]["completed"] += row.completed_tasks or 0
-
-        # Convert aggregate counts → percentages
-        results = {
-            key: (value["completed"] / value["total"]) * 100 if value["total"] > 0 else 0
-            for key, value in stats.items()
-        }
-
-        return results
+        Optional filters (project_id, technology_id, assignee_id, start_date,
+        end_date, date_field) are passed through to StatsService.
+        """
+        return StatsService.completion_percentages(group_by=group_by, **filters)
@@ -0,0 +1,218 @@
+from app import app
+from app.models import ContentType
+from app.services.file_service import get_file_service
+import hashlib
+import hmac
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+import time
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Bump when rendering changes so clients holding old ETags fetch the new output
+RENDER_VERSION = 1
+
+# Running size of the derivative cache in this process, computed on first use
+_cache = {'bytes': None}
+_cache_lock = threading.Lock()
+
+
+class ThumbnailService:
+    """
+    Thumbnails rendered on first request and cached on disk.
+
+    Derivatives are keyed by the source's content hash and the size name, so
+    documents sharing a blob share thumbnails and a key never changes meaning
+    (it doubles as the ETag). Serving a derivative refreshes its mtime; when
+    the cache outgrows THUMBNAIL_CACHE_BYTES the least recently used files are
+    evicted. PDFs are rendered from their first page with the command in
+    THUMBNAIL_PDF_RASTERIZER, when one is configured.
+    """
+
+    @staticmethod
+    def sizes():
+        return app.config['THUMBNAIL_SIZES']
+
+    @staticmethod
+    def supports(document):
+        if not PIL_AVAILABLE:
+            return False
+        if document.type == ContentType.IMAGE:
+            return True
+        return document.type == ContentType.PDF and bool(app.config.get('THUMBNAIL_PDF_RASTERIZER'))
+
+    @staticmethod
+    def url_for(document):
+        """API URL of a document's thumbnail, or None if it cannot have one"""
+        if not ThumbnailService.supports(document):
+            return None
+        return f"/api/documents/{document.id}/thumbnail"
+
+    @staticmethod
+    def _signature(document_id, expires):
+        message = f"thumbnail:{document_id}:{expires}".encode()
+        return hmac.new(app.config['SECRET_KEY'].encode(), message, hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def signed_url(document):
+        """
+        thumbnail_url with an expiring signature, so an <img src> can load it
+        without a Bearer token. The expiry is rounded up to a whole
+        THUMBNAIL_URL_TTL window, so the URL (and the browser's cached copy)
+        stays the same for a while and is valid for at least one TTL.
+        """
+        url = document.thumbnail_url
+        if not url or not url.startswith('/api/'):
+            return url
+        ttl = app.config['THUMBNAIL_URL_TTL']
+        expires = (int(time.time()) // ttl + 2) * ttl
+        return f"{url}?expires={expires}&signature={ThumbnailService._signature(document.id, expires)}"
+
+    @staticmethod
+    def verify_signature(document_id, expires, signature):
+        """True if expires/signature come from signed_url for this document and have not expired"""
+        if not expires or not signature or not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(signature, ThumbnailService._signature(document_id, int(expires)))
+
+    @staticmethod
+    def content_key(document):
+        """The blob hash, or for files stored before blobs a hash of path, size and mtime"""
+        if document.blob_sha256:
+            return document.blob_sha256
+        stat = os.stat(document.file_url)
+        return hashlib.sha256(
+            f"{document.file_url}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+    @staticmethod
+    def etag(key, size_name):
+        return f"{key[:32]}-{size_name}-v{RENDER_VERSION}"
+
+    @staticmethod
+    def folder():
+        return os.path.join(get_file_service().upload_folder, 'thumbnails')
+
+    @staticmethod
+    def derivative_path(key, size_name):
+        return os.path.join(ThumbnailService.folder(), key[:2], f"{key}_{size_name}.jpg")
+
+    @staticmethod
+    def get(document, size_name):
+        """
+        Path and ETag of a document's thumbnail at a named size, rendering it
+        if needed. Returns (None, None) when the document has no thumbnail.
+        """
+        pixels = ThumbnailService.sizes().get(size_name)
+        if pixels is None:
+            raise ValueError(f"size must be one of: {', '.join(ThumbnailService.sizes())}")
+        if not ThumbnailService.supports(document) or not os.path.exists(document.file_url):
+            return None, None
+
+        key = ThumbnailService.content_key(document)
+        path = ThumbnailService.derivative_path(key, size_name)
+        if os.path.exists(path):
+            ThumbnailService._touch(path)
+        else:
+            ThumbnailService._render(document, pixels, path)
+        return path, ThumbnailService.etag(key, size_name)
+
+    @staticmethod
+    def _touch(path):
+        """Mark a derivative as recently used (at most once a minute, to spare writes)"""
+        now = time.time()
+        try:
+            if now - os.stat(path).st_mtime > 60:
+                os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _render(document, pixels, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=ThumbnailService.folder()) as work:
+            source = document.file_url
+            if document.type == ContentType.PDF:
+                source = ThumbnailService._rasterize_first_page(source, pixels, work)
+
+            with Image.open(source) as image:
+                # Let the JPEG decoder skip detail we would scale away anyway
+                image.draft('RGB', (pixels, pixels))
+                image = ImageOps.exif_transpose(image)
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                image.thumbnail((pixels, pixels), Image.Resampling.LANCZOS)
+                partial = os.path.join(work, 'thumbnail.jpg')
+                image.save(partial, 'JPEG', quality=85, optimize=True)
+            os.replace(partial, path)
+        ThumbnailService._account(os.path.getsize(path))
+
+    @staticmethod
+    def _rasterize_first_page(pdf_path, pixels, work):
+        """Run THUMBNAIL_PDF_RASTERIZER for page one of a PDF and return the image it wrote"""
+        stem = os.path.join(work, 'page')
+        command = [part.format(input=pdf_path, output=stem + '.png', output_stem=stem, size=pixels)
+                   for part in shlex.split(app.config['THUMBNAIL_PDF_RASTERIZER'])]
+        try:
+            subprocess.run(command, check=True, capture_output=True,
+                           timeout=app.config.get('THUMBNAIL_RASTERIZE_TIMEOUT', 30))
+        except (OSError, subprocess.SubprocessError) as e:
+            raise Exception(f"Error rasterizing PDF: {str(e)}")
+        outputs = sorted(name for name in os.listdir(work) if name.startswith('page'))
+        if not outputs:
+            raise Exception("Error rasterizing PDF: no image was written")
+        return os.path.join(work, outputs[0])
+
+    @staticmethod
+    def _files():
+        for root, _, names in os.walk(ThumbnailService.folder()):
+            for name in names:
+                if name.endswith('.jpg') and '_' in name:  # skip renders in progress
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    @staticmethod
+    def _account(added):
+        """Add a new derivative to the running total and evict if over quota"""
+        with _cache_lock:
+            if _cache['bytes'] is None:
+                _cache['bytes'] = sum(size for _, size, _ in ThumbnailService._files())
+            else:
+                _cache['bytes'] += added
+            if _cache['bytes'] > app.config['THUMBNAIL_CACHE_BYTES']:
+                _cache['bytes'] = ThumbnailService.evict(app.config['THUMBNAIL_CACHE_BYTES'] * 0.9)
+
+    @staticmethod
+    def evict(target_bytes):
+        """Delete least recently used derivatives until the cache fits target_bytes; returns its size"""
+        files = sorted(ThumbnailService._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        return total
+
+    @staticmethod
+    def purge(key):
+        """Remove every derivative of a content key (its blob was deleted)"""
+        for size_name in ThumbnailService.sizes():
+            path = ThumbnailService.derivative_path(key, size_name)
+            if os.path.exists(path):
+                os.remove(path)
+                with _cache_lock:
+                    _cache['bytes'] = None
@@ -0,0 +1,224 @@
+from app import app, db
+from app.models import RevokedToken
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+import hashlib
+import jwt
+import secrets
+import threading
+import time
+
+# Who a verified access token belongs to; put on flask.g by token_required.
+# jti identifies the token for revocation (tokens issued without one use a hash of the token);
+# session_id is the login session the token was issued for, if any.
+Principal = namedtuple('Principal', 'user_id is_admin jti expires_at session_id')
+
+
+class TokenRevokedError(jwt.InvalidTokenError):
+    pass
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified tokens: SHA-256 of the token -> Principal. An
+    entry is dropped when its token expires, and the whole cache when the
+    signing key changes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.key = None
+
+    def get(self, digest, key, now):
+        with self.lock:
+            if key != self.key:
+                self.entries.clear()
+                self.key = key
+                return None
+            principal = self.entries.get(digest)
+            if principal is None:
+                return None
+            if principal.expires_at <= now:
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return principal
+
+    def put(self, digest, key, principal):
+        size = app.config['AUTH_TOKEN_CACHE_SIZE']
+        if size <= 0:
+            return
+        with self.lock:
+            if key != self.key:
+                self.entries.clear()
+                self.key = key
+            self.entries[digest] = principal
+            self.entries.move_to_end(digest)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class Denylist:
+    """
+    In-memory copy of revoked_tokens: jti -> expiry timestamp. Rows added by
+    other processes are picked up by id at most every AUTH_DENYLIST_REFRESH
+    seconds; entries past their expiry are forgotten, since the token check
+    rejects those tokens anyway. Ids can commit out of order (PostgreSQL
+    sequences), so each sync also counts the unexpired rows and reloads them
+    all when the count disagrees with what was loaded.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.jtis = {}
+        self.rows = {}  # revoked_tokens id -> expiry timestamp, of the rows loaded
+        self.watermark = 0
+        self.synced = None
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.jtis[jti] = expires_at
+
+    def _fresh(self, now):
+        return self.synced is not None and now - self.synced < app.config['AUTH_DENYLIST_REFRESH']
+
+    def sync(self, now):
+        if self._fresh(now):
+            return
+        with self.lock:
+            if self._fresh(now):
+                return
+            self.synced = now
+            columns = (RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+            self._load(db.session.execute(select(*columns)
+                                          .where(RevokedToken.id > self.watermark)
+                                          .order_by(RevokedToken.id)))
+            self.rows = {row_id: expires_at for row_id, expires_at in self.rows.items()
+                         if expires_at > now}
+            live = RevokedToken.expires_at > datetime.utcfromtimestamp(now)
+            if db.session.execute(select(func.count()).where(live)).scalar() != len(self.rows):
+                # A row committed below the watermark (or purged early): start over
+                self.rows = {}
+                self._load(db.session.execute(select(*columns).where(live)))
+            self.jtis = {jti: expires_at for jti, expires_at in self.jtis.items()
+                         if expires_at > now}
+
+    def _load(self, rows):
+        for row in rows:
+            expires_at = _timestamp(row.expires_at)
+            self.jtis[row.jti] = expires_at
+            self.rows[row.id] = expires_at
+            self.watermark = max(self.watermark, row.id)
+
+    def __contains__(self, jti):
+        return jti in self.jtis
+
+
+_cache = TokenCache()
+_denylist = Denylist()
+
+
+def _timestamp(utc_datetime):
+    return (utc_datetime - datetime(1970, 1, 1)).total_seconds()
+
+
+def _signing_key():
+    return app.config.get('SECRET_KEY', 'dev-key')
+
+
+def _reset(*args, **kwargs):
+    """Forget cached tokens and the denylist, e.g. when the tables are dropped"""
+    _cache.clear()
+    with _denylist.lock:
+        _denylist.reset()
+
+
+event.listen(db.metadata, 'before_drop', _reset)
+
+
+class TokenService:
+    """
+    Access token issue, verification and revocation.
+
+    Verifying an HS256 signature and parsing the claims on every request is
+    skipped for tokens seen before: verified tokens are cached in a bounded
+    LRU (AUTH_TOKEN_CACHE_SIZE) keyed by their SHA-256 until they expire.
+    Revoked tokens are kept in the revoked_tokens denylist until their
+    expiry, mirrored in memory and re-synced every AUTH_DENYLIST_REFRESH
+    seconds, so a token revoked in another process stops working within
+    that interval (in this process at once).
+    """
+
+    @staticmethod
+    def issue(user, session_id=None):
+        """An access token for user, valid for JWT_ACCESS_TOKEN_EXPIRES seconds"""
+        payload = {
+            'user_id': user.id,
+            'is_admin': user.is_admin,
+            'jti': secrets.token_hex(16),
+            'exp': datetime.utcnow() + timedelta(seconds=app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+        }
+        if session_id is not None:
+            payload['sid'] = session_id
+        return jwt.encode(payload, _signing_key(), algorithm='HS256')
+
+    @staticmethod
+    def verify(token):
+        """
+        The Principal of a valid, unrevoked token. Raises
+        jwt.ExpiredSignatureError, or jwt.InvalidTokenError (TokenRevokedError
+        when revoked).
+        """
+        now = time.time()
+        key = _signing_key()
+        digest = hashlib.sha256(token.encode()).digest()
+        principal = _cache.get(digest, key, now)
+        if principal is None:
+            data = jwt.decode(token, key, algorithms=['HS256'], options={'require': ['exp']})
+            try:
+                principal = Principal(data['user_id'], bool(data['is_admin']),
+                                      data.get('jti') or digest.hex()[:32], float(data['exp']),
+                                      data.get('sid'))
+            except (KeyError, TypeError, ValueError):
+                raise jwt.InvalidTokenError("Token is missing claims")
+            _cache.put(digest, key, principal)
+        _denylist.sync(now)
+        if principal.jti in _denylist:
+            raise TokenRevokedError("Token has been revoked")
+        return principal
+
+    @staticmethod
+    def revoke(principal):
+        """Deny a token from now until it expires"""
+        _denylist.add(principal.jti, principal.expires_at)
+        try:
+            db.session.add(RevokedToken(jti=principal.jti,
+                                        expires_at=datetime.utcfromtimestamp(principal.expires_at)))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # already revoked
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error revoking token: {str(e)}")
+
+    @staticmethod
+    def purge_expired():
+        """Delete denylist rows of tokens that have expired anyway; returns how many"""
+        try:
+            result = db.session.execute(
+                delete(RevokedToken).where(RevokedToken.expires_at < datetime.utcnow()))
+            db.session.commit()
+            return result.rowcount
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error purging revoked tokens: {str(e)}")
@@ -0,0 +1,256 @@
+from app import app, db
+from app.models import UploadSession
+from app.services.blob_service import BlobService
+from app.services.document_service import DocumentService
+from app.services.file_service import get_file_service
+from sqlalchemy import or_, update
+from sqlalchemy.exc import SQLAlchemyError
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import os
+import threading
+import uuid
+
+READ_SIZE = 64 * 1024
+
+# upload id -> (offset, sha256 of the first `offset` bytes), so each chunk is
+# hashed as it is written. Process local: another worker process (or a
+# restart) rebuilds the state by hashing the partial file once.
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+MAX_HASHERS = 256
+
+
+class UploadError(ValueError):
+    """Rejected upload request; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _take_hasher(upload, path):
+    """The running hash of an upload's first upload.received bytes"""
+    with _hashers_lock:
+        offset, digest = _hashers.pop(upload.id, (None, None))
+    if offset == upload.received:
+        return digest
+
+    digest = hashlib.sha256()
+    if upload.received:
+        with open(path, 'rb') as partial:
+            remaining = upload.received
+            while remaining:
+                chunk = partial.read(min(READ_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+    return digest
+
+
+def _keep_hasher(upload_id, offset, digest):
+    with _hashers_lock:
+        _hashers[upload_id] = (offset, digest)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+
+class UploadService:
+    """
+    Resumable uploads: start a session, PUT chunks at the current offset,
+    then complete it into a Document. Chunks go straight to a partial file
+    in the upload folder and are hashed as they arrive; an interrupted
+    chunk keeps the bytes that made it, so clients resume from the offset
+    reported by the server instead of re-sending the file.
+
+    A chunk is written only after a conditional UPDATE has claimed the
+    upload at that offset, so two requests (in any process) never write or
+    hash the same bytes; the claim is a lease, freed by the writer when it
+    is done or after UPLOAD_WRITE_LEASE seconds if it died.
+    """
+
+    @staticmethod
+    def start(user_id, filename, size, mime_type=None, sha256=None, tags=None, module_id=None):
+        """Validate an upload's name and size up front and open a session for it"""
+        content_type = DocumentService.content_type_for(filename or '')
+        if content_type is None:
+            raise UploadError(f"Unsupported file type: {filename}", 415)
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError("size must be a positive integer")
+        if size > app.config['MAX_UPLOAD_SIZE']:
+            raise UploadError(f"File is larger than {app.config['MAX_UPLOAD_SIZE']} bytes", 413)
+        if sha256 is not None and (not isinstance(sha256, str) or len(sha256) != 64):
+            raise UploadError("sha256 must be a hex SHA-256 digest")
+
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            original_name=filename,
+            type=content_type,
+            mime_type=mime_type,
+            size=size,
+            received=0,
+            sha256=sha256.lower() if sha256 else None,
+            tags=tags or [],
+            module_id=module_id,
+            expires_at=datetime.utcnow() + timedelta(seconds=app.config['UPLOAD_SESSION_TTL'])
+        )
+        try:
+            db.session.add(upload)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error starting upload: {str(e)}")
+        return upload
+
+    @staticmethod
+    def get_upload(upload_id, user_id, is_admin=False):
+        """An unexpired session owned by the user (any user's for admins)"""
+        upload = db.session.get(UploadSession, upload_id)
+        if (upload is None or upload.expires_at < datetime.utcnow() or
+                (upload.user_id != user_id and not is_admin)):
+            raise UploadError("Upload not found", 404)
+        return upload
+
+    @staticmethod
+    def write_chunk(upload, offset, stream, length):
+        """
+        Append `length` bytes from `stream` at `offset`, which must equal the
+        bytes received so far. Returns the new offset.
+        """
+        if offset != upload.received:
+            raise UploadError(f"Expected offset {upload.received}", 409)
+        if length is None:
+            raise UploadError("Content-Length is required", 411)
+        if length > app.config['UPLOAD_CHUNK_SIZE']:
+            raise UploadError(f"Chunks are limited to {app.config['UPLOAD_CHUNK_SIZE']} bytes", 413)
+        if offset + length > upload.size:
+            raise UploadError(f"Chunk ends past the declared size of {upload.size} bytes", 413)
+
+        writer = uuid.uuid4().hex
+        UploadService._claim(upload, offset, writer)
+        file_service = get_file_service()
+        path = file_service.partial_path(upload.id)
+        written, digest = 0, None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            digest = _take_hasher(upload, path)
+            with open(path, 'r+b' if offset else 'wb') as partial:
+                partial.seek(offset)
+                partial.truncate()  # drop bytes past the offset the server acknowledged
+                while written < length:
+                    chunk = stream.read(min(READ_SIZE, length - written))
+                    if not chunk:
+                        break
+                    if offset == 0 and written == 0:
+                        missing = min(file_service.SIGNATURE_BYTES, length) - len(chunk)
+                        head = chunk + (stream.read(missing) if missing > 0 else b'')
+                        if not file_service.matches_signature(upload.original_name, head):
+                            raise UploadError("File content does not match its type", 415)
+                        chunk = head
+                    partial.write(chunk)
+                    digest.update(chunk)
+                    written += len(chunk)
+        finally:
+            # Keep whatever arrived, even if the client went away mid-chunk
+            UploadService._advance(upload, offset, written, digest, writer)
+        return upload.received
+
+    @staticmethod
+    def _claim(upload, offset, writer):
+        """Take the upload's write lease at offset, or UploadError 409 if another request holds it"""
+        now = datetime.utcnow()
+        try:
+            result = db.session.execute(
+                update(UploadSession)
+                .where(UploadSession.id == upload.id, UploadSession.received == offset,
+                       or_(UploadSession.locked_by.is_(None), UploadSession.lease_expires_at < now))
+                .values(locked_by=writer,
+                        lease_expires_at=now + timedelta(seconds=app.config['UPLOAD_WRITE_LEASE']))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error claiming upload: {str(e)}")
+        if result.rowcount != 1:
+            db.session.refresh(upload)
+            if upload.received != offset:
+                raise UploadError(f"Expected offset {upload.received}", 409)
+            raise UploadError("Another chunk is being written to this upload", 409)
+
+    @staticmethod
+    def _advance(upload, offset, written, digest, writer):
+        """Record `written` more bytes (if any) and release the write lease"""
+        now = datetime.utcnow()
+        values = {'locked_by': None, 'lease_expires_at': None}
+        if written:
+            values.update(received=offset + written, last_modified=now,
+                          expires_at=now + timedelta(seconds=app.config['UPLOAD_SESSION_TTL']))
+        try:
+            result = db.session.execute(
+                update(UploadSession)
+                .where(UploadSession.id == upload.id, UploadSession.locked_by == writer)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error saving upload progress: {str(e)}")
+        db.session.refresh(upload)
+        if written and result.rowcount == 1:
+            _keep_hasher(upload.id, offset + written, digest)
+
+    @staticmethod
+    def complete(upload, uploaded_by=None):
+        """
+        Turn a fully received upload into a stored blob and Document and queue
+        its processing. Returns (document, job); job is None when the content
+        was already processed.
+        """
+        if upload.received != upload.size:
+            raise UploadError(f"Upload is incomplete: {upload.received} of {upload.size} bytes", 409)
+
+        path = get_file_service().partial_path(upload.id)
+        sha256 = _take_hasher(upload, path).hexdigest()
+        if upload.sha256 and upload.sha256 != sha256:
+            UploadService.abort(upload)
+            raise UploadError("Uploaded content does not match the declared sha256", 422)
+
+        _, ext = os.path.splitext(upload.original_name)
+        blob = BlobService.adopt(path, sha256, upload.size, ext)
+        db.session.delete(upload)
+        document = DocumentService.create_document(
+            blob, upload.original_name, upload.type,
+            mime_type=upload.mime_type,
+            tags=upload.tags,
+            uploaded_by=uploaded_by if uploaded_by is not None else upload.user_id,
+            module_id=upload.module_id
+        )
+        return document, DocumentService.queue_processing(document)
+
+    @staticmethod
+    def abort(upload):
+        """Discard a session and its partial file"""
+        path = get_file_service().partial_path(upload.id)
+        with _hashers_lock:
+            _hashers.pop(upload.id, None)
+        try:
+            db.session.delete(upload)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error aborting upload: {str(e)}")
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def purge_expired():
+        """Remove expired sessions and their partial files; returns how many"""
+        expired = UploadSession.query.filter(UploadSession.expires_at < datetime.utcnow()).all()
+        for upload in expired:
+            UploadService.abort(upload)
+        return len(expired)
@@ -1,5 +1,6 @@
 from app import db
 from app.models import Affirmation, Technology
+from app.services.rollup_service import TaskRollupService
 from sqlalchemy.exc import SQLAlchemyError
 
 class TechnologyService:
@@ -7,6 +8,10 @@ class TechnologyService:
     def get_all_technologies():
         return Technology.query.filter_by().order_by(Technology.id).all()
 
+    @staticmethod
+    def query_technologies():
+        return Technology.query
+
     @staticmethod
     def get_tech(id):
         return Technology.query.get_or_404(id)
@@ -43,6 +48,7 @@ class TechnologyService:
     def delete_tech(id):
         tech_to_delete = Technology.query.get_or_404(id)
         try:
+            TaskRollupService.drop_technology(id)
             db.session.delete(tech_to_delete)
             db.session.commit()
         except SQLAlchemyError as e:
@@ -59,6 +65,10 @@ class AffirmationService:
     def get_all_affirmations():
         return Affirmation.query.filter_by().order_by(Affirmation.id).all()
 
+    @staticmethod
+    def query_affirmations():
+        return Affirmation.query
+
     @staticmethod
     def add_affirmation(affirmation, daily_goals=None):
         new_affirmation = Affirmation(
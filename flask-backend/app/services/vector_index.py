@@ -0,0 +1,240 @@
+import heapq
+import json
+import math
+import os
+import threading
+from array import array
+from operator import mul
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+NO_OWNER = -1
+
+
+def pack_vector(vector):
+    """float32 bytes of a vector, as stored in embeddings.vector"""
+    return array('f', vector).tobytes()
+
+
+def unpack_vector(blob):
+    vector = array('f')
+    vector.frombytes(blob)
+    return vector
+
+
+def remove_files(folder, namespace):
+    """Delete the mapped files (and leftover temporaries) of the indexes in namespace"""
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(f"{namespace}-"):
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+
+def normalize(vector):
+    """The vector scaled to unit length (all zeros stays all zeros)"""
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+
+class VectorIndex:
+    """
+    In-memory copy of the embeddings table for one embedding model: a matrix
+    of unit vectors with, per row, the embedding id, entity kind code, owner
+    and shared flag used to filter results. Cosine similarity is then a dot
+    product with the (unit) query vector.
+
+    With NumPy the rows loaded by a full build are kept in a memory-mapped
+    float32 file under `folder`, written atomically, so other processes and
+    restarts map the same pages instead of re-reading every vector from the
+    database; rows added since sit in a small in-memory block until the next
+    compaction. Without NumPy vectors are kept as arrays and scored in Python,
+    which is fine for tests and small libraries. The file names start with
+    `namespace`, so indexes of different databases can share a folder.
+    """
+
+    def __init__(self, model, dimensions, folder=None, namespace=None):
+        self.model = model
+        self.dimensions = dimensions
+        self.folder = folder
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self._clear()
+        if folder and NUMPY_AVAILABLE:
+            self._load()
+
+    def _clear(self):
+        self.ids = []         # embedding id per row
+        self.kinds = []       # entity kind code per row
+        self.owners = []      # owner id per row (NO_OWNER when there is none)
+        self.shared = []      # is_shared per row
+        self.rows = {}        # embedding id -> row
+        self.deleted = set()  # rows whose embedding no longer exists
+        self.watermark = 0    # highest embedding id loaded
+        self.base = None      # NumPy: memory-mapped rows from the last full build
+        self.delta = []       # rows added since (NumPy), or every row (fallback)
+        self._arrays = None   # NumPy: cached (matrix, kinds, owners, shared, live)
+
+    def __len__(self):
+        return len(self.ids) - len(self.deleted)
+
+    # Persistence (NumPy only)
+
+    def _paths(self):
+        name = f"{self.model.replace('/', '_')}-{self.dimensions}"
+        if self.namespace:
+            name = f"{self.namespace}-{name}"
+        stem = os.path.join(self.folder, name)
+        return f"{stem}.f32", f"{stem}.json"
+
+    def _load(self):
+        vectors_path, meta_path = self._paths()
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['count'] == 0:
+                return
+            self.base = np.memmap(vectors_path, dtype=np.float32, mode='r',
+                                  shape=(meta['count'], self.dimensions))
+        except (OSError, ValueError, KeyError):
+            return
+        self.ids, self.kinds = meta['ids'], meta['kinds']
+        self.owners, self.shared = meta['owners'], meta['shared']
+        self.rows = {embedding_id: row for row, embedding_id in enumerate(self.ids)}
+        self.watermark = max(self.ids)
+
+    def _save(self, matrix):
+        os.makedirs(self.folder, exist_ok=True)
+        vectors_path, meta_path = self._paths()
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        matrix.astype(np.float32).tofile(vectors_path + suffix)
+        with open(meta_path + suffix, 'w') as f:
+            json.dump({'count': len(self.ids), 'ids': self.ids, 'kinds': self.kinds,
+                       'owners': self.owners, 'shared': self.shared}, f)
+        # Replacing (not rewriting) the files leaves other processes' mappings intact
+        os.replace(vectors_path + suffix, vectors_path)
+        os.replace(meta_path + suffix, meta_path)
+        self.base = np.memmap(vectors_path, dtype=np.float32, mode='r',
+                              shape=(len(self.ids), self.dimensions))
+        self.delta = []
+
+    # Updates
+
+    def add(self, embedding_id, kind, owner_id, is_shared, blob):
+        """Add the row of one embedding"""
+        self.rows[embedding_id] = len(self.ids)
+        self.ids.append(embedding_id)
+        self.kinds.append(kind)
+        self.owners.append(NO_OWNER if owner_id is None else owner_id)
+        self.shared.append(bool(is_shared))
+        self.delta.append(np.frombuffer(blob, dtype=np.float32) if NUMPY_AVAILABLE
+                          else unpack_vector(blob))
+        self.watermark = max(self.watermark, embedding_id)
+        self._arrays = None
+
+    def discard(self, live_ids):
+        """Drop rows whose embedding id is not in live_ids"""
+        gone = [row for embedding_id, row in self.rows.items() if embedding_id not in live_ids]
+        for row in gone:
+            del self.rows[self.ids[row]]
+            self.deleted.add(row)
+        if gone:
+            self._arrays = None
+
+    def needs_compaction(self):
+        """Many deleted rows, or (NumPy) many rows outside the mapped file"""
+        limit = max(1000, len(self.ids) // 4)
+        return len(self.deleted) > limit or (NUMPY_AVAILABLE and len(self.delta) > limit)
+
+    def compact(self):
+        """Rebuild the rows without deleted ones; with NumPy, rewrite the mapped file"""
+        keep = [row for row in range(len(self.ids)) if row not in self.deleted]
+        if NUMPY_AVAILABLE:
+            matrix = self._matrix()[keep] if keep else np.zeros((0, self.dimensions), np.float32)
+        else:
+            self.delta = [self.delta[row] for row in keep]
+        self.ids = [self.ids[row] for row in keep]
+        self.kinds = [self.kinds[row] for row in keep]
+        self.owners = [self.owners[row] for row in keep]
+        self.shared = [self.shared[row] for row in keep]
+        self.rows = {embedding_id: row for row, embedding_id in enumerate(self.ids)}
+        self.deleted = set()
+        self._arrays = None
+        if NUMPY_AVAILABLE:
+            if self.folder:
+                self._save(matrix)
+            else:
+                self.base, self.delta = matrix, []
+
+    # Search
+
+    def _parts(self):
+        """The mapped rows and the in-memory rows, as matrices (no copy of the mapped file)"""
+        parts = [] if self.base is None else [self.base]
+        if self.delta:
+            parts.append(np.vstack(self.delta))
+        return parts
+
+    def _matrix(self):
+        parts = self._parts()
+        if not parts:
+            return np.zeros((0, self.dimensions), np.float32)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _numpy_arrays(self):
+        if self._arrays is None:
+            live = np.ones(len(self.ids), dtype=bool)
+            live[list(self.deleted)] = False
+            self._arrays = (self._parts(), np.array(self.kinds, dtype=np.int16),
+                            np.array(self.owners, dtype=np.int64),
+                            np.array(self.shared, dtype=bool), live)
+        return self._arrays
+
+    def search(self, query, k, kinds=None, user_id=None):
+        """
+        [(score, embedding id)] of the k rows most similar to the unit vector
+        query, best first. kinds limits the entity kind codes; with user_id
+        only that user's rows, shared rows and rows without an owner count.
+        """
+        if k <= 0 or not self.ids:
+            return []
+        if NUMPY_AVAILABLE:
+            parts, row_kinds, owners, shared, live = self._numpy_arrays()
+            allowed = live.copy()
+            if kinds is not None:
+                allowed &= np.isin(row_kinds, list(kinds))
+            if user_id is not None:
+                allowed &= (owners == user_id) | (owners == NO_OWNER) | shared
+            candidates = np.flatnonzero(allowed)
+            if not len(candidates):
+                return []
+            query = np.asarray(query, dtype=np.float32)
+            scores = np.concatenate([part @ query for part in parts])[candidates]
+            if len(candidates) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return [(float(scores[i]), self.ids[candidates[i]]) for i in top]
+
+        query = array('f', query)
+        scored = []
+        for row, vector in enumerate(self.delta):
+            if row in self.deleted:
+                continue
+            if kinds is not None and self.kinds[row] not in kinds:
+                continue
+            if user_id is not None and self.owners[row] not in (user_id, NO_OWNER) \
+                    and not self.shared[row]:
+                continue
+            scored.append((sum(map(mul, vector, query)), self.ids[row]))
+        return heapq.nlargest(k, scored)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Benchmark for map-reduce summarization of long content
+
+Summarizes a long synthetic text with the offline fake provider, then
+again after editing one paragraph, and reports wall time, provider calls
+and prompt tokens sent. The previous behaviour (one prompt holding the
+whole text, no cache reuse after an edit) is shown for comparison; a real
+provider would reject a prompt that large outright. The fake's replies do
+not depend on the chunk text, so after the edit the combines above the
+changed chunk hit the cache too; with a real provider they are recomputed.
+
+Usage:
+    python benchmarks/bench_ai_chunking.py --paragraphs 2000 --chunk-tokens 3000
+"""
+
+import argparse
+import os
+import time
+
+from common import app, reset_database, print_table
+
+from app.services import ai_service
+from app.services.ai_cache_service import AICacheService
+from app.services.ai_providers import FakeClient
+from app.services.chunk_service import estimate_tokens
+
+
+class CountingFake(FakeClient):
+    """Fake provider that records how many calls and prompt tokens it received"""
+
+    def __init__(self, token_delay):
+        super().__init__(token_delay, max_words=20)
+        self.calls = 0
+        self.prompt_tokens = 0
+
+    def stream(self, system_prompt, user_prompt, max_tokens, timeout=None):
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(system_prompt + user_prompt)
+        return super().stream(system_prompt, user_prompt, max_tokens, timeout)
+
+
+def make_text(count, edited=None):
+    paragraphs = [' '.join(f'p{i}w{j}' for j in range(60)) + '.' for i in range(count)]
+    if edited is not None:
+        paragraphs[edited] = 'A freshly edited sentence. ' + paragraphs[edited]
+    return '\n\n'.join(paragraphs)
+
+
+def run(service, text, chunked):
+    provider = service.client
+    calls, tokens = provider.calls, provider.prompt_tokens
+    start = time.perf_counter()
+    if chunked:
+        service.generate_summary(text)
+    else:
+        service._call_ai(*service._summary_prompts(text, 'note', 200), temperature=0.5,
+                         max_tokens=500, use_cache=False)
+    return (time.perf_counter() - start, provider.calls - calls, provider.prompt_tokens - tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--paragraphs', type=int, default=2000)
+    parser.add_argument('--chunk-tokens', type=int, default=3000)
+    parser.add_argument('--token-delay', type=float, default=0.005)
+    args = parser.parse_args()
+
+    os.environ['AI_PROVIDER'] = 'fake'
+    service = ai_service.AIService()
+    service.client = CountingFake(args.token_delay)
+    app.config['AI_CHUNK_TOKENS'] = args.chunk_tokens
+
+    text, edited = make_text(args.paragraphs), make_text(args.paragraphs, args.paragraphs // 2)
+    rows = []
+    with app.app_context():
+        reset_database()
+        for label, content, chunked in [('single prompt', text, False),
+                                        ('single prompt, after edit', edited, False),
+                                        ('map-reduce', text, True),
+                                        ('map-reduce, after edit', edited, True)]:
+            seconds, calls, tokens = run(service, content, chunked)
+            rows.append((label, f'{seconds:.2f}', calls, tokens))
+        entries = AICacheService.stats()['entries']
+
+    print(f"{estimate_tokens(text)} estimated tokens, chunks of {args.chunk_tokens}\n")
+    print_table(['run', 'seconds', 'provider calls', 'prompt tokens'], rows)
+    print(f"\n{entries} cached responses")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark for saving generated flashcards
+
+Times saving a batch of generated flashcards into a module that already
+holds a growing number of cards: the previous way (one add per card, commit,
+then re-query every card of the module and user for the response) against
+save_flashcards (one INSERT ... RETURNING plus the index writes). Also
+counts the SQL statements each sends.
+
+Usage:
+    python benchmarks/bench_ai_persistence.py --existing 0 1000 10000 50000 --batch 20
+"""
+
+import argparse
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from common import app, db, best_of, reset_database, print_table, QueryCounter
+
+from app.models import Flashcard, Priority
+from app.services.ai_task_service import save_flashcards
+
+
+def legacy_save(cards, module_id, user_id, difficulty):
+    """The previous AIFlashcardsResource.post persistence, kept for comparison"""
+    for card_data in cards:
+        db.session.add(Flashcard(module_id=module_id, front=card_data.get('front', ''),
+                                 back=card_data.get('back', ''),
+                                 difficulty=card_data.get('difficulty', difficulty),
+                                 tags=card_data.get('tags', []), user_id=user_id,
+                                 date_created=datetime.utcnow()))
+    db.session.commit()
+    return [{'id': fc.id, 'front': fc.front, 'back': fc.back,
+             'difficulty': fc.difficulty.value if fc.difficulty else 'MEDIUM', 'tags': fc.tags}
+            for fc in Flashcard.query.filter_by(module_id=module_id, user_id=user_id).all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--existing', type=int, nargs='+', default=[0, 1000, 10000, 50000])
+    parser.add_argument('--batch', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cards = [{'front': f'Question {i}', 'back': f'Answer {i}', 'difficulty': 'MEDIUM',
+              'tags': ['bench']} for i in range(args.batch)]
+    rows = []
+    with app.app_context():
+        reset_database()
+        module_id, user_id, existing = 1, 1, 0
+
+        for target in sorted(args.existing):
+            if target > existing:
+                db.session.execute(insert(Flashcard), [
+                    {'module_id': module_id, 'front': f'Old {i}', 'back': 'Old', 'tags': [],
+                     'difficulty': Priority.MEDIUM, 'user_id': user_id}
+                    for i in range(existing, target)])
+                db.session.commit()
+                existing = target
+
+            with QueryCounter(db.engine) as before_queries:
+                legacy_save(cards, module_id, user_id, 'MEDIUM')
+            before, _ = best_of(lambda: legacy_save(cards, module_id, user_id, 'MEDIUM'), args.repeat)
+            data = {'module_id': module_id, 'user_id': user_id}
+            with QueryCounter(db.engine) as after_queries:
+                save_flashcards(cards, data)
+            after, _ = best_of(lambda: save_flashcards(cards, data), args.repeat)
+            rows.append((target, f'{before * 1000:.1f}', before_queries.count,
+                         f'{after * 1000:.1f}', after_queries.count))
+            # Keep the module at the intended size for the next row
+            existing = db.session.query(Flashcard).count()
+
+    print(f"Saving {args.batch} cards\n")
+    print_table(['existing cards', 'before ms', 'before queries', 'after ms', 'after queries'], rows)
+
+
+if __name__ == '__main__':
+    main()
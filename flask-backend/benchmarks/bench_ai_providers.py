@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark for provider outages with and without the circuit breaker
+
+Sends a burst of summarize requests from several threads to a fake provider
+that never answers within the request timeout, as during an outage, and
+reports how long the burst holds the threads and how many provider attempts
+it makes. Without a breaker every request spends its timeout on every retry;
+with it, once AI_BREAKER_THRESHOLD attempts have failed the rest are refused
+at once. A second table shows retries riding out a short burst of rate limits.
+
+Usage:
+    python benchmarks/bench_ai_providers.py --requests 40 --threads 4 --timeout 0.2
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import app, reset_database, print_table
+
+from app.services import ai_providers, ai_service
+from app.services.ai_providers import FakeClient, ProviderError
+
+
+class CountingClient(FakeClient):
+    """Fake client that counts attempts and can fail the first `rate_limited` with a 429"""
+
+    def __init__(self, token_delay, rate_limited=0):
+        super().__init__(token_delay, max_words=5)
+        self.attempts = 0
+        self.rate_limited = rate_limited
+
+    def stream(self, system_prompt, user_prompt, max_tokens, timeout=None):
+        self.attempts += 1
+        if self.attempts <= self.rate_limited:
+            error = Exception('rate limited')
+            error.status_code = 429
+            raise error
+        return super().stream(system_prompt, user_prompt, max_tokens, timeout)
+
+
+def burst(service, requests, threads):
+    def one(i):
+        start = time.perf_counter()
+        with app.app_context():
+            try:
+                service.generate_summary(f'Request {i} about photosynthesis', use_cache=False)
+                ok = True
+            except ProviderError:
+                ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    latencies = sorted(latency for _, latency in results)
+    return (sum(ok for ok, _ in results), wall, sum(latencies) / len(latencies),
+            latencies[int(len(latencies) * 0.95) - 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=0.2)
+    parser.add_argument('--retries', type=int, default=2)
+    args = parser.parse_args()
+
+    app.config.update(AI_CACHE_ENABLED=False, AI_REQUEST_TIMEOUT=args.timeout,
+                      AI_MAX_RETRIES=args.retries, AI_RETRY_BASE_DELAY=args.timeout / 4,
+                      AI_BREAKER_RESET=60)
+    service = ai_service.AIService.__new__(ai_service.AIService)
+    service.provider, service.model = 'fake', 'fake'
+
+    outage, recovery = [], []
+    with app.app_context():
+        reset_database()
+    for label, threshold in [('no breaker', 10 ** 9), ('breaker (threshold 5)', 5)]:
+        app.config['AI_BREAKER_THRESHOLD'] = threshold
+        ai_providers._breakers.clear()
+        service.client = CountingClient(token_delay=args.timeout * 10)
+        ok, wall, mean, p95 = burst(service, args.requests, args.threads)
+        outage.append((label, ok, service.client.attempts, f'{wall:.2f}',
+                       f'{mean * 1000:.0f}', f'{p95 * 1000:.0f}'))
+
+    for label, retries in [('no retries', 0), (f'{args.retries} retries', args.retries)]:
+        app.config.update(AI_MAX_RETRIES=retries, AI_BREAKER_THRESHOLD=10 ** 9)
+        ai_providers._breakers.clear()
+        service.client = CountingClient(token_delay=0, rate_limited=args.threads)
+        ok, wall, mean, p95 = burst(service, args.requests, args.threads)
+        recovery.append((label, ok, service.client.attempts, f'{wall:.2f}',
+                         f'{mean * 1000:.0f}', f'{p95 * 1000:.0f}'))
+
+    columns = ['', 'succeeded', 'provider attempts', 'wall s', 'mean ms', 'p95 ms']
+    print(f"{args.requests} requests on {args.threads} threads, provider down "
+          f"(timeout {args.timeout}s, {args.retries} retries)\n")
+    print_table(columns, outage)
+    print(f"\nFirst {args.threads} attempts rate limited\n")
+    print_table(columns, recovery)
+
+
+if __name__ == '__main__':
+    main()
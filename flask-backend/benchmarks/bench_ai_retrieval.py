@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Benchmark for flashcards generated from retrieved module material
+
+Fills a module with notes on several topics, then asks for flashcards on
+one topic two ways, with the offline fake provider:
+- the old way, sending every note's text as `content` (split into
+  AI_CHUNK_TOKENS chunks, one provider call each);
+- with module_id and topic, where the prompt holds only the most relevant
+  chunks within AI_RAG_MAX_TOKENS.
+Reports the request body size, provider calls, prompt tokens and wall time.
+
+Usage:
+    python benchmarks/bench_ai_retrieval.py --notes 50 200 --paragraphs 20
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from common import app, db, reset_database, print_table
+
+from app.models import Note
+from app.services import ai_service
+from app.services.ai_task_service import AITaskService
+from bench_ai_chunking import CountingFake
+
+TOPICS = {
+    'photosynthesis': "chlorophyll light glucose carbon oxygen leaf stomata",
+    'revolution': "bastille monarchy parliament estates guillotine republic",
+    'thermodynamics': "entropy heat engine temperature pressure energy",
+    'genetics': "gene allele chromosome mutation heredity protein",
+    'markets': "supply demand price equilibrium elasticity surplus",
+}
+
+
+def paragraph(rng, topic):
+    words = TOPICS[topic].split()
+    return ' '.join(rng.choice(words) for _ in range(70)) + '.'
+
+
+def run(service, data):
+    provider = service.client
+    calls, tokens = provider.calls, provider.prompt_tokens
+    start = time.perf_counter()
+    AITaskService.run('flashcards', dict(data, save_to_db=False, bypass_cache=True))
+    return (len(json.dumps(data)), provider.calls - calls, provider.prompt_tokens - tokens,
+            time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--notes', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--paragraphs', type=int, default=20)
+    parser.add_argument('--token-delay', type=float, default=0.0005)
+    args = parser.parse_args()
+
+    os.environ['AI_PROVIDER'] = 'fake'
+    service = ai_service.AIService()
+    service.client = CountingFake(args.token_delay)
+    ai_service._ai_service = service
+
+    rng = random.Random(3)
+    rows = []
+    with app.app_context():
+        for count in args.notes:
+            reset_database()
+            topics = list(TOPICS)
+            notes = [Note(name=f"{topics[i % len(topics)]} {i}", module_id=1, user_id=1,
+                          content=[paragraph(rng, topics[i % len(topics)])
+                                   for _ in range(args.paragraphs)])
+                     for i in range(count)]
+            db.session.add_all(notes)
+            db.session.commit()
+            content = '\n\n'.join('\n\n'.join(note.content) for note in notes)
+
+            full = run(service, {'content': content, 'num_cards': 10, 'user_id': 1})
+            # The first retrieval of a module also catches up its embeddings; time a warm one
+            run(service, {'module_id': 1, 'topic': 'photosynthesis', 'num_cards': 10,
+                          'user_id': 1})
+            retrieved = run(service, {'module_id': 1, 'topic': 'photosynthesis',
+                                      'num_cards': 10, 'user_id': 1})
+            for label, (size, calls, tokens, seconds) in [('full content', full),
+                                                          ('module + topic', retrieved)]:
+                rows.append((count, label, f'{size / 1024:.1f}', calls, tokens,
+                             f'{seconds:.2f}'))
+
+    print_table(['notes', 'request', 'body KiB', 'provider calls', 'prompt tokens', 'seconds'],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Benchmark for streamed AI summaries
+
+Measures time to first byte and to the full response for POST
+/api/ai/summarize, buffered (the previous behaviour) against "stream": true
+(Server-Sent Events), using the offline fake provider. Its per-token delay
+stands in for a real provider's generation speed, so the numbers show the
+shape of the improvement rather than any provider's latency.
+
+Usage:
+    python benchmarks/bench_ai_streaming.py --words 200 --token-delay 0.03
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import jwt
+
+from common import app, reset_database, print_table
+
+from app.services import ai_service
+
+
+def timed_request(client, headers, body):
+    """(seconds to first body chunk, seconds to the end of the body)"""
+    start = time.perf_counter()
+    response = client.post('/api/ai/summarize', headers=headers, json=body, buffered=False)
+    first = None
+    for _ in response.response:
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--words', type=int, default=200)
+    parser.add_argument('--token-delay', type=float, default=0.03)
+    args = parser.parse_args()
+
+    os.environ['AI_PROVIDER'] = 'fake'
+    os.environ['AI_FAKE_TOKEN_DELAY'] = str(args.token_delay)
+    service = ai_service.AIService()
+    service.client.max_words = args.words
+    ai_service._ai_service = service
+    app.config['AI_CACHE_ENABLED'] = False
+
+    with app.app_context():
+        reset_database()
+        token = jwt.encode({'user_id': 1, 'is_admin': True,
+                            'exp': datetime.utcnow() + timedelta(hours=1)},
+                           app.config['SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+    content = ' '.join(f'word{i}' for i in range(args.words))
+
+    rows = []
+    for label, body in [('buffered', {'content': content}),
+                        ('stream', {'content': content, 'stream': True})]:
+        first, total = timed_request(client, headers, body)
+        rows.append((label, f'{first * 1000:.0f}', f'{total * 1000:.0f}'))
+
+    print(f"{args.words} tokens at {args.token_delay * 1000:.0f} ms each\n")
+    print_table(['mode', 'first byte ms', 'complete ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
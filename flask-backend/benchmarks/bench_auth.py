@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Benchmark for per-request authentication overhead
+
+Times token_required around an empty view inside a request context, for a
+pool of distinct tokens used round-robin (as many clients would), with the
+verified-token cache off (every request decodes and checks the HS256
+signature) and on. The denylist is synced as configured, so the on figure
+includes its periodic refresh query.
+
+Usage:
+    python benchmarks/bench_auth.py --requests 20000 --tokens 1 100 5000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import jwt
+
+from common import app, reset_database, print_table
+
+from app.resources.auth_resource import token_required
+
+
+@token_required
+def view():
+    return None
+
+
+def run(tokens, requests):
+    contexts = [app.test_request_context(headers={'Authorization': f'Bearer {token}'})
+                for token in tokens]
+    start = time.perf_counter()
+    for i in range(requests):
+        with contexts[i % len(contexts)]:
+            view()
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--tokens', type=int, nargs='+', default=[1, 100, 5000])
+    args = parser.parse_args()
+
+    cache_size = app.config['AUTH_TOKEN_CACHE_SIZE']
+    rows = []
+    with app.app_context():
+        reset_database()
+        for count in args.tokens:
+            exp = datetime.utcnow() + timedelta(hours=1)
+            tokens = [jwt.encode({'user_id': i, 'is_admin': False, 'jti': f'bench-{i}',
+                                  'exp': exp}, app.config['SECRET_KEY'], algorithm='HS256')
+                      for i in range(count)]
+            app.config['AUTH_TOKEN_CACHE_SIZE'] = 0
+            uncached = run(tokens, args.requests)
+            app.config['AUTH_TOKEN_CACHE_SIZE'] = cache_size
+            cached = run(tokens, args.requests)
+            rows.append((count, f'{uncached * 1e6:.1f}', f'{cached * 1e6:.1f}',
+                         f'{uncached / cached:.1f}x'))
+
+    print_table(['tokens', 'no cache us/request', 'cache us/request', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark for TaskService.get_completion_stats
+
+Compares the previous N+1 implementation (one grouped query, then a
+Project/Technology lookup per row) with the single joined aggregate in
+StatsService. Reports query count and latency per task count.
+
+Usage:
+    python benchmarks/bench_completion_stats.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from common import app, db, QueryCounter, best_of, reset_database, print_table
+
+from sqlalchemy import func, insert
+from app.models import Task, Project, Technology, task_technologies
+from app.services.task_service import TaskService
+
+BATCH_SIZE = 50000
+
+
+def legacy_completion_stats(group_by="both"):
+    """The pre-StatsService implementation, kept here for comparison"""
+    query = (
+        db.session.query(
+            Task.project_id,
+            task_technologies.c.technology_id.label("tech_id"),
+            func.count(Task.id).label("total_tasks"),
+            func.sum(Task.is_completed.cast(db.Integer)).label("completed_tasks")
+        )
+        .join(task_technologies, task_technologies.c.task_id == Task.id)
+        .group_by(Task.project_id, task_technologies.c.technology_id)
+    )
+    stats = {}
+    for row in query.all():
+        project = Project.query.get(row.project_id) if row.project_id else None
+        tech = Technology.query.get(row.tech_id) if row.tech_id else None
+        project_name = project.name if project else "Unknown Project"
+        tech_name = tech.name if tech else "Unknown Technology"
+        key = f"{project_name} - {tech_name}"
+        if key not in stats:
+            stats[key] = {"total": 0, "completed": 0}
+        stats[key]["total"] += row.total_tasks
+        stats[key]["completed"] += row.completed_tasks or 0
+    return {
+        key: (value["completed"] / value["total"]) * 100 if value["total"] > 0 else 0
+        for key, value in stats.items()
+    }
+
+
+def seed(num_tasks, num_projects, num_technologies):
+    """Bulk insert projects, technologies and tasks (one technology per task)"""
+    reset_database()
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    db.session.execute(insert(Project), [
+        {'name': f'Project {i}', 'date_created': now} for i in range(num_projects)])
+    db.session.execute(insert(Technology), [
+        {'name': f'Tech {i}'} for i in range(num_technologies)])
+
+    for start in range(0, num_tasks, BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, num_tasks)
+        db.session.execute(insert(Task), [{
+            'id': i + 1,
+            'name': f'Task {i}',
+            'project_id': rng.randint(1, num_projects),
+            'is_completed': rng.random() < 0.4,
+            'date_created': now - timedelta(days=rng.randint(0, 365)),
+        } for i in range(start, stop)])
+        db.session.execute(insert(task_technologies), [{
+            'task_id': i + 1,
+            'technology_id': rng.randint(1, num_technologies),
+        } for i in range(start, stop)])
+    db.session.commit()
+
+
+def measure(fn, repeat):
+    db.session.expunge_all()
+    with QueryCounter(db.engine) as counter:
+        fn()
+    queries = counter.count
+
+    def run():
+        # Start from a cold identity map so the legacy lookups really hit the DB
+        db.session.expunge_all()
+        return fn()
+
+    seconds, result = best_of(run, repeat)
+    return queries, seconds, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--technologies', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    with app.app_context():
+        for size in args.sizes:
+            seed(size, args.projects, args.technologies)
+            legacy_q, legacy_s, legacy_result = measure(legacy_completion_stats, args.repeat)
+            new_q, new_s, new_result = measure(TaskService.get_completion_stats, args.repeat)
+            assert legacy_result == new_result, "implementations disagree"
+            rows.append((size, legacy_q, f'{legacy_s * 1000:.1f}', new_q, f'{new_s * 1000:.1f}',
+                         f'{legacy_s / new_s:.1f}x'))
+
+    print_table(['tasks', 'legacy queries', 'legacy ms', 'new queries', 'new ms', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
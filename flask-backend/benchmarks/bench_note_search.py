@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Benchmark for note search
+
+Compares the previous ilike scan over Note.name and Note.ai_summary with
+the FTS5 index in SearchService, which also covers content, items and tags.
+Reports latency and hit counts per query term.
+
+Usage:
+    python benchmarks/bench_note_search.py --notes 100000
+"""
+
+import argparse
+import random
+
+from common import app, db, best_of, reset_database, print_table
+
+from sqlalchemy import insert
+from app.models import Note
+from app.services.search_service import SearchService
+
+WORDS = ("algorithm array binary cache compiler database function graph hash heap "
+         "index kernel lambda matrix network object pointer queue recursion stack "
+         "thread tree vector photosynthesis mitochondria enzyme protein genome").split()
+
+BATCH_SIZE = 10000
+
+
+def vocabulary(rng, size=5000):
+    """Topic words plus filler pseudo-words, so each term is in only a few notes"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    filler = {''.join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(size)}
+    return WORDS + sorted(filler)
+
+
+def legacy_search_notes(query_string):
+    """The previous scan, kept here for comparison"""
+    return Note.query.filter(
+        db.or_(
+            Note.name.ilike(f'%{query_string}%'),
+            Note.ai_summary.ilike(f'%{query_string}%')
+        )
+    ).order_by(Note.last_modified.desc()).all()
+
+
+def seed(num_notes, rng):
+    reset_database()
+    vocab = vocabulary(rng)
+    batch = []
+    for i in range(num_notes):
+        batch.append({
+            'name': f'{rng.choice(vocab).title()} notes {i}',
+            'content': [' '.join(rng.choices(vocab, k=40)) for _ in range(3)],
+            'items': [' '.join(rng.choices(vocab, k=6)) for _ in range(2)],
+            'tags': rng.sample(vocab, 2),
+            'ai_summary': ' '.join(rng.choices(vocab, k=12)),
+        })
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(insert(Note), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Note), batch)
+    db.session.commit()
+    return SearchService.rebuild()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--notes', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    with app.app_context():
+        indexed = seed(args.notes, random.Random(11))
+        for term in ('recursion', 'photosynthesis enzyme', 'genom*'):
+            legacy_seconds, legacy = best_of(lambda: legacy_search_notes(term), args.repeat)
+            fts_seconds, hits = best_of(
+                lambda: SearchService.search_notes(term, limit=args.limit), args.repeat)
+            rows.append((term, len(legacy), f'{legacy_seconds * 1000:.1f}',
+                         len(hits), f'{fts_seconds * 1000:.1f}'))
+        print(f"{indexed} notes indexed\n")
+
+    print_table(['query', 'scan hits', 'scan ms', f'fts top {args.limit}', 'fts ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark for OCR of scanned images
+
+Times the OCR pipeline against scan size: preprocessing (draft decode,
+greyscale, downscale to OCR_MAX_MEGAPIXELS, Otsu binarization) and band
+tiling always; recognition the previous way (pytesseract on the decoded
+image as uploaded) against OCRService, and a cached lookup, when the
+tesseract binary is installed.
+
+Usage:
+    python benchmarks/bench_ocr.py --megapixels 2 8 24 --processes 4
+"""
+
+import argparse
+import os
+
+from PIL import Image, ImageDraw
+
+from common import app, BENCH_DIR, best_of, reset_database, print_table
+
+from app.services.ocr_service import (OCRService, band_boxes, ocr_available, preprocess,
+                                      recognize)
+
+
+def write_scan(path, megapixels):
+    """A 3:4 JPEG page of dark text lines on slightly noisy off-white paper"""
+    width = int((megapixels * 1e6 * 3 / 4) ** 0.5)
+    height = int(width * 4 / 3)
+    paper = Image.effect_noise((width, height), 12).point(lambda value: 200 + value // 5)
+    draw = ImageDraw.Draw(paper)
+    line = max(12, height // 80)
+    for top in range(line * 2, height - line * 2, line * 2):
+        draw.text((width // 12, top), "The quick brown fox jumps over the lazy dog " * 3,
+                  fill=30, font_size=line)
+    paper.convert('RGB').save(path, 'JPEG', quality=85)
+    return path
+
+
+def legacy_ocr(path):
+    """The previous FileService.extract_text_from_image, kept for comparison"""
+    import pytesseract
+    return pytesseract.image_to_string(Image.open(path))
+
+
+def prepare(path):
+    with Image.open(path) as image:
+        image = preprocess(image, app.config['OCR_MAX_MEGAPIXELS'], app.config['OCR_BINARIZE'])
+    return band_boxes(image, app.config['OCR_TILE_MEGAPIXELS'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[2, 8, 24])
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tesseract = ocr_available()
+    rows = []
+    with app.app_context():
+        reset_database()
+        for megapixels in args.megapixels:
+            path = write_scan(os.path.join(BENCH_DIR, f'scan_{megapixels:g}mp.jpg'), megapixels)
+            prepared, boxes = best_of(lambda: prepare(path), args.repeat)
+            row = [f'{megapixels:g}', f'{prepared * 1000:.0f}', len(boxes)]
+            if tesseract:
+                before, _ = best_of(lambda: legacy_ocr(path), 1)
+                after, _ = best_of(lambda: recognize(path, args.processes), 1)
+                OCRService.text_for(path)
+                cached, _ = best_of(lambda: OCRService.text_for(path), args.repeat)
+                row += [f'{before:.2f}', f'{after:.2f}', f'{cached * 1000:.1f}']
+            rows.append(row)
+
+    headers = ['MP', 'preprocess+tile ms', 'bands']
+    if tesseract:
+        headers += ['before s', 'OCRService s', 'cached ms']
+    print_table(headers, rows)
+    if not tesseract:
+        print("\ntesseract is not installed; recognition timings skipped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark for login throughput under the password hashing policy
+
+Registers a few users, then has many client threads log in at once through
+AuthService.authenticate_user for a fixed time, for each PBKDF2 iteration
+count and hashing pool size. Reports logins per second, per hashing core
+(the pool size, capped at the CPU count) and the mean login latency seen
+by the clients, which grows with the queue in front of the pool.
+
+Usage:
+    python benchmarks/bench_passwords.py --iterations 100000 260000 600000 --threads 1 2
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from common import app, db, reset_database, print_table
+
+from app.models import User
+from app.services.auth_service import AuthService
+
+
+def storm(clients, seconds, users):
+    """Log in from `clients` threads for `seconds`; (logins, mean latency)"""
+    done, latencies = [0], []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def client(n):
+        with app.app_context():
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                auth, error = AuthService.authenticate_user(f'user{n % users}', 'Secret@123')
+                assert error is None, error
+                with lock:
+                    done[0] += 1
+                    latencies.append(time.perf_counter() - start)
+            db.session.remove()
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return done[0], sum(latencies) / max(1, len(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, nargs='+', default=[100000, 260000, 600000])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--users', type=int, default=8)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    rows = []
+    for threads in args.threads:
+        app.config['PASSWORD_HASH_THREADS'] = threads
+        for iterations in args.iterations:
+            app.config['PASSWORD_HASH_ITERATIONS'] = iterations
+            with app.app_context():
+                reset_database()
+                for n in range(args.users):
+                    user = User(username=f'user{n}', email=f'user{n}@example.com')
+                    user.set_password('Secret@123')
+                    db.session.add(user)
+                db.session.commit()
+            logins, latency = storm(args.clients, args.seconds, args.users)
+            rate = logins / args.seconds
+            rows.append((iterations, threads, f'{rate:.1f}', f'{rate / min(threads, cpus):.1f}',
+                         f'{latency * 1000:.0f}'))
+
+    print(f"{cpus} CPUs, {args.clients} concurrent clients\n")
+    print_table(['iterations', 'pool threads', 'logins/s', 'logins/s/core', 'mean latency ms'],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
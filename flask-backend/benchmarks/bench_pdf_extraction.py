@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Benchmark for PDF text extraction throughput by page count and worker count
+
+Generates text PDFs and times DocumentService.extract_pdf_pages, which
+spreads page ranges over a process pool and writes each batch to
+document_pages as it finishes. The first row of each page count is the
+previous approach (one sequential pass joining every page in memory).
+"first batch" is how long until the first pages are visible to clients.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py --pages 100 500 1000 --workers 1 2 4
+"""
+
+import argparse
+import os
+import time
+
+from common import app, db, BENCH_DIR, best_of, reset_database, print_table, write_text_pdf
+
+from PyPDF2 import PdfReader
+from app.models import ContentType, Document, DocumentPage
+from app.services.document_service import DocumentService
+
+
+def legacy_extract(path):
+    """The previous sequential extract_text_from_pdf loop, kept for comparison"""
+    with open(path, 'rb') as file:
+        pdf_reader = PdfReader(file)
+        return "\n\n".join(text for page in pdf_reader.pages if (text := page.extract_text()))
+
+
+def timed_extract(document, first_batch):
+    """Run extract_pdf_pages, noting when the first page rows were committed"""
+    start = time.perf_counter()
+    first_batch.clear()
+
+    def note_first(session):
+        if not first_batch:
+            first_batch.append(time.perf_counter() - start)
+
+    from sqlalchemy import event
+    event.listen(db.session, 'after_commit', note_first)
+    try:
+        return DocumentService.extract_pdf_pages(document)
+    finally:
+        event.remove(db.session, 'after_commit', note_first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--pages-per-task', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    rows = []
+    with app.app_context():
+        reset_database()
+        app.config['PDF_PAGES_PER_TASK'] = args.pages_per_task
+        app.config['PDF_PARALLEL_MIN_PAGES'] = 0
+        for pages in args.pages:
+            path = write_text_pdf(os.path.join(BENCH_DIR, f'book_{pages}.pdf'), pages)
+            document = Document(name=f'book_{pages}.pdf', type=ContentType.PDF, file_url=path)
+            db.session.add(document)
+            db.session.commit()
+
+            seconds, _ = best_of(lambda: legacy_extract(path), args.repeat)
+            rows.append((pages, 'sequential (before)', f'{seconds:.2f}', f'{pages / seconds:.0f}',
+                         f'{seconds:.2f}'))
+            for workers in args.workers:
+                app.config['PDF_EXTRACT_PROCESSES'] = workers
+                first_batch = []
+                seconds, _ = best_of(lambda: timed_extract(document, first_batch), args.repeat)
+                stored = DocumentPage.query.filter_by(document_id=document.id).count()
+                assert stored == pages, (stored, pages)
+                rows.append((pages, f'{workers} worker(s)', f'{seconds:.2f}',
+                             f'{pages / seconds:.0f}', f'{first_batch[0]:.2f}'))
+
+    print_table(['pages', 'extractor', 'seconds', 'pages/s', 'first batch s'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Benchmark for semantic search over growing libraries
+
+Embeds a growing number of notes through the flush hook, then measures:
+- a query that reloads every vector from the embeddings table (what a
+  search without the in-process index would do);
+- a query on the index once it is warm;
+- a query right after one note was edited, which catches the index up by id.
+Without NumPy, vectors are scored in pure Python; with it, the index is a
+memory-mapped matrix and scoring is one matrix-vector product.
+
+Usage:
+    python benchmarks/bench_semantic_search.py --notes 1000 5000 20000
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import select
+
+from common import app, db, best_of, reset_database, print_table
+
+from app.models import Embedding, Note
+from app.services.embedding_service import EmbeddingService, get_embedder
+from app.services.vector_index import NUMPY_AVAILABLE, VectorIndex
+
+WORDS = ("cell energy light plant water carbon oxygen glucose membrane protein gene enzyme "
+         "reaction molecule atom force motion mass velocity market price demand supply war "
+         "treaty empire revolution king parliament vote law court").split()
+
+
+def note_text(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(80))
+
+
+def reload_and_search(query, embedder):
+    """Build a fresh index from the table for every query"""
+    index = VectorIndex(embedder.name, embedder.dimensions)
+    with index.lock:
+        EmbeddingService.refresh(index)
+        return index.search(embedder.embed([query])[0], 10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--notes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    query = "how do plants turn light and water into glucose"
+    rows = []
+    with app.app_context():
+        reset_database()
+        embedder = get_embedder()
+        existing = 0
+        for target in sorted(args.notes):
+            start = time.perf_counter()
+            for offset in range(existing, target, 500):
+                db.session.add_all([Note(name=f"Note {i}", content=[note_text(rng)], user_id=1)
+                                    for i in range(offset, min(offset + 500, target))])
+                db.session.commit()
+            per_note = (time.perf_counter() - start) / max(1, target - existing)
+            existing = target
+            chunks = db.session.scalar(select(db.func.count()).select_from(Embedding))
+
+            reload, _ = best_of(lambda: reload_and_search(query, embedder), args.repeat)
+            EmbeddingService.search(query, user_id=1)  # warm the index
+            warm, _ = best_of(lambda: EmbeddingService.search(query, user_id=1), args.repeat)
+
+            def edit_and_search():
+                note = db.session.get(Note, rng.randint(1, target))
+                note.content = [note_text(rng)]
+                db.session.commit()
+                EmbeddingService.search(query, user_id=1)
+
+            edited, _ = best_of(edit_and_search, args.repeat)
+            rows.append((target, chunks, f'{per_note * 1000:.2f}', f'{reload * 1000:.0f}',
+                         f'{warm * 1000:.0f}', f'{edited * 1000:.0f}'))
+
+    print(f"{embedder.name}, NumPy {'on' if NUMPY_AVAILABLE else 'off'}\n")
+    print_table(['notes', 'chunks', 'embed ms/note', 'reload+search ms', 'warm search ms',
+                 'edit+search ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
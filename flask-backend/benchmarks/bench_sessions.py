@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark for renewing access tokens with refresh tokens instead of logging in
+
+Times, per call, a password login (AuthService.authenticate_user, one
+PBKDF2 check at the configured cost) against a renewal
+(SessionService.refresh, one indexed UPDATE ... RETURNING and a JWT) with
+a growing number of open sessions, then the batched purge of as many
+expired sessions.
+
+Usage:
+    python benchmarks/bench_sessions.py --sessions 1000 100000 --renewals 2000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from common import app, db, reset_database, print_table
+
+from app.models import AuthSession, User
+from app.services.auth_service import AuthService
+from app.services.session_service import SessionService
+
+
+def per_call(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--renewals', type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = []
+    with app.app_context():
+        for count in args.sessions:
+            reset_database()
+            user = User(username='bench', email='bench@example.com')
+            user.set_password('Bench@123')
+            db.session.add(user)
+            db.session.commit()
+            past = datetime.utcnow() - timedelta(days=1)
+            future = datetime.utcnow() + timedelta(days=30)
+            for start in range(0, count, 10000):
+                db.session.execute(insert(AuthSession), [
+                    {'user_id': user.id, 'refresh_hash': f'{i:064x}',
+                     'expires_at': past if i % 2 else future}
+                    for i in range(start, min(start + 10000, count))])
+            db.session.commit()
+
+            login = per_call(lambda: AuthService.authenticate_user('bench', 'Bench@123'),
+                             args.logins)
+            refresh_token = [AuthService.authenticate_user('bench', 'Bench@123')[0]['refresh_token']]
+
+            def renew():
+                refresh_token[0] = SessionService.refresh(refresh_token[0])['refresh_token']
+
+            renewal = per_call(renew, args.renewals)
+            start = time.perf_counter()
+            purged = SessionService.purge_expired()
+            purge = time.perf_counter() - start
+            rows.append((count, f'{login * 1000:.1f}', f'{renewal * 1e6:.0f}',
+                         f'{login / renewal:.0f}x', purged, f'{purge * 1000:.0f}'))
+
+    print(f"PBKDF2 {app.config['PASSWORD_HASH_ALGORITHM']}, "
+          f"{app.config['PASSWORD_HASH_ITERATIONS']} iterations\n")
+    print_table(['sessions', 'login ms', 'refresh us', 'speedup', 'expired purged', 'purge ms'],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Benchmark for tag filters and tag counts
+
+Compares the previous per-tag JSON `contains` filters on Note.tags (string
+matching over every row on SQLite) with the entity_tags index, and a tag
+cloud counted in Python from the JSON columns with the grouped query in
+TagService. Filters are timed with count() so ORM loading does not dominate;
+the "expected" column is computed in Python and shows that the JSON filter
+only matches notes whose whole tag list serialises to the searched value.
+
+Usage:
+    python benchmarks/bench_tag_filters.py --notes 100000 --tags 500
+"""
+
+import argparse
+import random
+from collections import Counter
+
+from common import app, db, best_of, reset_database, print_table
+
+from sqlalchemy import insert
+from app.models import Note
+from app.services.tag_service import TagService
+
+BATCH_SIZE = 10000
+
+
+def legacy_filter(tags):
+    """The previous JSON contains filter, kept here for comparison"""
+    query = Note.query
+    for tag in tags:
+        query = query.filter(Note.tags.contains([tag]))
+    return query.count()
+
+
+def expected_count(all_tags, tags, mode):
+    match = all if mode == 'all' else any
+    return sum(1 for note_tags in all_tags if match(tag in note_tags for tag in tags))
+
+
+def legacy_tag_counts(limit):
+    counts = Counter(tag for (tags,) in db.session.query(Note.tags) for tag in tags or [])
+    return counts.most_common(limit)
+
+
+def seed(num_notes, num_tags, rng):
+    reset_database()
+    # Skewed popularity, like real tag usage
+    vocabulary = [f'tag{i}' for i in range(num_tags)]
+    weights = [1 / (i + 1) for i in range(num_tags)]
+    batch = []
+    for i in range(num_notes):
+        batch.append({'name': f'Note {i}',
+                      'tags': sorted(set(rng.choices(vocabulary, weights, k=rng.randint(1, 5))))})
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(insert(Note), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Note), batch)
+    db.session.commit()
+    return TagService.rebuild()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--notes', type=int, default=100000)
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    with app.app_context():
+        tag_rows = seed(args.notes, args.tags, random.Random(5))
+        all_tags = [set(tags or []) for (tags,) in db.session.query(Note.tags)]
+        cases = [(['tag3'], 'all'), (['tag40'], 'all'), (['tag0', 'tag1'], 'all'),
+                 (['tag7', 'tag90', 'tag200'], 'any')]
+        for tags, mode in cases:
+            if mode == 'all':
+                legacy_seconds, legacy = best_of(lambda: legacy_filter(tags), args.repeat)
+            else:
+                legacy_seconds, legacy = None, None
+            seconds, count = best_of(
+                lambda: TagService.filter_by_tags(Note.query, 'note', Note.id, tags, mode).count(),
+                args.repeat)
+            rows.append((f"{mode}: {' '.join(tags)}", expected_count(all_tags, tags, mode),
+                         '-' if legacy is None else legacy,
+                         '-' if legacy_seconds is None else f'{legacy_seconds * 1000:.1f}',
+                         count, f'{seconds * 1000:.1f}'))
+
+        legacy_seconds, _ = best_of(lambda: legacy_tag_counts(50), args.repeat)
+        seconds, _ = best_of(lambda: TagService.tag_counts('note', limit=50), args.repeat)
+        rows.append(('tag cloud top 50', '', '', f'{legacy_seconds * 1000:.1f}', '',
+                     f'{seconds * 1000:.1f}'))
+        print(f"{args.notes} notes, {tag_rows} entity_tags rows\n")
+
+    print_table(['filter', 'expected', 'json hits', 'json ms', 'index hits', 'index ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Benchmark for the task prerequisite graph
+
+Builds a random DAG (default 20k tasks, 50k edges) in one project and
+compares the previous recursive Task.get_prerequisites, which issues a
+query per visited node, with the bulk-loaded PrerequisiteGraph and the
+single WITH RECURSIVE query used when TASK_GRAPH_TRAVERSAL is 'cte'.
+
+Usage:
+    python benchmarks/bench_task_graph.py --tasks 20000 --edges 50000
+"""
+
+import argparse
+import random
+
+from common import app, db, QueryCounter, best_of, reset_database, print_table
+
+from sqlalchemy import insert
+from app.models import Task, Project, task_prerequisites
+from app.services.task_graph_service import PrerequisiteGraph, TaskGraphService
+
+
+def legacy_get_prerequisites(task, max_depth=5, current_depth=0):
+    """The previous recursive implementation, kept here for comparison"""
+    if current_depth >= max_depth:
+        return []
+    result = list(task.prerequisites)
+    for prereq in task.prerequisites:
+        result.extend(legacy_get_prerequisites(prereq, max_depth, current_depth + 1))
+    return result
+
+
+def seed(num_tasks, num_edges, rng):
+    reset_database()
+    db.session.execute(insert(Project), [{'name': 'Benchmark'}])
+    db.session.execute(insert(Task), [{
+        'id': i + 1, 'name': f'Task {i}', 'project_id': 1,
+        'estimated_duration': rng.randint(1, 8)
+    } for i in range(num_tasks)])
+
+    # Edges always point to a lower id, so the graph is acyclic
+    edges = set()
+    while len(edges) < num_edges:
+        task_id = rng.randint(2, num_tasks)
+        edges.add((task_id, rng.randint(1, task_id - 1)))
+    db.session.execute(insert(task_prerequisites),
+                       [{'task_id': t, 'prerequisite_id': p} for t, p in edges])
+    db.session.commit()
+
+
+def run(label, fn, rows, repeat):
+    with QueryCounter(db.engine) as counter:
+        result = fn()
+    seconds, _ = best_of(fn, repeat)
+    rows.append((label, counter.count, f'{seconds * 1000:.1f}'))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--edges', type=int, default=50000)
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    rows = []
+    with app.app_context():
+        seed(args.tasks, args.edges, rng)
+        sample = [Task.query.get(rng.randint(args.tasks // 2, args.tasks))
+                  for _ in range(args.samples)]
+        # Candidate dependent for the cycle checks: an early task with no prerequisites
+        target = Task.query.get(1)
+
+        legacy = run(f'legacy get_prerequisites x{args.samples}',
+                     lambda: [legacy_get_prerequisites(t, args.depth) for t in sample],
+                     rows, 1)
+        unique = run(f'iterative get_prerequisites x{args.samples}',
+                     lambda: [t.get_prerequisites(args.depth) for t in sample],
+                     rows, args.repeat)
+        cte = run(f'cte get_prerequisites x{args.samples}',
+                  lambda: [t.get_prerequisites(args.depth, use_cte=True) for t in sample],
+                  rows, args.repeat)
+        run(f'cte get_dependents x{args.samples}',
+            lambda: [t.get_dependents(args.depth) for t in sample], rows, args.repeat)
+        run('cte blocked tasks', lambda: TaskGraphService.get_blocked_tasks(1), rows, args.repeat)
+
+        graph = run('PrerequisiteGraph.load', lambda: PrerequisiteGraph.load(1), rows, args.repeat)
+        run(f'graph.ancestors x{args.samples}',
+            lambda: [graph.ancestors(t.id, args.depth) for t in sample], rows, args.repeat)
+        # Adding each sampled task as a prerequisite of `target`
+        run(f'legacy cycle check x{args.samples}',
+            lambda: [target in legacy_get_prerequisites(t, args.depth) for t in sample],
+            rows, 1)
+        run(f'graph.would_create_cycle x{args.samples}',
+            lambda: [graph.would_create_cycle(target.id, t.id) for t in sample], rows, args.repeat)
+        run('graph.find_cycle', graph.find_cycle, rows, args.repeat)
+        run('graph.topological_order', graph.topological_order, rows, args.repeat)
+        run('graph.critical_path', graph.critical_path, rows, args.repeat)
+        run('graph.transitive_closure', graph.transitive_closure, rows, 1)
+
+        duplicates = sum(len(a) - len(set(a)) for a in legacy)
+        print(f"{args.tasks} tasks, {args.edges} edges; legacy results contained "
+              f"{duplicates} duplicate entries, iterative results "
+              f"{sum(len(a) - len(set(a)) for a in unique)}; cte matches iterative: "
+              f"{all(set(a) == set(b) for a, b in zip(cte, unique))}\n")
+
+    print_table(['operation', 'queries', 'ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
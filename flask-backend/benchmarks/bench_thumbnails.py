@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark for thumbnail rendering and serving
+
+Times rendering a thumbnail from a large JPEG the previous way
+(Image.thumbnail, which Pillow already lets draft-decode at twice the target
+size) against ThumbnailService, which drafts at the target size, and then
+the cost of serving an already cached derivative and of a 304 revalidation
+through the API. The source is noise, so entropy decoding (which no draft
+mode skips) dominates the small sizes; real photos decode faster.
+
+Usage:
+    python benchmarks/bench_thumbnails.py --width 4000 --height 3000
+"""
+
+import argparse
+import io
+import os
+from datetime import datetime, timedelta
+
+import jwt
+from PIL import Image
+
+from common import app, db, best_of, reset_database, print_table
+
+from app.services import thumbnail_service
+from app.services.thumbnail_service import ThumbnailService
+
+
+def legacy_thumbnail(path, pixels):
+    """The previous FileService.generate_thumbnail rendering, kept for comparison"""
+    image = Image.open(path)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGB')
+    image.thumbnail((pixels, pixels), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, 'JPEG')
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # A noisy photo-like image so JPEG decoding does real work
+    photo = Image.effect_noise((args.width, args.height), 64).convert('RGB')
+    data = io.BytesIO()
+    photo.save(data, 'JPEG', quality=90)
+    data = data.getvalue()
+
+    with app.app_context():
+        reset_database()
+        token = jwt.encode({'user_id': 1, 'is_admin': True,
+                            'exp': datetime.utcnow() + timedelta(hours=1)},
+                           app.config['SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+    response = client.post('/api/documents', headers=headers,
+                           data={'file': (io.BytesIO(data), 'photo.jpg')},
+                           content_type='multipart/form-data')
+    document_id = response.get_json()['id']
+    url = f'/api/documents/{document_id}/thumbnail'
+
+    rows = []
+    with app.app_context():
+        from app.models import Document
+        document = db.session.get(Document, document_id)
+        for size_name, pixels in app.config['THUMBNAIL_SIZES'].items():
+            before, _ = best_of(lambda: legacy_thumbnail(document.file_url, pixels), args.repeat)
+
+            def cold():
+                path = ThumbnailService.derivative_path(ThumbnailService.content_key(document), size_name)
+                if os.path.exists(path):
+                    os.remove(path)
+                thumbnail_service._cache['bytes'] = None
+                return ThumbnailService.get(document, size_name)
+
+            after, _ = best_of(cold, args.repeat)
+            rows.append((size_name, f'{before * 1000:.1f}', f'{after * 1000:.1f}'))
+
+    cached, response = best_of(lambda: client.get(url, headers=headers), args.repeat)
+    etag = response.headers['ETag']
+    revalidate, response = best_of(
+        lambda: client.get(url, headers={**headers, 'If-None-Match': etag}), args.repeat)
+    assert response.status_code == 304
+
+    print(f"{args.width}x{args.height} JPEG ({len(data) / 1024 / 1024:.1f} MiB)\n")
+    print_table(['size', 'before ms', 'ThumbnailService ms'], rows)
+    print(f"\ncached GET: {cached * 1000:.1f} ms, 304 revalidation: {revalidate * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
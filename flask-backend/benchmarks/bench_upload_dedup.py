@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Benchmark for repeated uploads of the same document
+
+Uploads one generated PDF many times. "before" stores every copy under a
+new timestamped name with FileService.save_file and processes each one;
+"after" goes through POST /api/documents, which stores one blob per
+SHA-256 and copies the first copy's processing results to the duplicates
+(the first upload is processed by a worker). Reports total time, time per
+repeated upload and bytes written to the upload folder.
+
+Usage:
+    python benchmarks/bench_upload_dedup.py --uploads 50 --pages 200
+"""
+
+import argparse
+import io
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import jwt
+from werkzeug.datastructures import FileStorage
+
+from common import app, db, BENCH_DIR, reset_database, print_table, write_text_pdf
+
+from app.services import file_service
+from app.services.job_service import JobService
+
+
+def folder_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def fresh_file_service(name):
+    folder = os.path.join(BENCH_DIR, name)
+    shutil.rmtree(folder, ignore_errors=True)
+    file_service._file_service = file_service.FileService(folder)
+    return file_service._file_service
+
+
+def run_before(data, uploads):
+    service = fresh_file_service('uploads_before')
+    start = time.perf_counter()
+    for i in range(uploads):
+        upload = FileStorage(io.BytesIO(data), filename=f'lecture{i}.pdf')
+        _, path, _ = service.save_file(upload)
+        service.process_document(path, 'PDF')
+    return time.perf_counter() - start, folder_bytes(service.upload_folder)
+
+
+def run_after(data, uploads, headers):
+    service = fresh_file_service('uploads_after')
+    client = app.test_client()
+    start = time.perf_counter()
+    for i in range(uploads):
+        response = client.post('/api/documents', headers=headers,
+                               data={'file': (io.BytesIO(data), 'lecture.pdf')},
+                               content_type='multipart/form-data')
+        assert response.status_code in (201, 202), response.data
+        if i == 0:
+            with app.app_context():
+                JobService.work('bench', max_jobs=1)
+    return time.perf_counter() - start, folder_bytes(service.upload_folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args()
+
+    path = write_text_pdf(os.path.join(BENCH_DIR, 'lecture.pdf'), args.pages)
+    with open(path, 'rb') as pdf:
+        data = pdf.read()
+
+    with app.app_context():
+        reset_database()
+        token = jwt.encode({'user_id': 1, 'is_admin': True,
+                            'exp': datetime.utcnow() + timedelta(hours=1)},
+                           app.config['SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    rows = []
+    for label, run in (('before (copy + parse each)', lambda: run_before(data, args.uploads)),
+                       ('after (blob + reuse)', lambda: run_after(data, args.uploads, headers))):
+        seconds, stored = run()
+        rows.append((label, f'{seconds:.2f}', f'{seconds / args.uploads * 1000:.1f}',
+                     f'{stored / 1024 / 1024:.1f}'))
+
+    print(f"{args.uploads} uploads of a {args.pages}-page PDF ({len(data) / 1024:.0f} KiB)\n")
+    print_table(['storage', 'total s', 'ms / upload', 'MiB stored'], rows)
+
+
+if __name__ == '__main__':
+    main()
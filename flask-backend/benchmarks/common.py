@@ -0,0 +1,115 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Importing this module points the app at a throwaway SQLite database (unless
+DATABASE_URL is already set), so benchmarks never touch wibuddy.db.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Add the parent directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BENCH_DIR = tempfile.mkdtemp(prefix='wibuddy_bench_')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(BENCH_DIR, 'bench.db'))
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(BENCH_DIR, 'uploads'))
+
+from sqlalchemy import event
+from app import app, db
+
+
+class QueryCounter:
+    """Counts SQL statements sent to the engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_execute)
+
+
+@contextmanager
+def timed(results, key):
+    """Store the elapsed wall time of the block in results[key] (seconds)"""
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def best_of(fn, repeat=3):
+    """Run fn repeat times and return (best seconds, last result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def reset_database():
+    """Drop and recreate every table in the benchmark database"""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def write_text_pdf(path, pages, lines_per_page=40, words_per_line=10, seed=0):
+    """
+    Write a plain text PDF (Helvetica, one content stream per page) without
+    needing a PDF library. Returns path.
+    """
+    import random
+    rng = random.Random(seed)
+    words = ['alpha', 'binary', 'cache', 'delta', 'entropy', 'fourier', 'graph', 'hash',
+             'index', 'join', 'kernel', 'lambda', 'matrix', 'node', 'offset', 'parser']
+    offsets = []
+    with open(path, 'wb') as out:
+        def obj(number, body):
+            offsets.append((number, out.tell()))
+            out.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+        out.write(b'%PDF-1.4\n')
+        kids = ' '.join(f'{4 + 2 * i} 0 R' for i in range(pages)).encode()
+        obj(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        obj(2, b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % pages)
+        obj(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+        for i in range(pages):
+            lines = [f'Page {i + 1}'] + [' '.join(rng.choices(words, k=words_per_line))
+                                         for _ in range(lines_per_page)]
+            stream = ('BT /F1 10 Tf 14 TL 50 760 Td ' +
+                      ' '.join(f'({line}) Tj T*' for line in lines) + ' ET').encode()
+            obj(4 + 2 * i, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                           b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (5 + 2 * i))
+            obj(5 + 2 * i, b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        xref = out.tell()
+        out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(offsets) + 1))
+        for _, offset in sorted(offsets):
+            out.write(b'%010d 00000 n \n' % offset)
+        out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                  % (len(offsets) + 1, xref))
+    return path
+
+
+def print_table(headers, rows):
+    """Print rows as a simple aligned text table"""
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+              for i, h in enumerate(headers)]
+    line = '  '.join(str(h).ljust(w) for h, w in zip(headers, widths))
+    print(line)
+    print('-' * len(line))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)))
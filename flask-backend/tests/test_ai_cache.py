@@ -0,0 +1,131 @@
+import unittest
+import jwt
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app import app, db
+from app.config import Config
+from app.models import AIResponse, Note
+from app.services import ai_service
+from app.services.ai_cache_service import AICacheService
+
+
+class FakeOpenAI:
+    """Stands in for openai.OpenAI: answers every completion with a numbered reply"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=f"reply {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class AICacheTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        self._ai_service = ai_service._ai_service
+        self.provider = FakeOpenAI()
+        service = ai_service.AIService.__new__(ai_service.AIService)  # no real client or API key
+        service.provider, service.model, service.client = 'openai', 'test-model', self.provider
+        ai_service._ai_service = service
+
+        with app.app_context():
+            db.create_all()
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        app.config['AI_CACHE_TTL'] = Config.AI_CACHE_TTL
+        app.config['AI_CACHE_MAX_ENTRIES'] = Config.AI_CACHE_MAX_ENTRIES
+        ai_service._ai_service = self._ai_service
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _summarize(self, content, **options):
+        response = self.client.post('/api/ai/summarize', headers=self.headers,
+                                    json={'content': content, **options})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['summary']
+
+    def test_identical_requests_hit_the_cache(self):
+        self.assertEqual(self._summarize('Photosynthesis'), 'reply 1')
+        self.assertEqual(self._summarize('Photosynthesis'), 'reply 1')
+        self.assertEqual(self.provider.calls, 1)
+
+        # Anything that changes the prompt is a different entry
+        self.assertEqual(self._summarize('Photosynthesis', max_length=50), 'reply 2')
+        self.assertEqual(self._summarize('Respiration'), 'reply 3')
+
+        stats = self.client.get('/api/ai/cache', headers=self.headers).get_json()
+        self.assertEqual(stats['entries'], 3)
+        self.assertEqual(stats['stored_hits'], 1)
+
+    def test_bypass_refreshes_the_entry(self):
+        self._summarize('Photosynthesis')
+        self.assertEqual(self._summarize('Photosynthesis', bypass_cache=True), 'reply 2')
+        self.assertEqual(self._summarize('Photosynthesis'), 'reply 2')
+        self.assertEqual(self.provider.calls, 2)
+
+    def test_expired_entries_are_refetched(self):
+        self._summarize('Photosynthesis')
+        with app.app_context():
+            entry = db.session.query(AIResponse).one()
+            entry.date_created = datetime.utcnow() - timedelta(seconds=Config.AI_CACHE_TTL + 1)
+            db.session.commit()
+        self.assertEqual(self._summarize('Photosynthesis'), 'reply 2')
+
+    def test_least_recently_used_are_evicted(self):
+        app.config['AI_CACHE_MAX_ENTRIES'] = 2
+        self._summarize('first')
+        self._summarize('second')
+        with app.app_context():
+            db.session.query(AIResponse).update({'last_used': datetime.utcnow() - timedelta(hours=1)})
+            db.session.commit()
+        self._summarize('first')  # hit, now the most recently used
+        self._summarize('third')
+
+        self.assertEqual(self._summarize('first'), 'reply 1')
+        self.assertEqual(self._summarize('second'), 'reply 4')
+        with app.app_context():
+            self.assertLessEqual(db.session.query(AIResponse).count(), 2)
+
+    def test_lookups_leave_the_callers_session_alone(self):
+        self._summarize('Photosynthesis')
+        with app.app_context():
+            fingerprint = db.session.query(AIResponse.fingerprint).scalar()
+            db.session.rollback()
+            db.session.add(Note(name="Unsaved", content=[]))
+            self.assertEqual(AICacheService.get(fingerprint), 'reply 1')
+            AICacheService.put('0' * 64, 'openai', 'test-model', 'stored')
+            db.session.rollback()
+            self.assertEqual(Note.query.count(), 0)
+            self.assertEqual(AICacheService.get('0' * 64), 'stored')
+
+    def test_clearing_needs_admin(self):
+        self._summarize('Photosynthesis')
+        with app.app_context():
+            token = jwt.encode(
+                {'user_id': 2, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        response = self.client.delete('/api/ai/cache', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete('/api/ai/cache', headers=self.headers)
+        self.assertEqual(response.get_json()['removed'], 1)
+        self.assertEqual(self._summarize('Photosynthesis'), 'reply 2')
+        with app.app_context():
+            self.assertEqual(AICacheService.stats()['entries'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
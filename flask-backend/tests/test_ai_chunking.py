@@ -0,0 +1,146 @@
+import unittest
+import json
+import re
+import threading
+import jwt
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app import app, db
+from app.config import Config
+from app.models import ContentType, Document, DocumentPage
+from app.services import ai_service
+from app.services.chunk_service import PAGE_BREAK, estimate_tokens, split_chunks
+
+
+def paragraphs(count, words=40, seed='p'):
+    return [' '.join(f'{seed}{i}w{j}' for j in range(words)) + '.' for i in range(count)]
+
+
+class ScriptedOpenAI:
+    """Stands in for openai.OpenAI: JSON cards for flashcard prompts, a short line otherwise"""
+
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        prompt = messages[-1]['content']
+        with self.lock:
+            self.prompts.append(prompt)
+        cards = re.match(r'Create (\d+) flashcards', prompt)
+        if cards:
+            content = json.dumps([{'front': f'Q{i}', 'back': 'A', 'tags': []}
+                                  for i in range(int(cards.group(1)))])
+        else:
+            content = f"summary of {len(prompt)} characters"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class ChunkingTestCase(unittest.TestCase):
+    def test_chunks_fit_and_keep_every_paragraph_in_order(self):
+        text = '\n\n'.join(paragraphs(60))
+        chunks = split_chunks(text, 300)
+        self.assertGreater(len(chunks), 5)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 300)
+        self.assertEqual('\n\n'.join(chunks), text)
+
+    def test_page_breaks_and_long_paragraphs(self):
+        pages = ['\n\n'.join(paragraphs(4, seed=f'page{n}')) for n in range(3)]
+        for chunk in split_chunks(PAGE_BREAK.join(pages), 150):
+            # Half-full chunks never run across a page
+            self.assertEqual(len({word[:5] for word in chunk.split()}), 1)
+
+        huge = ' '.join(paragraphs(1, words=2000))
+        chunks = split_chunks(huge, 100)
+        self.assertTrue(all(estimate_tokens(chunk) <= 100 for chunk in chunks))
+        self.assertEqual(' '.join(chunks).split(), huge.split())
+
+    def test_an_edit_only_changes_nearby_chunks(self):
+        original = paragraphs(200)
+        edited = list(original)
+        edited[50] = edited[50].replace('p50w3 ', 'a rather longer replacement phrase ')
+        before = split_chunks('\n\n'.join(original), 400)
+        after = split_chunks('\n\n'.join(edited), 400)
+        self.assertLessEqual(len(set(after) - set(before)), 2)
+
+
+class MapReduceTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config['AI_CHUNK_TOKENS'] = 400
+        self.client = app.test_client()
+
+        self._ai_service = ai_service._ai_service
+        self.provider = ScriptedOpenAI()
+        service = ai_service.AIService.__new__(ai_service.AIService)  # no real client or API key
+        service.provider, service.model, service.client = 'openai', 'test-model', self.provider
+        ai_service._ai_service = service
+
+        with app.app_context():
+            db.create_all()
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        app.config['AI_CHUNK_TOKENS'] = Config.AI_CHUNK_TOKENS
+        ai_service._ai_service = self._ai_service
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _post(self, endpoint, **body):
+        response = self.client.post(f'/api/ai/{endpoint}', headers=self.headers, json=body)
+        self.assertEqual(response.status_code, 200, response.get_json())
+        return response.get_json()
+
+    def test_long_content_is_summarized_map_reduce(self):
+        text = paragraphs(120)
+        self._post('summarize', content='\n\n'.join(text))
+        first = len(self.provider.prompts)
+        chunk_prompts = [p for p in self.provider.prompts if p.startswith('Summarize')]
+        self.assertGreater(len(chunk_prompts), 5)
+        self.assertTrue(all(estimate_tokens(p) < 600 for p in self.provider.prompts))
+
+        # Unchanged content: everything is cached
+        self._post('summarize', content='\n\n'.join(text))
+        self.assertEqual(len(self.provider.prompts), first)
+
+        # One edited paragraph: its chunk, the combines above it and the final call
+        text[60] = 'An edited paragraph. ' + text[60]
+        self._post('summarize', content='\n\n'.join(text))
+        self.assertLess(len(self.provider.prompts) - first, first / 2)
+
+    def test_flashcards_are_shared_across_chunks(self):
+        result = self._post('flashcards', content='\n\n'.join(paragraphs(60)),
+                            num_cards=7, save_to_db=False)
+        self.assertEqual(result['count'], 7)
+        asked = [int(re.match(r'Create (\d+)', p).group(1)) for p in self.provider.prompts]
+        self.assertGreater(len(asked), 1)
+        self.assertEqual(sum(asked), 7)
+
+    def test_summarize_a_document_by_id(self):
+        with app.app_context():
+            document = Document(name='book.pdf', type=ContentType.PDF, file_url='book.pdf')
+            db.session.add(document)
+            db.session.flush()
+            for number, page in enumerate(paragraphs(3), 1):
+                db.session.add(DocumentPage(document_id=document.id, page_number=number,
+                                            text=page, char_count=len(page)))
+            db.session.commit()
+            document_id = document.id
+
+        self._post('summarize', document_id=document_id)
+        self.assertIn('p2w39.', self.provider.prompts[-1])
+        response = self.client.post('/api/ai/summarize', headers=self.headers,
+                                    json={'document_id': 999})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
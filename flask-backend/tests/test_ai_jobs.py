@@ -0,0 +1,146 @@
+import unittest
+import threading
+import time
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.config import Config
+from app.models import Job, JobStatus
+from app.services import ai_service
+from app.services.ai_task_service import AI_QUEUE
+from tests.test_ai_cache import FakeOpenAI
+
+
+class GatedOpenAI(FakeOpenAI):
+    """Holds every completion until release is set, like a slow provider"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def create(self, **kwargs):
+        self.release.wait(10)
+        return super().create(**kwargs)
+
+
+class AIJobTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config['AI_CACHE_ENABLED'] = False
+        self.client = app.test_client()
+
+        self._ai_service = ai_service._ai_service
+        self.provider = GatedOpenAI()
+        service = ai_service.AIService.__new__(ai_service.AIService)  # no real client or API key
+        service.provider, service.model, service.client = 'openai', 'test-model', self.provider
+        ai_service._ai_service = service
+
+        with app.app_context():
+            db.create_all()
+        self.headers = self._headers(1)
+
+    def tearDown(self):
+        self.provider.release.set()
+        for name in ('AI_CACHE_ENABLED', 'AI_MAX_JOBS_PER_USER', 'AI_MAX_QUEUED_JOBS'):
+            app.config[name] = getattr(Config, name)
+        ai_service._ai_service = self._ai_service
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, user_id):
+        with app.app_context():
+            token = jwt.encode(
+                {'user_id': user_id, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        return {'Authorization': f'Bearer {token}'}
+
+    def _submit(self, headers=None, content='Photosynthesis'):
+        return self.client.post('/api/ai/summarize', headers=headers or self.headers,
+                                json={'content': content, 'async': True})
+
+    def _wait_for(self, job_id, status, headers=None, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.client.get(f'/api/jobs/{job_id}', headers=headers or self.headers).get_json()
+            if job['status'] == status:
+                return job
+            time.sleep(0.05)
+        self.fail(f"job {job_id} did not reach {status}")
+
+    def test_async_request_returns_job_to_poll(self):
+        response = self._submit()
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()['job']
+        self.assertEqual(job['queue'], AI_QUEUE)
+        self.assertEqual(job['user_id'], 1)
+        self.assertEqual(self.provider.calls, 0)
+
+        self.provider.release.set()
+        job = self._wait_for(job['id'], 'SUCCEEDED')
+        self.assertEqual(job['result'], {'summary': 'reply 1', 'word_count': 2})
+
+        # Other users cannot read it
+        response = self.client.get(f"/api/jobs/{job['id']}", headers=self._headers(2))
+        self.assertEqual(response.status_code, 404)
+
+    def test_synchronous_request_still_works(self):
+        self.provider.release.set()
+        response = self.client.post('/api/ai/summarize', headers=self.headers,
+                                    json={'content': 'Photosynthesis'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['summary'], 'reply 1')
+
+    def test_per_user_and_global_limits(self):
+        app.config['AI_MAX_JOBS_PER_USER'] = 2
+        app.config['AI_MAX_QUEUED_JOBS'] = 3
+        with app.app_context():
+            # Queued jobs nobody is running yet
+            for user_id in (1, 1, 2):
+                db.session.add(Job(kind='ai_summarize', queue=AI_QUEUE, user_id=user_id,
+                                   status=JobStatus.QUEUED, run_after=datetime.utcnow() + timedelta(hours=1)))
+            db.session.commit()
+
+        response = self._submit()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(self._submit(self._headers(2)).status_code, 429)  # server is full
+
+        app.config['AI_MAX_QUEUED_JOBS'] = 4
+        response = self._submit(self._headers(2))
+        self.assertEqual(response.status_code, 202)
+        self.provider.release.set()
+        self._wait_for(response.get_json()['job']['id'], 'SUCCEEDED', headers=self._headers(2))
+
+    def test_concurrent_submits_cannot_overshoot_the_cap(self):
+        app.config['AI_MAX_JOBS_PER_USER'] = 2
+        barrier = threading.Barrier(8)
+        statuses = []
+
+        def submit():
+            client = app.test_client()
+            barrier.wait()
+            statuses.append(client.post('/api/ai/summarize', headers=self.headers,
+                                        json={'content': 'Photosynthesis', 'async': True}).status_code)
+
+        threads = [threading.Thread(target=submit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [202, 202] + [429] * 6)
+        with app.app_context():
+            self.assertEqual(Job.query.filter_by(queue=AI_QUEUE, user_id=1).count(), 2)
+
+    def test_failed_job_records_error(self):
+        ai_service._ai_service.client = None
+        job = self._submit().get_json()['job']
+        job = self._wait_for(job['id'], 'FAILED')
+        self.assertIn('not configured', job['last_error'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import jwt
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import app, db
+from app.models import Flashcard, Priority, Question, QuestionType
+from app.services import ai_service
+from app.services.ai_task_service import save_flashcards, save_questions
+from app.services.search_service import SearchService
+from app.services.tag_service import TagService
+from tests.test_ai_chunking import ScriptedOpenAI
+
+
+def statements(fn):
+    """fn's result and the number of SQL statements it sent"""
+    sent = []
+    listener = lambda *args: sent.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        return fn(), len(sent)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+class AIPersistenceTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add(Flashcard(module_id=1, front='Old card', back='Old', user_id=1))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_saved_flashcards_are_returned_and_indexed(self):
+        cards = [
+            {'front': 'What is osmosis?', 'back': 'Diffusion of water', 'tags': ['biology']},
+            {'front': 'What is a cell?', 'back': 'Unit of life', 'difficulty': ' high ',
+             'tags': ['biology', 'cells']},
+            {'front': 'What is ATP?', 'back': 'Energy currency', 'difficulty': 'extreme'},
+            'not a card',
+        ]
+        with app.app_context():
+            saved, _ = statements(lambda: save_flashcards(cards, {'module_id': 1, 'user_id': 1},
+                                                          'low'))
+            self.assertEqual([card['front'] for card in saved],
+                             ['What is osmosis?', 'What is a cell?', 'What is ATP?'])
+            self.assertEqual([card['difficulty'] for card in saved], ['LOW', 'HIGH', 'LOW'])
+            ids = [card['id'] for card in saved]
+            self.assertEqual(ids, sorted(ids))
+            self.assertEqual(db.session.get(Flashcard, ids[1]).difficulty, Priority.HIGH)
+
+            hits = SearchService.search('osmosis', user_id=1)
+            self.assertEqual([(hit.entity_type, hit.entity_id) for hit in hits],
+                             [('flashcard', ids[0])])
+            self.assertEqual(TagService.tag_counts('flashcard', owner_id=1),
+                             [('biology', 2), ('cells', 1)])
+
+    def test_statement_count_does_not_grow_with_the_batch(self):
+        with app.app_context():
+            TagService.ensure_index()  # one-time backfill check on a fresh engine
+            counts = []
+            for size in (2, 40):
+                cards = [{'front': f'Q{i}', 'back': 'A', 'tags': ['t']} for i in range(size)]
+                saved, count = statements(lambda: save_flashcards(cards, {'user_id': 1}))
+                self.assertEqual(len(saved), size)
+                counts.append(count)
+            self.assertEqual(counts[0], counts[1])
+
+    def test_saved_questions(self):
+        items = [
+            {'question': 'Define mitosis', 'type': 'short_answer', 'correct_answer': 'Cell division',
+             'related_concepts': ['meiosis']},
+            {'question': 'Pick the organelle', 'type': 'ESSAY_PLUS', 'options': ['Nucleus', 'Salt'],
+             'difficulty': 'HIGH'},
+        ]
+        with app.app_context():
+            saved = save_questions(items, {'user_id': 1})
+            self.assertEqual([q['type'] for q in saved], ['SHORT_ANSWER', 'SHORT_ANSWER'])
+            self.assertEqual(saved[1]['difficulty'], 'HIGH')
+            question = db.session.get(Question, saved[0]['id'])
+            self.assertEqual(question.type, QuestionType.SHORT_ANSWER)
+            self.assertEqual([hit.entity_id for hit in SearchService.search('meiosis')],
+                             [saved[0]['id']])
+
+    def test_endpoint_returns_only_the_new_cards(self):
+        _ai_service = ai_service._ai_service
+        service = ai_service.AIService.__new__(ai_service.AIService)  # no real client or API key
+        service.provider, service.model, service.client = 'openai', 'test-model', ScriptedOpenAI()
+        ai_service._ai_service = service
+        try:
+            with app.app_context():
+                token = jwt.encode(
+                    {'user_id': 1, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                    app.config['SECRET_KEY'],
+                    algorithm='HS256'
+                )
+            response = self.client.post('/api/ai/flashcards',
+                                        headers={'Authorization': f'Bearer {token}'},
+                                        json={'content': 'Cells', 'num_cards': 3,
+                                              'module_id': 1, 'user_id': 1})
+        finally:
+            ai_service._ai_service = _ai_service
+        self.assertEqual(response.status_code, 200, response.get_json())
+        data = response.get_json()
+        self.assertEqual(data['count'], 3)
+        self.assertNotIn('Old card', [card['front'] for card in data['flashcards']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import jwt
+import time
+from datetime import datetime, timedelta
+from app import app, db
+from app.config import Config
+from app.services import ai_providers, ai_service
+from app.services.ai_providers import (FakeClient, ProviderError, ProviderUnavailableError,
+                                       backoff, breaker_states)
+from tests.test_ai_cache import FakeOpenAI
+
+SETTINGS = ('AI_CACHE_ENABLED', 'AI_MAX_RETRIES', 'AI_RETRY_BASE_DELAY', 'AI_RETRY_MAX_DELAY',
+            'AI_REQUEST_TIMEOUT', 'AI_BREAKER_THRESHOLD', 'AI_BREAKER_RESET')
+
+
+class ProviderFailure(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = None
+        if retry_after is not None:
+            self.response = type('Response', (), {'headers': {'retry-after': str(retry_after)}})()
+
+
+class FlakyOpenAI(FakeOpenAI):
+    """Raises the queued failures first, then answers; records each call's timeout"""
+
+    def __init__(self, failures=()):
+        super().__init__()
+        self.failures = list(failures)
+        self.attempts = 0
+        self.timeouts = []
+
+    def create(self, **kwargs):
+        self.attempts += 1
+        self.timeouts.append(kwargs.get('timeout'))
+        if self.failures:
+            raise self.failures.pop(0)
+        return super().create(**kwargs)
+
+
+class AIProviderTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config.update(AI_CACHE_ENABLED=False, AI_MAX_RETRIES=3, AI_RETRY_BASE_DELAY=0.01,
+                          AI_RETRY_MAX_DELAY=1, AI_REQUEST_TIMEOUT=5, AI_BREAKER_THRESHOLD=3,
+                          AI_BREAKER_RESET=60)
+        ai_providers._breakers.clear()
+        self.client = app.test_client()
+
+        self._ai_service = ai_service._ai_service
+        self.service = ai_service.AIService.__new__(ai_service.AIService)  # no real client or API key
+        self.service.provider, self.service.model = 'openai', 'test-model'
+        ai_service._ai_service = self.service
+
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        for name in SETTINGS:
+            app.config[name] = getattr(Config, name)
+        ai_providers._breakers.clear()
+        ai_service._ai_service = self._ai_service
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _summarize(self, flaky):
+        self.service.client = flaky
+        with app.app_context():
+            return self.service.generate_summary('Photosynthesis')
+
+    def test_rate_limits_are_retried_with_a_timeout(self):
+        flaky = FlakyOpenAI([ProviderFailure(429), ProviderFailure(503)])
+        self.assertEqual(self._summarize(flaky), 'reply 1')
+        self.assertEqual(flaky.attempts, 3)
+        self.assertEqual(flaky.timeouts, [5, 5, 5])
+        self.assertEqual(breaker_states(), {'openai': 'closed'})
+
+    def test_client_errors_and_long_retry_after_are_not_retried(self):
+        flaky = FlakyOpenAI([ProviderFailure(400)])
+        with self.assertRaisesRegex(ProviderError, 'AI API error: HTTP 400'):
+            self._summarize(flaky)
+        self.assertEqual(flaky.attempts, 1)
+
+        flaky = FlakyOpenAI([ProviderFailure(429, retry_after=120)])
+        with self.assertRaises(ProviderError):
+            self._summarize(flaky)
+        self.assertEqual(flaky.attempts, 1)
+
+    def test_backoff_is_jittered_and_bounded(self):
+        with app.app_context():
+            delays = [backoff(3) for _ in range(200)]
+            self.assertTrue(all(0 <= delay <= 0.08 for delay in delays))
+            self.assertGreater(len(set(delays)), 100)
+            self.assertEqual(backoff(0, retry_after=0.5), 0.5)
+            self.assertIsNone(backoff(0, retry_after=5))
+
+    def test_breaker_opens_then_lets_a_trial_through(self):
+        flaky = FlakyOpenAI([ProviderFailure(500)] * 4)
+        with self.assertRaises(ProviderUnavailableError):
+            self._summarize(flaky)
+        # Three failures opened the circuit before the last retry
+        self.assertEqual(flaky.attempts, 3)
+        self.assertEqual(breaker_states(), {'openai': 'open'})
+
+        headers = self._headers()
+        response = self.client.post('/api/ai/summarize', headers=headers,
+                                    json={'content': 'Photosynthesis'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        response = self.client.post('/api/ai/summarize', headers=headers,
+                                    json={'content': 'Photosynthesis', 'stream': True})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(flaky.attempts, 3)
+
+        ai_providers._breakers['openai'].reset_after = 0.05
+        time.sleep(0.1)
+        self.assertEqual(breaker_states(), {'openai': 'half-open'})
+        flaky.failures = []
+        self.assertEqual(self._summarize(flaky), 'reply 1')
+        self.assertEqual(breaker_states(), {'openai': 'closed'})
+
+    def test_fake_provider_times_out(self):
+        app.config['AI_REQUEST_TIMEOUT'] = 0.01
+        app.config['AI_MAX_RETRIES'] = 1
+        self.service.provider, self.service.model = 'fake', 'fake'
+        self.service.client = FakeClient(token_delay=0.5)
+        start = time.perf_counter()
+        with app.app_context(), self.assertRaisesRegex(ProviderError, 'No reply within'):
+            self.service.generate_summary('Photosynthesis')
+        self.assertLess(time.perf_counter() - start, 0.4)
+
+    def _headers(self):
+        with app.app_context():
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        return {'Authorization': f'Bearer {token}'}
+
+if __name__ == '__main__':
+    unittest.main()
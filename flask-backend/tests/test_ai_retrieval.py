@@ -0,0 +1,113 @@
+import unittest
+import jwt
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app import app, db
+from app.models import ContentType, Document, Embedding, Flashcard, Note
+from app.services import ai_service
+from app.services.chunk_service import estimate_tokens
+from app.services.embedding_service import EmbeddingService
+from tests.test_ai_chunking import ScriptedOpenAI
+
+
+def paragraph(topic, i):
+    return f"{topic} fact {i}: " + ' '.join(f"{topic}{j}" for j in range(60)) + '.'
+
+
+class AIRetrievalTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Note(name="Photosynthesis", module_id=1, user_id=1,
+                     content=[paragraph('chlorophyll', i) for i in range(8)]),
+                Note(name="Trade routes", module_id=1, user_id=1,
+                     content=[paragraph('caravan', i) for i in range(8)]),
+                Note(name="Someone else's photosynthesis", module_id=1, user_id=2,
+                     content=["chlorophyll secrets"]),
+                Note(name="Other module", module_id=2, user_id=1, content=["chlorophyll elsewhere"]),
+                Document(name="leaf.pdf", type=ContentType.PDF, file_url="/tmp/leaf.pdf",
+                         module_id=1, uploaded_by=2, is_shared=True,
+                         extracted_text="Chlorophyll in the leaf absorbs red and blue light."),
+            ])
+            db.session.commit()
+
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_retrieval_stays_in_the_module_and_budget(self):
+        with app.app_context():
+            hits = EmbeddingService.retrieve("chlorophyll", 1, user_id=1, max_tokens=400)
+            titles = {hit.title for hit in hits}
+            self.assertIn("Photosynthesis", titles)
+            self.assertIn("leaf.pdf", titles)
+            self.assertFalse(titles & {"Trade routes", "Someone else's photosynthesis",
+                                       "Other module"})
+            self.assertLessEqual(sum(estimate_tokens(f"{hit.title}\n{hit.text}") for hit in hits),
+                                 400)
+            # Reading order: notes, then documents, each chunk by chunk
+            keys = [(hit.entity_type != 'note', hit.entity_id, hit.chunk) for hit in hits]
+            self.assertEqual(keys, sorted(keys))
+
+            self.assertEqual(len(EmbeddingService.retrieve("chlorophyll", 1, user_id=1,
+                                                           limit=1)), 1)
+            self.assertEqual(EmbeddingService.retrieve("chlorophyll", 3, user_id=1), [])
+
+    def test_entities_without_embeddings_are_embedded_first(self):
+        with app.app_context():
+            db.session.execute(insert(Note), [{'name': 'Bulk', 'module_id': 3, 'user_id': 1,
+                                               'content': ['Mitochondria make ATP']}])
+            db.session.commit()
+            self.assertEqual(Embedding.query.filter_by(entity_type='note').count(),
+                             Embedding.query.filter(Embedding.entity_type == 'note',
+                                                    Embedding.title != 'Bulk').count())
+            hits = EmbeddingService.retrieve("mitochondria", 3, user_id=1)
+            self.assertEqual([hit.title for hit in hits], ['Bulk'])
+
+    def test_flashcards_from_module_and_topic(self):
+        _ai_service = ai_service._ai_service
+        service = ai_service.AIService.__new__(ai_service.AIService)  # no real client or API key
+        service.provider, service.model, service.client = 'openai', 'test-model', ScriptedOpenAI()
+        ai_service._ai_service = service
+        try:
+            response = self.client.post('/api/ai/flashcards', headers=self.headers,
+                                        json={'module_id': 1, 'topic': 'chlorophyll',
+                                              'num_cards': 3, 'max_context_tokens': 300,
+                                              'user_id': 2})
+            missing = self.client.post('/api/ai/flashcards', headers=self.headers,
+                                       json={'module_id': 1})
+            empty = self.client.post('/api/ai/questions', headers=self.headers,
+                                     json={'module_id': 3, 'topic': 'chlorophyll'})
+            summary = self.client.post('/api/ai/summarize', headers=self.headers,
+                                       json={'module_id': 1, 'topic': 'chlorophyll'})
+        finally:
+            ai_service._ai_service = _ai_service
+        self.assertEqual(response.status_code, 200, response.get_json())
+        data = response.get_json()
+        self.assertEqual(data['count'], 3)
+        self.assertTrue(data['sources'])
+        self.assertNotIn('caravan', ''.join(service.client.prompts))
+        self.assertLessEqual(len(service.client.prompts[0]), 300 * 4 + 1000)
+        with app.app_context():
+            # Saved for the requester, whatever the body said
+            self.assertEqual({card.user_id for card in Flashcard.query.all()}, {1})
+
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(empty.status_code, 400)
+        self.assertEqual(summary.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
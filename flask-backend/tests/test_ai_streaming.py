@@ -0,0 +1,91 @@
+import unittest
+import json
+import os
+import time
+import jwt
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app import app, db
+from app.models import CheatSheet
+from app.services import ai_service
+
+CONTENT = ' '.join(f'word{i}' for i in range(20))
+
+
+def read_events(response):
+    """(event, data) pairs of a text/event-stream body, and when the first arrived"""
+    events, first_at, buffer = [], None, ''
+    for chunk in response.response:
+        first_at = first_at or time.perf_counter()
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+    for message in buffer.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in message.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events, first_at
+
+
+class AIStreamingTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        self._ai_service = ai_service._ai_service
+        with patch.dict(os.environ, {'AI_PROVIDER': 'fake', 'AI_FAKE_TOKEN_DELAY': '0.02'}):
+            ai_service._ai_service = ai_service.AIService()
+
+        with app.app_context():
+            db.create_all()
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        ai_service._ai_service = self._ai_service
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _stream(self, endpoint, **body):
+        return self.client.post(f'/api/ai/{endpoint}', headers=self.headers, buffered=False,
+                                json={'content': CONTENT, 'stream': True, **body})
+
+    def test_summary_streams_tokens_then_result(self):
+        start = time.perf_counter()
+        response = self._stream('summarize')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        events, first_at = read_events(response)
+        total = time.perf_counter() - start
+
+        tokens = [data['text'] for event, data in events if event == 'token']
+        self.assertGreater(len(tokens), 10)
+        self.assertEqual(events[-1][0], 'done')
+        self.assertEqual(events[-1][1]['summary'], ''.join(tokens))
+        self.assertLess(first_at - start, total / 2)
+
+        # Served from the cache in one piece the second time
+        events, _ = read_events(self._stream('summarize'))
+        self.assertEqual([event for event, _ in events], ['token', 'done'])
+        self.assertEqual(events[0][1]['text'], ''.join(tokens))
+
+    def test_streamed_cheatsheet_is_saved(self):
+        events, _ = read_events(self._stream('cheatsheet', title='Words', user_id=1))
+        done = events[-1][1]
+        self.assertEqual(done['title'], 'Words')
+        with app.app_context():
+            self.assertIsNotNone(db.session.get(CheatSheet, done['id']))
+
+    def test_unsupported_or_failing_streams(self):
+        response = self._stream('flashcards')
+        self.assertEqual(response.status_code, 400)
+
+        ai_service._ai_service.client = None
+        response = self._stream('summarize')
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('not configured', response.get_json()['message'])
+
+if __name__ == '__main__':
+    unittest.main()
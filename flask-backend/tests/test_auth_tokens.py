@@ -0,0 +1,116 @@
+import unittest
+import hashlib
+import time
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.config import Config
+from app.models import RevokedToken, User
+from app.services import token_service
+from app.services.token_service import TokenRevokedError, TokenService
+
+
+class AuthTokenTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            user = User(username='reader', email='reader@example.com')
+            user.set_password('Reader@123')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        for name in ('AUTH_TOKEN_CACHE_SIZE', 'AUTH_DENYLIST_REFRESH', 'SECRET_KEY'):
+            app.config[name] = getattr(Config, name)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _token(self, user_id=None, **claims):
+        payload = {'user_id': user_id or self.user_id, 'is_admin': False,
+                   'exp': datetime.utcnow() + timedelta(hours=1), **claims}
+        return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+
+    def _login(self):
+        response = self.client.post('/api/auth/login',
+                                    json={'username': 'reader', 'password': 'Reader@123'})
+        return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+    def test_verified_tokens_are_cached_until_they_expire(self):
+        token = self._token()
+        digest = hashlib.sha256(token.encode()).digest()
+        with app.app_context():
+            principal = TokenService.verify(token)
+            self.assertEqual((principal.user_id, principal.is_admin), (self.user_id, False))
+            self.assertIs(TokenService.verify(token), principal)
+            key = app.config['SECRET_KEY']
+            self.assertIs(token_service._cache.get(digest, key, time.time()), principal)
+            self.assertIsNone(token_service._cache.get(digest, key, principal.expires_at + 1))
+
+            # A new signing key invalidates everything cached under the old one
+            app.config['SECRET_KEY'] = 'rotated-signing-key-' * 2
+            with self.assertRaises(jwt.InvalidTokenError):
+                TokenService.verify(token)
+
+    def test_cache_is_bounded(self):
+        app.config['AUTH_TOKEN_CACHE_SIZE'] = 2
+        tokens = [self._token(user_id=i) for i in (1, 2, 3)]
+        with app.app_context():
+            for token in tokens:
+                TokenService.verify(token)
+            self.assertEqual(len(token_service._cache.entries), 2)
+            self.assertNotIn(hashlib.sha256(tokens[0].encode()).digest(),
+                             token_service._cache.entries)
+            with self.assertRaises(jwt.InvalidTokenError):
+                TokenService.verify(jwt.encode({'user_id': 1, 'is_admin': False},
+                                               app.config['SECRET_KEY'], algorithm='HS256'))
+
+    def test_logout_revokes_only_that_token(self):
+        headers, other = self._login(), self._login()
+        self.assertEqual(self.client.get('/api/tasks', headers=headers).status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/logout', headers=headers).status_code, 200)
+
+        response = self.client.get('/api/tasks', headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.get_json()['message'], 'Token has been revoked')
+        self.assertEqual(self.client.get('/api/tasks', headers=other).status_code, 200)
+
+    def test_revocations_from_other_processes_are_synced(self):
+        app.config['AUTH_DENYLIST_REFRESH'] = 0
+        token = self._token(jti='elsewhere')
+        with app.app_context():
+            TokenService.verify(token)
+            db.session.add(RevokedToken(jti='elsewhere',
+                                        expires_at=datetime.utcnow() + timedelta(hours=1)))
+            db.session.add(RevokedToken(jti='old', expires_at=datetime.utcnow() - timedelta(hours=1)))
+            db.session.commit()
+            with self.assertRaises(TokenRevokedError):
+                TokenService.verify(token)
+            self.assertNotIn('old', token_service._denylist)
+
+            self.assertEqual(TokenService.purge_expired(), 1)
+            self.assertEqual([row.jti for row in RevokedToken.query], ['elsewhere'])
+
+    def test_revocations_committed_out_of_id_order_are_synced(self):
+        app.config['AUTH_DENYLIST_REFRESH'] = 0
+        token = self._token(jti='late')
+        expires_at = datetime.utcnow() + timedelta(hours=1)
+        with app.app_context():
+            db.session.add(RevokedToken(id=10, jti='early', expires_at=expires_at))
+            db.session.commit()
+            TokenService.verify(token)
+            self.assertEqual(token_service._denylist.watermark, 10)
+
+            # A lower id from a transaction that committed after the sync
+            db.session.add(RevokedToken(id=5, jti='late', expires_at=expires_at))
+            db.session.commit()
+            with self.assertRaises(TokenRevokedError):
+                TokenService.verify(token)
+
+if __name__ == '__main__':
+    unittest.main()
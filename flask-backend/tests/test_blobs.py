@@ -0,0 +1,136 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.models import Document, DocumentPage, FileBlob, Job
+from app.services import file_service
+from app.services.blob_service import BlobService
+from app.services.job_service import JobService
+from tests.test_document_pages import write_pdf
+
+
+class BlobStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        self.upload_folder = tempfile.mkdtemp()
+        self._file_service = file_service._file_service
+        file_service._file_service = file_service.FileService(self.upload_folder)
+        path = write_pdf(os.path.join(self.upload_folder, 'source.pdf'), ['Week one', 'Week two'])
+        with open(path, 'rb') as pdf:
+            self.pdf = pdf.read()
+
+        with app.app_context():
+            db.create_all()
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        file_service._file_service = self._file_service
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _upload(self, name='lecture.pdf'):
+        data = {'file': (io.BytesIO(self.pdf), name)}
+        response = self.client.post('/api/documents', data=data, headers=self.headers,
+                                    content_type='multipart/form-data')
+        return response.status_code, json.loads(response.data)
+
+    def _stored_files(self):
+        return [name for _, _, names in os.walk(os.path.join(self.upload_folder, 'blobs'))
+                for name in names]
+
+    def test_duplicates_share_one_blob(self):
+        status, first = self._upload()
+        self.assertEqual(status, 202)
+        status, second = self._upload('LECTURE.PDF')
+        self.assertEqual(status, 202)
+        self.assertEqual(first['file_url'], second['file_url'])
+        self.assertEqual(len(self._stored_files()), 1)
+        with app.app_context():
+            blob = FileBlob.query.one()
+            self.assertEqual(blob.ref_count, 2)
+            self.assertEqual(blob.size, len(self.pdf))
+
+    def test_processing_is_reused(self):
+        status, first = self._upload()
+        status, second = self._upload()
+        with app.app_context():
+            # The second job finds the first one's results instead of parsing again
+            self.assertEqual(JobService.work('worker', max_jobs=5), 2)
+            self.assertEqual(db.session.get(Job, second['job']['id']).result['reused'], True)
+
+        status, third = self._upload()
+        self.assertEqual(status, 201)
+        self.assertIsNone(third['job'])
+        self.assertEqual(third['status'], 'COMPLETED')
+        self.assertEqual(third['page_count'], 2)
+        self.assertIn('Week two', third['extracted_text'])
+        with app.app_context():
+            self.assertEqual(DocumentPage.query.filter_by(document_id=third['id']).count(), 2)
+            self.assertEqual(Job.query.count(), 2)
+
+        # Explicit reprocessing still runs a job
+        response = self.client.post(f"/api/documents/{third['id']}/process", headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNotNone(json.loads(response.data)['job'])
+
+    def test_file_removed_with_last_reference(self):
+        _, first = self._upload()
+        _, second = self._upload()
+
+        self.client.delete(f"/api/documents/{first['id']}", headers=self.headers)
+        self.assertEqual(len(self._stored_files()), 1)
+        with app.app_context():
+            self.assertEqual(FileBlob.query.one().ref_count, 1)
+
+        self.client.delete(f"/api/documents/{second['id']}", headers=self.headers)
+        self.assertEqual(self._stored_files(), [])
+        with app.app_context():
+            self.assertEqual(FileBlob.query.count(), 0)
+            self.assertEqual(Document.query.count(), 0)
+
+    def test_release_racing_a_new_upload_keeps_the_file(self):
+        _, first = self._upload()
+        with app.app_context():
+            sha256 = Document.query.one().blob_sha256
+
+            def stage_copy():
+                temp_path = os.path.join(self.upload_folder, 'blobs', 'copy.part')
+                with open(temp_path, 'wb') as copy:
+                    copy.write(self.pdf)
+                return temp_path
+
+            # The last reference is dropped and committed; the same content is
+            # stored again before the releasing request removes the file
+            released = BlobService.release(sha256)
+            db.session.commit()
+            BlobService.adopt(stage_copy(), sha256, len(self.pdf), '.pdf')
+            db.session.commit()
+            self.assertFalse(BlobService.remove_file(released))
+            blob = FileBlob.query.one()
+            self.assertTrue(os.path.exists(blob.path))
+
+            # Removed first, stored again after: the file is put back
+            released = BlobService.release(sha256)
+            db.session.commit()
+            self.assertTrue(BlobService.remove_file(released))
+            BlobService.adopt(stage_copy(), sha256, len(self.pdf), '.pdf')
+            db.session.commit()
+            self.assertTrue(os.path.exists(FileBlob.query.one().path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.config import Config
+from app.models import ContentType, Document, DocumentPage, DocumentStatus
+from app.services import file_service
+from app.services.document_service import DocumentService
+
+
+def write_pdf(path, page_texts):
+    """Minimal PDF with one line of Helvetica text per page"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>',
+               b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                   b' '.join(b'%d 0 R' % (4 + 2 * i) for i in range(len(page_texts))),
+                   len(page_texts)),
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    for i, text in enumerate(page_texts):
+        stream = b'BT /F1 12 Tf 72 720 Td (%s) Tj ET' % text.encode()
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (5 + 2 * i))
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+    data, offsets = b'%PDF-1.4\n', []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(data)
+    data += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    data += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    data += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as out:
+        out.write(data)
+    return path
+
+
+class DocumentPagesTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config['PDF_PAGES_PER_TASK'] = 2
+        app.config['PDF_PARALLEL_MIN_PAGES'] = 0
+        app.config['PDF_EXTRACT_PROCESSES'] = 2
+        self.client = app.test_client()
+
+        self.upload_folder = tempfile.mkdtemp()
+        self._file_service = file_service._file_service
+        file_service._file_service = file_service.FileService(self.upload_folder)
+        path = write_pdf(os.path.join(self.upload_folder, 'book.pdf'),
+                         [f'Chapter {i}' for i in range(1, 6)])
+
+        with app.app_context():
+            db.create_all()
+            document = Document(name='book.pdf', type=ContentType.PDF, file_url=path)
+            db.session.add(document)
+            db.session.commit()
+            self.document_id = document.id
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        for name in ('PDF_PAGES_PER_TASK', 'PDF_PARALLEL_MIN_PAGES', 'PDF_EXTRACT_PROCESSES',
+                     'EXTRACTED_TEXT_MAX_CHARS'):
+            app.config[name] = getattr(Config, name)
+        file_service._file_service = self._file_service
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_parallel_extraction_stores_every_page(self):
+        with app.app_context():
+            DocumentService.process(self.document_id)
+            document = db.session.get(Document, self.document_id)
+            self.assertEqual(document.status, DocumentStatus.COMPLETED)
+            self.assertEqual(document.page_count, 5)
+            self.assertEqual(document.extracted_text.split(),
+                             [word for i in range(1, 6) for word in ('Chapter', str(i))])
+            pages = DocumentPage.query.filter_by(document_id=self.document_id) \
+                .order_by(DocumentPage.page_number).all()
+            self.assertEqual([page.page_number for page in pages], [1, 2, 3, 4, 5])
+            self.assertIn('Chapter 3', pages[2].text)
+
+            # Reprocessing replaces the rows
+            DocumentService.process(self.document_id)
+            self.assertEqual(DocumentService.pages_extracted(self.document_id), 5)
+
+    def test_extracted_text_is_capped(self):
+        app.config['EXTRACTED_TEXT_MAX_CHARS'] = 15
+        with app.app_context():
+            DocumentService.process(self.document_id)
+            document = db.session.get(Document, self.document_id)
+            self.assertLessEqual(len(document.extracted_text), 15)
+            self.assertTrue(document.extracted_text.startswith('Chapter 1'))
+            # The pages keep the full text
+            self.assertEqual(DocumentService.pages_extracted(self.document_id), 5)
+
+    def test_corrupt_pdf_fails_on_last_attempt(self):
+        with app.app_context():
+            document = db.session.get(Document, self.document_id)
+            with open(document.file_url, 'wb') as out:
+                out.write(b'not really a pdf')
+            with self.assertRaises(Exception):
+                DocumentService.process(self.document_id, last_attempt=False)
+            self.assertEqual(db.session.get(Document, self.document_id).status, DocumentStatus.PENDING)
+            with self.assertRaises(Exception):
+                DocumentService.process(self.document_id)
+            self.assertEqual(db.session.get(Document, self.document_id).status, DocumentStatus.FAILED)
+
+    def test_pages_endpoint(self):
+        with app.app_context():
+            DocumentService.process(self.document_id)
+
+        response = self.client.get(f'/api/documents/{self.document_id}/pages?limit=2',
+                                   headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([page['page_number'] for page in json.loads(response.data)], [1, 2])
+        cursor = response.headers['X-Next-Cursor']
+        response = self.client.get(f'/api/documents/{self.document_id}/pages?limit=10&cursor={cursor}',
+                                   headers=self.headers)
+        self.assertEqual([page['page_number'] for page in json.loads(response.data)], [3, 4, 5])
+
+        response = self.client.get(f'/api/documents/{self.document_id}', headers=self.headers)
+        self.assertEqual(json.loads(response.data)['pages_extracted'], 5)
+
+        self.client.delete(f'/api/documents/{self.document_id}', headers=self.headers)
+        with app.app_context():
+            self.assertEqual(DocumentPage.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
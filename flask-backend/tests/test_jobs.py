@@ -0,0 +1,186 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.models import Job, JobStatus, Document, DocumentStatus
+from app.services import file_service
+from app.services.job_service import JobService, job_handler
+from app.services.document_service import PROCESS_JOB
+from tests.test_document_pages import write_pdf
+
+calls = []
+
+
+@job_handler('test_echo')
+def echo_job(job):
+    calls.append(job.id)
+    return {'echo': job.payload.get('value')}
+
+
+@job_handler('test_flaky')
+def flaky_job(job):
+    calls.append(job.id)
+    if job.attempts < job.payload.get('succeed_on', 99):
+        raise RuntimeError('boom')
+    return {'attempts': job.attempts}
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config['JOB_RETRY_DELAY'] = 0
+        self.client = app.test_client()
+        calls.clear()
+
+        self.upload_folder = tempfile.mkdtemp()
+        self._file_service = file_service._file_service
+        file_service._file_service = file_service.FileService(self.upload_folder)
+
+        with app.app_context():
+            db.create_all()
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        app.config['JOB_RETRY_DELAY'] = 30
+        app.config['JOBS_RUN_INLINE'] = False
+        file_service._file_service = self._file_service
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_claim_is_exclusive(self):
+        with app.app_context():
+            job_id = JobService.enqueue('test_echo', {'value': 1}).id
+            first = JobService.claim('worker-a')
+            self.assertEqual(first.id, job_id)
+            self.assertEqual(first.status, JobStatus.RUNNING)
+            self.assertEqual(first.attempts, 1)
+            self.assertIsNone(JobService.claim('worker-b'))
+
+            # Only the lease holder can finish or renew the job
+            self.assertFalse(JobService.heartbeat(job_id, 'worker-b'))
+            JobService.complete(first, 'worker-b', {'stolen': True})
+            self.assertEqual(db.session.get(Job, job_id, populate_existing=True).status,
+                             JobStatus.RUNNING)
+            self.assertTrue(JobService.heartbeat(job_id, 'worker-a'))
+
+    def test_expired_lease_is_reclaimed(self):
+        with app.app_context():
+            job_id = JobService.enqueue('test_echo', {'value': 2}).id
+            JobService.claim('dead-worker')
+            job = db.session.get(Job, job_id)
+            job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+
+            self.assertEqual(JobService.work('worker-b', max_jobs=5), 1)
+            job = db.session.get(Job, job_id)
+            self.assertEqual(job.status, JobStatus.SUCCEEDED)
+            self.assertEqual(job.attempts, 2)
+            self.assertEqual(job.result, {'echo': 2})
+
+    def test_retries_with_backoff_then_fails(self):
+        app.config['JOB_RETRY_DELAY'] = 60
+        with app.app_context():
+            job_id = JobService.enqueue('test_flaky', max_attempts=2).id
+            self.assertEqual(JobService.work('worker', max_jobs=5), 1)
+            job = db.session.get(Job, job_id)
+            self.assertEqual(job.status, JobStatus.QUEUED)
+            self.assertEqual(job.last_error, 'RuntimeError: boom')
+            self.assertGreater(job.run_after, datetime.utcnow() + timedelta(seconds=50))
+
+            # Not due yet
+            self.assertIsNone(JobService.claim('worker'))
+            job.run_after = datetime.utcnow()
+            db.session.commit()
+            self.assertEqual(JobService.work('worker', max_jobs=5), 1)
+            job = db.session.get(Job, job_id)
+            self.assertEqual(job.status, JobStatus.FAILED)
+            self.assertEqual(job.attempts, 2)
+
+    def test_retry_succeeds_and_queues_filter(self):
+        with app.app_context():
+            job_id = JobService.enqueue('test_flaky', {'succeed_on': 2}, queue='other').id
+            self.assertEqual(JobService.work('worker', queues=['default'], max_jobs=5), 0)
+            self.assertEqual(JobService.work('worker', queues=['other'], max_jobs=5), 2)
+            job = db.session.get(Job, job_id)
+            self.assertEqual(job.status, JobStatus.SUCCEEDED)
+            self.assertEqual(job.result, {'attempts': 2})
+            self.assertEqual(calls, [job_id, job_id])
+
+    def test_unknown_kind_fails_without_retry(self):
+        with app.app_context():
+            job_id = JobService.enqueue('no_such_kind').id
+            JobService.work('worker', max_jobs=5)
+            job = db.session.get(Job, job_id)
+            self.assertEqual(job.status, JobStatus.FAILED)
+            self.assertEqual(job.attempts, 1)
+
+    def test_upload_queues_processing(self):
+        path = write_pdf(os.path.join(self.upload_folder, 'source.pdf'), ['Lecture one'])
+        with open(path, 'rb') as pdf:
+            data = {'file': (io.BytesIO(pdf.read()), 'notes.pdf'), 'user_id': '1'}
+        response = self.client.post('/api/documents', data=data, headers=self.headers,
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 202)
+        body = json.loads(response.data)
+        self.assertEqual(body['status'], 'PENDING')
+        self.assertEqual(body['job']['status'], 'QUEUED')
+        self.assertEqual(body['job']['kind'], PROCESS_JOB)
+
+        # Reprocessing while a job is queued reuses it
+        response = self.client.post(f"/api/documents/{body['id']}/process", headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.data)['job']['id'], body['job']['id'])
+
+        with app.app_context():
+            self.assertEqual(JobService.work('worker', queues=['documents'], max_jobs=5), 1)
+            document = db.session.get(Document, body['id'])
+            self.assertEqual(document.status, DocumentStatus.COMPLETED)
+            self.assertIn('Lecture one', document.extracted_text)
+
+        response = self.client.get(f"/api/documents/{body['id']}", headers=self.headers)
+        document = json.loads(response.data)
+        self.assertEqual(document['status'], 'COMPLETED')
+        self.assertEqual(document['job']['status'], 'SUCCEEDED')
+
+        response = self.client.get(f"/api/jobs/{body['job']['id']}", headers=self.headers)
+        self.assertEqual(json.loads(response.data)['status'], 'SUCCEEDED')
+
+    def test_errors_are_only_shown_to_owners_and_admins(self):
+        with app.app_context():
+            job_id = JobService.enqueue('test_flaky', max_attempts=1).id
+            JobService.work('worker', max_jobs=5)
+            token = jwt.encode(
+                {'user_id': 2, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        response = self.client.get(f"/api/jobs/{job_id}",
+                                   headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(json.loads(response.data)['status'], 'FAILED')
+        self.assertIsNone(json.loads(response.data)['last_error'])
+        response = self.client.get(f"/api/jobs/{job_id}", headers=self.headers)
+        self.assertEqual(json.loads(response.data)['last_error'], 'RuntimeError: boom')
+
+    def test_inline_mode(self):
+        app.config['JOBS_RUN_INLINE'] = True
+        with app.app_context():
+            job = JobService.enqueue('test_echo', {'value': 3})
+            job = db.session.get(Job, job.id, populate_existing=True)
+            self.assertEqual(job.status, JobStatus.SUCCEEDED)
+            self.assertEqual(job.result, {'echo': 3})
+
+if __name__ == '__main__':
+    unittest.main()
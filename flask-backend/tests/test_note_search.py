@@ -0,0 +1,102 @@
+import unittest
+import json
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.services.notes_service import NoteService
+from app.services.search_service import SearchService
+
+class NoteSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            self.recursion = NoteService.add_note(
+                "Recursion", content=["A function that calls itself", "Base case first"],
+                tags=["algorithms"], user_id=1).id
+            self.sorting = NoteService.add_note(
+                "Sorting", type='list', items=["merge sort uses recursion", "quick sort"],
+                user_id=2).id
+            self.biology = NoteService.add_note(
+                "Cells", content=["Mitochondria is the powerhouse"],
+                ai_summary="Cell biology basics", user_id=1).id
+
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _ids(self, query, **kwargs):
+        return [note.id for note, _, _ in NoteService.search_notes(query, **kwargs)]
+
+    def test_searches_json_content_and_items(self):
+        with app.app_context():
+            self.assertEqual(self._ids("mitochondria"), [self.biology])
+            # Name matches outrank matches in the body
+            self.assertEqual(self._ids("recursion"), [self.recursion, self.sorting])
+            self.assertEqual(self._ids("recursion", user_id=2), [self.sorting])
+            self.assertEqual(self._ids("algorithms"), [self.recursion])
+            self.assertEqual(self._ids("powerh*"), [self.biology])
+            self.assertEqual(self._ids('"); DROP TABLE notes; --'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        with app.app_context():
+            NoteService.update_note(self.sorting, items=["bubble sort"])
+            self.assertEqual(self._ids("recursion"), [self.recursion])
+            NoteService.delete_note(self.recursion)
+            self.assertEqual(self._ids("recursion"), [])
+
+            # A rebuild reproduces the incrementally maintained index
+            self.assertEqual(SearchService.rebuild(), 2)
+            self.assertEqual(self._ids("bubble"), [self.sorting])
+
+    def test_search_endpoint_pages_with_snippets(self):
+        with app.app_context():
+            recursion_again = NoteService.add_note(
+                "Tail calls", content=["recursion without a growing stack"], user_id=1).id
+
+        response = self.client.get('/api/notes/search?q=sort&limit=1&user_id=2',
+                                   headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(len(data), 1)
+        self.assertIn('<mark>', data[0]['snippet'])
+        self.assertIn('rank', data[0])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+        response = self.client.get('/api/notes/search?q=recursion&limit=1', headers=self.headers)
+        cursor = response.headers['X-Next-Cursor']
+        response = self.client.get(f'/api/notes/search?q=recursion&limit=1&cursor={cursor}',
+                                   headers=self.headers)
+        self.assertEqual([note['id'] for note in json.loads(response.data)], [recursion_again])
+
+    def test_search_endpoint_is_limited_to_the_caller(self):
+        with app.app_context():
+            token = jwt.encode(
+                {'user_id': 2, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        headers = {'Authorization': f'Bearer {token}'}
+        for url in ('/api/notes/search?q=recursion', '/api/notes/search?q=recursion&user_id=1'):
+            response = self.client.get(url, headers=headers)
+            self.assertEqual([note['id'] for note in json.loads(response.data)], [self.sorting])
+
+        # Admins search their own notes unless they ask for another user's
+        response = self.client.get('/api/notes/search?q=recursion', headers=self.headers)
+        self.assertEqual([note['id'] for note in json.loads(response.data)], [self.recursion])
+        response = self.client.get('/api/notes/search?q=recursion&user_id=2', headers=self.headers)
+        self.assertEqual([note['id'] for note in json.loads(response.data)], [self.sorting])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import os
+import shutil
+import tempfile
+from PIL import Image, ImageDraw
+from app import app, db
+from app.config import Config
+from app.models import ContentType, Document, DocumentStatus, OCRResult
+from app.services.document_service import DocumentService
+from app.services.ocr_service import (OCRService, band_boxes, ocr_available, otsu_threshold,
+                                      preprocess, recognize)
+
+
+def lined_page(width, height, line_height=20, gap=20):
+    """White page with black bars standing in for lines of text"""
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for top in range(gap, height - line_height, line_height + gap):
+        draw.rectangle([40, top, width - 40, top + line_height - 1], fill=20)
+    return image
+
+
+class OCRPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.folder = tempfile.mkdtemp()
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        app.config['OCR_LANG'] = Config.OCR_LANG
+        shutil.rmtree(self.folder, ignore_errors=True)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_otsu_threshold_splits_ink_from_paper(self):
+        histogram = [0] * 256
+        histogram[30], histogram[220] = 100, 900
+        self.assertTrue(30 <= otsu_threshold(histogram) < 220)
+
+    def test_preprocess_downscales_and_binarizes(self):
+        scan = Image.new('RGB', (5000, 4000), (240, 235, 220))
+        ImageDraw.Draw(scan).rectangle([100, 100, 4000, 300], fill=(40, 40, 60))
+        image = preprocess(scan, max_megapixels=4)
+        self.assertEqual(image.mode, 'L')
+        self.assertLessEqual(image.width * image.height, 4e6)
+        self.assertAlmostEqual(image.width / image.height, 5000 / 4000, places=2)
+        self.assertEqual({value for _, value in image.getcolors()}, {0, 255})
+
+    def test_bands_cut_between_lines(self):
+        page = lined_page(2000, 4000)
+        boxes = band_boxes(page, tile_megapixels=2)
+        self.assertEqual(len(boxes), 4)
+        self.assertEqual(boxes[0][1], 0)
+        self.assertEqual(boxes[-1][3], 4000)
+        for previous, box in zip(boxes, boxes[1:]):
+            self.assertEqual(previous[3], box[1])
+            # The cut row is blank paper
+            self.assertEqual(page.crop((0, box[1], 2000, box[1] + 1)).getextrema(), (255, 255))
+        self.assertEqual(band_boxes(page, tile_megapixels=10), [(0, 0, 2000, 4000)])
+
+    def test_results_are_cached_by_content(self):
+        path = os.path.join(self.folder, 'scan.png')
+        lined_page(400, 300).save(path)
+        with app.app_context():
+            sha256 = OCRService.file_sha256(path)
+            db.session.add(OCRResult(content_sha256=sha256,
+                                     settings=OCRService.settings_fingerprint(),
+                                     text='cached text'))
+            document = Document(name='scan.png', type=ContentType.IMAGE, file_url=path,
+                                blob_sha256=None)
+            db.session.add(document)
+            db.session.commit()
+
+            self.assertEqual(OCRService.text_for(path), 'cached text')
+            DocumentService.process(document.id)
+            document = db.session.get(Document, document.id)
+            self.assertEqual(document.status, DocumentStatus.COMPLETED)
+            self.assertEqual(document.ocr_text, 'cached text')
+
+            # Different settings are a different cache entry
+            app.config['OCR_LANG'] = 'deu'
+            self.assertIsNone(OCRService.get_cached(sha256))
+
+    @unittest.skipUnless(ocr_available(), "tesseract is not installed")
+    def test_recognizes_tiled_scan(self):
+        image = Image.new('L', (1600, 2400), 255)
+        draw = ImageDraw.Draw(image)
+        for i in range(12):
+            draw.text((100, 100 + i * 180), f"Line number {i}", fill=0, font_size=64)
+        path = os.path.join(self.folder, 'tall.png')
+        image.save(path)
+        app.config['OCR_TILE_MEGAPIXELS'] = 1
+        try:
+            with app.app_context():
+                text, _, tiles = recognize(path, processes=2)
+        finally:
+            app.config['OCR_TILE_MEGAPIXELS'] = Config.OCR_TILE_MEGAPIXELS
+        self.assertGreater(tiles, 1)
+        self.assertIn('Line number 11', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import json
+import jwt
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import app, db
+from app.models import Note, Task
+
+class PaginationTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+
+            # Several notes share a timestamp so the id tie-breaker matters
+            base = datetime(2024, 1, 1)
+            for i in range(7):
+                db.session.add(Note(name=f"Note {i}", content=[f"body {i}"],
+                                    last_modified=base + timedelta(minutes=i // 2)))
+            for i in range(5):
+                db.session.add(Task(name=f"Task {i}"))
+            db.session.commit()
+
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _walk(self, url):
+        names, cursor = [], None
+        while True:
+            page_url = url + (f"&cursor={cursor}" if cursor else "")
+            response = self.client.get(page_url, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            names.extend(item['name'] for item in json.loads(response.data))
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                return names
+
+    def test_notes_keyset_pages(self):
+        """Walking the cursor returns every note once, newest first"""
+        names = self._walk('/api/notes?limit=3')
+        self.assertEqual(names, [f"Note {i}" for i in (6, 5, 4, 3, 2, 1, 0)])
+
+    def test_keyset_pages_across_null_keys(self):
+        with app.app_context():
+            db.session.execute(update(Note).where(Note.name.in_(["Note 1", "Note 2", "Note 5"]))
+                               .values(last_modified=None))
+            db.session.commit()
+        for limit in (1, 2, 3):
+            names = self._walk(f'/api/notes?limit={limit}')
+            self.assertEqual(names, [f"Note {i}" for i in (6, 4, 3, 0, 5, 2, 1)])
+
+    def test_tasks_keyset_pages(self):
+        names = self._walk('/api/tasks?limit=2')
+        self.assertEqual(names, [f"Task {i}" for i in range(5)])
+
+    def test_limit_defaults_and_cap(self):
+        app.config['API_MAX_PAGE_SIZE'] = 4
+        try:
+            response = self.client.get('/api/tasks?limit=100', headers=self.headers)
+            self.assertEqual(len(json.loads(response.data)), 4)
+            self.assertIn('X-Next-Cursor', response.headers)
+        finally:
+            app.config['API_MAX_PAGE_SIZE'] = 500
+
+    def test_fields_projection(self):
+        response = self.client.get('/api/notes?fields=id,name&limit=1', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(set(data[0].keys()), {'id', 'name'})
+
+    def test_invalid_arguments(self):
+        for query in ('fields=bogus', 'cursor=not-a-cursor', 'limit=0', 'limit=abc'):
+            response = self.client.get(f'/api/notes?{query}', headers=self.headers)
+            self.assertEqual(response.status_code, 400, query)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+from app import app, db, passwords
+from app.config import Config
+from app.models import User
+
+
+class PasswordPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config['PASSWORD_HASH_ITERATIONS'] = 1000
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            user = User(username='student', email='student@example.com')
+            user.set_password('Student@123')
+            db.session.add(user)
+            db.session.commit()
+
+    def tearDown(self):
+        for name in ('PASSWORD_HASH_ALGORITHM', 'PASSWORD_HASH_ITERATIONS',
+                     'PASSWORD_HASH_THREADS', 'PASSWORD_HASH_MAX_PENDING'):
+            app.config[name] = getattr(Config, name)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _login(self, password='Student@123'):
+        return self.client.post('/api/auth/login',
+                                json={'username': 'student', 'password': password})
+
+    def _stored_hash(self):
+        with app.app_context():
+            return User.query.filter_by(username='student').first().password_hash
+
+    def test_hashes_follow_the_policy(self):
+        self.assertTrue(self._stored_hash().startswith('pbkdf2:sha256:1000$'))
+        with app.app_context():
+            user = User.query.filter_by(username='student').first()
+            self.assertTrue(user.check_password('Student@123'))
+            self.assertFalse(user.check_password('student@123'))
+            self.assertFalse(user.password_needs_rehash())
+            app.config['PASSWORD_HASH_ALGORITHM'] = 'pbkdf2:sha512'
+            self.assertTrue(user.password_needs_rehash())
+
+    def test_login_rehashes_outdated_hashes(self):
+        self.assertEqual(self._login().status_code, 200)
+        unchanged = self._stored_hash()
+
+        app.config['PASSWORD_HASH_ITERATIONS'] = 2000
+        self.assertEqual(self._login('wrong').status_code, 401)
+        self.assertEqual(self._stored_hash(), unchanged)
+        self.assertEqual(self._login().status_code, 200)
+        self.assertTrue(self._stored_hash().startswith('pbkdf2:sha256:2000$'))
+        self.assertEqual(self._login().status_code, 200)
+
+    def test_busy_rehash_does_not_fail_the_login(self):
+        outdated = self._stored_hash()
+        app.config['PASSWORD_HASH_ITERATIONS'] = 2000
+        with mock.patch('app.models.hash_password', side_effect=passwords.PasswordHashBusyError):
+            response = self._login()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('refresh_token', response.get_json())
+        self.assertEqual(self._stored_hash(), outdated)
+
+    def test_full_hashing_queue_refuses_logins(self):
+        with app.app_context():
+            _, pending = passwords._pool()
+        held = 0
+        while pending.acquire(blocking=False):
+            held += 1
+        try:
+            response = self._login()
+        finally:
+            for _ in range(held):
+                pending.release()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(self._login().status_code, 200)
+
+    def test_pool_follows_its_settings(self):
+        with app.app_context():
+            first = passwords._pool()
+            self.assertEqual(passwords._pool(), first)
+            app.config['PASSWORD_HASH_THREADS'] = 1
+            app.config['PASSWORD_HASH_MAX_PENDING'] = 1
+            executor, pending = passwords._pool()
+            self.assertIsNot(executor, first[0])
+            self.assertTrue(pending.acquire(blocking=False))
+            self.assertTrue(pending.acquire(blocking=False))
+            self.assertFalse(pending.acquire(blocking=False))
+            pending.release()
+            pending.release()
+        self.assertEqual(self._login().status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
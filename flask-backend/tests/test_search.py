@@ -0,0 +1,94 @@
+import unittest
+import json
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.models import (Note, Document, Flashcard, Question, CheatSheet, ContentType,
+                        QuestionType)
+from app.services.search_service import SearchService
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Note(name="Entropy", content=["Disorder of a system"], user_id=1),
+                Document(name="thermo.pdf", original_name="Thermodynamics.pdf",
+                         type=ContentType.PDF, file_url="/tmp/thermo.pdf",
+                         extracted_text="The second law: entropy never decreases",
+                         uploaded_by=2, is_shared=True),
+                Document(name="private.pdf", type=ContentType.PDF, file_url="/tmp/p.pdf",
+                         ocr_text="Scanned entropy table", uploaded_by=2),
+                Flashcard(front="What is entropy?", back="A measure of disorder", user_id=1),
+                Question(question="Define enthalpy", type=QuestionType.SHORT_ANSWER,
+                         explanation="Unlike entropy, enthalpy is heat content", user_id=1),
+                CheatSheet(title="Thermo", content={"laws": ["entropy increases"]}, user_id=3),
+            ])
+            db.session.commit()
+
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _types(self, query, **kwargs):
+        return sorted(hit.entity_type for hit in SearchService.search(query, **kwargs))
+
+    def test_all_entity_types_are_indexed(self):
+        with app.app_context():
+            self.assertEqual(self._types("entropy"),
+                             ['cheatsheet', 'document', 'document', 'flashcard', 'note', 'question'])
+            self.assertEqual(self._types("entropy", entity_types=['document']),
+                             ['document', 'document'])
+            # Filter tokens are not searchable text
+            self.assertEqual(self._types("shared"), [])
+            self.assertEqual(self._types("note"), [])
+
+    def test_owner_filter(self):
+        with app.app_context():
+            # User 1 sees their own content plus the shared document, not user 2's private one
+            self.assertEqual(self._types("entropy", user_id=1),
+                             ['document', 'flashcard', 'note', 'question'])
+            for hit in SearchService.search("entropy", user_id=1):
+                self.assertIn('<mark>', hit.snippet)
+
+    def test_writes_update_the_index(self):
+        with app.app_context():
+            card = Flashcard.query.first()
+            card.front = "What is enthalpy?"
+            card.back = "Heat content"
+            db.session.delete(Question.query.first())
+            db.session.commit()
+            self.assertEqual(self._types("enthalpy"), ['flashcard'])
+
+            document = Document.query.filter_by(name="private.pdf").first()
+            document.is_shared = True
+            db.session.commit()
+            self.assertIn('document', self._types("scanned", user_id=1))
+
+            self.assertEqual(SearchService.rebuild(), 6 - 1)
+            self.assertEqual(self._types("enthalpy"), ['flashcard'])
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/search?q=entropy&type=flashcard,note', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(sorted(hit['type'] for hit in data), ['flashcard', 'note'])
+        self.assertEqual(set(data[0].keys()), {'type', 'id', 'title', 'rank', 'snippet'})
+
+        response = self.client.get('/api/search?q=entropy&type=bogus', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
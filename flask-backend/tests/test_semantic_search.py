@@ -0,0 +1,184 @@
+import unittest
+import json
+import os
+import tempfile
+import jwt
+from datetime import datetime, timedelta
+from app import app, db
+from app.config import Config
+from app.models import CheatSheet, ContentType, Document, Embedding, Note
+from app.services import embedding_service
+from app.services.embedding_service import EmbeddingService, HashingEmbedder
+from app.services.vector_index import VectorIndex, pack_vector
+
+PHOTOSYNTHESIS = ("Plants capture light energy in their chloroplasts and convert carbon dioxide "
+                  "and water into glucose, releasing oxygen.")
+
+
+class CountingEmbedder(HashingEmbedder):
+    texts = []
+
+    def embed(self, texts):
+        CountingEmbedder.texts.extend(texts)
+        return super().embed(texts)
+
+
+class FailingEmbedder(HashingEmbedder):
+    def embed(self, texts):
+        raise Exception("Embedding provider unavailable")
+
+
+class SemanticSearchTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([
+                Note(name="Photosynthesis", content=[PHOTOSYNTHESIS], user_id=1),
+                Note(name="French Revolution", content=["The storming of the Bastille in 1789 "
+                                                        "began a decade of political upheaval."],
+                     user_id=1),
+                Note(name="Private biology", content=["Chloroplasts convert light energy."],
+                     user_id=2),
+                Document(name="cells.pdf", type=ContentType.PDF, file_url="/tmp/cells.pdf",
+                         extracted_text="Mitochondria produce energy for the cell.\n\n" * 3,
+                         uploaded_by=2, is_shared=True),
+                CheatSheet(title="Biology", user_id=1, content=[
+                    {"title": "Photosynthetic organisms", "content": "Chlorophyll absorbs light",
+                     "key_points": ["Glucose is produced"]},
+                    {"title": "Genetics", "content": "DNA encodes genes", "key_points": []},
+                ]),
+            ])
+            db.session.commit()
+
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        app.config['EMBEDDING_PROVIDER'] = 'hashing'
+        embedding_service._embedders.pop('counting', None)
+        embedding_service._embedders.pop('failing', None)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _search(self, query, **kwargs):
+        return [(hit.entity_type, hit.title)
+                for hit in EmbeddingService.search(query, **kwargs)]
+
+    def test_entities_are_chunked_and_searchable(self):
+        with app.app_context():
+            self.assertEqual(db.session.query(Embedding).filter_by(entity_type='cheatsheet').count(), 2)
+            hits = self._search("How do plants make glucose from light?", user_id=1, limit=3)
+            self.assertIn(hits[0], [('note', 'Photosynthesis'),
+                                    ('cheatsheet', 'Biology: Photosynthetic organisms')])
+            self.assertNotIn(('note', 'Private biology'), hits)
+
+            hits = self._search("mitochondria energy", user_id=1, entity_types=['document'])
+            self.assertEqual(hits, [('document', 'cells.pdf')])
+
+    def test_writes_update_the_index_incrementally(self):
+        with app.app_context():
+            self.assertEqual(self._search("bastille revolution", user_id=1, limit=1),
+                             [('note', 'French Revolution')])
+
+            note = Note.query.filter_by(name="French Revolution").first()
+            note.name = "Storming of the Bastille"
+            db.session.delete(Note.query.filter_by(name="Photosynthesis").first())
+            db.session.commit()
+            hits = self._search("bastille revolution", user_id=1)
+            self.assertEqual(hits[0], ('note', 'Storming of the Bastille'))
+            self.assertNotIn('Photosynthesis', [title for _, title in hits])
+            # Two notes, one document and two cheat sheet sections
+            self.assertEqual(EmbeddingService.rebuild(), 5)
+            self.assertEqual(self._search("bastille revolution", user_id=1)[0],
+                             ('note', 'Storming of the Bastille'))
+
+    def test_unchanged_chunks_keep_their_vectors(self):
+        embedding_service.embedder('counting')(CountingEmbedder)
+        app.config['EMBEDDING_PROVIDER'] = 'counting'
+        CountingEmbedder.texts = []
+        paragraphs = [f"Paragraph {i} " + ' '.join(f'word{i}x{j}' for j in range(200))
+                      for i in range(6)]
+        with app.app_context():
+            note = Note(name="Long", content=paragraphs, user_id=1)
+            db.session.add(note)
+            db.session.commit()
+            first = len(CountingEmbedder.texts)
+            self.assertGreater(first, 2)
+
+            note.content = paragraphs[:-1] + ["A different last paragraph"]
+            db.session.commit()
+            self.assertLess(len(CountingEmbedder.texts) - first, first)
+
+    def test_embedder_failures_do_not_fail_saves(self):
+        embedding_service.embedder('failing')(FailingEmbedder)
+        app.config['EMBEDDING_PROVIDER'] = 'failing'
+        with app.app_context():
+            db.session.add(Note(name="Volcanoes", content=["Magma erupts through the crust."],
+                                user_id=1))
+            db.session.commit()
+            note_id = Note.query.filter_by(name="Volcanoes").one().id
+            pending = Embedding.query.filter_by(entity_id=note_id, entity_type='note').one()
+            self.assertIsNone(pending.vector)
+
+            # The provider is back (same model name): the chunk is searchable once embedded
+            app.config['EMBEDDING_PROVIDER'] = 'hashing'
+            self.assertNotIn(('note', 'Volcanoes'), self._search("magma crust", user_id=1))
+            self.assertEqual(EmbeddingService.embed_pending(), 1)
+            self.assertEqual(self._search("magma crust", user_id=1)[0], ('note', 'Volcanoes'))
+
+    def test_dropping_tables_only_removes_this_databases_index_files(self):
+        with tempfile.TemporaryDirectory() as folder, app.app_context():
+            app.config['EMBEDDING_INDEX_DIR'] = folder
+            try:
+                index = EmbeddingService.index_for(HashingEmbedder())
+                vectors_path, meta_path = index._paths()
+                other_path = os.path.join(folder, 'other-' + os.path.basename(vectors_path))
+                for path in (vectors_path, meta_path, other_path):
+                    open(path, 'wb').close()
+                self.assertTrue(os.path.basename(vectors_path).startswith(index.namespace))
+
+                db.drop_all()
+                self.assertEqual(os.listdir(folder), [os.path.basename(other_path)])
+                db.create_all()
+            finally:
+                app.config['EMBEDDING_INDEX_DIR'] = Config.EMBEDDING_INDEX_DIR
+
+    def test_vector_index_filters_and_discards(self):
+        embedder = HashingEmbedder(dimensions=32)
+        index = VectorIndex('test', 32)
+        for embedding_id, (text, owner, shared) in enumerate(
+                [("red apple", 1, False), ("red apple pie", 2, False), ("green apple", 2, True)], 1):
+            index.add(embedding_id, 1, owner, shared, pack_vector(embedder.embed([text])[0]))
+        query = embedder.embed(["red apple"])[0]
+        self.assertEqual([i for _, i in index.search(query, 3)], [1, 2, 3])
+        self.assertEqual([i for _, i in index.search(query, 3, user_id=1)], [1, 3])
+        self.assertEqual(index.search(query, 3, kinds={2}), [])
+        index.discard({2, 3})
+        self.assertEqual([i for _, i in index.search(query, 3)], [2, 3])
+        index.compact()
+        self.assertEqual(len(index), 2)
+
+    def test_semantic_endpoint(self):
+        response = self.client.get('/api/search/semantic?q=chlorophyll+light&type=cheatsheet',
+                                   headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data[0]['title'], 'Biology: Photosynthetic organisms')
+        self.assertEqual(set(data[0]), {'type', 'id', 'title', 'score', 'chunk', 'snippet'})
+
+        response = self.client.get('/api/search/semantic?q=x&type=flashcard', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/search/semantic', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from app import app, db
+from app.config import Config
+from app.models import AuthSession, User
+from app.services.session_service import SessionService
+
+
+class SessionTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config['PASSWORD_HASH_ITERATIONS'] = 1000
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            user = User(username='learner', email='learner@example.com')
+            user.set_password('Learner@123')
+            db.session.add(user)
+            db.session.commit()
+
+    def tearDown(self):
+        app.config['PASSWORD_HASH_ITERATIONS'] = Config.PASSWORD_HASH_ITERATIONS
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _login(self):
+        response = self.client.post('/api/auth/login',
+                                    json={'username': 'learner', 'password': 'Learner@123'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def _refresh(self, refresh_token):
+        return self.client.post('/api/auth/refresh', json={'refresh_token': refresh_token})
+
+    def test_refresh_rotates_tokens_without_hashing_passwords(self):
+        login = self._login()
+        self.assertEqual(login['expires_in'], app.config['JWT_ACCESS_TOKEN_EXPIRES'])
+        with app.app_context():
+            stored = AuthSession.query.one()
+            self.assertNotIn(login['refresh_token'], (stored.refresh_hash, stored.previous_hash))
+
+        with mock.patch('app.models.verify_password') as verify, \
+                mock.patch('app.models.hash_password') as hash_:
+            response = self._refresh(login['refresh_token'])
+        verify.assert_not_called()
+        hash_.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        renewed = response.get_json()
+        self.assertNotEqual(renewed['refresh_token'], login['refresh_token'])
+        self.assertNotEqual(renewed['token'], login['token'])
+        headers = {'Authorization': f"Bearer {renewed['token']}"}
+        self.assertEqual(self.client.get('/api/tasks', headers=headers).status_code, 200)
+        self.assertEqual(self._refresh(renewed['refresh_token']).status_code, 200)
+
+    def test_replayed_refresh_token_ends_the_session(self):
+        login = self._login()
+        renewed = self._refresh(login['refresh_token']).get_json()
+        replay = self._refresh(login['refresh_token'])
+        self.assertEqual(replay.status_code, 401)
+        self.assertIn('already used', replay.get_json()['message'])
+        self.assertEqual(self._refresh(renewed['refresh_token']).status_code, 401)
+
+        self.assertEqual(self._refresh('made-up').status_code, 401)
+        self.assertEqual(self.client.post('/api/auth/refresh', json={}).status_code, 400)
+
+    def test_logout_ends_the_session(self):
+        login = self._login()
+        other = self._login()
+        response = self.client.post('/api/auth/logout',
+                                    headers={'Authorization': f"Bearer {login['token']}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._refresh(login['refresh_token']).status_code, 401)
+        self.assertEqual(self._refresh(other['refresh_token']).status_code, 200)
+
+    def test_password_change_ends_other_sessions(self):
+        current = self._login()
+        other = self._login()
+        with app.app_context():
+            user_id = User.query.one().id
+        response = self.client.put(f'/api/users/{user_id}', json={'password': 'Changed@456'},
+                                   headers={'Authorization': f"Bearer {current['token']}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._refresh(other['refresh_token']).status_code, 401)
+        self.assertEqual(self._refresh(current['refresh_token']).status_code, 200)
+
+    def test_deleting_a_user_ends_their_sessions(self):
+        login = self._login()
+        with app.app_context():
+            admin = User(username='admin', email='admin@example.com', is_admin=True)
+            admin.set_password('Admin@123')
+            db.session.add(admin)
+            db.session.commit()
+            user_id = User.query.filter_by(username='learner').one().id
+        admin_login = self.client.post('/api/auth/login',
+                                       json={'username': 'admin', 'password': 'Admin@123'}).get_json()
+        response = self.client.delete(f'/api/users/{user_id}',
+                                      headers={'Authorization': f"Bearer {admin_login['token']}"})
+        self.assertEqual(response.status_code, 200)
+        with app.app_context():
+            self.assertEqual(AuthSession.query.filter_by(user_id=user_id).count(), 0)
+        self.assertEqual(self._refresh(login['refresh_token']).status_code, 401)
+
+    def test_expired_sessions_are_purged_in_batches(self):
+        login = self._login()
+        with app.app_context():
+            user_id = User.query.one().id
+            past = datetime.utcnow() - timedelta(seconds=1)
+            db.session.add_all([AuthSession(user_id=user_id, refresh_hash=f'old{i}', expires_at=past)
+                                for i in range(5)])
+            db.session.commit()
+            self.assertEqual(SessionService.purge_expired(batch_size=2), 5)
+            self.assertEqual(AuthSession.query.count(), 1)
+        self.assertEqual(self._refresh(login['refresh_token']).status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import app, db
+from app.models import Task, Project, Technology, User
+from app.services.stats_service import StatsService
+from app.services.task_service import TaskService
+
+class StatsServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+
+        with app.app_context():
+            db.create_all()
+
+            user = User(username="stats", email="stats@example.com", password_hash="x")
+            alpha = Project(name="Alpha")
+            beta = Project(name="Beta")
+            python = Technology(name="Python")
+            flask = Technology(name="Flask")
+            db.session.add_all([user, alpha, beta, python, flask])
+            db.session.commit()
+
+            old = datetime.utcnow() - timedelta(days=30)
+            tasks = [
+                Task(name="a1", project_id=alpha.id, is_completed=True, assignee_id=user.id),
+                Task(name="a2", project_id=alpha.id, is_completed=False),
+                Task(name="b1", project_id=beta.id, is_completed=True, date_created=old),
+                Task(name="orphan", is_completed=False),
+            ]
+            tasks[0].technologies.append(python)
+            tasks[0].technologies.append(flask)
+            tasks[1].technologies.append(python)
+            tasks[2].technologies.append(flask)
+            tasks[3].technologies.append(python)
+            db.session.add_all(tasks)
+            db.session.commit()
+
+            self.user_id = user.id
+            self.alpha_id = alpha.id
+            self.python_id = python.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_completion_stats_by_both(self):
+        with app.app_context():
+            stats = TaskService.get_completion_stats()
+            self.assertEqual(stats["Alpha - Python"], 50)
+            self.assertEqual(stats["Alpha - Flask"], 100)
+            self.assertEqual(stats["Beta - Flask"], 100)
+            self.assertEqual(stats["Unknown Project - Python"], 0)
+
+    def test_completion_stats_by_project_and_technology(self):
+        with app.app_context():
+            by_project = TaskService.get_completion_stats(group_by="project")
+            self.assertAlmostEqual(by_project["Alpha"], 200 / 3)
+            by_tech = TaskService.get_completion_stats(group_by="technology")
+            self.assertAlmostEqual(by_tech["Python"], 100 / 3)
+            self.assertEqual(by_tech["Flask"], 100)
+
+    def test_completion_counts_filters(self):
+        with app.app_context():
+            rows = StatsService.completion_counts(project_id=self.alpha_id,
+                                                  technology_id=self.python_id)
+            self.assertEqual(len(rows), 1)
+            self.assertEqual(rows[0]['project_name'], "Alpha")
+            self.assertEqual(rows[0]['technology_name'], "Python")
+            self.assertEqual((rows[0]['total'], rows[0]['completed']), (2, 1))
+
+            rows = StatsService.completion_counts(group_by="project", assignee_id=self.user_id)
+            self.assertEqual([(r['project_name'], r['total']) for r in rows], [("Alpha", 2)])
+
+            since = datetime.utcnow() - timedelta(days=1)
+            rows = StatsService.completion_counts(group_by="project", start_date=since)
+            self.assertNotIn("Beta", [r['project_name'] for r in rows])
+
+    def test_completion_stats_single_query(self):
+        with app.app_context():
+            statements = []
+
+            def count(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            engine = db.engine
+            event.listen(engine, "before_cursor_execute", count)
+            try:
+                TaskService.get_completion_stats()
+            finally:
+                event.remove(engine, "before_cursor_execute", count)
+
+            self.assertEqual(len(statements), 1)
+
+if __name__ == '__main__':
+    unittest.main()
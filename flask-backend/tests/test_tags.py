@@ -0,0 +1,115 @@
+import unittest
+import json
+import jwt
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app import app, db
+from app.models import Note, Course, EntityTag
+from app.services.notes_service import NoteService, CourseService
+from app.services import tag_service
+from app.services.tag_service import TagService
+
+class TagIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        with app.app_context():
+            db.create_all()
+            self.both = NoteService.add_note("Both", tags=["python", "flask"], user_id=1).id
+            self.python = NoteService.add_note("Python", tags=["python", " python "], user_id=1).id
+            self.other = NoteService.add_note("Other", tags=["sql"], user_id=2).id
+            CourseService.add_course("Web", tags=["flask"], user_id=1)
+
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _note_ids(self, tags, mode='all'):
+        return sorted(note.id for note in NoteService.get_all_notes(tags=tags, tag_mode=mode))
+
+    def test_all_and_any_filters(self):
+        with app.app_context():
+            self.assertEqual(self._note_ids(["python"]), sorted([self.both, self.python]))
+            self.assertEqual(self._note_ids(["python", "flask"]), [self.both])
+            self.assertEqual(self._note_ids(["flask", "sql"], 'any'), sorted([self.both, self.other]))
+            self.assertEqual(self._note_ids(["missing"]), [])
+            self.assertEqual([c.name for c in CourseService.get_all_courses(tags=["flask"])], ["Web"])
+            with self.assertRaises(ValueError):
+                NoteService.get_all_notes(tags=["python"], tag_mode="some")
+
+    def test_index_follows_writes(self):
+        with app.app_context():
+            NoteService.update_note(self.python, tags=["sql"])
+            NoteService.delete_note(self.other)
+            self.assertEqual(self._note_ids(["sql"]), [self.python])
+            self.assertEqual(self._note_ids(["python"]), [self.both])
+            self.assertEqual(TagService.tag_counts('note'), [('flask', 1), ('python', 1), ('sql', 1)])
+
+    def test_tag_counts_and_rebuild(self):
+        with app.app_context():
+            self.assertEqual(TagService.tag_counts(), [('flask', 2), ('python', 2), ('sql', 1)])
+            self.assertEqual(TagService.tag_counts(owner_id=2), [('sql', 1)])
+
+            # Bulk inserts bypass the hook until the index is rebuilt
+            db.session.execute(insert(Note), [{'name': 'Bulk', 'tags': ['sql']}])
+            db.session.commit()
+            self.assertEqual(TagService.rebuild(), 6)
+            self.assertEqual(dict(TagService.tag_counts())['sql'], 2)
+            self.assertEqual(EntityTag.query.filter_by(entity_type='course').count(), 1)
+
+    def test_existing_databases_are_backfilled_on_read(self):
+        with app.app_context():
+            # What a database created before the tag index existed looks like
+            EntityTag.__table__.drop(db.engine)
+            tag_service._ready.clear()
+
+            self.assertEqual(TagService.tag_counts(), [('flask', 2), ('python', 2), ('sql', 1)])
+            self.assertEqual(self._note_ids(['python']), sorted([self.both, self.python]))
+
+    def test_existing_databases_are_backfilled_on_write(self):
+        with app.app_context():
+            db.session.query(EntityTag).delete()
+            db.session.commit()
+            tag_service._ready.clear()
+
+            NoteService.add_note("New", tags=["sql"], user_id=2)
+            self.assertIn(db.engine, tag_service._ready)
+            self.assertEqual(TagService.tag_counts(), [('flask', 2), ('python', 2), ('sql', 2)])
+
+    def test_endpoints(self):
+        response = self.client.get('/api/tags?type=note&limit=1', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), [{'tag': 'python', 'count': 2}])
+
+        response = self.client.get('/api/notes?tags=flask&tags=sql&tag_mode=any', headers=self.headers)
+        self.assertEqual(sorted(note['name'] for note in json.loads(response.data)), ['Both', 'Other'])
+        response = self.client.get('/api/notes?tags=flask&tag_mode=bogus', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_tag_cloud_is_limited_to_the_caller(self):
+        with app.app_context():
+            token = jwt.encode(
+                {'user_id': 2, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        headers = {'Authorization': f'Bearer {token}'}
+        for url in ('/api/tags', '/api/tags?user_id=1'):
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(json.loads(response.data), [{'tag': 'sql', 'count': 1}])
+
+        response = self.client.get('/api/tags?user_id=2', headers=self.headers)
+        self.assertEqual(json.loads(response.data), [{'tag': 'sql', 'count': 1}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+from app import app, db
+from app.models import Task, Project
+from app.services.task_graph_service import PrerequisiteGraph, TaskGraphService
+
+class PrerequisiteGraphTestCase(unittest.TestCase):
+    """In-memory graph algorithms"""
+
+    def test_diamond_has_no_duplicates(self):
+        # 4 depends on 2 and 3, which both depend on 1
+        graph = PrerequisiteGraph([(4, 2), (4, 3), (2, 1), (3, 1)])
+        self.assertEqual(sorted(graph.ancestors(4)), [1, 2, 3])
+        self.assertEqual(sorted(graph.ancestors(4, max_depth=1)), [2, 3])
+        self.assertEqual(sorted(graph.descendants(1)), [2, 3, 4])
+
+    def test_topological_order_and_closure(self):
+        graph = PrerequisiteGraph([(4, 2), (4, 3), (2, 1), (3, 1)])
+        order = graph.topological_order()
+        for task_id, prerequisite_id in [(4, 2), (4, 3), (2, 1), (3, 1)]:
+            self.assertLess(order.index(prerequisite_id), order.index(task_id))
+        closure = graph.transitive_closure()
+        self.assertEqual(closure[4], frozenset({1, 2, 3}))
+        self.assertEqual(closure[1], frozenset())
+
+    def test_cycles(self):
+        graph = PrerequisiteGraph([(3, 2), (2, 1)])
+        self.assertIsNone(graph.find_cycle())
+        self.assertTrue(graph.would_create_cycle(1, 3))
+        self.assertFalse(graph.would_create_cycle(3, 1))
+
+        graph.add_edge(1, 3)
+        cycle = graph.find_cycle()
+        self.assertEqual(cycle[0], cycle[-1])
+        self.assertEqual(set(cycle), {1, 2, 3})
+        with self.assertRaises(ValueError):
+            graph.topological_order()
+
+    def test_critical_path(self):
+        graph = PrerequisiteGraph([(4, 2), (4, 3), (2, 1), (3, 1)],
+                                  durations={1: 2, 2: 5, 3: 1, 4: 3})
+        self.assertEqual(graph.critical_path(), (10, [1, 2, 4]))
+
+    def test_deep_chain_is_iterative(self):
+        edges = [(i + 1, i) for i in range(5000)]
+        graph = PrerequisiteGraph(edges)
+        self.assertEqual(len(graph.ancestors(5000)), 5000)
+        self.assertEqual(graph.topological_order()[0], 0)
+
+
+class TaskGraphServiceTestCase(unittest.TestCase):
+    """Graph loading and the Task model helpers"""
+
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+
+        with app.app_context():
+            db.create_all()
+            project = Project(name="Graph")
+            db.session.add(project)
+            db.session.commit()
+
+            tasks = [Task(name=f"t{i}", project_id=project.id, estimated_duration=i + 1)
+                     for i in range(4)]
+            db.session.add_all(tasks)
+            db.session.commit()
+            # Diamond: t3 -> t1, t2 -> t0
+            tasks[3].prerequisites.append(tasks[1])
+            tasks[3].prerequisites.append(tasks[2])
+            tasks[1].prerequisites.append(tasks[0])
+            tasks[2].prerequisites.append(tasks[0])
+            db.session.commit()
+
+            self.project_id = project.id
+            self.ids = [task.id for task in tasks]
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_get_prerequisites_unique(self):
+        with app.app_context():
+            task = Task.query.get(self.ids[3])
+            names = sorted(t.name for t in task.get_prerequisites())
+            self.assertEqual(names, ["t0", "t1", "t2"])
+            self.assertEqual(sorted(t.name for t in task.get_prerequisites(max_depth=1)),
+                             ["t1", "t2"])
+
+    def test_load_project_graph(self):
+        with app.app_context():
+            graph = TaskGraphService.get_graph(self.project_id)
+            t0, t1, t2, t3 = self.ids
+            self.assertEqual(graph.topological_order()[0], t0)
+            self.assertEqual(graph.critical_path(), (1 + 3 + 4, [t0, t2, t3]))
+
+    def test_add_prerequisite_rejects_cycle(self):
+        with app.app_context():
+            t0, t1, t2, t3 = self.ids
+            with self.assertRaises(ValueError):
+                TaskGraphService.add_prerequisite(t0, t3)
+            TaskGraphService.add_prerequisite(t3, t0)
+            self.assertIn(t0, [t.id for t in Task.query.get(t3).prerequisites])
+
+    def test_cte_matches_graph_traversal(self):
+        with app.app_context():
+            t0, t1, t2, t3 = self.ids
+            # Close a cycle so both strategies have to stop on their own
+            Task.query.get(t0).prerequisites.append(Task.query.get(t3))
+            db.session.commit()
+
+            task = Task.query.get(t3)
+            for depth in (1, 2, 3, None):
+                graph = [t.id for t in task.get_prerequisites(max_depth=depth, use_cte=False)]
+                cte = [t.id for t in task.get_prerequisites(max_depth=depth, use_cte=True)]
+                self.assertEqual(set(cte), set(graph), depth)
+                self.assertNotIn(t3, cte)
+
+    def test_cte_and_graph_traversal_agree_on_order(self):
+        with app.app_context():
+            t0, t1, t2, t3 = self.ids
+            task = Task.query.get(t3)
+            expected = {0: [], 1: [t1, t2], None: [t0, t1, t2]}
+            for depth, ids in expected.items():
+                graph = [t.id for t in task.get_prerequisites(max_depth=depth, use_cte=False)]
+                cte = [t.id for t in task.get_prerequisites(max_depth=depth, use_cte=True)]
+                self.assertEqual(graph, ids, depth)
+                self.assertEqual(cte, ids, depth)
+
+    def test_cte_depth_order_and_dependents(self):
+        with app.app_context():
+            t0, t1, t2, t3 = self.ids
+            prerequisites = Task.query.get(t3).get_prerequisites(use_cte=True)
+            self.assertEqual([t.id for t in prerequisites], [t1, t2, t0])
+            dependents = Task.query.get(t0).get_dependents()
+            self.assertEqual([t.id for t in dependents], [t1, t2, t3])
+            self.assertEqual([t.id for t in Task.query.get(t0).get_dependents(max_depth=1)],
+                             [t1, t2])
+
+    def test_blocked_tasks(self):
+        with app.app_context():
+            t0, t1, t2, t3 = self.ids
+            blocked = TaskGraphService.get_blocked_tasks(self.project_id)
+            self.assertEqual([t.id for t in blocked], [t1, t2, t3])
+
+            for task_id in (t0, t1):
+                Task.query.get(task_id).is_completed = True
+            db.session.commit()
+            # t3 still waits on t2
+            self.assertEqual([t.id for t in TaskGraphService.get_blocked_tasks()], [t3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from app import app, db
+from app.models import Project, Technology, Progress, TaskRollup
+from app.services.task_service import TaskService
+from app.services import rollup_service
+from app.services.rollup_service import TaskRollupService
+
+class TaskRollupTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+
+        with app.app_context():
+            db.create_all()
+            alpha = Project(name="Alpha")
+            beta = Project(name="Beta")
+            python = Technology(name="Python")
+            flask = Technology(name="Flask")
+            db.session.add_all([alpha, beta, python, flask])
+            db.session.commit()
+            self.alpha_id, self.beta_id = alpha.id, beta.id
+            self.python_id, self.flask_id = python.id, flask.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _rollups(self):
+        return {(r.project_id, r.technology_id): (r.total_tasks, r.completed_tasks)
+                for r in TaskRollup.query.all() if r.total_tasks}
+
+    def test_incremental_updates(self):
+        with app.app_context():
+            t1 = TaskService.add_task("t1", project_id=self.alpha_id, technology_id=self.python_id)
+            t2 = TaskService.add_task("t2", project_id=self.alpha_id, technology_id=self.flask_id)
+            TaskService.add_task("t3", project_id=self.beta_id, technology_id=self.python_id,
+                                 is_completed=True)
+
+            self.assertEqual(Project.query.get(self.alpha_id).project_progress(), 0)
+            TaskService.complete_task(t1.id, True)
+            self.assertEqual(Project.query.get(self.alpha_id).project_progress(), 50)
+            self.assertEqual(Progress.calculate_progress('technology', self.python_id), 100)
+
+            # Moving a task between projects and technologies moves its counts
+            TaskService.update_task(t2.id, project_id=self.beta_id, technology_id=self.python_id)
+            self.assertEqual(Progress.calculate_progress('project', self.alpha_id), 100)
+            self.assertEqual(Progress.calculate_progress('technology', self.flask_id), 0)
+
+            TaskService.delete_task(t1.id)
+            self.assertEqual(Progress.calculate_progress('project', self.alpha_id), 0)
+            self.assertEqual(Progress.calculate_progress('project', self.beta_id), 50)
+
+    def test_rebuild_matches_incremental(self):
+        with app.app_context():
+            t1 = TaskService.add_task("t1", project_id=self.alpha_id, technology_id=self.python_id)
+            TaskService.add_task("t2", technology_id=self.flask_id, is_completed=True)
+            TaskService.add_task("t3", project_id=self.beta_id)
+            TaskService.complete_task(t1.id, True)
+
+            incremental = self._rollups()
+            TaskRollupService.rebuild()
+            self.assertEqual(self._rollups(), incremental)
+            self.assertEqual(incremental[(TaskRollup.ALL, TaskRollup.ALL)], (3, 2))
+
+    def _forget_rollups(self):
+        # What a database created before the rollups existed looks like
+        db.session.query(TaskRollup).delete()
+        db.session.commit()
+        rollup_service._ready.clear()
+
+    def test_existing_databases_are_backfilled_on_read(self):
+        with app.app_context():
+            TaskService.add_task("t1", project_id=self.alpha_id, technology_id=self.python_id,
+                                 is_completed=True)
+            TaskService.add_task("t2", project_id=self.alpha_id)
+            self._forget_rollups()
+
+            self.assertEqual(Progress.calculate_progress('project', self.alpha_id), 50)
+            self.assertEqual(Progress.calculate_progress('technology', self.python_id), 100)
+
+    def test_existing_databases_are_backfilled_on_write(self):
+        with app.app_context():
+            t1 = TaskService.add_task("t1", project_id=self.alpha_id, technology_id=self.python_id)
+            TaskService.add_task("t2", project_id=self.beta_id, is_completed=True)
+            self._forget_rollups()
+
+            TaskService.complete_task(t1.id, True)
+            TaskService.add_task("t3", project_id=self.alpha_id)
+            incremental = self._rollups()
+            self.assertEqual(incremental[(self.alpha_id, TaskRollup.ALL)], (2, 1))
+
+            TaskRollupService.rebuild()
+            self.assertEqual(self._rollups(), incremental)
+
+            self._forget_rollups()
+            TaskService.delete_task(t1.id)
+            self.assertEqual(self._rollups()[(TaskRollup.ALL, TaskRollup.ALL)], (2, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import jwt
+from datetime import datetime, timedelta
+from PIL import Image
+from app import app, db
+from app.config import Config
+from app.services import file_service, thumbnail_service
+from app.services.job_service import JobService
+from app.services.thumbnail_service import ThumbnailService
+from tests.test_document_pages import write_pdf
+
+
+class ThumbnailTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+        self.upload_folder = tempfile.mkdtemp()
+        self._file_service = file_service._file_service
+        file_service._file_service = file_service.FileService(self.upload_folder)
+        thumbnail_service._cache['bytes'] = None
+
+        photo = io.BytesIO()
+        Image.new('RGB', (2000, 1500), (30, 120, 200)).save(photo, 'JPEG')
+        self.photo = photo.getvalue()
+
+        with app.app_context():
+            db.create_all()
+            token = jwt.encode(
+                {'user_id': 1, 'is_admin': True, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                app.config['SECRET_KEY'],
+                algorithm='HS256'
+            )
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def tearDown(self):
+        app.config['THUMBNAIL_CACHE_BYTES'] = Config.THUMBNAIL_CACHE_BYTES
+        app.config['THUMBNAIL_PDF_RASTERIZER'] = Config.THUMBNAIL_PDF_RASTERIZER
+        thumbnail_service._cache['bytes'] = None
+        file_service._file_service = self._file_service
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _upload(self, data, name):
+        response = self.client.post('/api/documents', headers=self.headers,
+                                    data={'file': (io.BytesIO(data), name)},
+                                    content_type='multipart/form-data')
+        return json.loads(response.data)['id']
+
+    def _thumbnail(self, document_id, size=None, etag=None):
+        url = f'/api/documents/{document_id}/thumbnail' + (f'?size={size}' if size else '')
+        headers = dict(self.headers)
+        if etag:
+            headers['If-None-Match'] = etag
+        return self.client.get(url, headers=headers)
+
+    def _derivatives(self):
+        return sorted(path for _, _, path in ThumbnailService._files())
+
+    def test_sizes_etag_and_revalidation(self):
+        document_id = self._upload(self.photo, 'photo.jpg')
+        response = self._thumbnail(document_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertEqual(max(Image.open(io.BytesIO(response.data)).size), 320)
+        etag = response.headers['ETag']
+
+        response = self._thumbnail(document_id, etag=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self._thumbnail(document_id, 'small')
+        self.assertEqual(max(Image.open(io.BytesIO(response.data)).size), 128)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(self._thumbnail(document_id, 'huge').status_code, 400)
+
+    def test_signed_url_works_without_a_token(self):
+        document_id = self._upload(self.photo, 'photo.jpg')
+        with app.app_context():
+            JobService.work('worker', max_jobs=1)
+        response = self.client.get(f'/api/documents/{document_id}', headers=self.headers)
+        url = json.loads(response.data)['thumbnail_url']
+        self.assertIn('signature=', url)
+
+        response = self.client.get(url + '&size=small')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(max(Image.open(io.BytesIO(response.data)).size), 128)
+
+        # Tampered, expired or missing signatures still need the Bearer token
+        expires = int(url.split('expires=')[1].split('&')[0])
+        for bad in (url[:-1] + ('0' if url[-1] != '0' else '1'),
+                    url.replace(f'expires={expires}', f'expires={expires + 1}'),
+                    f'/api/documents/{document_id}/thumbnail'):
+            self.assertEqual(self.client.get(bad).status_code, 401, bad)
+        with app.app_context():
+            signature = ThumbnailService._signature(document_id, 1)
+        response = self.client.get(f'/api/documents/{document_id}/thumbnail'
+                                   f'?expires=1&signature={signature}')
+        self.assertEqual(response.status_code, 401)
+
+    def test_duplicates_share_derivatives_until_deleted(self):
+        first = self._upload(self.photo, 'photo.jpg')
+        second = self._upload(self.photo, 'copy.jpg')
+        self.assertEqual(self._thumbnail(first).headers['ETag'],
+                         self._thumbnail(second).headers['ETag'])
+        self.assertEqual(len(self._derivatives()), 1)
+
+        self.client.delete(f'/api/documents/{first}', headers=self.headers)
+        self.assertEqual(len(self._derivatives()), 1)
+        self.client.delete(f'/api/documents/{second}', headers=self.headers)
+        self.assertEqual(self._derivatives(), [])
+
+    def test_lru_eviction_under_quota(self):
+        document_id = self._upload(self.photo, 'photo.jpg')
+        self._thumbnail(document_id, 'large')
+        large = self._derivatives()[0]
+        os.utime(large, (1, 1))  # least recently used
+
+        app.config['THUMBNAIL_CACHE_BYTES'] = os.path.getsize(large)
+        self._thumbnail(document_id, 'small')
+        self.assertEqual([os.path.basename(path).split('_')[1] for path in self._derivatives()],
+                         ['small.jpg'])
+
+    def test_pdf_first_page_needs_rasterizer(self):
+        path = write_pdf(os.path.join(self.upload_folder, 'book.pdf'), ['Cover'])
+        with open(path, 'rb') as pdf:
+            document_id = self._upload(pdf.read(), 'book.pdf')
+        self.assertEqual(self._thumbnail(document_id).status_code, 404)
+
+        # Stand-in for e.g. pdftoppm: writes a portrait page image to {output}
+        app.config['THUMBNAIL_PDF_RASTERIZER'] = (
+            f'{sys.executable} -c "import sys; from PIL import Image; '
+            f'Image.new(\'RGB\', (600, 800), \'white\').save(sys.argv[1])" {{output}}')
+        response = self._thumbnail(document_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(response.data)).size, (240, 320))
+
+if __name__ == '__main__':
+    unittest.main()
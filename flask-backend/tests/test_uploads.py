@@ -0,0 +1,167 @@
+import unittest
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import jwt
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import app, db
+from app.config import Config
+from app.models import Document, UploadSession
+from app.services import file_service, upload_service
+from tests.test_document_pages import write_pdf
+
+
+class ResumableUploadTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        app.config['TESTING'] = True
+        app.config['UPLOAD_CHUNK_SIZE'] = 256
+        self.client = app.test_client()
+
+        self.upload_folder = tempfile.mkdtemp()
+        self._file_service = file_service._file_service
+        file_service._file_service = file_service.FileService(self.upload_folder)
+        path = write_pdf(os.path.join(self.upload_folder, 'source.pdf'),
+                         [f'Slide {i}' for i in range(1, 4)])
+        with open(path, 'rb') as pdf:
+            self.pdf = pdf.read()
+
+        with app.app_context():
+            db.create_all()
+        self.headers = self._headers(1)
+
+    def tearDown(self):
+        app.config['UPLOAD_CHUNK_SIZE'] = Config.UPLOAD_CHUNK_SIZE
+        app.config['MAX_UPLOAD_SIZE'] = Config.MAX_UPLOAD_SIZE
+        file_service._file_service = self._file_service
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, user_id):
+        token = jwt.encode(
+            {'user_id': user_id, 'is_admin': False, 'exp': datetime.utcnow() + timedelta(hours=1)},
+            app.config['SECRET_KEY'],
+            algorithm='HS256'
+        )
+        return {'Authorization': f'Bearer {token}'}
+
+    def _start(self, **fields):
+        data = {'filename': 'deck.pdf', 'size': len(self.pdf)}
+        data.update(fields)
+        response = self.client.post('/api/uploads', json=data, headers=self.headers)
+        return response.status_code, json.loads(response.data)
+
+    def _put(self, upload_id, offset, chunk):
+        response = self.client.put(f'/api/uploads/{upload_id}', data=chunk,
+                                   headers={**self.headers, 'Upload-Offset': str(offset)})
+        return response.status_code, json.loads(response.data)
+
+    def _send_all(self, upload_id, start=0, chunk_size=200):
+        for offset in range(start, len(self.pdf), chunk_size):
+            status, body = self._put(upload_id, offset, self.pdf[offset:offset + chunk_size])
+            self.assertEqual(status, 200, body)
+        return body
+
+    def test_chunked_upload_creates_document(self):
+        status, upload = self._start(sha256=hashlib.sha256(self.pdf).hexdigest(), tags=['deck'])
+        self.assertEqual(status, 201)
+        self.assertEqual(upload['offset'], 0)
+        self.assertEqual(upload['chunk_size'], 256)
+
+        body = self._send_all(upload['id'])
+        self.assertEqual(body['offset'], len(self.pdf))
+
+        response = self.client.post(f"/api/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        document = json.loads(response.data)
+        self.assertEqual(document['status'], 'PENDING')
+        self.assertEqual(document['file_size'], len(self.pdf))
+        with open(document['file_url'], 'rb') as stored:
+            self.assertEqual(stored.read(), self.pdf)
+        with app.app_context():
+            self.assertEqual(db.session.get(Document, document['id']).tags, ['deck'])
+            self.assertEqual(db.session.get(Document, document['id']).uploaded_by, 1)
+            self.assertEqual(UploadSession.query.count(), 0)
+
+    def test_resume_after_interruption(self):
+        _, upload = self._start(sha256=hashlib.sha256(self.pdf).hexdigest())
+        self._put(upload['id'], 0, self.pdf[:200])
+
+        # A retry of an old chunk is refused with the offset to resume from
+        status, body = self._put(upload['id'], 0, self.pdf[:200])
+        self.assertEqual(status, 409)
+        self.assertEqual(body['offset'], 200)
+
+        # Another worker process (no cached hash state) picks up from the offset
+        upload_service._hashers.clear()
+        response = self.client.get(f"/api/uploads/{upload['id']}", headers=self.headers)
+        self.assertEqual(json.loads(response.data)['offset'], 200)
+        self._send_all(upload['id'], start=200)
+        response = self.client.post(f"/api/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+
+    def test_concurrent_chunk_is_refused(self):
+        _, upload = self._start()
+        self._put(upload['id'], 0, self.pdf[:200])
+        with app.app_context():
+            db.session.execute(update(UploadSession).values(
+                locked_by='other-request', lease_expires_at=datetime.utcnow() + timedelta(minutes=1)))
+            db.session.commit()
+
+        status, body = self._put(upload['id'], 200, self.pdf[200:400])
+        self.assertEqual(status, 409)
+        self.assertEqual(body['offset'], 200)
+
+        # The other request died: its lease runs out and the offset is free again
+        with app.app_context():
+            db.session.execute(update(UploadSession).values(
+                lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            db.session.commit()
+        body = self._send_all(upload['id'], start=200)
+        self.assertEqual(body['offset'], len(self.pdf))
+        with app.app_context():
+            self.assertIsNone(db.session.get(UploadSession, upload['id']).locked_by)
+        response = self.client.post(f"/api/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+
+    def test_early_rejections(self):
+        status, _ = self._start(filename='virus.exe')
+        self.assertEqual(status, 415)
+        app.config['MAX_UPLOAD_SIZE'] = 100
+        status, _ = self._start()
+        self.assertEqual(status, 413)
+        app.config['MAX_UPLOAD_SIZE'] = Config.MAX_UPLOAD_SIZE
+
+        _, upload = self._start()
+        status, _ = self._put(upload['id'], 0, b'MZ' + self.pdf[2:200])
+        self.assertEqual(status, 415)
+        status, _ = self._put(upload['id'], 0, self.pdf[:300])  # over UPLOAD_CHUNK_SIZE
+        self.assertEqual(status, 413)
+
+        response = self.client.post(f"/api/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+        response = self.client.get(f"/api/uploads/{upload['id']}", headers=self._headers(2))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post('/api/documents', headers=self.headers,
+                                    data={'file': (io.BytesIO(b'MZ not a pdf'), 'notes.pdf')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+
+    def test_checksum_mismatch_discards_upload(self):
+        _, upload = self._start(sha256='0' * 64)
+        self._send_all(upload['id'])
+        response = self.client.post(f"/api/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 422)
+        response = self.client.get(f"/api/uploads/{upload['id']}", headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(os.path.exists(file_service.get_file_service().partial_path(upload['id'])))
+
+if __name__ == '__main__':
+    unittest.main()